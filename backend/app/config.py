@@ -10,12 +10,201 @@ JWT_SECRET = SECRET_KEY  # alias
 ALGORITHM = os.environ.get("ALGORITHM") or os.environ.get("JWT_ALGO", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
+# Password hashing - bcrypt cost and the executor that runs it off the request path.
+# PASSWORD_HASH_EXECUTOR is "thread" (bcrypt releases the GIL, so threads use several
+# cores), "process" (spawns the worker interpreters at startup) or "inline".
+# Changing BCRYPT_ROUNDS rehashes each user's password at their next login.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_EXECUTOR = os.environ.get("PASSWORD_HASH_EXECUTOR", "thread").lower()
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Database pools (sync and async engines; ignored for SQLite)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE_SECONDS = int(os.environ.get("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_TIMEOUT_SECONDS = float(os.environ.get("DB_POOL_TIMEOUT_SECONDS", "30"))
+
+# Schema bootstrap - tables are created by "python -m app.database.bootstrap" (run once per
+# environment), not at import. DB_CREATE_TABLES=true also creates missing tables at startup,
+# handy for local development; leave it off on serverless so cold starts skip the DDL round-trips.
+DB_CREATE_TABLES = os.environ.get("DB_CREATE_TABLES", "false").lower() == "true"
+
+# Auth caches - decoded tokens (LRU, kept until the token expires) and users
+# (short TTL, so a deleted user loses access within AUTH_USER_CACHE_TTL_SECONDS)
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", "4096"))
+AUTH_USER_CACHE_SIZE = int(os.environ.get("AUTH_USER_CACHE_SIZE", "1024"))
+AUTH_USER_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_USER_CACHE_TTL_SECONDS", "30"))
+
 # API Keys
 HF_TOKEN = os.environ.get("HF_TOKEN", "")
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
 
+# Gemini - model name and size of the dedicated thread pool for SDK calls
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_MAX_WORKERS = int(os.environ.get("GEMINI_MAX_WORKERS", "16"))
+# Structured output - ask Gemini for schema-constrained JSON (response_mime_type/response_schema)
+# and parse it strictly, with one cheap repair pass (prose or code fences around the object, a
+# trailing comma, "Summary:/Tone:" lines) before the answer counts as a failure and is retried.
+# false: free-form answers read by the lenient parser, which never fails.
+GEMINI_JSON_MODE = os.environ.get("GEMINI_JSON_MODE", "true").lower() == "true"
+
+# HuggingFace HTTP client - one pooled client shared by the whole process
+HF_POOL_MAX_CONNECTIONS = int(os.environ.get("HF_POOL_MAX_CONNECTIONS", "100"))
+HF_POOL_MAX_KEEPALIVE = int(os.environ.get("HF_POOL_MAX_KEEPALIVE", "20"))
+HF_KEEPALIVE_EXPIRY = float(os.environ.get("HF_KEEPALIVE_EXPIRY", "30"))
+HF_HTTP2 = os.environ.get("HF_HTTP2", "false").lower() == "true"
+
+# Result cache for /analyze - backend is one of: memory, sqlite, postgres, none
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory").lower()
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL_SECONDS = int(os.environ.get("CACHE_TTL_SECONDS", "3600"))
+CACHE_SQLITE_PATH = os.environ.get("CACHE_SQLITE_PATH", "analysis_cache.db")
+
+# Batch analysis - items per request, texts per upstream call, upstream calls in flight
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "100"))
+BATCH_HF_SIZE = int(os.environ.get("BATCH_HF_SIZE", "8"))
+BATCH_GEMINI_SIZE = int(os.environ.get("BATCH_GEMINI_SIZE", "5"))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
+
+# Long documents - texts over LONG_DOC_THRESHOLD_TOKENS (estimated subword tokens; BART-MNLI
+# silently truncates past 1024) are split on paragraph/sentence boundaries into chunks of at most
+# CHUNK_MAX_TOKENS. Chunks are classified concurrently (CHUNK_CONCURRENCY calls in flight) with
+# scores averaged by chunk size, and summarized map-reduce style: one summary per chunk, then
+# summaries of the summaries, LONG_DOC_REDUCE_MAX_TOKENS at a time, until one remains.
+# MAX_TEXT_LENGTH (characters) bounds every analyzed text.
+LONG_DOC_ENABLED = os.environ.get("LONG_DOC_ENABLED", "true").lower() == "true"
+LONG_DOC_THRESHOLD_TOKENS = int(os.environ.get("LONG_DOC_THRESHOLD_TOKENS", "900"))
+CHUNK_MAX_TOKENS = int(os.environ.get("CHUNK_MAX_TOKENS", "700"))
+CHUNK_CONCURRENCY = int(os.environ.get("CHUNK_CONCURRENCY", "4"))
+LONG_DOC_REDUCE_MAX_TOKENS = int(os.environ.get("LONG_DOC_REDUCE_MAX_TOKENS", "2000"))
+MAX_TEXT_LENGTH = int(os.environ.get("MAX_TEXT_LENGTH", "200000"))
+
+# Pipeline mode for /analyze: "sequential" (HF, then Gemini with the category) or
+# "parallel" (category-agnostic Gemini call runs alongside HF).
+# Parallel re-run policy: "mismatch" re-runs Gemini when its category guess
+# disagrees with HF, "never" always keeps the speculative result.
+PIPELINE_MODE = os.environ.get("PIPELINE_MODE", "sequential").lower()
+PARALLEL_RERUN_POLICY = os.environ.get("PARALLEL_RERUN_POLICY", "mismatch").lower()
+
+# Adaptive upstream concurrency limits (AIMD bulkheads) - starting/min/max calls in flight
+# per upstream, and the latency above which a call counts as a congestion signal.
+# Callers beyond the limit wait in a queue of LIMITER_MAX_QUEUE for at most
+# LIMITER_QUEUE_TIMEOUT_MS, then get a fast 503 with Retry-After.
+HF_CONCURRENCY_INITIAL = int(os.environ.get("HF_CONCURRENCY_INITIAL", "16"))
+HF_CONCURRENCY_MIN = int(os.environ.get("HF_CONCURRENCY_MIN", "2"))
+HF_CONCURRENCY_MAX = int(os.environ.get("HF_CONCURRENCY_MAX", str(HF_POOL_MAX_CONNECTIONS)))
+HF_LATENCY_TARGET_MS = int(os.environ.get("HF_LATENCY_TARGET_MS", "10000"))
+GEMINI_CONCURRENCY_INITIAL = int(os.environ.get("GEMINI_CONCURRENCY_INITIAL", "8"))
+GEMINI_CONCURRENCY_MIN = int(os.environ.get("GEMINI_CONCURRENCY_MIN", "1"))
+GEMINI_CONCURRENCY_MAX = int(os.environ.get("GEMINI_CONCURRENCY_MAX", str(GEMINI_MAX_WORKERS)))
+GEMINI_LATENCY_TARGET_MS = int(os.environ.get("GEMINI_LATENCY_TARGET_MS", "15000"))
+LIMITER_MAX_QUEUE = int(os.environ.get("LIMITER_MAX_QUEUE", "100"))
+LIMITER_QUEUE_TIMEOUT_MS = int(os.environ.get("LIMITER_QUEUE_TIMEOUT_MS", "2000"))
+
+# Circuit breakers (one per upstream) - trip after BREAKER_FAILURE_THRESHOLD consecutive
+# failures or a BREAKER_ERROR_RATE failure rate over the last BREAKER_WINDOW calls
+# (at least BREAKER_MIN_CALLS), stay open BREAKER_RESET_TIMEOUT_S, then let
+# BREAKER_HALF_OPEN_PROBES probe calls through before closing again.
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_ERROR_RATE = float(os.environ.get("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_WINDOW = int(os.environ.get("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.environ.get("BREAKER_MIN_CALLS", "10"))
+BREAKER_RESET_TIMEOUT_S = float(os.environ.get("BREAKER_RESET_TIMEOUT_S", "30"))
+BREAKER_HALF_OPEN_PROBES = int(os.environ.get("BREAKER_HALF_OPEN_PROBES", "1"))
+
+# Retries - exponential backoff with full jitter between RETRY_BASE_DELAY_MS and
+# RETRY_MAX_DELAY_MS, and a process-wide budget: retries stay below
+# RETRY_BUDGET_RATIO x first attempts (plus RETRY_BUDGET_MIN_PER_SEC).
+RETRY_BASE_DELAY_MS = int(os.environ.get("RETRY_BASE_DELAY_MS", "500"))
+RETRY_MAX_DELAY_MS = int(os.environ.get("RETRY_MAX_DELAY_MS", "8000"))
+RETRY_BUDGET_RATIO = float(os.environ.get("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN_PER_SEC = float(os.environ.get("RETRY_BUDGET_MIN_PER_SEC", "1"))
+
+# End-to-end request deadline in seconds; clients may ask for less (or more, up to
+# REQUEST_TIMEOUT_MAX_S) with the X-Request-Timeout header
+REQUEST_TIMEOUT_S = float(os.environ.get("REQUEST_TIMEOUT_S", "90"))
+REQUEST_TIMEOUT_MAX_S = float(os.environ.get("REQUEST_TIMEOUT_MAX_S", "300"))
+
+# Coalesce concurrent /analyze requests for the same text and labels into one pipeline run
+COALESCE_REQUESTS = os.environ.get("COALESCE_REQUESTS", "true").lower() == "true"
+
+# Metrics - in-process registry exposed at GET /metrics (Prometheus text format)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+
+# Tracing - per-request spans on the monotonic clock (auth, DB, upstream attempts, retry
+# waits, serialization). Clients get the breakdown in meta.spans with ?verbose=true;
+# TRACE_EXPORT_PATH appends every finished trace to a JSONL file (one span per line)
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+TRACE_EXPORT_PATH = os.environ.get("TRACE_EXPORT_PATH", "")
+
+# Analysis history - results are buffered in memory and inserted in batches off the
+# request path (every HISTORY_FLUSH_INTERVAL_MS, or sooner once HISTORY_BATCH_SIZE rows
+# are waiting). Past HISTORY_MAX_BUFFER rows (database down) new rows are dropped.
+# A batch the database rejects is bisected to isolate the bad rows, which are retried
+# on later flushes and dropped after HISTORY_MAX_ATTEMPTS.
+HISTORY_ENABLED = os.environ.get("HISTORY_ENABLED", "true").lower() == "true"
+HISTORY_BATCH_SIZE = int(os.environ.get("HISTORY_BATCH_SIZE", "100"))
+HISTORY_FLUSH_INTERVAL_MS = int(os.environ.get("HISTORY_FLUSH_INTERVAL_MS", "500"))
+HISTORY_MAX_BUFFER = int(os.environ.get("HISTORY_MAX_BUFFER", "10000"))
+HISTORY_MAX_ATTEMPTS = int(os.environ.get("HISTORY_MAX_ATTEMPTS", "3"))
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", "20"))
+HISTORY_MAX_PAGE_SIZE = int(os.environ.get("HISTORY_MAX_PAGE_SIZE", "100"))
+
 # Mock Mode - set to "true" to use fake responses instead of real APIs
 MOCK_MODE = os.environ.get("MOCK_MODE", "false").lower() == "true"
 
+# Mock engine - seeded latency and fault model behind MOCK_MODE's fake services, and behind
+# MOCK_UPSTREAMS, which keeps the real HuggingFace/Gemini services (retries, deadlines,
+# limiters, breakers) but points them at simulated endpoints instead of the network.
+# Latency specs in ms: "fixed:ms=300", "uniform:low=100,high=500",
+# "lognormal:median=400,sigma=0.5" or "replay:p50=420,p90=900,p99=2500" (interpolated
+# between recorded percentiles). Fault rates are per upstream attempt, from 0 to 1; a
+# timeout hangs until the caller's timeout expires.
+MOCK_UPSTREAMS = os.environ.get("MOCK_UPSTREAMS", "false").lower() == "true"
+MOCK_SEED = int(os.environ.get("MOCK_SEED", "0"))
+MOCK_HF_LATENCY = os.environ.get("MOCK_HF_LATENCY", "uniform:low=100,high=500")
+MOCK_GEMINI_LATENCY = os.environ.get("MOCK_GEMINI_LATENCY", "uniform:low=200,high=800")
+MOCK_TOKEN_LATENCY = os.environ.get("MOCK_TOKEN_LATENCY", "uniform:low=10,high=50")
+MOCK_HF_LOADING_RATE = float(os.environ.get("MOCK_HF_LOADING_RATE", "0"))
+MOCK_HF_LOADING_ESTIMATED_S = float(os.environ.get("MOCK_HF_LOADING_ESTIMATED_S", "1"))
+MOCK_HF_TIMEOUT_RATE = float(os.environ.get("MOCK_HF_TIMEOUT_RATE", "0"))
+MOCK_GEMINI_TIMEOUT_RATE = float(os.environ.get("MOCK_GEMINI_TIMEOUT_RATE", "0"))
+MOCK_GEMINI_PARSE_ERROR_RATE = float(os.environ.get("MOCK_GEMINI_PARSE_ERROR_RATE", "0"))
+
+# Classifier backend: "hf" (remote BART-MNLI), "mock" or "local" (in-process CPU engine).
+# LOCAL_CLASSIFIER_MODEL optionally names a transformers zero-shot model for "local".
+CLASSIFIER_BACKEND = os.environ.get("CLASSIFIER_BACKEND", "mock" if MOCK_MODE else "hf").lower()
+LOCAL_CLASSIFIER_MODEL = os.environ.get("LOCAL_CLASSIFIER_MODEL", "")
+LOCAL_CLASSIFIER_WORKERS = int(os.environ.get("LOCAL_CLASSIFIER_WORKERS", "2"))
+
+# Two-stage classification - BART-MNLI runs one NLI pass per candidate label. With
+# LABEL_PREFILTER_TOP_K > 0, HuggingFace classification first ranks the labels locally (hashed
+# bag-of-words similarity to label descriptions) and only sends the top K; pruned labels come
+# back with score 0 in hf_scores and are listed in meta.pruned_labels. 0 sends every label.
+LABEL_PREFILTER_TOP_K = int(os.environ.get("LABEL_PREFILTER_TOP_K", "0"))
+
+# Label sets - named per-user candidate label lists, passed to /analyze as label_set_id
+# (DEFAULT_LABELS otherwise). Resolved sets are kept in a per-process LRU for
+# LABEL_SET_CACHE_TTL_SECONDS; an update or delete drops this process's entry at once,
+# other workers pick it up within the TTL.
+LABEL_SET_MAX_LABELS = int(os.environ.get("LABEL_SET_MAX_LABELS", "32"))
+LABEL_SET_CACHE_SIZE = int(os.environ.get("LABEL_SET_CACHE_SIZE", "1024"))
+LABEL_SET_CACHE_TTL_SECONDS = float(os.environ.get("LABEL_SET_CACHE_TTL_SECONDS", "60"))
+# Hashed label-description vectors kept by the label pre-filter and the local classifier
+LABEL_CENTROID_CACHE_SIZE = int(os.environ.get("LABEL_CENTROID_CACHE_SIZE", "4096"))
+
+# Near-duplicate reuse - with DEDUP_ENABLED, an /analyze text missing the exact result cache
+# may reuse the result of an earlier text with the same labels and models whose 256-bit SimHash
+# fingerprint (word 3-grams; case, whitespace and URL query strings ignored) has a similarity
+# (1 - differing bits / 256) of at least DEDUP_THRESHOLD. A changed word or an added sentence
+# leaves ~0.85-0.95; unrelated texts sharing boilerplate reach ~0.75, and different texts sharing
+# most of their sentences ~0.8 (see benchmarks/bench_dedup.py). Texts under DEDUP_MIN_WORDS words are
+# only matched exactly. The index keeps the DEDUP_MAX_ENTRIES most recent results and is
+# rebuilt at startup from the fingerprints stored with the history.
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "false").lower() == "true"
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0.85"))
+DEDUP_MIN_WORDS = int(os.environ.get("DEDUP_MIN_WORDS", "50"))
+DEDUP_MAX_ENTRIES = int(os.environ.get("DEDUP_MAX_ENTRIES", "10000"))
+
 # Validation
 MIN_TEXT_LENGTH = 20
@@ -0,0 +1,66 @@
+"""
+Database bootstrap
+Creates the PostgreSQL database if it is missing, then the tables.
+Nothing here runs when the app is imported: run it once per environment
+
+    python -m app.database.bootstrap
+
+or set DB_CREATE_TABLES=true to create missing tables at app startup.
+"""
+from sqlalchemy.engine import make_url
+from app.database.base import Base
+from app.database.connection import DATABASE_URL, engine
+
+
+def register_models() -> None:
+    """Import every model so its table is registered on Base.metadata"""
+    from app.models.user import User  # noqa: F401
+    from app.models.cache_entry import CacheEntry  # noqa: F401
+    from app.models.analysis import Analysis  # noqa: F401
+    from app.models.label_set import LabelSet  # noqa: F401
+
+
+def ensure_database() -> None:
+    """Create the PostgreSQL database named in DATABASE_URL when it does not exist"""
+    url = make_url(DATABASE_URL)
+    if url.get_backend_name() != "postgresql":
+        return
+    import psycopg2
+    from psycopg2 import sql
+    from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+    conn = psycopg2.connect(
+        dbname="postgres", user=url.username, password=url.password, host=url.host, port=url.port,
+        **({"sslmode": url.query["sslmode"]} if "sslmode" in url.query else {})
+    )
+    try:
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (url.database,))
+            if cur.fetchone():
+                print(f"ℹ Database '{url.database}' already exists.")
+            else:
+                cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(url.database)))
+                print(f"Database '{url.database}' created.")
+    finally:
+        conn.close()
+
+
+def create_tables() -> None:
+    """Create missing tables (existing ones are left untouched)"""
+    register_models()
+    Base.metadata.create_all(bind=engine)
+
+
+def main() -> None:
+    try:
+        ensure_database()
+    except Exception as e:
+        # Managed databases (Neon...) usually exist already and may refuse the postgres database
+        print(f"Could not create/check database: {e}")
+    create_tables()
+    print(f"✅ Tables ready: {', '.join(sorted(Base.metadata.tables))}")
+
+
+if __name__ == "__main__":
+    main()
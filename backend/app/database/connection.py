@@ -1,13 +1,29 @@
 """
 Database Connection Module
 Supports both local PostgreSQL and Neon (via DATABASE_URL)
+
+Two engines share the same database:
+- engine / SessionLocal / get_db: sync psycopg2 engine (threadpool routes)
+- get_async_engine / get_async_db: SQLAlchemy asyncio engine (asyncpg for
+  PostgreSQL, aiosqlite for SQLite), created on first use so the async
+  drivers are only needed when async routes run
+
+Importing this module opens no connection: creating the database and its
+tables is left to app.database.bootstrap.
 """
 import os
+from typing import TYPE_CHECKING, AsyncIterator
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from urllib.parse import quote_plus
 from dotenv import load_dotenv
 from app.database.base import Base
+from app.utils.metrics import instrument_engine
+from app.config import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE_SECONDS, DB_POOL_TIMEOUT_SECONDS
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
 
 # Load environment variables
 load_dotenv()
@@ -40,34 +56,49 @@ else:
     DB_PASS_ENCODED = quote_plus(DB_PASS)
     DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASS_ENCODED}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     
-    # Only try to create database locally (not in serverless)
-    if os.environ.get("VERCEL") != "1":
-        try:
-            import psycopg2
-            from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-            
-            conn = psycopg2.connect(
-                dbname="postgres", user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT
-            )
-            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-            cur = conn.cursor()
-            cur.execute(f"SELECT 1 FROM pg_database WHERE datname='{DB_NAME}';")
-            exists = cur.fetchone()
-            if not exists:
-                cur.execute(f"CREATE DATABASE {DB_NAME};")
-                print(f"Database '{DB_NAME}' created.")
-            else:
-                print(f"ℹ Database '{DB_NAME}' already exists.")
-            cur.close()
-            conn.close()
-        except Exception as e:
-            print(f"Could not create/check database: {e}")
-    
     print("✅ Using local PostgreSQL")
 
+
+def _pool_options(url: str) -> dict:
+    """Pool settings from config; SQLite uses SQLAlchemy's own pooling defaults"""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+        "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+    }
+
+
+def to_async_url(url: str) -> str:
+    """
+    Async driver URL for a sync DATABASE_URL.
+    postgresql(+psycopg2) -> postgresql+asyncpg (sslmode becomes asyncpg's ssl),
+    sqlite -> sqlite+aiosqlite.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        query = {k: v for k, v in parsed.query.items() if k != "sslmode"}
+        return parsed.set(drivername="sqlite+aiosqlite", query=query).render_as_string(hide_password=False)
+    if backend == "postgresql":
+        query = dict(parsed.query)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return parsed.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+    return url
+
+
 # SQLAlchemy setup
-engine = create_engine(DATABASE_URL, future=True, echo=False, pool_pre_ping=True)
+engine = create_engine(DATABASE_URL, future=True, echo=False, pool_pre_ping=True, **_pool_options(DATABASE_URL))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+instrument_engine(engine)
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+_async_engine = None
+_async_sessionmaker = None
 
 
 def get_db():
@@ -77,3 +108,47 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_async_engine():
+    """Return the process-wide async engine, creating it on first use"""
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL, echo=False, pool_pre_ping=True, **_pool_options(ASYNC_DATABASE_URL)
+        )
+        instrument_engine(_async_engine.sync_engine)
+    return _async_engine
+
+
+def get_async_sessionmaker():
+    """Return the AsyncSession factory bound to the async engine"""
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        _async_sessionmaker = async_sessionmaker(get_async_engine(), expire_on_commit=False, autoflush=False)
+    return _async_sessionmaker
+
+
+async def get_async_db() -> AsyncIterator["AsyncSession"]:
+    """Dependency for async routes - yields an AsyncSession"""
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+async def dispose_async_engine() -> None:
+    """Close pooled async connections (called from the app lifespan)"""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_sessionmaker = None
+
+
+async def get_session_factory():
+    """
+    Dependency for async code that opens its own short-lived AsyncSessions.
+    Async, so resolving it needs no threadpool hop.
+    """
+    return get_async_sessionmaker()
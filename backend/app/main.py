@@ -1,13 +1,53 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers.db_check import router as db_router
 from app.routers.auth import router as auth_router
 from app.routers.analyze import router as analyze_router
+from app.routers.label_sets import router as label_sets_router
+from app.routers.metrics import router as metrics_router
+from app.services import huggingface_service
+from app.services.classifier_service import check_backend
+from app.database.connection import dispose_async_engine
+from app.utils.password_hasher import password_hasher
+from app.services.history_service import history_writer
+from app.services.dedup_service import near_duplicates
+from app.utils.retry import DeadlineMiddleware
+from app.utils.metrics import MetricsMiddleware
+from app.utils.tracing import TracingMiddleware, span_exporter
+from app.config import CLASSIFIER_BACKEND, DB_CREATE_TABLES, DEDUP_ENABLED
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared upstream clients and worker pools on startup; close them (and pooled DB connections) on shutdown"""
+    # A misspelled backend would otherwise only fail on the first /analyze request
+    check_backend(CLASSIFIER_BACKEND)
+    if DB_CREATE_TABLES:
+        from app.database.bootstrap import create_tables
+        await asyncio.to_thread(create_tables)
+    await huggingface_service.start_client()
+    password_hasher.start()
+    await history_writer.start()
+    if DEDUP_ENABLED:
+        await near_duplicates.rebuild()
+    try:
+        yield
+    finally:
+        await history_writer.stop()
+        await huggingface_service.close_client()
+        password_hasher.shutdown()
+        await dispose_async_engine()
+        if span_exporter is not None:
+            span_exporter.close()
+
 
 app = FastAPI(
     title="Hybrid Analyzer API",
     description="Text analysis using HuggingFace + Gemini AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware - must specify exact origin when using credentials
@@ -23,10 +63,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+def _route_template(scope) -> str:
+    """Full path template of the matched route, e.g. /analyze/history ("unmatched" for 404s)"""
+    # Recent FastAPI versions nest included routers, leaving the prefix-less path on scope["route"]
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if getattr(context, "path", None):
+        return context.path
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+# Plain ASGI middleware (no extra task per request); both cover streamed bodies until the last chunk
+app.add_middleware(MetricsMiddleware, route_template=_route_template)
+app.add_middleware(DeadlineMiddleware)
+
+# Outermost, so auth, validation and serialization happen inside the trace
+app.add_middleware(TracingMiddleware, route_template=_route_template)
+
+
 # Routers
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(analyze_router, prefix="/analyze", tags=["Analysis"])
+app.include_router(label_sets_router, prefix="/label-sets", tags=["Label sets"])
 app.include_router(db_router, tags=["Database"])
+app.include_router(metrics_router, tags=["Metrics"])
 
 
 @app.get("/")
@@ -36,7 +97,8 @@ async def root():
         "docs": "/docs",
         "endpoints": {
             "auth": "/auth",
-            "analyze": "/analyze"
+            "analyze": "/analyze",
+            "label_sets": "/label-sets"
         }
     }
 
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, Boolean, DateTime, JSON, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database.base import Base
+
+
+class Analysis(Base):
+    """One analysis result delivered to a user (the /analyze/history rows)"""
+    __tablename__ = "analyses"
+    
+    # BIGINT on Postgres; SQLite only autoincrements INTEGER primary keys
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    text_hash = Column(String(64), nullable=False)
+    category = Column(String(64), nullable=False)
+    hf_scores = Column(JSON, nullable=False)
+    summary = Column(Text, nullable=False)
+    tone = Column(String(32), nullable=False)
+    hf_latency_ms = Column(Integer, nullable=False, default=0)
+    gemini_latency_ms = Column(Integer, nullable=False, default=0)
+    total_execution_ms = Column(Integer, nullable=False, default=0)
+    cached = Column(Boolean, nullable=False, default=False)
+    # Near-duplicate index: SimHash of the text (hex) and hash of its labels and models
+    # (NULL when not fingerprinted); the index is rebuilt from these at startup
+    fingerprint = Column(String(64), nullable=True)
+    context_key = Column(String(16), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    # Keyset pagination: newest-first pages of one user, optionally of one category
+    __table_args__ = (
+        Index("ix_analyses_user_id_id", "user_id", "id"),
+        Index("ix_analyses_user_id_category_id", "user_id", "category", "id"),
+    )
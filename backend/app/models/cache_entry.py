@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Text, Float
+from app.database.base import Base
+
+
+class CacheEntry(Base):
+    """Row of the database-backed /analyze result cache"""
+    __tablename__ = "analysis_cache"
+    
+    key = Column(String(64), primary_key=True)
+    value = Column(Text, nullable=False)
+    expires_at = Column(Float, nullable=False, index=True)
+    accessed_at = Column(Float, nullable=False, index=True)
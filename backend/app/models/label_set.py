@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database.base import Base
+
+
+class LabelSet(Base):
+    """Named list of candidate labels owned by one user (the /label-sets rows)"""
+    __tablename__ = "label_sets"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String(64), nullable=False)
+    labels = Column(JSON, nullable=False)
+    # Bumped on every update, so a cached copy can tell it is stale
+    version = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="uq_label_sets_user_id_name"),
+    )
@@ -4,14 +4,49 @@ Protected by JWT authentication
 Supports MOCK_MODE for testing without external APIs
 """
 import time
+import json
+import asyncio
 import logging
-from fastapi import APIRouter, Depends, HTTPException
-from app.schemas.analyze_schema import AnalyzeRequest, AnalyzeResponse, MetaInfo
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, AsyncIterator
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.analyze_schema import (
+    AnalyzeRequest, AnalyzeResponse, MetaInfo,
+    BatchAnalyzeRequest, BatchAnalyzeResponse, BatchItemResult, BatchMetaInfo,
+    HistoryItem, HistoryPage
+)
 from app.routers.auth import get_current_user
-from app.services.huggingface_service import classify_text, HuggingFaceError
-from app.services.gemini_service import analyze_text, GeminiError
-from app.services.mock_service import mock_classify_text, mock_analyze_text
-from app.config import MIN_TEXT_LENGTH, MOCK_MODE
+from app.database.connection import get_async_db, get_session_factory
+from app.services.huggingface_service import (
+    classify_text, classify_texts, HuggingFaceError, pool_stats, hf_limiter, hf_breaker,
+    DEFAULT_LABELS, HF_MODEL_ID
+)
+from app.services.gemini_service import (
+    analyze_text, analyze_texts, analyze_text_stream, GeminiError, gemini_limiter, gemini_breaker
+)
+from app.services.mock_service import mock_analyze_text, mock_analyze_text_stream
+from app.services.cache_service import result_cache, make_cache_key
+from app.services.history_service import history_writer, history_row, list_history
+from app.services.classifier_service import get_classifier
+from app.services.label_set_service import get_label_profile
+from app.services.dedup_service import near_duplicates, text_fingerprint, context_key
+from app.utils.singleflight import SingleFlight
+from app.utils.limiter import LoadShedError
+from app.utils.retry import DeadlineExceeded, retry_budget
+from app.utils.password_hasher import password_hasher
+from app.utils.metrics import PIPELINE_DURATION, DEDUP_LOOKUPS, count_error
+from app.utils.tracing import request_start, span, open_span, traced_handler, verbose_spans
+from app.utils.text import estimate_tokens, chunk_text
+from app.config import (
+    MIN_TEXT_LENGTH, MOCK_MODE, GEMINI_MODEL, PIPELINE_MODE, PARALLEL_RERUN_POLICY, CLASSIFIER_BACKEND,
+    COALESCE_REQUESTS, HISTORY_ENABLED, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE,
+    BATCH_HF_SIZE, BATCH_GEMINI_SIZE, BATCH_CONCURRENCY,
+    LONG_DOC_ENABLED, LONG_DOC_THRESHOLD_TOKENS, CHUNK_MAX_TOKENS, CHUNK_CONCURRENCY, LONG_DOC_REDUCE_MAX_TOKENS,
+    LABEL_PREFILTER_TOP_K, DEDUP_ENABLED
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -26,10 +61,391 @@ if MOCK_MODE:
     logger.info("🔶 MOCK MODE ENABLED - Using fake API responses")
 
 
+# Factory of the context entered around each upstream call of a batch group
+CallSlot = Callable[[], AsyncContextManager]
+
+
+def _model_ids() -> list:
+    """Identifiers of the models producing a result (part of the cache key)"""
+    if CLASSIFIER_BACKEND == "hf":
+        # Pre-filtered scores differ from full-label ones
+        classifier_id = f"{HF_MODEL_ID}+top{LABEL_PREFILTER_TOP_K}" if LABEL_PREFILTER_TOP_K > 0 else HF_MODEL_ID
+    else:
+        classifier_id = get_classifier(CLASSIFIER_BACKEND).model_id
+    return [classifier_id, "mock-analyzer" if MOCK_MODE else GEMINI_MODEL]
+
+
+async def _resolve_labels(label_set_id: Optional[int], user_id: int, session_factory) -> List[str]:
+    """Candidate labels of a request: the user's label set it names, or DEFAULT_LABELS"""
+    if label_set_id is None:
+        return DEFAULT_LABELS
+    profile = await get_label_profile(user_id, label_set_id, session_factory)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Label set not found")
+    return list(profile.labels)
+
+
+async def _run_classifier(text: str, labels: List[str]) -> dict:
+    """Classify with the configured CLASSIFIER_BACKEND"""
+    if CLASSIFIER_BACKEND == "hf":
+        return await classify_text(text, labels)
+    return await get_classifier(CLASSIFIER_BACKEND).classify(text, labels)
+
+
+def _shed_detail(error: LoadShedError) -> str:
+    """Error detail for a call rejected by a limiter or an open circuit"""
+    service = "Summarization" if error.upstream == "gemini" else "Classification"
+    return f"{service} service unavailable: {str(error)}"
+
+
+def _overloaded(error: LoadShedError) -> HTTPException:
+    """Fast 503 telling the client when to come back"""
+    return HTTPException(
+        status_code=503,
+        detail=_shed_detail(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def _deadline_exceeded(error: DeadlineExceeded) -> HTTPException:
+    """504 for a request that ran out of its end-to-end deadline"""
+    return HTTPException(status_code=504, detail=str(error))
+
+
+async def _classify(text: str, labels: List[str]) -> dict:
+    """Step 1: classification, mapping upstream failures to a 503 (504 past the deadline)"""
+    try:
+        with span("classify"):
+            hf_result = await _run_classifier(text, labels)
+    except LoadShedError as e:
+        count_error(e)
+        raise _overloaded(e)
+    except DeadlineExceeded as e:
+        count_error(e)
+        raise _deadline_exceeded(e)
+    except HuggingFaceError as e:
+        count_error(e)
+        logger.error(f"HuggingFace error: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Classification service unavailable: {str(e)}"
+        )
+    
+    logger.info(f"Classification: {hf_result['category']} (latency: {hf_result['latency_ms']}ms)")
+    return hf_result
+
+
+@contextmanager
+def _summarization_errors() -> Iterator[None]:
+    """Map summarization failures to a 503 (504 past the deadline)"""
+    try:
+        yield
+    except LoadShedError as e:
+        count_error(e)
+        raise _overloaded(e)
+    except DeadlineExceeded as e:
+        count_error(e)
+        raise _deadline_exceeded(e)
+    except GeminiError as e:
+        count_error(e)
+        logger.error(f"Gemini error: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Summarization service unavailable: {str(e)}"
+        )
+
+
+async def _summarize(text: str, category: Optional[str], labels: List[str]) -> dict:
+    """Step 2: summary + tone, mapping upstream failures to a 503 (504 past the deadline)"""
+    with _summarization_errors(), span("summarize", category=category):
+        if MOCK_MODE:
+            gemini_result = await mock_analyze_text(text, category, labels)
+            logger.info(f"[MOCK] Analysis: tone={gemini_result['tone']}")
+        elif category is None:
+            gemini_result = await analyze_text(text, None, labels)
+        else:
+            gemini_result = await analyze_text(text, category)
+    
+    logger.info(f"Analysis: tone={gemini_result['tone']} (latency: {gemini_result['latency_ms']}ms)")
+    return gemini_result
+
+
+async def _run_sequential(text: str, labels: List[str]) -> dict:
+    """Classify, then summarize with the category in the Gemini prompt"""
+    hf_result = await _classify(text, labels)
+    gemini_result = await _summarize(text, hf_result["category"], labels)
+    
+    return {
+        "category": hf_result["category"],
+        "hf_scores": hf_result["scores"],
+        "summary": gemini_result["summary"],
+        "tone": gemini_result["tone"],
+        "hf_latency_ms": hf_result["latency_ms"],
+        "gemini_latency_ms": gemini_result["latency_ms"],
+        "pipeline_mode": "sequential",
+        "stage_overlap_ms": 0,
+        "gemini_reran": False,
+        "pruned_labels": hf_result.get("pruned_labels")
+    }
+
+
+async def _run_parallel(text: str, labels: List[str]) -> dict:
+    """
+    Start a category-agnostic Gemini call alongside classification.
+    
+    Once both finish, PARALLEL_RERUN_POLICY decides whether the speculative
+    summary is kept ("never") or redone with the HuggingFace category when
+    Gemini's own category guess disagrees ("mismatch").
+    """
+    spans = {}
+    
+    async def timed(name, coro):
+        started = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            spans[name] = (started, time.perf_counter())
+    
+    hf_task = asyncio.create_task(timed("hf", _classify(text, labels)))
+    gemini_task = asyncio.create_task(timed("gemini", _summarize(text, None, labels)))
+    
+    try:
+        hf_result = await hf_task
+    except BaseException:
+        gemini_task.cancel()
+        await asyncio.gather(gemini_task, return_exceptions=True)
+        raise
+    gemini_result = await gemini_task
+    
+    (hf_start, hf_end), (gemini_start, gemini_end) = spans["hf"], spans["gemini"]
+    overlap_ms = max(0, int((min(hf_end, gemini_end) - max(hf_start, gemini_start)) * 1000))
+    
+    category = hf_result["category"]
+    gemini_latency = gemini_result["latency_ms"]
+    guessed = (gemini_result.get("category") or "").lower()
+    reran = PARALLEL_RERUN_POLICY == "mismatch" and guessed != category.lower()
+    
+    if reran:
+        logger.info(f"Parallel pipeline: Gemini guessed '{guessed}', HF said '{category}'; re-running Gemini")
+        gemini_result = await _summarize(text, category, labels)
+        gemini_latency += gemini_result["latency_ms"]
+    
+    return {
+        "category": category,
+        "hf_scores": hf_result["scores"],
+        "summary": gemini_result["summary"],
+        "tone": gemini_result["tone"],
+        "hf_latency_ms": hf_result["latency_ms"],
+        "gemini_latency_ms": gemini_latency,
+        "pipeline_mode": "parallel",
+        "stage_overlap_ms": overlap_ms,
+        "gemini_reran": reran,
+        "pruned_labels": hf_result.get("pruned_labels")
+    }
+
+
+# Reduce rounds before the remaining summaries are sent in one prompt regardless of size
+MAX_REDUCE_LEVELS = 4
+
+
+async def _map_bounded(fn: Callable[[Any], Awaitable[Any]], items: list, stats: Dict[str, int]) -> list:
+    """
+    fn(item) for every item with at most CHUNK_CONCURRENCY running, results
+    in order. The first failure cancels the other calls and is raised.
+    """
+    semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+    
+    async def run(item):
+        async with semaphore:
+            stats["in_flight"] += 1
+            stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+            stats["upstream_calls"] += 1
+            try:
+                return await fn(item)
+            finally:
+                stats["in_flight"] -= 1
+    
+    tasks = [asyncio.create_task(run(item)) for item in items]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def _aggregate_scores(results: List[dict], weights: List[int]) -> Dict[str, float]:
+    """Chunk scores averaged by chunk size, highest first"""
+    total = sum(weights) or 1
+    scores: Dict[str, float] = {}
+    for result, weight in zip(results, weights):
+        for label, score in result["scores"].items():
+            scores[label] = scores.get(label, 0.0) + score * weight / total
+    return {label: round(score, 4) for label, score in sorted(scores.items(), key=lambda item: item[1], reverse=True)}
+
+
+async def _run_long_document(
+    text: str,
+    labels: List[str],
+    call_slot: Optional[Callable[[str], CallSlot]] = None,
+    on_classified: Optional[Callable[[dict], None]] = None,
+    summarize_final: Optional[Callable[[str, str], Awaitable[dict]]] = None
+) -> dict:
+    """
+    Map-reduce pipeline for texts too long for one classification call.
+    
+    The text is split into CHUNK_MAX_TOKENS chunks on paragraph/sentence
+    boundaries. Map: every chunk is classified, then summarized with the
+    document's category, CHUNK_CONCURRENCY calls at a time. Reduce: the
+    chunk summaries are summarized in groups of LONG_DOC_REDUCE_MAX_TOKENS
+    until one summary (and its tone) remains.
+    
+    call_slot(upstream) (from /analyze/batch) is entered around every
+    upstream call; on_classified gets the classification as soon as every
+    chunk is classified; summarize_final(text, category) replaces
+    _summarize for the last reduce call (/analyze/stream streams it).
+    """
+    def slotted(upstream: str, fn: Callable[[Any], Awaitable[dict]]) -> Callable[[Any], Awaitable[dict]]:
+        if call_slot is None:
+            return fn
+        
+        async def run(item):
+            async with call_slot(upstream)():
+                return await fn(item)
+        return run
+    
+    chunks = chunk_text(text, CHUNK_MAX_TOKENS)
+    weights = [estimate_tokens(chunk) for chunk in chunks]
+    stats = {"in_flight": 0, "peak_in_flight": 0, "upstream_calls": 0}
+    
+    with span("map.classify", chunks=len(chunks)):
+        started = time.perf_counter()
+        hf_results = await _map_bounded(slotted("hf", lambda chunk: _classify(chunk, labels)), chunks, stats)
+        classify_ms = int((time.perf_counter() - started) * 1000)
+    scores = _aggregate_scores(hf_results, weights)
+    category = next(iter(scores))
+    if on_classified is not None:
+        on_classified({"category": category, "hf_scores": scores, "hf_latency_ms": classify_ms})
+    
+    summarize = slotted("gemini", lambda part: _summarize(part, category, labels))
+    with span("map.summarize", chunks=len(chunks)):
+        started = time.perf_counter()
+        partials = await _map_bounded(summarize, chunks, stats)
+        map_summarize_ms = int((time.perf_counter() - started) * 1000)
+    
+    started = time.perf_counter()
+    final = partials[0] if len(partials) == 1 else None
+    levels = 0
+    summaries = [partial["summary"] for partial in partials]
+    while final is None:
+        levels += 1
+        groups = chunk_text("\n\n".join(summaries), LONG_DOC_REDUCE_MAX_TOKENS)
+        with span("reduce", level=levels, groups=len(groups)):
+            if len(groups) == 1 or levels == MAX_REDUCE_LEVELS:
+                stats["upstream_calls"] += 1
+                if summarize_final is not None:
+                    final = await summarize_final("\n\n".join(groups), category)
+                else:
+                    final = await summarize("\n\n".join(groups))
+            else:
+                reduced = await _map_bounded(summarize, groups, stats)
+                summaries = [item["summary"] for item in reduced]
+    reduce_ms = int((time.perf_counter() - started) * 1000)
+    
+    logger.info(
+        f"Long document: {len(chunks)} chunks, {stats['upstream_calls']} upstream calls, "
+        f"{levels} reduce levels, peak {stats['peak_in_flight']} in flight"
+    )
+    return {
+        "category": category,
+        "hf_scores": scores,
+        "summary": final["summary"],
+        "tone": final["tone"],
+        "hf_latency_ms": classify_ms,
+        "gemini_latency_ms": map_summarize_ms + reduce_ms,
+        "pipeline_mode": "map_reduce",
+        "stage_overlap_ms": 0,
+        "gemini_reran": False,
+        "chunking": {
+            "document_tokens": sum(weights),
+            "chunks": len(chunks),
+            "chunk_max_tokens": CHUNK_MAX_TOKENS,
+            "concurrency": CHUNK_CONCURRENCY,
+            "peak_in_flight": stats["peak_in_flight"],
+            "classify_ms": classify_ms,
+            "map_summarize_ms": map_summarize_ms,
+            "reduce_ms": reduce_ms,
+            "reduce_levels": levels,
+            "upstream_calls": stats["upstream_calls"],
+        }
+    }
+
+
+def _is_long_document(text: str) -> bool:
+    return LONG_DOC_ENABLED and estimate_tokens(text) > LONG_DOC_THRESHOLD_TOKENS
+
+
+async def _run_pipeline(text: str, labels: List[str]) -> dict:
+    """Run classification + analysis in the configured PIPELINE_MODE (map-reduce for long documents)"""
+    if _is_long_document(text):
+        with PIPELINE_DURATION.time(), span("pipeline", mode="map_reduce"):
+            return await _run_long_document(text, labels)
+    with PIPELINE_DURATION.time(), span("pipeline", mode=PIPELINE_MODE):
+        if PIPELINE_MODE == "parallel":
+            return await _run_parallel(text, labels)
+        return await _run_sequential(text, labels)
+
+
+def _record_history(
+    user_id: int,
+    text: str,
+    response: AnalyzeResponse,
+    fingerprint: Optional[int] = None,
+    context: Optional[str] = None
+) -> None:
+    """Queue a delivered result for the history table (write-behind, never waits)"""
+    if HISTORY_ENABLED:
+        history_writer.record(history_row(
+            user_id, text, response.model_dump(), response.meta.model_dump(), fingerprint, context
+        ))
+
+
+async def _find_near_duplicate(text: str, context: str) -> Tuple[Optional[int], Optional[Tuple[dict, float]]]:
+    """The text's fingerprint (None when too short) and the near-duplicate result it matches, if any"""
+    if _is_long_document(text):
+        # Up to tens of milliseconds for the longest texts; keep them off the event loop
+        fingerprint = await asyncio.to_thread(text_fingerprint, text)
+    else:
+        fingerprint = text_fingerprint(text)
+    if fingerprint is None:
+        DEDUP_LOOKUPS.labels("skipped").inc()
+        return None, None
+    with span("dedup.lookup") as lookup:
+        match = near_duplicates.lookup(context, fingerprint)
+        lookup.set(hit=match is not None)
+    DEDUP_LOOKUPS.labels("hit" if match is not None else "miss").inc()
+    return fingerprint, match
+
+
+def _upstream_calls(result: dict) -> int:
+    """Upstream calls one pipeline run made (classification, summary, optional re-run; every chunk call for long documents)"""
+    if result.get("chunking"):
+        return result["chunking"]["upstream_calls"]
+    return 3 if result.get("gemini_reran") else 2
+
+
+# Concurrent identical /analyze requests share one pipeline run, keyed like the result cache
+analysis_flight = SingleFlight(cost=_upstream_calls)
+
+
 @router.post("/", response_model=AnalyzeResponse)
+@traced_handler
 async def analyze(
     request: AnalyzeRequest,
-    current_user=Depends(get_current_user)
+    verbose: bool = Query(False, description="Include the span breakdown in meta.spans"),
+    current_user=Depends(get_current_user),
+    session_factory=Depends(get_session_factory)
 ):
     """
     Analyze text using HuggingFace classification + Gemini summarization.
@@ -38,11 +454,27 @@ async def analyze(
     
     Flow:
     1. Validate text length
-    2. Classify text with HuggingFace BART-MNLI (or mock)
-    3. Analyze with Gemini (summary + tone) (or mock)
-    4. Return combined results with latency metrics
+    2. Return the cached result if this text was analyzed recently
+    3. With DEDUP_ENABLED, return the result of a near-identical text
+       analyzed before (meta.near_duplicate_similarity)
+    4. Classify text with HuggingFace BART-MNLI (or mock), against the
+       labels of label_set_id when given (DEFAULT_LABELS otherwise)
+    5. Analyze with Gemini (summary + tone) (or mock) - after step 4, or
+       concurrently with it when PIPELINE_MODE is "parallel"
+    6. Cache and return combined results with latency metrics
+    
+    Texts over LONG_DOC_THRESHOLD_TOKENS go through the map-reduce pipeline
+    instead of steps 4-5 (chunked classification and summaries, reported in
+    meta.chunking).
+    
+    Every returned result is also queued for the user's history (write-behind).
+    Steps 4-6 are coalesced: identical requests arriving while a run is in
+    flight wait for that run and share its result (or its error).
+    
+    total_execution_ms counts from the request's arrival, so it includes
+    auth and body validation; ?verbose=true adds the span breakdown.
     """
-    start_time = time.time()
+    start_time = request_start()
     
     # Validate text length
     if len(request.text.strip()) < MIN_TEXT_LENGTH:
@@ -53,72 +485,598 @@ async def analyze(
     
     logger.info(f"Analysis started for user {current_user.email} (mock={MOCK_MODE})")
     
-    # Step 1: Classification (HuggingFace or Mock)
+    labels = await _resolve_labels(request.label_set_id, current_user.id, session_factory)
+    model_ids = _model_ids()
+    
+    # Result cache lookup
+    cache_key = make_cache_key(request.text, labels, model_ids)
+    cache_start = time.perf_counter()
+    with span("cache.lookup") as lookup:
+        cached = await result_cache.get(cache_key)
+        lookup.set(hit=cached is not None)
+    
+    # Near-duplicate lookup
+    fingerprint = context = similarity = None
+    if cached is None and DEDUP_ENABLED:
+        context = context_key(labels, model_ids)
+        fingerprint, match = await _find_near_duplicate(request.text, context)
+        if match is not None:
+            cached, similarity = match
+    cache_latency_ms = round((time.perf_counter() - cache_start) * 1000, 3)
+    
+    if cached is not None:
+        total_execution_ms = int((time.perf_counter() - start_time) * 1000)
+        logger.info(f"Cache hit (near-duplicate similarity={similarity}). Total execution: {total_execution_ms}ms")
+        response = AnalyzeResponse(
+            **cached,
+            meta=MetaInfo(
+                hf_latency_ms=0,
+                gemini_latency_ms=0,
+                total_execution_ms=total_execution_ms,
+                cached=True,
+                cache_latency_ms=cache_latency_ms,
+                cache_hits=result_cache.hits,
+                cache_misses=result_cache.misses,
+                spans=verbose_spans(verbose),
+                near_duplicate_similarity=similarity
+            )
+        )
+        # No fingerprint: a reused result stays indexed under the text it was computed for,
+        # otherwise chains of near duplicates would drift away from it after a rebuild
+        _record_history(current_user.id, request.text, response)
+        return response
+    
+    async def execute() -> dict:
+        # Steps 1-2: Classification + Analysis (HuggingFace/Gemini or Mock)
+        result = await _run_pipeline(request.text, labels)
+        data = {
+            "category": result["category"],
+            "hf_scores": result["hf_scores"],
+            "summary": result["summary"],
+            "tone": result["tone"]
+        }
+        await result_cache.set(cache_key, data)
+        if fingerprint is not None:
+            near_duplicates.add(context, fingerprint, data)
+        return result
+    
+    if COALESCE_REQUESTS:
+        try:
+            result, coalesced = await analysis_flight.do(cache_key, execute)
+        except DeadlineExceeded as e:
+            logger.warning(f"Deadline exceeded waiting for a coalesced analysis: {e}")
+            raise _deadline_exceeded(e)
+    else:
+        result, coalesced = await execute(), False
+    
+    # Calculate total execution time
+    total_execution_ms = int((time.perf_counter() - start_time) * 1000)
+    
+    logger.info(f"Analysis complete (coalesced={coalesced}). Total execution: {total_execution_ms}ms")
+    
+    response = AnalyzeResponse(
+        category=result["category"],
+        hf_scores=result["hf_scores"],
+        summary=result["summary"],
+        tone=result["tone"],
+        meta=MetaInfo(
+            hf_latency_ms=result["hf_latency_ms"],
+            gemini_latency_ms=result["gemini_latency_ms"],
+            total_execution_ms=total_execution_ms,
+            pipeline_mode=result["pipeline_mode"],
+            stage_overlap_ms=result["stage_overlap_ms"],
+            gemini_reran=result["gemini_reran"],
+            coalesced=coalesced,
+            cache_latency_ms=cache_latency_ms,
+            cache_hits=result_cache.hits,
+            cache_misses=result_cache.misses,
+            spans=verbose_spans(verbose),
+            chunking=result.get("chunking"),
+            pruned_labels=result.get("pruned_labels")
+        )
+    )
+    _record_history(current_user.id, request.text, response, fingerprint, context)
+    return response
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_long_document(text: str, labels: List[str]) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    _run_long_document for /analyze/stream: yields ("classification", ...)
+    once every chunk is classified, ("token", ...) pieces of the final
+    reduce call as they are generated, then ("result", the pipeline result).
+    Failures raise the HTTPException /analyze would answer with.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    stream = mock_analyze_text_stream if MOCK_MODE else analyze_text_stream
+    streamed = False
+    
+    async def summarize_final(summaries: str, category: str) -> dict:
+        nonlocal streamed
+        result = None
+        with _summarization_errors(), span("summarize", category=category):
+            async for event in stream(summaries, category):
+                if event["type"] == "token":
+                    streamed = True
+                    queue.put_nowait(("token", {"text": event["text"]}))
+                else:
+                    result = event
+        return result
+    
+    task = asyncio.create_task(_run_long_document(
+        text, labels,
+        on_classified=lambda data: queue.put_nowait(("classification", data)),
+        summarize_final=summarize_final
+    ))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
     try:
-        if MOCK_MODE:
-            hf_result = await mock_classify_text(request.text)
-            logger.info(f"[MOCK] Classification: {hf_result['category']}")
+        while (item := await queue.get()) is not None:
+            yield item
+        result = task.result()
+    finally:
+        # Stops the work when the client goes away (no-op once done)
+        task.cancel()
+    
+    if not streamed:
+        # A single chunk: its map summary is the final one
+        yield "token", {"text": result["summary"]}
+    yield "result", result
+
+
+@router.post("/stream")
+@traced_handler
+async def analyze_stream(
+    request: AnalyzeRequest,
+    verbose: bool = Query(False, description="Include the span breakdown in the done event's meta.spans"),
+    current_user=Depends(get_current_user),
+    session_factory=Depends(get_session_factory)
+):
+    """
+    Streaming variant of /analyze using Server-Sent Events.
+    
+    Requires JWT authentication.
+    
+    Events:
+    - classification: category and hf_scores, sent as soon as HuggingFace answers
+    - token: a piece of the Gemini summary, sent as it is generated
+    - done: summary, tone and MetaInfo timings
+    - error: detail (and retry_after when the request was shed), if an
+      upstream fails (the stream then ends)
+    
+    Long documents go through the /analyze map-reduce pipeline: the
+    classification event follows the classification of every chunk, and
+    the tokens are those of the final reduce call.
+    """
+    start_time = request_start()
+    
+    if len(request.text.strip()) < MIN_TEXT_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Text must be at least {MIN_TEXT_LENGTH} characters long"
+        )
+    
+    logger.info(f"Streaming analysis started for user {current_user.email} (mock={MOCK_MODE})")
+    
+    labels = await _resolve_labels(request.label_set_id, current_user.id, session_factory)
+    cache_key = make_cache_key(request.text, labels, _model_ids())
+    
+    async def events() -> AsyncIterator[str]:
+        cache_start = time.perf_counter()
+        with span("cache.lookup") as lookup:
+            cached = await result_cache.get(cache_key)
+            lookup.set(hit=cached is not None)
+        cache_latency_ms = round((time.perf_counter() - cache_start) * 1000, 3)
+        
+        if cached is not None:
+            yield _sse("classification", {
+                "category": cached["category"],
+                "hf_scores": cached["hf_scores"],
+                "hf_latency_ms": 0
+            })
+            yield _sse("token", {"text": cached["summary"]})
+            meta = MetaInfo(
+                hf_latency_ms=0,
+                gemini_latency_ms=0,
+                total_execution_ms=int((time.perf_counter() - start_time) * 1000),
+                cached=True,
+                cache_latency_ms=cache_latency_ms,
+                cache_hits=result_cache.hits,
+                cache_misses=result_cache.misses,
+                spans=verbose_spans(verbose)
+            )
+            if HISTORY_ENABLED:
+                history_writer.record(history_row(current_user.id, request.text, cached, meta.model_dump()))
+            yield _sse("done", {"summary": cached["summary"], "tone": cached["tone"], "meta": meta.model_dump()})
+            return
+        
+        first_token_ms = None
+        chunking = None
+        if _is_long_document(request.text):
+            # Map-reduce, streaming the final reduce call
+            try:
+                async for event, data in _stream_long_document(request.text, labels):
+                    if event == "result":
+                        hf_result = {"scores": data["hf_scores"], "latency_ms": data["hf_latency_ms"]}
+                        gemini_result = {
+                            "summary": data["summary"],
+                            "tone": data["tone"],
+                            "latency_ms": data["gemini_latency_ms"]
+                        }
+                        chunking = data["chunking"]
+                        continue
+                    if event == "classification":
+                        category = data["category"]
+                    elif first_token_ms is None:
+                        first_token_ms = int((time.perf_counter() - start_time) * 1000)
+                    yield _sse(event, data)
+            except HTTPException as e:
+                error = {"detail": e.detail}
+                if e.headers and "Retry-After" in e.headers:
+                    error["retry_after"] = int(e.headers["Retry-After"])
+                yield _sse("error", error)
+                return
         else:
-            hf_result = await classify_text(request.text)
+            # Step 1: Classification, sent to the client right away
+            try:
+                with span("classify"):
+                    hf_result = await _run_classifier(request.text, labels)
+            except LoadShedError as e:
+                count_error(e)
+                yield _sse("error", {"detail": _shed_detail(e), "retry_after": e.retry_after})
+                return
+            except DeadlineExceeded as e:
+                count_error(e)
+                yield _sse("error", {"detail": str(e)})
+                return
+            except HuggingFaceError as e:
+                count_error(e)
+                logger.error(f"HuggingFace error: {e}")
+                yield _sse("error", {"detail": f"Classification service unavailable: {str(e)}"})
+                return
         
-        category = hf_result["category"]
-        hf_scores = hf_result["scores"]
-        hf_latency = hf_result["latency_ms"]
+            category = hf_result["category"]
+            yield _sse("classification", {
+                "category": category,
+                "hf_scores": hf_result["scores"],
+                "hf_latency_ms": hf_result["latency_ms"]
+            })
         
-        logger.info(f"Classification: {category} (latency: {hf_latency}ms)")
+            # Step 2: Gemini summary, streamed token by token
+            gemini_result = None
+            summarize = open_span("summarize", category=category)
+            try:
+                stream = mock_analyze_text_stream if MOCK_MODE else analyze_text_stream
+                async for event in stream(request.text, category):
+                    if event["type"] == "token":
+                        if first_token_ms is None:
+                            first_token_ms = int((time.perf_counter() - start_time) * 1000)
+                        yield _sse("token", {"text": event["text"]})
+                    else:
+                        gemini_result = event
+            except LoadShedError as e:
+                count_error(e)
+                yield _sse("error", {"detail": _shed_detail(e), "retry_after": e.retry_after})
+                return
+            except DeadlineExceeded as e:
+                count_error(e)
+                yield _sse("error", {"detail": str(e)})
+                return
+            except GeminiError as e:
+                count_error(e)
+                logger.error(f"Gemini error: {e}")
+                yield _sse("error", {"detail": f"Summarization service unavailable: {str(e)}"})
+                return
+            finally:
+                summarize.finish()
         
-    except HuggingFaceError as e:
-        logger.error(f"HuggingFace error: {e}")
-        raise HTTPException(
-            status_code=503,
-            detail=f"Classification service unavailable: {str(e)}"
+        total_execution_ms = int((time.perf_counter() - start_time) * 1000)
+        PIPELINE_DURATION.observe(time.perf_counter() - start_time)
+        logger.info(f"Streaming analysis complete. Total execution: {total_execution_ms}ms")
+        
+        data = {
+            "category": category,
+            "hf_scores": hf_result["scores"],
+            "summary": gemini_result["summary"],
+            "tone": gemini_result["tone"]
+        }
+        await result_cache.set(cache_key, data)
+        
+        meta = MetaInfo(
+            hf_latency_ms=hf_result["latency_ms"],
+            gemini_latency_ms=gemini_result["latency_ms"],
+            total_execution_ms=total_execution_ms,
+            time_to_first_token_ms=first_token_ms,
+            pipeline_mode="map_reduce" if chunking is not None else None,
+            cache_latency_ms=cache_latency_ms,
+            cache_hits=result_cache.hits,
+            cache_misses=result_cache.misses,
+            spans=verbose_spans(verbose),
+            chunking=chunking
         )
+        if HISTORY_ENABLED:
+            history_writer.record(history_row(current_user.id, request.text, data, meta.model_dump()))
+        yield _sse("done", {
+            "summary": gemini_result["summary"],
+            "tone": gemini_result["tone"],
+            "meta": meta.model_dump()
+        })
     
-    # Step 2: Analysis (Gemini or Mock)
-    try:
-        if MOCK_MODE:
-            gemini_result = await mock_analyze_text(request.text, category)
-            logger.info(f"[MOCK] Analysis: tone={gemini_result['tone']}")
-        else:
-            gemini_result = await analyze_text(request.text, category)
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _classify_group(texts: List[str], labels: List[str], call_slot: CallSlot) -> list:
+    """Classify a group of texts (one batched upstream call when possible)"""
+    if CLASSIFIER_BACKEND == "hf":
+        return await classify_texts(texts, labels, call_slot=call_slot)
+    async with call_slot():
+        return await asyncio.gather(
+            *[_run_classifier(text, labels) for text in texts],
+            return_exceptions=True
+        )
+
+
+async def _analyze_group(items: List[Tuple[str, str]], call_slot: CallSlot) -> list:
+    """Summarize a group of (text, category) pairs (one packed prompt when possible)"""
+    if MOCK_MODE:
+        async def analyze_one(text: str, category: str) -> dict:
+            async with call_slot():
+                return await mock_analyze_text(text, category)
         
-        summary = gemini_result["summary"]
-        tone = gemini_result["tone"]
-        gemini_latency = gemini_result["latency_ms"]
+        return await asyncio.gather(
+            *[analyze_one(text, category) for text, category in items],
+            return_exceptions=True
+        )
+    return await analyze_texts(items, call_slot=call_slot)
+
+
+def _item_error(error: Exception) -> str:
+    """Error detail for a failed batch item, worded like the /analyze errors"""
+    count_error(error)
+    if isinstance(error, LoadShedError):
+        return _shed_detail(error)
+    if isinstance(error, DeadlineExceeded):
+        return str(error)
+    if isinstance(error, HuggingFaceError):
+        return f"Classification service unavailable: {str(error)}"
+    if isinstance(error, GeminiError):
+        return f"Summarization service unavailable: {str(error)}"
+    logger.error(f"Unexpected batch item error: {error!r}")
+    return "Internal error during analysis"
+
+
+def _chunks(items: list, size: int) -> List[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+@router.post("/batch", response_model=BatchAnalyzeResponse)
+@traced_handler
+async def analyze_batch(
+    request: BatchAnalyzeRequest,
+    current_user=Depends(get_current_user),
+    session_factory=Depends(get_session_factory)
+):
+    """
+    Analyze many texts in one call.
+    
+    Requires JWT authentication.
+    
+    Texts are validated and looked up in the result cache one by one. The
+    remaining texts are classified in groups of BATCH_HF_SIZE (one
+    multi-input HuggingFace call per group) and summarized in groups of
+    BATCH_GEMINI_SIZE (one packed Gemini prompt per group), with at most
+    BATCH_CONCURRENCY upstream calls in flight, one-by-one fallbacks of a
+    failed group call included (and counted in meta). Long documents go
+    through the /analyze map-reduce pipeline on their own, their chunk
+    calls within the same BATCH_CONCURRENCY. Each item gets either a result
+    or an error; one failing item never fails the batch.
+    """
+    start_time = request_start()
+    labels = await _resolve_labels(request.label_set_id, current_user.id, session_factory)
+    model_ids = _model_ids()
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    results: List[BatchItemResult] = [None] * len(request.texts)
+    calls = {"hf": 0, "gemini": 0}
+    
+    def call_slot(upstream: str) -> CallSlot:
+        """Slot of the batch's BATCH_CONCURRENCY budget for one upstream call, counted in meta"""
+        @asynccontextmanager
+        async def slot():
+            async with semaphore:
+                calls[upstream] += 1
+                yield
+        return slot
+    cached_count = 0
+    pending = []
+    long_documents = []
+    
+    logger.info(f"Batch analysis of {len(request.texts)} texts started for user {current_user.email}")
+    
+    for index, text in enumerate(request.texts):
+        try:
+            item = AnalyzeRequest(text=text)
+        except ValidationError as e:
+            results[index] = BatchItemResult(index=index, error=e.errors()[0]["msg"])
+            continue
         
-        logger.info(f"Analysis: tone={tone} (latency: {gemini_latency}ms)")
+        if len(item.text.strip()) < MIN_TEXT_LENGTH:
+            results[index] = BatchItemResult(
+                index=index,
+                error=f"Text must be at least {MIN_TEXT_LENGTH} characters long"
+            )
+            continue
         
-    except GeminiError as e:
-        logger.error(f"Gemini error: {e}")
-        raise HTTPException(
-            status_code=503,
-            detail=f"Summarization service unavailable: {str(e)}"
+        cache_key = make_cache_key(item.text, labels, model_ids)
+        cached = await result_cache.get(cache_key)
+        if cached is not None:
+            cached_count += 1
+            results[index] = BatchItemResult(index=index, result=AnalyzeResponse(
+                **cached,
+                meta=MetaInfo(
+                    hf_latency_ms=0,
+                    gemini_latency_ms=0,
+                    total_execution_ms=int((time.perf_counter() - start_time) * 1000),
+                    cached=True
+                )
+            ))
+            _record_history(current_user.id, item.text, results[index].result)
+            continue
+        
+        if _is_long_document(item.text):
+            long_documents.append((index, item.text, cache_key))
+        else:
+            pending.append((index, item.text, cache_key))
+    
+    async def summarize(group):
+        outcomes = await _analyze_group(
+            [(text, hf["category"]) for _, text, _, hf in group], call_slot("gemini")
         )
+        
+        for (index, text, cache_key, hf_result), outcome in zip(group, outcomes):
+            if isinstance(outcome, Exception):
+                results[index] = BatchItemResult(index=index, error=_item_error(outcome))
+                continue
+            
+            data = {
+                "category": hf_result["category"],
+                "hf_scores": hf_result["scores"],
+                "summary": outcome["summary"],
+                "tone": outcome["tone"]
+            }
+            await result_cache.set(cache_key, data)
+            results[index] = BatchItemResult(index=index, result=AnalyzeResponse(
+                **data,
+                meta=MetaInfo(
+                    hf_latency_ms=hf_result["latency_ms"],
+                    gemini_latency_ms=outcome["latency_ms"],
+                    total_execution_ms=int((time.perf_counter() - start_time) * 1000),
+                    pruned_labels=hf_result.get("pruned_labels")
+                )
+            ))
+            _record_history(current_user.id, text, results[index].result)
     
-    # Calculate total execution time
-    total_execution_ms = int((time.time() - start_time) * 1000)
+    async def process(group):
+        outcomes = await _classify_group([text for _, text, _ in group], labels, call_slot("hf"))
+        
+        classified = []
+        for (index, text, cache_key), outcome in zip(group, outcomes):
+            if isinstance(outcome, Exception):
+                results[index] = BatchItemResult(index=index, error=_item_error(outcome))
+            else:
+                classified.append((index, text, cache_key, outcome))
+        
+        await asyncio.gather(*[summarize(sub) for sub in _chunks(classified, BATCH_GEMINI_SIZE)])
     
-    logger.info(f"Analysis complete. Total execution: {total_execution_ms}ms")
+    async def process_long(index, text, cache_key):
+        try:
+            result = await _run_long_document(text, labels, call_slot=call_slot)
+        except Exception as e:
+            results[index] = BatchItemResult(
+                index=index, error=e.detail if isinstance(e, HTTPException) else _item_error(e)
+            )
+            return
+        
+        data = {
+            "category": result["category"],
+            "hf_scores": result["hf_scores"],
+            "summary": result["summary"],
+            "tone": result["tone"]
+        }
+        await result_cache.set(cache_key, data)
+        results[index] = BatchItemResult(index=index, result=AnalyzeResponse(
+            **data,
+            meta=MetaInfo(
+                hf_latency_ms=result["hf_latency_ms"],
+                gemini_latency_ms=result["gemini_latency_ms"],
+                total_execution_ms=int((time.perf_counter() - start_time) * 1000),
+                pipeline_mode=result["pipeline_mode"],
+                chunking=result["chunking"]
+            )
+        ))
+        _record_history(current_user.id, text, results[index].result)
     
-    return AnalyzeResponse(
-        category=category,
-        hf_scores=hf_scores,
-        summary=summary,
-        tone=tone,
-        meta=MetaInfo(
-            hf_latency_ms=hf_latency,
-            gemini_latency_ms=gemini_latency,
+    await asyncio.gather(
+        *[process(group) for group in _chunks(pending, BATCH_HF_SIZE)],
+        *[process_long(*item) for item in long_documents]
+    )
+    
+    failed = sum(1 for item in results if item.error is not None)
+    total_execution_ms = int((time.perf_counter() - start_time) * 1000)
+    
+    logger.info(
+        f"Batch analysis complete: {len(results) - failed}/{len(results)} ok, "
+        f"{calls['hf']} HF calls, {calls['gemini']} Gemini calls in {total_execution_ms}ms"
+    )
+    
+    return BatchAnalyzeResponse(
+        results=results,
+        meta=BatchMetaInfo(
+            total_items=len(results),
+            succeeded=len(results) - failed,
+            failed=failed,
+            cached=cached_count,
+            hf_requests=calls["hf"],
+            gemini_requests=calls["gemini"],
             total_execution_ms=total_execution_ms
         )
     )
 
 
+@router.get("/history", response_model=HistoryPage)
+@traced_handler
+async def analysis_history(
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="next_cursor of the previous page"),
+    category: Optional[str] = Query(None, description="Only analyses with this category"),
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    The current user's past analyses, newest first.
+    
+    Requires JWT authentication.
+    
+    Keyset-paginated: follow next_cursor until it is null. Each page is an
+    index range scan, so the last page of a long history is as fast as the
+    first. Results are written behind the response, so an analysis can take
+    up to HISTORY_FLUSH_INTERVAL_MS to appear.
+    """
+    rows, next_cursor = await list_history(db, current_user.id, limit, cursor, category)
+    return HistoryPage(
+        items=[HistoryItem.model_validate(row) for row in rows],
+        next_cursor=next_cursor
+    )
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint for the analyze service"""
     return {
         "status": "ok",
         "service": "analyze",
-        "mock_mode": MOCK_MODE
+        "mock_mode": MOCK_MODE,
+        "classifier_backend": CLASSIFIER_BACKEND,
+        "hf_pool": pool_stats(),
+        "limits": {
+            "huggingface": hf_limiter.stats(),
+            "gemini": gemini_limiter.stats()
+        },
+        "breakers": {
+            "huggingface": hf_breaker.stats(),
+            "gemini": gemini_breaker.stats()
+        },
+        "retry_budget": retry_budget.stats(),
+        "cache": result_cache.stats(),
+        "coalescing": analysis_flight.stats(),
+        "password_hashing": password_hasher.stats(),
+        "history": history_writer.stats(),
+        "near_duplicates": near_duplicates.stats() if DEDUP_ENABLED else None
     }
 
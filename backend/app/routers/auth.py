@@ -1,17 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, Request
-from sqlalchemy.orm import Session
-from app.database.connection import get_db, engine
-from app.database.base import Base
-from app.models.user import User  # Import to register model with Base
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.connection import get_async_db, get_session_factory
+from app.models.user import User
 from app.schemas.user_schema import UserCreate, UserLogin, UserOut
-from app.services.auth_service import create_user, authenticate_user
-from app.utils.security import create_access_token, decode_token
+from app.services.auth_service import (
+    create_user_async, authenticate_user_async, get_user_by_email_async,
+    decode_token_cached, get_user_cached, CurrentUser
+)
+from app.utils.security import create_access_token
+from app.utils.metrics import AUTH_DURATION
+from app.utils.tracing import span
 
 router = APIRouter()
 
-# create tables (for dev). In prod use migrations
-Base.metadata.create_all(bind=engine)
-
 COOKIE_NAME = "access_token"
 
 
@@ -25,10 +26,10 @@ def _user_to_dict(user: User) -> dict:
 
 
 @router.post("/register")
-def register(payload: UserCreate, response: Response, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == payload.email).first():
+async def register(payload: UserCreate, response: Response, db: AsyncSession = Depends(get_async_db)):
+    if await get_user_by_email_async(db, payload.email):
         raise HTTPException(status_code=400, detail="Email already registered")
-    user = create_user(db, payload.email, payload.password)
+    user = await create_user_async(db, payload.email, payload.password)
     
     # Create token for the new user
     token = create_access_token({"sub": str(user.id), "email": user.email})
@@ -53,8 +54,8 @@ def register(payload: UserCreate, response: Response, db: Session = Depends(get_
 
 
 @router.post("/login")
-def login(payload: UserLogin, response: Response, db: Session = Depends(get_db)):
-    user = authenticate_user(db, payload.email, payload.password)
+async def login(payload: UserLogin, response: Response, db: AsyncSession = Depends(get_async_db)):
+    user = await authenticate_user_async(db, payload.email, payload.password)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     token = create_access_token({"sub": str(user.id), "email": user.email})
@@ -78,7 +79,19 @@ def login(payload: UserLogin, response: Response, db: Session = Depends(get_db))
     }
 
 
-def get_current_user(request: Request, db: Session = Depends(get_db)):
+async def get_current_user(request: Request, session_factory=Depends(get_session_factory)) -> CurrentUser:
+    """
+    Resolve the authenticated user without blocking the event loop.
+    
+    The JWT signature is checked once per token (decoded claims are cached
+    until expiry); the user row is read through a short-TTL cache, so most
+    requests never touch the database.
+    """
+    with AUTH_DURATION.time(), span("auth"):
+        return await _resolve_user(request, session_factory)
+
+
+async def _resolve_user(request: Request, session_factory) -> CurrentUser:
     token = None
     
     # First, try to get token from Authorization header (Bearer token)
@@ -93,19 +106,18 @@ def get_current_user(request: Request, db: Session = Depends(get_db)):
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    data = decode_token(token)
+    data = decode_token_cached(token)
     if not data or "sub" not in data:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user_id = int(data["sub"])
-    user = db.query(User).get(user_id)
+    user = await get_user_cached(int(data["sub"]), session_factory)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
 
 
 @router.get("/me", response_model=UserOut)
-def me(user=Depends(get_current_user)):
+async def me(user=Depends(get_current_user)):
     return user
 
 
@@ -0,0 +1,94 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.connection import get_async_db
+from app.routers.auth import get_current_user
+from app.schemas.label_set_schema import LabelSetIn, LabelSetOut
+from app.services.label_set_service import (
+    list_label_sets, get_label_set, get_label_set_by_name,
+    create_label_set, update_label_set, delete_label_set
+)
+from app.utils.tracing import traced_handler
+
+router = APIRouter()
+
+
+async def _owned(db: AsyncSession, user_id: int, label_set_id: int):
+    row = await get_label_set(db, user_id, label_set_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Label set not found")
+    return row
+
+
+def _name_taken(name: str) -> HTTPException:
+    return HTTPException(status_code=409, detail=f"A label set named '{name}' already exists")
+
+
+async def _check_name_free(db: AsyncSession, user_id: int, name: str, label_set_id: int = None) -> None:
+    existing = await get_label_set_by_name(db, user_id, name)
+    if existing is not None and existing.id != label_set_id:
+        raise _name_taken(name)
+
+
+@router.post("/", response_model=LabelSetOut, status_code=201)
+@traced_handler
+async def create(
+    payload: LabelSetIn,
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Create a named label set; pass its id as label_set_id to /analyze
+    to classify against these labels instead of the defaults.
+    """
+    await _check_name_free(db, current_user.id, payload.name)
+    try:
+        return await create_label_set(db, current_user.id, payload.name, payload.labels)
+    except IntegrityError:
+        # A concurrent request took the name after the check (uq_label_sets_user_id_name)
+        await db.rollback()
+        raise _name_taken(payload.name)
+
+
+@router.get("/", response_model=List[LabelSetOut])
+@traced_handler
+async def list_all(current_user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """The current user's label sets"""
+    return await list_label_sets(db, current_user.id)
+
+
+@router.get("/{label_set_id}", response_model=LabelSetOut)
+@traced_handler
+async def get_one(label_set_id: int, current_user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    return await _owned(db, current_user.id, label_set_id)
+
+
+@router.put("/{label_set_id}", response_model=LabelSetOut)
+@traced_handler
+async def replace(
+    label_set_id: int,
+    payload: LabelSetIn,
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Replace a label set's name and labels. Its version goes up, and later
+    analyses use the new labels (cached results of the old ones are not
+    reused, since the labels are part of the cache key).
+    """
+    row = await _owned(db, current_user.id, label_set_id)
+    await _check_name_free(db, current_user.id, payload.name, label_set_id)
+    try:
+        return await update_label_set(db, row, payload.name, payload.labels)
+    except IntegrityError:
+        await db.rollback()
+        raise _name_taken(payload.name)
+
+
+@router.delete("/{label_set_id}", status_code=204)
+@traced_handler
+async def delete(label_set_id: int, current_user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    row = await _owned(db, current_user.id, label_set_id)
+    await delete_label_set(db, row)
+    return Response(status_code=204)
@@ -0,0 +1,64 @@
+"""
+Metrics Endpoint - Prometheus text exposition of the in-process registry
+Gauges for state that already lives elsewhere (limiters, breakers, the
+history buffer, the password hashing pool) are read at scrape time.
+"""
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.services.huggingface_service import hf_limiter, hf_breaker
+from app.services.gemini_service import gemini_limiter, gemini_breaker
+from app.services.cache_service import result_cache
+from app.services.history_service import history_writer
+from app.utils.password_hasher import password_hasher
+from app.utils.retry import retry_budget
+from app.utils.metrics import registry, Counter, Gauge
+from app.config import METRICS_ENABLED
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_LIMITERS = {"huggingface": hf_limiter, "gemini": gemini_limiter}
+_BREAKERS = {"huggingface": hf_breaker, "gemini": gemini_breaker}
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+Gauge(
+    registry, "analyzer_upstream_in_flight", "Upstream calls holding a limiter slot",
+    ["upstream"], callback=lambda: {(name,): l.in_flight for name, l in _LIMITERS.items()}
+)
+Gauge(
+    registry, "analyzer_upstream_concurrency_limit", "Current adaptive concurrency limit per upstream",
+    ["upstream"], callback=lambda: {(name,): int(l.limit) for name, l in _LIMITERS.items()}
+)
+Gauge(
+    registry, "analyzer_upstream_queued", "Calls waiting for a limiter slot",
+    ["upstream"], callback=lambda: {(name,): l.stats()["queued"] for name, l in _LIMITERS.items()}
+)
+Gauge(
+    registry, "analyzer_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["upstream"], callback=lambda: {(name,): _BREAKER_STATES[b.stats()["state"]] for name, b in _BREAKERS.items()}
+)
+Gauge(
+    registry, "analyzer_retry_budget_tokens", "Retry tokens left in the shared retry budget",
+    callback=lambda: {(): retry_budget.stats()["tokens"]}
+)
+Counter(
+    registry, "analyzer_result_cache_lookups_total", "Result cache lookups by result",
+    ["result"], callback=lambda: {("hit",): result_cache.hits, ("miss",): result_cache.misses}
+)
+Gauge(
+    registry, "analyzer_history_pending_rows", "Analyses waiting in the write-behind buffer",
+    callback=lambda: {(): history_writer.pending()}
+)
+Gauge(
+    registry, "analyzer_password_hash_in_flight", "Password hashing jobs queued or running",
+    callback=lambda: {(): password_hasher.in_flight}
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
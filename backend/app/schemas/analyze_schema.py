@@ -2,7 +2,9 @@
 Schemas for /analyze endpoint
 """
 from pydantic import BaseModel, Field
-from typing import Dict, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from app.config import BATCH_MAX_ITEMS, MAX_TEXT_LENGTH
 
 
 class AnalyzeRequest(BaseModel):
@@ -10,8 +12,10 @@ class AnalyzeRequest(BaseModel):
     text: str = Field(
         ...,
         min_length=20,
-        description="Text to analyze (minimum 20 characters)"
+        max_length=MAX_TEXT_LENGTH,
+        description=f"Text to analyze (20 to {MAX_TEXT_LENGTH} characters)"
     )
+    label_set_id: Optional[int] = Field(None, description="Id of one of your label sets (default labels when omitted)")
     
     class Config:
         json_schema_extra = {
@@ -21,11 +25,47 @@ class AnalyzeRequest(BaseModel):
         }
 
 
+class SpanInfo(BaseModel):
+    """One timed span of the request (meta.spans)"""
+    name: str = Field(..., description="Span name, e.g. auth, hf.attempt, retry_wait")
+    parent: Optional[str] = Field(None, description="Name of the enclosing span")
+    start_ms: float = Field(..., description="Start, in milliseconds after the request arrived")
+    duration_ms: float = Field(..., description="Duration in milliseconds")
+    attrs: Optional[Dict[str, Any]] = Field(None, description="Span attributes (status code, error...)")
+
+
+class ChunkingInfo(BaseModel):
+    """How a long document was split and processed (meta.chunking)"""
+    document_tokens: int = Field(..., description="Estimated subword tokens in the text")
+    chunks: int = Field(..., description="Chunks the text was split into")
+    chunk_max_tokens: int = Field(..., description="Token budget per chunk")
+    concurrency: int = Field(..., description="Chunk calls allowed in flight")
+    peak_in_flight: int = Field(..., description="Most chunk calls actually in flight at once")
+    classify_ms: int = Field(..., description="Classification of all chunks, wall time")
+    map_summarize_ms: int = Field(..., description="Per-chunk summaries, wall time")
+    reduce_ms: int = Field(..., description="Summaries of summaries down to the final one, wall time")
+    reduce_levels: int = Field(..., description="Reduce rounds (1 when the chunk summaries fit one prompt)")
+    upstream_calls: int = Field(..., description="Classification and summarization calls made")
+
+
 class MetaInfo(BaseModel):
     """Latency metrics for the analysis"""
     hf_latency_ms: int = Field(..., description="HuggingFace API latency in milliseconds")
     gemini_latency_ms: int = Field(..., description="Gemini API latency in milliseconds")
-    total_execution_ms: int = Field(..., description="Total execution time in milliseconds")
+    total_execution_ms: int = Field(..., description="Time from request arrival (before auth and validation) in milliseconds")
+    pipeline_mode: Optional[str] = Field(None, description="sequential, parallel or map_reduce (long documents)")
+    stage_overlap_ms: Optional[int] = Field(None, description="Time the HuggingFace and Gemini stages ran concurrently")
+    gemini_reran: Optional[bool] = Field(None, description="Parallel mode: Gemini was re-run with the HuggingFace category")
+    time_to_first_token_ms: Optional[int] = Field(None, description="Streaming only: time from request start to the first summary token")
+    cached: bool = Field(False, description="True when the result was served from the result cache (or reused from a near-identical text)")
+    coalesced: bool = Field(False, description="True when the result was shared from an identical in-flight request")
+    cache_latency_ms: Optional[float] = Field(None, description="Time spent on the cache lookup in milliseconds")
+    cache_hits: Optional[int] = Field(None, description="Result cache hits since process start")
+    cache_misses: Optional[int] = Field(None, description="Result cache misses since process start")
+    spans: Optional[List[SpanInfo]] = Field(None, description="With ?verbose=true: spans finished before the response was built")
+    chunking: Optional[ChunkingInfo] = Field(None, description="Long documents: chunking and map-reduce metrics")
+    pruned_labels: Optional[List[str]] = Field(None, description="Labels the pre-filter kept out of classification (scored 0)")
+    near_duplicate_similarity: Optional[float] = Field(None, description="Set when the result was reused from a near-identical text: SimHash similarity of the two")
 
 
 class AnalyzeResponse(BaseModel):
@@ -52,6 +92,75 @@ class AnalyzeResponse(BaseModel):
         }
 
 
+class BatchAnalyzeRequest(BaseModel):
+    """Request body for /analyze/batch endpoint"""
+    texts: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=BATCH_MAX_ITEMS,
+        description=f"Texts to analyze (1 to {BATCH_MAX_ITEMS} items)"
+    )
+    label_set_id: Optional[int] = Field(None, description="Id of one of your label sets, used for every text")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "texts": [
+                    "The new smartphone features an innovative AI chip that processes data 50% faster than previous models.",
+                    "The central bank raised interest rates again to fight persistent inflation in the eurozone."
+                ]
+            }
+        }
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of one batch item: either a result or an error"""
+    index: int = Field(..., description="Position of the text in the request")
+    result: Optional[AnalyzeResponse] = Field(None, description="Analysis result when successful")
+    error: Optional[str] = Field(None, description="Error detail when the item failed")
+
+
+class BatchMetaInfo(BaseModel):
+    """Aggregate metrics for a batch"""
+    total_items: int = Field(..., description="Number of texts in the request")
+    succeeded: int = Field(..., description="Items analyzed successfully")
+    failed: int = Field(..., description="Items that returned an error")
+    cached: int = Field(..., description="Items served from the result cache")
+    hf_requests: int = Field(..., description="Batched HuggingFace calls made")
+    gemini_requests: int = Field(..., description="Batched Gemini calls made")
+    total_execution_ms: int = Field(..., description="Total execution time in milliseconds")
+
+
+class BatchAnalyzeResponse(BaseModel):
+    """Response from /analyze/batch endpoint"""
+    results: List[BatchItemResult] = Field(..., description="Per-item results, in request order")
+    meta: BatchMetaInfo = Field(..., description="Aggregate metrics")
+
+
+class HistoryItem(BaseModel):
+    """One past analysis of the current user"""
+    id: int
+    text_hash: str = Field(..., description="SHA-256 of the normalized text")
+    category: str
+    hf_scores: Dict[str, float]
+    summary: str
+    tone: str
+    hf_latency_ms: int
+    gemini_latency_ms: int
+    total_execution_ms: int
+    cached: bool
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class HistoryPage(BaseModel):
+    """Response from /analyze/history"""
+    items: List[HistoryItem] = Field(..., description="Analyses, newest first")
+    next_cursor: Optional[int] = Field(None, description="Pass as cursor to get the next page; null on the last page")
+
+
 class ErrorResponse(BaseModel):
     """Error response"""
     detail: str
@@ -0,0 +1,64 @@
+"""
+Schemas for /label-sets endpoints
+"""
+from pydantic import BaseModel, Field, field_validator
+from datetime import datetime
+from typing import List
+from app.config import LABEL_SET_MAX_LABELS
+
+
+class LabelSetIn(BaseModel):
+    """Request body to create or replace a label set"""
+    name: str = Field(..., min_length=1, max_length=64, description="Name, unique per user")
+    labels: List[str] = Field(
+        ...,
+        min_length=2,
+        max_length=LABEL_SET_MAX_LABELS,
+        description=f"Candidate labels (2 to {LABEL_SET_MAX_LABELS}, each up to 64 characters)"
+    )
+
+    @field_validator("name")
+    @classmethod
+    def strip_name(cls, name: str) -> str:
+        name = name.strip()
+        if not name:
+            raise ValueError("name must not be blank")
+        return name
+
+    @field_validator("labels")
+    @classmethod
+    def clean_labels(cls, labels: List[str]) -> List[str]:
+        """Strip labels and reject blank, overlong or duplicate (case-insensitive) ones"""
+        cleaned, seen = [], set()
+        for label in labels:
+            label = label.strip()
+            if not label or len(label) > 64:
+                raise ValueError("labels must be 1 to 64 characters")
+            if label.lower() in seen:
+                raise ValueError(f"duplicate label: {label}")
+            seen.add(label.lower())
+            cleaned.append(label)
+        if len(cleaned) < 2:
+            raise ValueError("at least 2 labels are required")
+        return cleaned
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "name": "support tickets",
+                "labels": ["billing", "bug report", "feature request", "account access"]
+            }
+        }
+
+
+class LabelSetOut(BaseModel):
+    """A stored label set"""
+    id: int
+    name: str
+    labels: List[str]
+    version: int = Field(..., description="Incremented on every update")
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
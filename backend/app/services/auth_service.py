@@ -1,6 +1,32 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
-from app.utils.security import hash_password, verify_password
+from app.utils.security import hash_password, verify_and_update_password, decode_token
+from app.utils.password_hasher import password_hasher
+from app.utils.tracing import span
+from app.services.cache_service import MemoryCacheBackend
+from app.config import AUTH_TOKEN_CACHE_SIZE, AUTH_USER_CACHE_SIZE, AUTH_USER_CACHE_TTL_SECONDS
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Authenticated principal, detached from any database session"""
+    id: int
+    email: str
+    created_at: Optional[datetime]
+
+
+# Verified token claims, kept until the token's own expiry
+_token_cache = MemoryCacheBackend(AUTH_TOKEN_CACHE_SIZE)
+# Users looked up for authentication, kept for a short TTL
+_user_cache = MemoryCacheBackend(AUTH_USER_CACHE_SIZE)
+_stats = {"token_hits": 0, "token_misses": 0, "user_hits": 0, "user_misses": 0}
+
 
 def create_user(db: Session, email: str, password: str) -> User:
     hashed = hash_password(password)
@@ -8,12 +34,118 @@ def create_user(db: Session, email: str, password: str) -> User:
     db.add(user)
     db.commit()
     db.refresh(user)
+    invalidate_user(user.id)
     return user
 
 def authenticate_user(db: Session, email: str, password: str):
     user = db.query(User).filter(User.email == email).first()
     if not user:
         return None
-    if not verify_password(password, user.password):
+    verified, new_hash = verify_and_update_password(password, user.password)
+    if not verified:
         return None
+    if new_hash:
+        user.password = new_hash
+        db.commit()
+    return user
+
+
+async def create_user_async(db: AsyncSession, email: str, password: str) -> User:
+    """create_user for async routes; bcrypt runs on the password hashing pool"""
+    hashed = await password_hasher.hash(password)
+    user = User(email=email, password=hashed)
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    invalidate_user(user.id)
     return user
+
+
+async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.email == email).limit(1))
+    return result.scalars().first()
+
+
+async def authenticate_user_async(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    """
+    authenticate_user for async routes; bcrypt runs on the password hashing pool.
+    A password hashed at an outdated cost is transparently rehashed.
+    """
+    user = await get_user_by_email_async(db, email)
+    if not user:
+        return None
+    verified, new_hash = await password_hasher.verify_and_update(password, user.password)
+    if not verified:
+        return None
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
+    return user
+
+
+def decode_token_cached(token: str) -> Dict[str, Any]:
+    """
+    decode_token with a bounded LRU in front of it.
+    A token's signature is verified once; its claims are then served from
+    memory until the token expires. Invalid tokens are never cached.
+    """
+    claims = _token_cache.get(token)
+    if claims is not None:
+        _stats["token_hits"] += 1
+        return claims
+    
+    _stats["token_misses"] += 1
+    claims = decode_token(token)
+    if claims and "sub" in claims and "exp" in claims:
+        ttl = claims["exp"] - time.time()
+        if ttl > 0:
+            _token_cache.set(token, claims, ttl)
+    return claims
+
+
+async def _load_user(session_factory: Callable[[], AsyncSession], user_id: int) -> Optional[CurrentUser]:
+    with span("auth.user_lookup"):
+        async with session_factory() as db:
+            user = await db.get(User, user_id)
+            if user is None:
+                return None
+            return CurrentUser(id=user.id, email=user.email, created_at=user.created_at)
+
+
+async def get_user_cached(user_id: int, session_factory: Callable[[], AsyncSession]) -> Optional[CurrentUser]:
+    """
+    Look a user up through the short-TTL user cache.
+    Only cache misses reach the database, through the async engine. Missing users
+    are not cached, so a new account works immediately.
+    """
+    key = str(user_id)
+    user = _user_cache.get(key)
+    if user is not None:
+        _stats["user_hits"] += 1
+        return user
+    
+    _stats["user_misses"] += 1
+    user = await _load_user(session_factory, user_id)
+    if user is not None:
+        _user_cache.set(key, user, AUTH_USER_CACHE_TTL_SECONDS)
+    return user
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop a cached user; call after changing or deleting a user row"""
+    _user_cache.delete(str(user_id))
+
+
+def clear_auth_caches() -> None:
+    _token_cache.clear()
+    _user_cache.clear()
+    for key in _stats:
+        _stats[key] = 0
+
+
+def auth_cache_stats() -> Dict[str, int]:
+    return {
+        **_stats,
+        "tokens_cached": _token_cache.size(),
+        "users_cached": _user_cache.size(),
+    }
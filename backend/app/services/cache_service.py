@@ -0,0 +1,277 @@
+"""
+Result Cache for /analyze
+Content-addressed cache of analysis results with LRU + TTL eviction
+
+Keys are a SHA-256 of the normalized text, the candidate labels and the
+model identifiers, so a change of model or label set never serves a stale
+result. Storage is pluggable: in-process memory, a SQLite file, or a table
+in the application database (Postgres in production).
+"""
+import time
+import json
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Sequence, Callable
+from app.models.cache_entry import CacheEntry
+from app.config import CACHE_BACKEND, CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, CACHE_SQLITE_PATH
+from app.utils.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(text: str, labels: Sequence[str], model_ids: Sequence[str]) -> str:
+    """Hash of normalized text, candidate labels and model identifiers"""
+    material = json.dumps(
+        [normalize_text(text), sorted(labels), list(model_ids)],
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class CacheBackend:
+    """
+    Storage interface for the result cache.
+
+    Backends whose calls do I/O set blocking = True so ResultCache runs them
+    off the event loop.
+    """
+    name = "base"
+    blocking = False
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def size(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Bounded in-process LRU with per-entry expiry"""
+    name = "memory"
+
+    def __init__(self, max_entries: int, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache stored in a local SQLite file, shared by workers on one host"""
+    name = "sqlite"
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_result_cache_accessed ON result_cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE result_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now)
+            )
+            self._conn.execute("DELETE FROM result_cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM result_cache WHERE key IN ("
+                "SELECT key FROM result_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM result_cache")
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM result_cache").fetchone()[0]
+
+
+class DatabaseCacheBackend(CacheBackend):
+    """Cache stored in the analysis_cache table of the application database"""
+    name = "postgres"
+    blocking = True
+
+    def __init__(self, session_factory, max_entries: int):
+        self.session_factory = session_factory
+        self.max_entries = max_entries
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self.session_factory() as db:
+            entry = db.get(CacheEntry, key)
+            if entry is None:
+                return None
+            if entry.expires_at <= now:
+                db.delete(entry)
+                db.commit()
+                return None
+            value = entry.value
+            entry.accessed_at = now
+            db.commit()
+        return json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        now = time.time()
+        with self.session_factory() as db:
+            db.merge(CacheEntry(key=key, value=json.dumps(value), expires_at=now + ttl, accessed_at=now))
+            db.query(CacheEntry).filter(CacheEntry.expires_at <= now).delete(synchronize_session=False)
+            stale = (
+                db.query(CacheEntry.key)
+                .order_by(CacheEntry.accessed_at.desc())
+                .offset(self.max_entries)
+                .all()
+            )
+            if stale:
+                db.query(CacheEntry).filter(
+                    CacheEntry.key.in_([row.key for row in stale])
+                ).delete(synchronize_session=False)
+            db.commit()
+
+    def clear(self) -> None:
+        with self.session_factory() as db:
+            db.query(CacheEntry).delete()
+            db.commit()
+
+    def size(self) -> int:
+        with self.session_factory() as db:
+            return db.query(CacheEntry).count()
+
+
+class ResultCache:
+    """Async front of a CacheBackend with hit/miss accounting"""
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.backend is None:
+            return None
+        try:
+            value = await self._call(self.backend.get, key)
+        except Exception as e:
+            # A broken cache must never fail the request
+            logger.warning(f"Cache get failed ({self.backend.name}): {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        if self.backend is None:
+            return
+        try:
+            await self._call(self.backend.set, key, value, self.ttl)
+        except Exception as e:
+            logger.warning(f"Cache set failed ({self.backend.name}): {e}")
+
+    def clear(self) -> None:
+        """Drop all entries and reset counters"""
+        if self.backend is not None:
+            self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "backend": self.backend.name if self.backend else "none",
+            "hits": self.hits,
+            "misses": self.misses,
+            "ttl_seconds": self.ttl,
+        }
+        # Only count entries when it is free; other backends would need I/O
+        if self.backend is not None and not self.backend.blocking:
+            stats["entries"] = self.backend.size()
+        return stats
+
+
+def build_cache(backend: str = CACHE_BACKEND) -> ResultCache:
+    """Create the result cache selected by CACHE_BACKEND"""
+    if backend == "none":
+        return ResultCache(None, CACHE_TTL_SECONDS)
+    if backend == "sqlite":
+        return ResultCache(SQLiteCacheBackend(CACHE_SQLITE_PATH, CACHE_MAX_ENTRIES), CACHE_TTL_SECONDS)
+    if backend == "postgres":
+        from app.database.connection import SessionLocal
+        return ResultCache(DatabaseCacheBackend(SessionLocal, CACHE_MAX_ENTRIES), CACHE_TTL_SECONDS)
+    if backend != "memory":
+        logger.warning(f"Unknown CACHE_BACKEND '{backend}', falling back to memory")
+    return ResultCache(MemoryCacheBackend(CACHE_MAX_ENTRIES), CACHE_TTL_SECONDS)
+
+
+result_cache = build_cache()
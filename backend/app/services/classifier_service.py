@@ -0,0 +1,128 @@
+"""
+Classifier Backends
+Pluggable zero-shot classification engines behind one interface
+
+- hf:    remote facebook/bart-large-mnli through huggingface_service
+- mock:  fake scores from mock_service
+- local: in-process CPU engine, loaded once and run on a small thread pool.
+         Uses a transformers zero-shot pipeline when LOCAL_CLASSIFIER_MODEL
+         is set (optional dependency), otherwise a hashed bag-of-words
+         classifier scoring texts against label-description centroids.
+
+Every backend returns the same dict as classify_text:
+category, confidence, scores and latency_ms.
+"""
+import time
+import math
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from app.config import CLASSIFIER_BACKEND, LOCAL_CLASSIFIER_MODEL, LOCAL_CLASSIFIER_WORKERS
+from app.services.huggingface_service import classify_text, DEFAULT_LABELS, HF_MODEL_ID
+from app.services.mock_service import mock_classify_text
+from app.services.label_prefilter import label_prefilter
+
+logger = logging.getLogger(__name__)
+
+# Softmax temperature for turning cosine similarities into scores
+CENTROID_TEMPERATURE = 0.05
+
+
+class ClassifierBackend:
+    """Interface of a zero-shot classification engine"""
+    name = "base"
+    model_id = "unknown"
+
+    async def classify(self, text: str, candidate_labels: Optional[List[str]] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class HuggingFaceClassifier(ClassifierBackend):
+    """Remote BART-MNLI through the HuggingFace inference API"""
+    name = "hf"
+    model_id = HF_MODEL_ID
+
+    async def classify(self, text: str, candidate_labels: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await classify_text(text, candidate_labels)
+
+
+class MockClassifier(ClassifierBackend):
+    """Fake classifier from mock_service"""
+    name = "mock"
+    model_id = "mock-classifier"
+
+    async def classify(self, text: str, candidate_labels: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await mock_classify_text(text, candidate_labels)
+
+
+class LocalClassifier(ClassifierBackend):
+    """In-process CPU classifier, loaded once and run on a dedicated thread pool"""
+    name = "local"
+
+    def __init__(self, model_name: str = LOCAL_CLASSIFIER_MODEL, workers: int = LOCAL_CLASSIFIER_WORKERS):
+        self.model_name = model_name
+        self.model_id = model_name or "local-hashed-centroid"
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="local-classifier")
+        self._pipeline = None
+
+    def _load_pipeline(self):
+        """Load the transformers zero-shot pipeline on first use (optional dependency)"""
+        if self._pipeline is None:
+            from transformers import pipeline
+            logger.info(f"Loading local zero-shot model {self.model_name}")
+            self._pipeline = pipeline("zero-shot-classification", model=self.model_name, device=-1)
+        return self._pipeline
+
+    def _score_centroids(self, text: str, labels: List[str]) -> Dict[str, float]:
+        similarities = label_prefilter.similarities(text, labels)
+        top = max(similarities)
+        weights = [math.exp((s - top) / CENTROID_TEMPERATURE) for s in similarities]
+        total = sum(weights)
+        return {label: w / total for label, w in zip(labels, weights)}
+
+    def _score(self, text: str, labels: List[str]) -> Dict[str, float]:
+        if self.model_name:
+            output = self._load_pipeline()(text, candidate_labels=labels)
+            return dict(zip(output["labels"], output["scores"]))
+        return self._score_centroids(text, labels)
+
+    async def classify(self, text: str, candidate_labels: Optional[List[str]] = None) -> Dict[str, Any]:
+        labels = candidate_labels or DEFAULT_LABELS
+        start_time = time.time()
+
+        loop = asyncio.get_running_loop()
+        raw = await loop.run_in_executor(self._executor, self._score, text, labels)
+
+        ranked = sorted(raw.items(), key=lambda item: item[1], reverse=True)
+        scores = {label: round(score, 4) for label, score in ranked}
+        latency_ms = int((time.time() - start_time) * 1000)
+
+        return {
+            "category": ranked[0][0],
+            "confidence": round(ranked[0][1], 4),
+            "scores": scores,
+            "latency_ms": latency_ms
+        }
+
+
+_BACKENDS = {
+    "hf": HuggingFaceClassifier,
+    "mock": MockClassifier,
+    "local": LocalClassifier,
+}
+_instances: Dict[str, ClassifierBackend] = {}
+
+
+def check_backend(name: str) -> None:
+    """Raise ValueError unless a classifier backend is registered under name"""
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown classifier backend '{name}'. Choose one of: {', '.join(_BACKENDS)}")
+
+
+def get_classifier(name: str = CLASSIFIER_BACKEND) -> ClassifierBackend:
+    """Return the (process-wide) classifier backend registered under name"""
+    check_backend(name)
+    if name not in _instances:
+        _instances[name] = _BACKENDS[name]()
+    return _instances[name]
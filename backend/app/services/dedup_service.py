@@ -0,0 +1,176 @@
+"""
+Near-duplicate Result Reuse
+Serves /analyze results for texts almost identical to one analyzed before
+
+The exact result cache misses resubmissions with trivial edits: whitespace,
+tracking parameters, a fixed typo. Every analyzed text gets a 256-bit SimHash
+fingerprint (utils.text.simhash); two texts are near duplicates when their
+similarity, 1 - differing bits / 256, reaches the threshold.
+
+Lookups use LSH banding: the fingerprint is cut into bands of LSH_BAND_BITS
+bits, each band value maps to the fingerprints having it, and only
+fingerprints sharing at least one band with the query are compared. Two
+fingerprints at similarity s share a given band with probability about
+s ** LSH_BAND_BITS, so matches at 0.85 and above are found almost always
+and those close to a threshold around 0.8 most of the time
+(benchmarks/bench_dedup.py reports the recall per kind of edit).
+
+Entries are scoped by a context key (the labels and model identifiers, like
+the result cache key) and kept in an LRU of max_entries. Fingerprints are
+also stored with the history rows of computed (not reused) results, from
+which rebuild() reloads the most recent entries at startup.
+"""
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.analysis import Analysis
+from app.utils.text import SIMHASH_BITS, simhash, tokenize
+from app.config import DEDUP_THRESHOLD, DEDUP_MIN_WORDS, DEDUP_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+# Narrower bands find more distant matches but compare more unrelated candidates
+LSH_BAND_BITS = 10
+LSH_BANDS = SIMHASH_BITS // LSH_BAND_BITS
+_BAND_MASK = (1 << LSH_BAND_BITS) - 1
+
+
+def to_hex(fingerprint: int) -> str:
+    """Fingerprint as stored in the analyses.fingerprint column"""
+    return format(fingerprint, f"0{SIMHASH_BITS // 4}x")
+
+
+def context_key(labels: Sequence[str], model_ids: Sequence[str]) -> str:
+    """Short hash of the candidate labels and model identifiers a result depends on"""
+    material = json.dumps([sorted(labels), list(model_ids)], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+def text_fingerprint(text: str, min_words: int = DEDUP_MIN_WORDS) -> Optional[int]:
+    """SimHash of a text, or None when it is too short for a near match to be safe"""
+    if len(tokenize(text)) < min_words:
+        return None
+    return simhash(text)
+
+
+def max_distance(threshold: float) -> int:
+    """Differing bits allowed at a similarity threshold"""
+    return max(int(SIMHASH_BITS * (1 - threshold) + 1e-9), 0)
+
+
+class NearDuplicateIndex:
+    """LSH index of recent results by text fingerprint"""
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, max_entries: int = DEDUP_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_distance = max_distance(threshold)
+        self._entries: "OrderedDict[Tuple[str, int], Dict[str, Any]]" = OrderedDict()
+        # Lists, not sets: a small set costs ~5 times the memory of a list and buckets hold few entries
+        self._buckets: Dict[Tuple[str, int], List[int]] = {}
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.lookups = 0
+        self.hits = 0
+        self.candidates = 0
+
+    def _band_keys(self, context: str, fingerprint: int):
+        for band in range(LSH_BANDS):
+            yield (context, (band << LSH_BAND_BITS) | ((fingerprint >> (band * LSH_BAND_BITS)) & _BAND_MASK))
+
+    def lookup(self, context: str, fingerprint: int) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Result of the closest candidate within max_distance, and its similarity"""
+        self.lookups += 1
+        candidates: Set[int] = set()
+        for key in self._band_keys(context, fingerprint):
+            candidates.update(self._buckets.get(key, ()))
+        self.candidates += len(candidates)
+        if not candidates:
+            return None
+
+        distance, closest = min(((fingerprint ^ other).bit_count(), other) for other in candidates)
+        if distance > self.max_distance:
+            return None
+        self.hits += 1
+        self._entries.move_to_end((context, closest))
+        return self._entries[(context, closest)], round(1 - distance / SIMHASH_BITS, 4)
+
+    def add(self, context: str, fingerprint: int, result: Dict[str, Any]) -> None:
+        """Index a result, evicting the least recently used entries past max_entries"""
+        key = (context, fingerprint)
+        if key not in self._entries:
+            for band_key in self._band_keys(context, fingerprint):
+                self._buckets.setdefault(band_key, []).append(fingerprint)
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            (old_context, old_fingerprint), _ = self._entries.popitem(last=False)
+            for band_key in self._band_keys(old_context, old_fingerprint):
+                bucket = self._buckets[band_key]
+                bucket.remove(old_fingerprint)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def clear(self) -> None:
+        """Drop all entries and reset counters"""
+        self._entries.clear()
+        self._buckets.clear()
+        self.reset_stats()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    async def rebuild(self, session_factory: Optional[Callable[[], AsyncSession]] = None) -> int:
+        """
+        Reload the max_entries most recent fingerprinted history rows of
+        computed results (served-from-cache rows are skipped, so entries
+        never chain); returns the entries loaded. A failing read leaves the
+        index empty.
+        """
+        if session_factory is None:
+            from app.database.connection import get_async_sessionmaker
+            session_factory = get_async_sessionmaker()
+        query = (
+            select(
+                Analysis.context_key, Analysis.fingerprint,
+                Analysis.category, Analysis.hf_scores, Analysis.summary, Analysis.tone
+            )
+            .where(Analysis.fingerprint.is_not(None), Analysis.cached.is_(False))
+            .order_by(Analysis.id.desc())
+            .limit(self.max_entries)
+        )
+        self.clear()
+        try:
+            async with session_factory() as db:
+                rows = (await db.execute(query)).all()
+        except Exception as e:
+            logger.warning(f"Near-duplicate index rebuild failed: {e}")
+            return 0
+        # Oldest first, so the most recent rows end up most recently used
+        for row in reversed(rows):
+            self.add(row.context_key, int(row.fingerprint, 16), {
+                "category": row.category,
+                "hf_scores": row.hf_scores,
+                "summary": row.summary,
+                "tone": row.tone
+            })
+        return self.size()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "threshold": self.threshold,
+            "max_distance": self.max_distance,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "avg_candidates": round(self.candidates / self.lookups, 2) if self.lookups else 0.0,
+        }
+
+
+near_duplicates = NearDuplicateIndex()
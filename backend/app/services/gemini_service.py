@@ -1,22 +1,79 @@
 """
 Gemini Summarization & Tone Analysis Service
 Uses Google Gemini API for contextual text analysis
+
+The SDK call is blocking, so it runs on a bounded dedicated thread pool
+instead of the event loop. The SDK is imported and configured on first use
+(importing it takes longer than the rest of the app), and the model object
+is built once and reused.
+Calls hold a slot of gemini_limiter while in flight; when it is saturated
+they wait briefly or are shed with LoadShedError (never retried here).
+gemini_breaker stops calling Gemini while it keeps failing (CircuitOpenError,
+a LoadShedError, is likewise not retried). Retries follow gemini_retry:
+jittered backoff, the shared retry budget and the request deadline, which
+also caps each call's timeout.
+With GEMINI_JSON_MODE, JSON prompts ask for schema-constrained output that
+is parsed without regexes: json.loads of the whole answer, then a single
+repair pass; an answer neither can read raises GeminiParseError and is
+retried like any failed call.
 """
-import google.generativeai as genai
 import time
 import json
+import asyncio
 import logging
 import re
-from typing import Dict, Any
-from app.config import GEMINI_API_KEY
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import AsyncContextManager, Callable, Dict, Any, List, Optional, Tuple, Union, AsyncIterator
+from app.config import (
+    GEMINI_API_KEY, GEMINI_MODEL, GEMINI_MAX_WORKERS, GEMINI_JSON_MODE,
+    GEMINI_CONCURRENCY_INITIAL, GEMINI_CONCURRENCY_MIN, GEMINI_CONCURRENCY_MAX, GEMINI_LATENCY_TARGET_MS,
+    LIMITER_MAX_QUEUE, LIMITER_QUEUE_TIMEOUT_MS,
+    BREAKER_FAILURE_THRESHOLD, BREAKER_ERROR_RATE, BREAKER_WINDOW, BREAKER_MIN_CALLS,
+    BREAKER_RESET_TIMEOUT_S, BREAKER_HALF_OPEN_PROBES, MOCK_UPSTREAMS
+)
+from app.utils.limiter import AdaptiveLimiter, LoadShedError
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.retry import RetryPolicy, DeadlineExceeded, attempt_timeout
+from app.utils.metrics import GEMINI_DURATION, GEMINI_PARSE, UPSTREAM_RESPONSES
+from app.utils.tracing import span, open_span
 
 logger = logging.getLogger(__name__)
 
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-
 TIMEOUT_SECONDS = 30
 MAX_RETRIES = 2
+VALID_TONES = ["positif", "neutre", "négatif"]
+STREAM_TONE_MARKER = "TONE:"
+
+
+# Dedicated pool so slow Gemini calls never starve Starlette's shared threadpool
+_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_WORKERS, thread_name_prefix="gemini")
+_genai = None
+_model = None
+
+gemini_limiter = AdaptiveLimiter(
+    "gemini",
+    initial_limit=GEMINI_CONCURRENCY_INITIAL,
+    min_limit=GEMINI_CONCURRENCY_MIN,
+    max_limit=GEMINI_CONCURRENCY_MAX,
+    max_queue=LIMITER_MAX_QUEUE,
+    queue_timeout=LIMITER_QUEUE_TIMEOUT_MS / 1000,
+    latency_target=GEMINI_LATENCY_TARGET_MS / 1000,
+)
+
+gemini_breaker = CircuitBreaker(
+    "gemini",
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    error_rate=BREAKER_ERROR_RATE,
+    window_size=BREAKER_WINDOW,
+    min_calls=BREAKER_MIN_CALLS,
+    reset_timeout=BREAKER_RESET_TIMEOUT_S,
+    half_open_max_calls=BREAKER_HALF_OPEN_PROBES,
+)
+
+gemini_retry = RetryPolicy("gemini", max_attempts=MAX_RETRIES + 1)
 
 
 class GeminiError(Exception):
@@ -24,10 +81,103 @@ class GeminiError(Exception):
     pass
 
 
+class GeminiParseError(GeminiError):
+    """Structured answer that stays unreadable after the repair pass"""
+    pass
+
+
+BATCH_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "id": {"type": "integer"},
+            "summary": {"type": "string"},
+            "tone": {"type": "string", "enum": VALID_TONES},
+        },
+        "required": ["id", "summary", "tone"],
+    },
+}
+
+
+def _get_genai():
+    """Return the google.generativeai module, importing and configuring it on first use"""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=GEMINI_API_KEY)
+        _genai = genai
+    return _genai
+
+
+def _get_model():
+    """Return the process-wide GenerativeModel, creating it on first use"""
+    global _model
+    if _model is None:
+        if MOCK_UPSTREAMS:
+            from app.services.mock_service import MockGeminiModel
+            _model = MockGeminiModel()
+        else:
+            _model = _get_genai().GenerativeModel(GEMINI_MODEL)
+    return _model
+
+
+def _count_outcome(error: Optional[BaseException]) -> None:
+    """Count one Gemini attempt: ok, the API status code, or the error class"""
+    if error is None:
+        status = "ok"
+    elif isinstance(getattr(error, "code", None), int):
+        status = str(error.code)
+    else:
+        status = type(error).__name__
+    UPSTREAM_RESPONSES.labels(upstream="gemini", status=status).inc()
+
+
+def _response_schema(candidate_labels: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Schema of a summary + tone answer; with candidate_labels, also a category among them"""
+    properties = {"summary": {"type": "string"}, "tone": {"type": "string", "enum": VALID_TONES}}
+    required = ["summary", "tone"]
+    if candidate_labels is not None:
+        properties["category"] = {"type": "string", **({"enum": list(candidate_labels)} if candidate_labels else {})}
+        required.append("category")
+    return {"type": "object", "properties": properties, "required": required}
+
+
+def _json_config(schema: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """generation_config asking for JSON matching schema, or None outside GEMINI_JSON_MODE"""
+    if not GEMINI_JSON_MODE:
+        return None
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+
+async def _generate(prompt: str, generation_config: Optional[Dict[str, Any]] = None):
+    """Run the blocking generate_content call on the Gemini executor"""
+    model = _get_model()
+    loop = asyncio.get_running_loop()
+    options = {"generation_config": generation_config} if generation_config else {}
+    call = functools.partial(
+        model.generate_content, prompt,
+        request_options={"timeout": attempt_timeout(TIMEOUT_SECONDS)}, **options
+    )
+    async with gemini_breaker.guard(), gemini_limiter.slot():
+        start = time.perf_counter()
+        with span("gemini.attempt"):
+            try:
+                response = await loop.run_in_executor(_executor, call)
+            except Exception as e:
+                _count_outcome(e)
+                raise
+            finally:
+                GEMINI_DURATION.observe(time.perf_counter() - start)
+        _count_outcome(None)
+        return response
+
+
 def _parse_gemini_response(text: str) -> Dict[str, str]:
     """
     Parse Gemini response to extract summary and tone.
-    Handles both JSON and plain text responses.
+    Handles both JSON and plain text responses (free-form answers, when
+    GEMINI_JSON_MODE is off); never fails.
     """
     # Try to parse as JSON first
     try:
@@ -35,10 +185,13 @@ def _parse_gemini_response(text: str) -> Dict[str, str]:
         json_match = re.search(r'\{[^{}]*\}', text, re.DOTALL)
         if json_match:
             data = json.loads(json_match.group())
-            return {
+            result = {
                 "summary": data.get("summary", "").strip(),
                 "tone": data.get("tone", "neutre").strip().lower()
             }
+            if data.get("category"):
+                result["category"] = str(data["category"]).strip().lower()
+            return result
     except json.JSONDecodeError:
         pass
     
@@ -52,13 +205,7 @@ def _parse_gemini_response(text: str) -> Dict[str, str]:
         if "summary:" in line_lower or "résumé:" in line_lower:
             summary = line.split(":", 1)[-1].strip()
         elif "tone:" in line_lower or "ton:" in line_lower:
-            tone_text = line.split(":", 1)[-1].strip().lower()
-            if "positif" in tone_text or "positive" in tone_text:
-                tone = "positif"
-            elif "négatif" in tone_text or "negative" in tone_text or "negatif" in tone_text:
-                tone = "négatif"
-            else:
-                tone = "neutre"
+            tone = _normalize_tone(line.split(":", 1)[-1])
     
     # If no structured format, use the whole text as summary
     if not summary:
@@ -67,18 +214,107 @@ def _parse_gemini_response(text: str) -> Dict[str, str]:
     return {"summary": summary, "tone": tone}
 
 
-async def analyze_text(text: str, category: str) -> Dict[str, Any]:
+def _analysis_fields(data: Any) -> Optional[Dict[str, str]]:
+    """summary, tone (and category) of a decoded answer, or None if it has no summary"""
+    if not isinstance(data, dict):
+        return None
+    summary = data.get("summary")
+    if not isinstance(summary, str) or not summary.strip():
+        return None
+    tone = data.get("tone")
+    result = {"summary": summary.strip(), "tone": tone.strip().lower() if isinstance(tone, str) else "neutre"}
+    if data.get("category"):
+        result["category"] = str(data["category"]).strip().lower()
+    return result
+
+
+def _repair_json_response(text: str) -> Optional[Dict[str, str]]:
     """
-    Analyze text with Gemini: generate summary and detect tone.
+    The single repair pass for a structured answer that is not bare JSON:
+    the outermost {...} (dropping code fences or prose around it and a
+    trailing comma before the closing brace), or failing any braces,
+    "Summary:" / "Tone:" lines. Truncated or otherwise invalid JSON is not
+    patched up: a cut-off summary is worth a retry.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        body = text[start:end].rstrip()
+        if body.endswith(","):
+            body = body[:-1]
+        try:
+            return _analysis_fields(json.loads(body + "}"))
+        except json.JSONDecodeError:
+            return None
     
-    Args:
-        text: The original text to analyze
-        category: The category from HuggingFace classification
+    summary, tone = "", "neutre"
+    for line in text.splitlines():
+        key, colon, value = line.partition(":")
+        if not colon:
+            continue
+        key = key.strip(" *#-").lower()
+        if key in ("summary", "résumé"):
+            summary = value.strip(" *")
+        elif key in ("tone", "ton"):
+            tone = _normalize_tone(value.strip(" *"))
+    return {"summary": summary, "tone": tone} if summary else None
+
+
+def _parse_json_response(text: str) -> Dict[str, str]:
+    """
+    Parse a structured-output answer: json.loads of the whole text, then
+    _repair_json_response. Counts the outcome in GEMINI_PARSE.
     
-    Returns:
-        Dict with summary, tone, and latency_ms
+    Raises:
+        GeminiParseError: When neither yields a summary
     """
-    prompt = f"""Analyze the following text that has been classified as "{category}".
+    try:
+        result = _analysis_fields(json.loads(text))
+    except json.JSONDecodeError:
+        result = None
+    if result is not None:
+        GEMINI_PARSE.labels(outcome="strict").inc()
+        return result
+    
+    result = _repair_json_response(text)
+    if result is not None:
+        GEMINI_PARSE.labels(outcome="repaired").inc()
+        return result
+    
+    GEMINI_PARSE.labels(outcome="failed").inc()
+    raise GeminiParseError(f"Unparseable Gemini answer: {text[:80]!r}")
+
+
+def _parse_answer(text: str) -> Dict[str, str]:
+    """Parse a summary + tone answer with the parser matching GEMINI_JSON_MODE"""
+    return _parse_json_response(text) if GEMINI_JSON_MODE else _parse_gemini_response(text)
+
+
+def _build_open_prompt(text: str, candidate_labels: List[str]) -> str:
+    """Category-agnostic prompt that also asks Gemini for its own category guess"""
+    labels = ", ".join(candidate_labels)
+    return f"""Analyze the following text.
+
+TEXT:
+{text}
+
+Respond in this exact JSON format:
+{{
+    "summary": "A clear, concise 2-3 sentence summary of the main points",
+    "tone": "positif OR neutre OR négatif",
+    "category": "the single best matching category among: {labels}"
+}}
+
+Rules:
+- Summary must be in the same language as the original text
+- Tone must be exactly one of: positif, neutre, négatif
+- Category must be exactly one of: {labels}
+- Keep summary under 150 words
+- Be objective in your analysis"""
+
+
+def _build_prompt(text: str, category: str) -> str:
+    """Prompt asking for a JSON summary + tone of a single text"""
+    return f"""Analyze the following text that has been classified as "{category}".
 
 TEXT:
 {text}
@@ -95,40 +331,321 @@ Rules:
 - Keep summary under 150 words
 - Be objective in your analysis"""
 
-    start_time = time.time()
+
+def _build_stream_prompt(text: str, category: str) -> str:
+    """Prompt whose answer starts with the summary so it can be streamed as-is"""
+    return f"""Analyze the following text that has been classified as "{category}".
+
+TEXT:
+{text}
+
+First write a clear, concise 2-3 sentence summary of the main points as plain text.
+Then, on a final separate line, write exactly: {STREAM_TONE_MARKER} positif OR neutre OR négatif
+
+Rules:
+- Summary must be in the same language as the original text
+- Do not use JSON or markdown
+- Tone must be exactly one of: positif, neutre, négatif
+- Keep summary under 150 words
+- Be objective in your analysis"""
+
+
+def _normalize_tone(tone_text: str) -> str:
+    """Map free-form tone wording to positif / neutre / négatif"""
+    tone_text = tone_text.strip().lower()
+    if "positif" in tone_text or "positive" in tone_text:
+        return "positif"
+    if "négatif" in tone_text or "negative" in tone_text or "negatif" in tone_text:
+        return "négatif"
+    return "neutre"
+
+
+def _build_batch_prompt(items: List[Tuple[str, str]]) -> str:
+    """Prompt packing several texts into one request, answered as a JSON array"""
+    documents = "\n\n".join(
+        f'<document id="{index}" category="{category}">\n{text}\n</document>'
+        for index, (text, category) in enumerate(items)
+    )
+    return f"""Analyze each of the following {len(items)} documents independently.
+Each document has an id and the category it has been classified as.
+
+{documents}
+
+Respond with a JSON array containing exactly one object per document, in this format:
+[
+    {{"id": 0, "summary": "A clear, concise 2-3 sentence summary of the main points", "tone": "positif OR neutre OR négatif"}}
+]
+
+Rules:
+- Each summary must be in the same language as its document
+- Tone must be exactly one of: positif, neutre, négatif
+- Keep each summary under 150 words
+- Be objective in your analysis"""
+
+
+def _parse_batch_response(text: str, count: int) -> Dict[int, Dict[str, str]]:
+    """Extract {id: {summary, tone}} from a batch answer, skipping unusable entries"""
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    
+    results = {}
+    for entry in data if isinstance(data, list) else []:
+        if not isinstance(entry, dict) or not isinstance(entry.get("id"), int):
+            continue
+        if not 0 <= entry["id"] < count or not str(entry.get("summary", "")).strip():
+            continue
+        tone = str(entry.get("tone", "neutre")).strip().lower()
+        results[entry["id"]] = {
+            "summary": str(entry["summary"]).strip(),
+            "tone": tone if tone in VALID_TONES else "neutre"
+        }
+    return results
+
+
+async def _stream_chunks(prompt: str) -> AsyncIterator[str]:
+    """
+    Yield text chunks of a streamed generate_content call.
+    
+    The blocking chunk iterator runs on the Gemini executor and hands chunks
+    to the event loop through a queue. Closing the generator early tells the
+    worker thread to stop reading.
+    """
+    model = _get_model()
+    loop = asyncio.get_running_loop()
+    timeout = attempt_timeout(TIMEOUT_SECONDS)
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    end = object()
+    
+    def produce():
+        try:
+            for chunk in model.generate_content(prompt, stream=True, request_options={"timeout": timeout}):
+                if stop.is_set():
+                    break
+                if chunk.text:
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, end)
+    
+    async with gemini_breaker.guard(), gemini_limiter.slot():
+        start = time.perf_counter()
+        # Spans the yields below, so it cannot be the parent of later spans
+        stream_span = open_span("gemini.stream")
+        loop.run_in_executor(_executor, produce)
+        chunks = 0
+        try:
+            while True:
+                item = await queue.get()
+                if item is end:
+                    break
+                if isinstance(item, Exception):
+                    _count_outcome(item)
+                    stream_span.set(error=type(item).__name__)
+                    raise item
+                chunks += 1
+                yield item
+            _count_outcome(None)
+        finally:
+            stop.set()
+            stream_span.set(chunks=chunks)
+            stream_span.finish()
+            GEMINI_DURATION.observe(time.perf_counter() - start)
+
+
+async def analyze_text_stream(text: str, category: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a Gemini summary as it is generated.
+    
+    Yields {"type": "token", "text": ...} events for summary text, then one
+    {"type": "result", "summary", "tone", "latency_ms", "first_token_ms"}
+    event. The trailing tone line is held back and never sent as a token.
+    Attempts that fail before the first token are retried; once text has
+    been sent, a failure raises GeminiError.
+    """
+    prompt = _build_stream_prompt(text, category)
+    marker = STREAM_TONE_MARKER
+    start_time = time.perf_counter()
+    gemini_retry.start()
+    
+    for attempt in range(MAX_RETRIES + 1):
+        buffer = ""
+        emitted = 0
+        marker_at = -1
+        first_token_ms = None
+        
+        try:
+            async for chunk in _stream_chunks(prompt):
+                buffer += chunk
+                if marker_at == -1:
+                    marker_at = buffer.upper().find(marker)
+                # Hold back a possible partial marker at the end of the buffer
+                safe_end = marker_at if marker_at != -1 else len(buffer) - len(marker) + 1
+                if safe_end > emitted:
+                    if first_token_ms is None:
+                        first_token_ms = int((time.perf_counter() - start_time) * 1000)
+                    yield {"type": "token", "text": buffer[emitted:safe_end]}
+                    emitted = safe_end
+        except (LoadShedError, DeadlineExceeded):
+            raise
+        except Exception as e:
+            delay = gemini_retry.next_delay(attempt, e) if emitted == 0 else None
+            if delay is not None:
+                logger.warning(f"Gemini stream attempt {attempt + 1} failed: {e}. Retrying in {delay:.2f}s...")
+                await gemini_retry.sleep(delay)
+                continue
+            logger.error(f"Gemini stream error after {attempt + 1} attempts: {e}")
+            raise GeminiError(f"Analysis failed: {str(e)}")
+        
+        if marker_at == -1:
+            if len(buffer) > emitted:
+                yield {"type": "token", "text": buffer[emitted:]}
+            summary, tone = buffer.strip(), "neutre"
+        else:
+            summary, tone = buffer[:marker_at].strip(), _normalize_tone(buffer[marker_at + len(marker):])
+        
+        if not summary:
+            if attempt < MAX_RETRIES:
+                logger.warning(f"Gemini stream attempt {attempt + 1} returned no summary. Retrying...")
+                continue
+            raise GeminiError("Empty response from Gemini")
+        
+        latency_ms = int((time.perf_counter() - start_time) * 1000)
+        logger.info(f"Gemini stream complete: tone={tone} in {latency_ms}ms (first token {first_token_ms}ms)")
+        
+        yield {
+            "type": "result",
+            "summary": summary,
+            "tone": tone,
+            "latency_ms": latency_ms,
+            "first_token_ms": first_token_ms
+        }
+        return
+
+
+async def analyze_text(
+    text: str,
+    category: Optional[str] = None,
+    candidate_labels: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Analyze text with Gemini: generate summary and detect tone.
+    
+    Args:
+        text: The original text to analyze
+        category: The category from HuggingFace classification, or None for
+            a category-agnostic analysis (used by the parallel pipeline)
+        candidate_labels: Labels Gemini picks its own category from when
+            category is None
+    
+    Returns:
+        Dict with summary, tone, and latency_ms (plus Gemini's category
+        guess when category is None)
+    """
+    if category is None:
+        prompt = _build_open_prompt(text, candidate_labels or [])
+        generation_config = _json_config(_response_schema(candidate_labels or []))
+    else:
+        prompt = _build_prompt(text, category)
+        generation_config = _json_config(_response_schema())
+
+    start_time = time.perf_counter()
+    gemini_retry.start()
     
     for attempt in range(MAX_RETRIES + 1):
         try:
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            response = model.generate_content(prompt)
+            response = await _generate(prompt, generation_config)
             
-            latency_ms = int((time.time() - start_time) * 1000)
+            latency_ms = int((time.perf_counter() - start_time) * 1000)
             
             if not response.text:
                 raise GeminiError("Empty response from Gemini")
             
-            result = _parse_gemini_response(response.text)
+            result = _parse_answer(response.text)
             
             # Validate tone
-            if result["tone"] not in ["positif", "neutre", "négatif"]:
+            if result["tone"] not in VALID_TONES:
                 result["tone"] = "neutre"
             
             logger.info(f"Gemini analysis complete: tone={result['tone']} in {latency_ms}ms")
             
-            return {
+            analysis = {
                 "summary": result["summary"],
                 "tone": result["tone"],
                 "latency_ms": latency_ms
             }
+            if category is None:
+                analysis["category"] = result.get("category")
+            return analysis
             
+        except (LoadShedError, DeadlineExceeded):
+            raise
         except Exception as e:
-            latency_ms = int((time.time() - start_time) * 1000)
-            
-            if attempt < MAX_RETRIES:
-                logger.warning(f"Gemini attempt {attempt + 1} failed: {e}. Retrying...")
+            delay = gemini_retry.next_delay(attempt, e)
+            if delay is not None:
+                logger.warning(f"Gemini attempt {attempt + 1} failed: {e}. Retrying in {delay:.2f}s...")
+                await gemini_retry.sleep(delay)
                 continue
             
             logger.error(f"Gemini error after {attempt + 1} attempts: {e}")
             raise GeminiError(f"Analysis failed: {str(e)}")
     
     raise GeminiError("Max retries exceeded")
+
+
+async def analyze_texts(
+    items: List[Tuple[str, str]],
+    call_slot: Optional[Callable[[], AsyncContextManager]] = None
+) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Analyze several (text, category) pairs with one structured Gemini prompt.
+    
+    Documents missing from the answer (or the whole batch, if the call or
+    the JSON fails) are analyzed one by one with analyze_text.
+    
+    Args:
+        items: List of (text, category) pairs
+        call_slot: Context manager factory entered around each upstream call
+            (the packed prompt and every one-by-one fallback), so callers can
+            bound and count them
+    
+    Returns:
+        One analyze_text-style dict per item, or the exception raised for it
+    """
+    results: Dict[int, Dict[str, Any]] = {}
+    if call_slot is None:
+        call_slot = nullcontext
+    
+    if len(items) > 1:
+        try:
+            async with call_slot():
+                start_time = time.perf_counter()
+                response = await _generate(_build_batch_prompt(items), _json_config(BATCH_RESPONSE_SCHEMA))
+            latency_ms = int((time.perf_counter() - start_time) * 1000)
+            for index, parsed in _parse_batch_response(response.text or "", len(items)).items():
+                results[index] = {**parsed, "latency_ms": latency_ms}
+            logger.info(f"Gemini batch analysis: {len(results)}/{len(items)} documents in {latency_ms}ms")
+        except (LoadShedError, DeadlineExceeded) as e:
+            return [e] * len(items)
+        except Exception as e:
+            logger.warning(f"Gemini batch analysis failed: {e}. Analyzing one by one")
+    
+    async def analyze_one(text: str, category: str) -> Dict[str, Any]:
+        async with call_slot():
+            return await analyze_text(text, category)
+    
+    missing = [index for index in range(len(items)) if index not in results]
+    fallback = await asyncio.gather(
+        *[analyze_one(*items[index]) for index in missing],
+        return_exceptions=True
+    )
+    for index, result in zip(missing, fallback):
+        results[index] = result
+    
+    return [results[index] for index in range(len(items))]
@@ -0,0 +1,273 @@
+"""
+Analysis History
+Persists every analysis a user receives in the analyses table.
+
+Writes are write-behind: record() only appends to an in-memory buffer, and
+a background task inserts the buffered rows in batches (one multi-row
+INSERT per HISTORY_BATCH_SIZE rows), so the request path never waits on
+the database. A flush failing to reach the database keeps the rows for the
+next attempt; once HISTORY_MAX_BUFFER rows are waiting, new rows are
+dropped and counted. A batch the database rejects (a constraint or schema
+error) is bisected so the other rows are written; the rejected rows go to
+the back of the buffer and are dropped after HISTORY_MAX_ATTEMPTS flushes,
+so one bad row cannot hold up the rows recorded after it.
+
+Reads are keyset-paginated, newest first: a page is "rows of this user with
+id below the cursor", served by the (user_id, id) index (or the
+(user_id, category, id) one when filtering), so deep pages cost the same
+as the first one.
+"""
+import time
+import asyncio
+import hashlib
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.exc import InterfaceError, OperationalError, StatementError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.analysis import Analysis
+from app.services.dedup_service import to_hex
+from app.utils.text import normalize_text
+from app.config import HISTORY_BATCH_SIZE, HISTORY_FLUSH_INTERVAL_MS, HISTORY_MAX_BUFFER, HISTORY_MAX_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 of the normalized text (the text itself is not stored)"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _is_rejection(error: BaseException) -> bool:
+    """Whether the database refused the rows themselves, rather than being unreachable"""
+    return isinstance(error, StatementError) and not isinstance(error, (OperationalError, InterfaceError))
+
+
+def history_row(
+    user_id: int,
+    text: str,
+    result: Dict[str, Any],
+    meta: Dict[str, Any],
+    fingerprint: Optional[int] = None,
+    context_key: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    analyses row for one delivered result (category, hf_scores, summary, tone)
+    and its MetaInfo; fingerprint is the SimHash of the text, if any
+    """
+    return {
+        "user_id": user_id,
+        "text_hash": text_hash(text),
+        "category": result["category"],
+        "hf_scores": result["hf_scores"],
+        "summary": result["summary"],
+        "tone": result["tone"],
+        "hf_latency_ms": meta.get("hf_latency_ms") or 0,
+        "gemini_latency_ms": meta.get("gemini_latency_ms") or 0,
+        "total_execution_ms": meta.get("total_execution_ms") or 0,
+        "cached": bool(meta.get("cached")),
+        "fingerprint": to_hex(fingerprint) if fingerprint is not None else None,
+        "context_key": context_key,
+    }
+
+
+class HistoryWriter:
+    """Write-behind buffer batching analyses inserts off the request path"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        batch_size: int = HISTORY_BATCH_SIZE,
+        flush_interval: float = HISTORY_FLUSH_INTERVAL_MS / 1000,
+        max_buffer: int = HISTORY_MAX_BUFFER,
+        max_attempts: int = HISTORY_MAX_ATTEMPTS,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_attempts = max(1, max_attempts)
+        # (row, rejected attempts so far)
+        self._buffer: Deque[Tuple[Dict[str, Any], int]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.rejected = 0
+        self.last_flush_ms = 0.0
+
+    def _sessions(self) -> Callable[[], AsyncSession]:
+        if self.session_factory is None:
+            from app.database.connection import get_async_sessionmaker
+            return get_async_sessionmaker()
+        return self.session_factory
+
+    def record(self, row: Dict[str, Any]) -> bool:
+        """Queue a row for insertion; never blocks. False when the buffer is full."""
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return False
+        self._buffer.append((row, 0))
+        self.recorded += 1
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    async def _insert(self, entries: List[Tuple[Dict[str, Any], int]]) -> None:
+        async with self._sessions()() as db:
+            await db.execute(insert(Analysis), [row for row, _ in entries])
+            await db.commit()
+
+    def _requeue(self, entries: List[Tuple[Dict[str, Any], int]], front: bool) -> None:
+        """Put entries back (at the front to keep their order), within the buffer bound"""
+        room = max(0, self.max_buffer - len(self._buffer))
+        if front:
+            self._buffer.extendleft(reversed(entries[:room]))
+        else:
+            self._buffer.extend(entries[:room])
+        self.dropped += len(entries) - min(room, len(entries))
+
+    async def _write_batch(self, batch: List[Tuple[Dict[str, Any], int]]) -> Tuple[int, Optional[Exception]]:
+        """
+        Insert one batch, bisecting it when the database rejects it. Rejected
+        rows are requeued at the back (or dropped once out of attempts). When
+        the database cannot be reached, the unwritten rows are requeued at
+        the front and the error returned. Returns (rows written, that error).
+        """
+        written = 0
+        parts = [batch]
+        while parts:
+            part = parts.pop()
+            try:
+                await self._insert(part)
+            except asyncio.CancelledError:
+                # Cancelled mid-insert (stop() waits instead, but the loop may be torn down): keep the rows
+                self._requeue([entry for unwritten in reversed(parts + [part]) for entry in unwritten], front=True)
+                raise
+            except Exception as e:
+                if not _is_rejection(e):
+                    self._requeue([entry for unwritten in reversed(parts + [part]) for entry in unwritten], front=True)
+                    return written, e
+                if len(part) > 1:
+                    middle = len(part) // 2
+                    parts.extend((part[middle:], part[:middle]))
+                    continue
+                row, attempts = part[0]
+                if attempts + 1 >= self.max_attempts:
+                    self.rejected += 1
+                    logger.error(f"History row dropped after {attempts + 1} rejected inserts: {e}")
+                else:
+                    self._requeue([(row, attempts + 1)], front=False)
+                continue
+            written += len(part)
+        return written, None
+
+    async def flush(self) -> int:
+        """Insert everything buffered so far, one batch at a time; returns rows written"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        written = 0
+        async with self._flush_lock:
+            # Rows requeued after a rejection wait for the next flush
+            remaining = len(self._buffer)
+            while self._buffer and remaining > 0:
+                batch: List[Tuple[Dict[str, Any], int]] = []
+                while self._buffer and len(batch) < min(self.batch_size, remaining):
+                    batch.append(self._buffer.popleft())
+                remaining -= len(batch)
+                start = time.perf_counter()
+                count, error = await self._write_batch(batch)
+                self.written += count
+                written += count
+                if error is not None:
+                    self.failed_flushes += 1
+                    logger.warning(f"History flush of {len(batch)} rows failed: {error}")
+                    break
+                self.flushes += 1
+                self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+        return written
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def start(self) -> None:
+        """Start the background flusher on the running event loop"""
+        if self._task is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher (letting a running flush finish) and write out what is still buffered"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._wakeup = None
+        await self.flush()
+        self._flush_lock = None
+
+    def clear(self) -> None:
+        """Drop buffered rows and reset counters"""
+        self._buffer.clear()
+        self.reset_stats()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._buffer),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "rejected": self.rejected,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+async def list_history(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    cursor: Optional[int] = None,
+    category: Optional[str] = None
+) -> Tuple[List[Analysis], Optional[int]]:
+    """
+    One newest-first page of a user's analyses.
+    cursor is the next_cursor of the previous page (the last id it showed);
+    returns the rows and the cursor of the next page (None on the last page).
+    """
+    query = select(Analysis).where(Analysis.user_id == user_id)
+    if category is not None:
+        query = query.where(Analysis.category == category)
+    if cursor is not None:
+        query = query.where(Analysis.id < cursor)
+    query = query.order_by(Analysis.id.desc()).limit(limit + 1)
+
+    rows = list((await db.execute(query)).scalars())
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+history_writer = HistoryWriter()
@@ -1,24 +1,120 @@
 """
 HuggingFace Zero-Shot Classification Service
 Uses facebook/bart-large-mnli for text classification
+
+All requests go through one pooled httpx.AsyncClient so connections to the
+router are kept alive between classifications. The app lifespan opens and
+closes it; get_client() creates it lazily if the lifespan did not run.
+
+Every request holds a slot of hf_limiter while it is in flight, so bursts
+queue briefly or are shed with LoadShedError instead of overloading the API.
+Requests also pass hf_breaker: once the API keeps failing, calls (and the
+remaining retries) fail at once with CircuitOpenError until it recovers.
+Retries follow hf_retry: jittered backoff, the shared retry budget and the
+request deadline, which also caps each attempt's timeout.
+
+With LABEL_PREFILTER_TOP_K, classify_text is two-stage: label_prefilter
+keeps the K candidate labels closest to the text and only those are sent
+(BART-MNLI cost is linear in the label count); the others are added back
+to the scores at 0 and listed under "pruned_labels".
 """
 import httpx
 import time
 import asyncio
 import logging
-from typing import Dict, Any, List
-from app.config import HF_TOKEN
+from contextlib import nullcontext
+from typing import AsyncContextManager, Callable, Dict, Any, List, Optional, Union
+from app.config import (
+    HF_TOKEN,
+    HF_POOL_MAX_CONNECTIONS,
+    HF_POOL_MAX_KEEPALIVE,
+    HF_KEEPALIVE_EXPIRY,
+    HF_HTTP2,
+    HF_CONCURRENCY_INITIAL,
+    HF_CONCURRENCY_MIN,
+    HF_CONCURRENCY_MAX,
+    HF_LATENCY_TARGET_MS,
+    LIMITER_MAX_QUEUE,
+    LIMITER_QUEUE_TIMEOUT_MS,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_ERROR_RATE,
+    BREAKER_WINDOW,
+    BREAKER_MIN_CALLS,
+    BREAKER_RESET_TIMEOUT_S,
+    BREAKER_HALF_OPEN_PROBES,
+    MOCK_UPSTREAMS,
+    LABEL_PREFILTER_TOP_K,
+)
+from app.services.label_prefilter import label_prefilter
+from app.utils.limiter import AdaptiveLimiter, LoadShedError
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.retry import RetryPolicy, DeadlineExceeded, attempt_timeout, is_retryable_status
+from app.utils.metrics import HF_DURATION, LABELS_PRUNED, UPSTREAM_RESPONSES
+from app.utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
-HF_API_URL = "https://router.huggingface.co/hf-inference/models/facebook/bart-large-mnli"
+HF_MODEL_ID = "facebook/bart-large-mnli"
+HF_API_URL = f"https://router.huggingface.co/hf-inference/models/{HF_MODEL_ID}"
 DEFAULT_LABELS = [
     "technology", "business", "politics", "sports", "entertainment",
     "health", "science", "education", "travel", "food"
 ]
 TIMEOUT_SECONDS = 60  # Increased from 30s
 MAX_RETRIES = 3
-RETRY_DELAY = 5  # seconds
+
+
+_client: Optional[httpx.AsyncClient] = None
+_http2_enabled = False
+_clients_created = 0
+_requests_sent = 0
+
+# Status codes telling us the API is overloaded (the limiter backs off on them)
+OVERLOAD_STATUS_CODES = (429, 503)
+
+hf_limiter = AdaptiveLimiter(
+    "huggingface",
+    initial_limit=HF_CONCURRENCY_INITIAL,
+    min_limit=HF_CONCURRENCY_MIN,
+    max_limit=HF_CONCURRENCY_MAX,
+    max_queue=LIMITER_MAX_QUEUE,
+    queue_timeout=LIMITER_QUEUE_TIMEOUT_MS / 1000,
+    latency_target=HF_LATENCY_TARGET_MS / 1000,
+)
+
+hf_breaker = CircuitBreaker(
+    "huggingface",
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    error_rate=BREAKER_ERROR_RATE,
+    window_size=BREAKER_WINDOW,
+    min_calls=BREAKER_MIN_CALLS,
+    reset_timeout=BREAKER_RESET_TIMEOUT_S,
+    half_open_max_calls=BREAKER_HALF_OPEN_PROBES,
+)
+
+
+hf_retry = RetryPolicy("huggingface", max_attempts=MAX_RETRIES)
+
+
+def _is_failure_status(status_code: int) -> bool:
+    """Responses that mean the API itself is unhealthy (not a bad request)"""
+    return status_code >= 500 or status_code == 429
+
+
+def _estimated_time(response: httpx.Response) -> float:
+    """Seconds until a loading model should be ready, from a 503 body"""
+    try:
+        return float(response.json().get("estimated_time", 20))
+    except (ValueError, TypeError, AttributeError):
+        return 20.0
+
+
+def _retry_after_header(response: httpx.Response) -> Optional[float]:
+    """Retry-After seconds of a 429 response, if given"""
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError, TypeError):
+        return None
 
 
 class HuggingFaceError(Exception):
@@ -26,101 +122,331 @@ class HuggingFaceError(Exception):
     pass
 
 
+def _build_client() -> httpx.AsyncClient:
+    """Create the pooled client from the HF_POOL_* / HF_HTTP2 settings"""
+    global _http2_enabled, _clients_created
+
+    http2 = HF_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HF_HTTP2 is enabled but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+
+    limits = httpx.Limits(
+        max_connections=HF_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=HF_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=HF_KEEPALIVE_EXPIRY,
+    )
+    _http2_enabled = http2
+    _clients_created += 1
+    if MOCK_UPSTREAMS:
+        from app.services.mock_service import MockHFTransport
+        return httpx.AsyncClient(timeout=TIMEOUT_SECONDS, transport=MockHFTransport())
+    return httpx.AsyncClient(timeout=TIMEOUT_SECONDS, limits=limits, http2=http2)
+
+
+async def start_client() -> None:
+    """Open the shared client (called from the app lifespan)"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+        logger.info(f"HuggingFace client started (http2={_http2_enabled}, max_connections={HF_POOL_MAX_CONNECTIONS})")
+
+
+async def close_client() -> None:
+    """Close the shared client and release pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("HuggingFace client closed")
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it if the lifespan did not run"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Connection pool statistics for the shared client"""
+    stats = {
+        "started": _client is not None,
+        "http2": _http2_enabled,
+        "max_connections": HF_POOL_MAX_CONNECTIONS,
+        "max_keepalive_connections": HF_POOL_MAX_KEEPALIVE,
+        "keepalive_expiry": HF_KEEPALIVE_EXPIRY,
+        "clients_created": _clients_created,
+        "requests_sent": _requests_sent,
+    }
+
+    # httpx does not expose the pool publicly; read httpcore's view if available
+    pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if isinstance(connections, list):
+        stats["connections"] = len(connections)
+        stats["idle_connections"] = sum(1 for conn in connections if conn.is_idle())
+
+    return stats
+
+
+def _parse_classification(data: Any, latency_ms: int) -> Dict[str, Any]:
+    """Turn one zero-shot result into the classify_text result dict"""
+    # Handle new HuggingFace router API format (list of {label, score} objects)
+    scores = {}
+    if isinstance(data, list):
+        # New format: [{"label": "tech", "score": 0.99}, ...]
+        for item in data:
+            scores[item.get("label", "unknown")] = round(item.get("score", 0.0), 4)
+        top_label = data[0].get("label", "unknown") if data else "unknown"
+        top_score = data[0].get("score", 0.0) if data else 0.0
+    else:
+        # Old format: {"labels": [], "scores": []}
+        for label, score in zip(data.get("labels", []), data.get("scores", [])):
+            scores[label] = round(score, 4)
+        top_label = data.get("labels", ["unknown"])[0]
+        top_score = data.get("scores", [0.0])[0]
+
+    return {
+        "category": top_label,
+        "confidence": round(top_score, 4),
+        "scores": scores,
+        "latency_ms": latency_ms
+    }
+
+
+def _with_pruned(result: Dict[str, Any], pruned: List[str]) -> Dict[str, Any]:
+    """Complete a pre-filtered result: pruned labels score 0 and are listed under pruned_labels"""
+    result["scores"].update((label, 0.0) for label in pruned)
+    result["pruned_labels"] = pruned
+    return result
+
+
+async def _post(client: httpx.AsyncClient, headers: dict, payload: dict, timeout: float) -> httpx.Response:
+    """One timed request to the inference API, counted by outcome"""
+    start = time.perf_counter()
+    with span("hf.attempt") as attempt:
+        try:
+            response = await client.post(HF_API_URL, headers=headers, json=payload, timeout=timeout)
+        except httpx.TimeoutException:
+            UPSTREAM_RESPONSES.labels(upstream="huggingface", status="timeout").inc()
+            raise
+        except httpx.HTTPError as e:
+            UPSTREAM_RESPONSES.labels(upstream="huggingface", status=type(e).__name__).inc()
+            raise
+        finally:
+            HF_DURATION.observe(time.perf_counter() - start)
+        attempt.set(status=response.status_code)
+    UPSTREAM_RESPONSES.labels(upstream="huggingface", status=str(response.status_code)).inc()
+    return response
+
+
 async def classify_text(
     text: str,
     candidate_labels: List[str] = None
 ) -> Dict[str, Any]:
     """
     Classify text using HuggingFace BART-MNLI zero-shot classification.
-    
+
     Args:
         text: The text to classify
         candidate_labels: List of possible categories (uses defaults if not provided)
-    
+
     Returns:
-        Dict with category, confidence, and all scores
+        Dict with category, confidence, and all scores (plus pruned_labels
+        when the label pre-filter dropped some; scores of the kept labels
+        then sum to 1 among themselves)
     """
+    global _requests_sent
+
     if candidate_labels is None:
         candidate_labels = DEFAULT_LABELS
-    
+
+    pruned: List[str] = []
+    if LABEL_PREFILTER_TOP_K > 0:
+        candidate_labels, pruned = label_prefilter.select(text, candidate_labels, LABEL_PREFILTER_TOP_K)
+        LABELS_PRUNED.inc(len(pruned))
+
     headers = {
         "Authorization": f"Bearer {HF_TOKEN}",
         "Content-Type": "application/json"
     }
-    
+
     payload = {
         "inputs": text,
         "parameters": {
             "candidate_labels": candidate_labels
         }
     }
-    
-    start_time = time.time()
+
+    start_time = time.perf_counter()
     last_error = None
-    
+    client = get_client()
+    hf_retry.start()
+
     for attempt in range(MAX_RETRIES):
+        retry_after = None
+        timeout = attempt_timeout(TIMEOUT_SECONDS)
         try:
-            async with httpx.AsyncClient(timeout=TIMEOUT_SECONDS) as client:
-                response = await client.post(HF_API_URL, headers=headers, json=payload)
-                
-                latency_ms = int((time.time() - start_time) * 1000)
-                
-                if response.status_code == 503:
-                    # Model is loading - wait and retry
-                    error_data = response.json()
-                    estimated_time = error_data.get("estimated_time", 20)
-                    logger.warning(f"Model loading, waiting {estimated_time}s (attempt {attempt + 1}/{MAX_RETRIES})")
-                    if attempt < MAX_RETRIES - 1:
-                        await asyncio.sleep(min(estimated_time, RETRY_DELAY))
-                        continue
-                    raise HuggingFaceError(f"Model is loading. Please try again in {estimated_time}s")
-                
-                if response.status_code != 200:
-                    logger.error(f"HuggingFace API error: {response.status_code} - {response.text}")
-                    raise HuggingFaceError(f"API error: {response.status_code}")
-                
-                data = response.json()
-                
-                # Handle new HuggingFace router API format (list of {label, score} objects)
-                scores = {}
-                if isinstance(data, list):
-                    # New format: [{"label": "tech", "score": 0.99}, ...]
-                    for item in data:
-                        scores[item.get("label", "unknown")] = round(item.get("score", 0.0), 4)
-                    top_label = data[0].get("label", "unknown") if data else "unknown"
-                    top_score = data[0].get("score", 0.0) if data else 0.0
-                else:
-                    # Old format: {"labels": [], "scores": []}
-                    for label, score in zip(data.get("labels", []), data.get("scores", [])):\
-                        scores[label] = round(score, 4)
-                    top_label = data.get("labels", ["unknown"])[0]
-                    top_score = data.get("scores", [0.0])[0]
-                
-                logger.info(f"HuggingFace classification: {top_label} ({top_score:.2%}) in {latency_ms}ms")
-                
-                return {
-                    "category": top_label,
-                    "confidence": round(top_score, 4),
-                    "scores": scores,
-                    "latency_ms": latency_ms
-                }
-                
-        except httpx.TimeoutException:
-            latency_ms = int((time.time() - start_time) * 1000)
-            last_error = f"Request timeout after {TIMEOUT_SECONDS}s"
+            async with hf_breaker.guard() as call, hf_limiter.slot() as slot:
+                _requests_sent += 1
+                response = await _post(client, headers, payload, timeout)
+                slot.overloaded = response.status_code in OVERLOAD_STATUS_CODES
+                call.failed = _is_failure_status(response.status_code)
+
+            latency_ms = int((time.perf_counter() - start_time) * 1000)
+
+            if response.status_code == 200:
+                result = _parse_classification(response.json(), latency_ms)
+                if pruned:
+                    result = _with_pruned(result, pruned)
+                logger.info(
+                    f"HuggingFace classification: {result['category']} ({result['confidence']:.2%}) in {latency_ms}ms"
+                )
+                return result
+
+            if response.status_code == 503:
+                # Model is loading - retry once it should be ready
+                estimated_time = _estimated_time(response)
+                retry_after = estimated_time
+                last_error = f"Model is loading. Please try again in {estimated_time}s"
+                logger.warning(f"Model loading, estimated {estimated_time}s (attempt {attempt + 1}/{MAX_RETRIES})")
+            else:
+                logger.error(f"HuggingFace API error: {response.status_code} - {response.text}")
+                last_error = f"API error: {response.status_code}"
+                if response.status_code == 429:
+                    retry_after = _retry_after_header(response)
+
+            failure = HuggingFaceError(last_error)
+            retryable = is_retryable_status(response.status_code)
+
+        except httpx.TimeoutException as e:
+            last_error = f"Request timeout after {timeout:.0f}s"
             logger.warning(f"HuggingFace timeout (attempt {attempt + 1}/{MAX_RETRIES})")
-            if attempt < MAX_RETRIES - 1:
-                await asyncio.sleep(RETRY_DELAY)
-                continue
-        
+            failure, retryable = e, True
+
         except httpx.RequestError as e:
-            latency_ms = int((time.time() - start_time) * 1000)
             last_error = f"Connection error: {str(e)}"
             logger.warning(f"HuggingFace request error (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
-            if attempt < MAX_RETRIES - 1:
-                await asyncio.sleep(RETRY_DELAY)
-                continue
-    
-    logger.error(f"HuggingFace failed after {MAX_RETRIES} attempts: {last_error}")
+            failure, retryable = e, True
+
+        delay = hf_retry.next_delay(attempt, failure, retryable=retryable, retry_after=retry_after)
+        if delay is None:
+            break
+        await hf_retry.sleep(delay)
+
+    logger.error(f"HuggingFace failed after {attempt + 1} attempts: {last_error}")
     raise HuggingFaceError(last_error or "Classification failed after retries")
 
+
+async def classify_texts(
+    texts: List[str],
+    candidate_labels: List[str] = None,
+    call_slot: Optional[Callable[[], AsyncContextManager]] = None
+) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Classify several texts with a single multi-input request.
+
+    The inference API accepts a list of inputs for zero-shot classification
+    and answers with one result per input. If the endpoint rejects the batch
+    or answers in another shape, each text is classified on its own with
+    classify_text (and its retries) instead.
+
+    With LABEL_PREFILTER_TOP_K, each text keeps its own top-K labels, as in
+    classify_text; texts keeping the same labels share one request.
+
+    Args:
+        texts: The texts to classify
+        candidate_labels: List of possible categories (uses defaults if not provided)
+        call_slot: Context manager factory entered around each upstream call
+            (the multi-input request and every one-by-one fallback), so
+            callers can bound and count them
+
+    Returns:
+        One classify_text-style dict per text, or the exception raised for it
+    """
+    if candidate_labels is None:
+        candidate_labels = DEFAULT_LABELS
+    if call_slot is None:
+        call_slot = nullcontext
+
+    if LABEL_PREFILTER_TOP_K <= 0:
+        return await _classify_batch(texts, candidate_labels, call_slot)
+
+    groups: Dict[tuple, List[int]] = {}
+    pruned_by_text: List[List[str]] = []
+    for index, text in enumerate(texts):
+        kept, pruned = label_prefilter.select(text, candidate_labels, LABEL_PREFILTER_TOP_K)
+        LABELS_PRUNED.inc(len(pruned))
+        groups.setdefault(tuple(kept), []).append(index)
+        pruned_by_text.append(pruned)
+
+    outcomes = await asyncio.gather(*[
+        _classify_batch([texts[index] for index in indexes], list(kept), call_slot)
+        for kept, indexes in groups.items()
+    ])
+    results: List[Union[Dict[str, Any], Exception]] = [None] * len(texts)
+    for indexes, group_results in zip(groups.values(), outcomes):
+        for index, result in zip(indexes, group_results):
+            if isinstance(result, dict) and pruned_by_text[index]:
+                result = _with_pruned(result, pruned_by_text[index])
+            results[index] = result
+    return results
+
+
+async def _classify_batch(
+    texts: List[str],
+    candidate_labels: List[str],
+    call_slot: Callable[[], AsyncContextManager]
+) -> List[Union[Dict[str, Any], Exception]]:
+    """classify_texts against the same labels for every text (no pre-filtering)"""
+    global _requests_sent
+
+    if len(texts) > 1:
+        headers = {
+            "Authorization": f"Bearer {HF_TOKEN}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "inputs": texts,
+            "parameters": {
+                "candidate_labels": candidate_labels
+            }
+        }
+
+        try:
+            async with call_slot():
+                start_time = time.perf_counter()
+                timeout = attempt_timeout(TIMEOUT_SECONDS)
+                async with hf_breaker.guard() as call, hf_limiter.slot() as slot:
+                    _requests_sent += 1
+                    response = await _post(get_client(), headers, payload, timeout)
+                    slot.overloaded = response.status_code in OVERLOAD_STATUS_CODES
+                    call.failed = _is_failure_status(response.status_code)
+            latency_ms = int((time.perf_counter() - start_time) * 1000)
+
+            if response.status_code == 200:
+                data = response.json()
+                if (
+                    isinstance(data, list)
+                    and len(data) == len(texts)
+                    and all(isinstance(item, list) or (isinstance(item, dict) and "labels" in item) for item in data)
+                ):
+                    logger.info(f"HuggingFace batch classification of {len(texts)} texts in {latency_ms}ms")
+                    return [_parse_classification(item, latency_ms) for item in data]
+
+            logger.info(f"HuggingFace batch request not usable (status {response.status_code}), classifying one by one")
+        except httpx.HTTPError as e:
+            logger.warning(f"HuggingFace batch request failed: {e}. Classifying one by one")
+        except (LoadShedError, DeadlineExceeded) as e:
+            return [e] * len(texts)
+
+    async def classify_one(text: str) -> Dict[str, Any]:
+        async with call_slot():
+            return await classify_text(text, candidate_labels)
+
+    return await asyncio.gather(*[classify_one(text) for text in texts], return_exceptions=True)
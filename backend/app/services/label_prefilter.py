@@ -0,0 +1,91 @@
+"""
+Label Pre-filter
+Cheap first stage of two-stage zero-shot classification
+
+BART-MNLI runs one premise/hypothesis pass per candidate label, so its cost
+grows linearly with the label count. The pre-filter ranks the labels
+locally by hashed bag-of-words similarity between the text and each label's
+description (microseconds, no model), and only the top k go to the NLI
+model.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from app.config import LABEL_CENTROID_CACHE_SIZE
+from app.utils.text import hashed_vector, cosine
+
+# Keywords describing the default labels; other labels are described by their own name
+LABEL_DESCRIPTIONS = {
+    "technology": "technology software hardware computer digital internet ai artificial intelligence "
+                  "machine learning algorithm data chip smartphone app device cloud cyber robot innovation",
+    "business": "business company market economy finance stock investor revenue profit bank trade "
+                "startup ceo corporate industry sales growth inflation price merger",
+    "politics": "politics government election president minister parliament policy law vote party "
+                "senate congress campaign democracy diplomatic reform legislation",
+    "sports": "sports match game team player coach tournament championship league goal score season "
+              "football soccer basketball tennis olympic athlete win",
+    "entertainment": "entertainment movie film music actor actress celebrity show series album concert "
+                     "festival television streaming hollywood star premiere",
+    "health": "health medical doctor patient hospital disease treatment vaccine medicine virus "
+              "wellness mental care symptoms clinical nutrition therapy",
+    "science": "science research scientist study discovery experiment physics chemistry biology space "
+               "nasa climate laboratory universe species researchers",
+    "education": "education school university student teacher learning course class exam curriculum "
+                 "degree campus academic teaching pupils college",
+    "travel": "travel trip tourism tourist destination hotel flight airline vacation journey beach "
+              "city visit holiday passport explore",
+    "food": "food recipe cooking restaurant chef meal dish cuisine ingredient taste dinner kitchen "
+            "eat flavor dessert baking",
+}
+
+
+class LabelPrefilter:
+    """Ranks candidate labels by similarity to their description centroids"""
+
+    def __init__(self, descriptions: Dict[str, str] = LABEL_DESCRIPTIONS, max_entries: int = LABEL_CENTROID_CACHE_SIZE):
+        self.descriptions = descriptions
+        self.max_entries = max_entries
+        # LRU: users' label sets make the label vocabulary unbounded
+        self._centroids: "OrderedDict[str, Dict[int, float]]" = OrderedDict()
+        # The local classifier scores on worker threads
+        self._lock = threading.Lock()
+
+    def centroid(self, label: str) -> Dict[int, float]:
+        """Hashed vector of the label and its description, computed once per label"""
+        with self._lock:
+            centroid = self._centroids.get(label)
+            if centroid is not None:
+                self._centroids.move_to_end(label)
+                return centroid
+        centroid = hashed_vector(f"{label} {self.descriptions.get(label.lower(), label)}")
+        with self._lock:
+            self._centroids[label] = centroid
+            while len(self._centroids) > self.max_entries:
+                self._centroids.popitem(last=False)
+        return centroid
+
+    def similarities(self, text: str, labels: List[str]) -> List[float]:
+        """Cosine similarity of the text to each label's centroid"""
+        vector = hashed_vector(text)
+        return [cosine(vector, self.centroid(label)) for label in labels]
+
+    def select(self, text: str, labels: List[str], top_k: int) -> Tuple[List[str], List[str]]:
+        """
+        Split labels into (kept, pruned): the top_k most similar to the text,
+        and the rest, both in their original order. Every label is kept when
+        there are no more than top_k, or when the text shares no feature with
+        any description (nothing to rank by).
+        """
+        if top_k <= 0 or len(labels) <= top_k:
+            return list(labels), []
+        similarities = self.similarities(text, labels)
+        if max(similarities) <= 0:
+            return list(labels), []
+        ranked = sorted(range(len(labels)), key=lambda i: similarities[i], reverse=True)
+        keep = set(ranked[:top_k])
+        kept = [label for i, label in enumerate(labels) if i in keep]
+        pruned = [label for i, label in enumerate(labels) if i not in keep]
+        return kept, pruned
+
+
+label_prefilter = LabelPrefilter()
@@ -0,0 +1,136 @@
+"""
+Label Sets
+Named, per-user candidate label lists that /analyze requests reference by id
+
+Rows live in the label_sets table. What a request needs from one (its
+labels, plus the hashed label vectors the pre-filter and the local
+classifier score against) is resolved once into a LabelProfile and kept in
+a per-process LRU for LABEL_SET_CACHE_TTL_SECONDS, so most requests never
+read the table. Updating or deleting a set drops this process's entry at
+once; other workers serve the old labels for at most the TTL.
+
+Results stay correct across label sets without further bookkeeping: the
+result cache key and the coalescing key both include the labels.
+"""
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.label_set import LabelSet
+from app.services.cache_service import MemoryCacheBackend
+from app.services.label_prefilter import label_prefilter
+from app.utils.tracing import span
+from app.config import LABEL_SET_CACHE_SIZE, LABEL_SET_CACHE_TTL_SECONDS
+
+
+@dataclass(frozen=True)
+class LabelProfile:
+    """A label set resolved for analysis, detached from any database session"""
+    id: int
+    user_id: int
+    name: str
+    labels: Tuple[str, ...]
+    version: int
+
+
+_profiles = MemoryCacheBackend(LABEL_SET_CACHE_SIZE)
+_stats = {"hits": 0, "misses": 0}
+
+
+def _profile_key(user_id: int, label_set_id: int) -> str:
+    return f"{user_id}:{label_set_id}"
+
+
+def build_profile(row: LabelSet) -> LabelProfile:
+    """LabelProfile of a row, with the label vectors computed ahead of the first request"""
+    profile = LabelProfile(
+        id=row.id, user_id=row.user_id, name=row.name, labels=tuple(row.labels), version=row.version
+    )
+    for label in profile.labels:
+        label_prefilter.centroid(label)
+    return profile
+
+
+async def get_label_profile(
+    user_id: int,
+    label_set_id: int,
+    session_factory: Callable[[], AsyncSession]
+) -> Optional[LabelProfile]:
+    """
+    Resolve one of the user's label sets through the profile cache.
+    Sets of other users look missing; missing sets are not cached.
+    """
+    key = _profile_key(user_id, label_set_id)
+    profile = _profiles.get(key)
+    if profile is not None:
+        _stats["hits"] += 1
+        return profile
+
+    _stats["misses"] += 1
+    with span("label_set.lookup"):
+        async with session_factory() as db:
+            row = await get_label_set(db, user_id, label_set_id)
+            if row is None:
+                return None
+            profile = build_profile(row)
+    _profiles.set(key, profile, LABEL_SET_CACHE_TTL_SECONDS)
+    return profile
+
+
+def invalidate_label_set(user_id: int, label_set_id: int) -> None:
+    """Drop a cached profile; call after changing or deleting a label_sets row"""
+    _profiles.delete(_profile_key(user_id, label_set_id))
+
+
+def clear_label_profiles() -> None:
+    _profiles.clear()
+    _stats.update(hits=0, misses=0)
+
+
+def label_profile_stats() -> dict:
+    return {**_stats, "size": _profiles.size()}
+
+
+async def list_label_sets(db: AsyncSession, user_id: int) -> List[LabelSet]:
+    result = await db.execute(select(LabelSet).where(LabelSet.user_id == user_id).order_by(LabelSet.id))
+    return list(result.scalars())
+
+
+async def get_label_set(db: AsyncSession, user_id: int, label_set_id: int) -> Optional[LabelSet]:
+    result = await db.execute(
+        select(LabelSet).where(LabelSet.id == label_set_id, LabelSet.user_id == user_id).limit(1)
+    )
+    return result.scalars().first()
+
+
+async def get_label_set_by_name(db: AsyncSession, user_id: int, name: str) -> Optional[LabelSet]:
+    result = await db.execute(
+        select(LabelSet).where(LabelSet.user_id == user_id, LabelSet.name == name).limit(1)
+    )
+    return result.scalars().first()
+
+
+async def create_label_set(db: AsyncSession, user_id: int, name: str, labels: List[str]) -> LabelSet:
+    row = LabelSet(user_id=user_id, name=name, labels=labels, version=1)
+    db.add(row)
+    await db.commit()
+    await db.refresh(row)
+    return row
+
+
+async def update_label_set(db: AsyncSession, row: LabelSet, name: str, labels: List[str]) -> LabelSet:
+    """Replace a set's name and labels and bump its version"""
+    row.name = name
+    row.labels = labels
+    row.version = row.version + 1
+    await db.commit()
+    await db.refresh(row)
+    invalidate_label_set(row.user_id, row.id)
+    return row
+
+
+async def delete_label_set(db: AsyncSession, row: LabelSet) -> None:
+    user_id, label_set_id = row.user_id, row.id
+    await db.delete(row)
+    await db.commit()
+    invalidate_label_set(user_id, label_set_id)
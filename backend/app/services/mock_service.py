@@ -1,10 +1,50 @@
 """
 Mock Services for Backend Testing
 Returns fake responses without calling external APIs
+
+Latencies, scores, tones and injected faults come from mock_engine, a
+seeded model configured by the MOCK_* settings (or per test with
+mock_engine.configure). Each call draws from its own generator, derived
+from the seed, the call's input and how many times that input was seen
+before, so a run replays identically however requests interleave.
+
+Two ways to use it:
+- MOCK_MODE: the routers call mock_classify_text / mock_analyze_text
+  instead of the services. A fault fails the call the way the service
+  would once it gave up (HuggingFaceError / GeminiError), without retries.
+- MOCK_UPSTREAMS: the real services run unchanged against MockHFTransport
+  (an httpx transport standing in for the inference API) and
+  MockGeminiModel (standing in for the SDK model), so faults go through
+  the real retry, deadline and limiter code. Creating either attaches the
+  engine: retries back off without jitter and the circuit breakers are
+  bypassed, since both would otherwise depend on unseeded randomness or on
+  the order in which concurrent calls finish.
 """
+import re
+import json
+import math
+import time
 import random
 import asyncio
-from typing import Dict, Any, List
+import hashlib
+import threading
+from types import SimpleNamespace
+from typing import Dict, Any, List, AsyncIterator, Callable, Iterator, Optional, Tuple, Union
+
+import httpx
+
+from app.config import (
+    MOCK_SEED, MOCK_HF_LATENCY, MOCK_GEMINI_LATENCY, MOCK_TOKEN_LATENCY,
+    MOCK_HF_LOADING_RATE, MOCK_HF_LOADING_ESTIMATED_S, MOCK_HF_TIMEOUT_RATE,
+    MOCK_GEMINI_TIMEOUT_RATE, MOCK_GEMINI_PARSE_ERROR_RATE
+)
+from app.services import gemini_service, huggingface_service
+from app.services.gemini_service import (
+    GeminiError, STREAM_TONE_MARKER, VALID_TONES,
+    _build_prompt, _build_open_prompt, _build_stream_prompt, _parse_answer, _normalize_tone
+)
+from app.services.huggingface_service import HuggingFaceError, HF_MODEL_ID
+from app.utils.retry import attempt_timeout
 
 # Mock category labels
 MOCK_CATEGORIES = [
@@ -26,9 +66,324 @@ MOCK_SUMMARIES = {
     "food": "The content explores culinary topics, recipes, and food industry trends."
 }
 
+DEFAULT_SUMMARY = "This text contains interesting content that has been analyzed by our AI system."
+
 # Mock tones
 MOCK_TONES = ["positif", "neutre", "négatif"]
 
+# Inputs whose call count is remembered; past it the counts start over
+MAX_TRACKED_KEYS = 100_000
+
+
+class LatencyModel:
+    """
+    Latency distribution parsed from a spec (values in milliseconds):
+    - fixed:ms=300
+    - uniform:low=100,high=500
+    - lognormal:median=400,sigma=0.5
+    - replay:p50=420,p90=900,p99=2500 (inverse CDF interpolated linearly
+      between the recorded percentiles, with p0 at 0 ms unless given, and
+      clamped to the highest one)
+    """
+    PARAMS = {
+        "fixed": {"ms"},
+        "uniform": {"low", "high"},
+        "lognormal": {"median", "sigma"},
+    }
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, _, raw = spec.strip().partition(":")
+        self.kind = kind.strip().lower()
+        try:
+            params = {
+                key.strip().lower(): float(value)
+                for key, value in (item.split("=", 1) for item in raw.split(",") if item.strip())
+            }
+        except ValueError:
+            raise ValueError(f"Invalid latency spec {spec!r}: expected kind:name=value,...")
+
+        if self.kind == "replay":
+            points = []
+            for key, value in params.items():
+                if not re.fullmatch(r"p\d+(\.\d+)?", key) or not 0 <= float(key[1:]) <= 100:
+                    raise ValueError(f"Invalid latency spec {spec!r}: replay takes percentiles like p50=420")
+                points.append((float(key[1:]) / 100, value))
+            if not points:
+                raise ValueError(f"Invalid latency spec {spec!r}: replay needs at least one percentile")
+            points.sort()
+            if points[0][0] > 0:
+                points.insert(0, (0.0, 0.0))
+            if any(b[1] < a[1] for a, b in zip(points, points[1:])):
+                raise ValueError(f"Invalid latency spec {spec!r}: percentiles must not decrease")
+            self.points = points
+        elif self.kind in self.PARAMS:
+            if set(params) != self.PARAMS[self.kind]:
+                expected = ",".join(f"{name}=..." for name in sorted(self.PARAMS[self.kind]))
+                raise ValueError(f"Invalid latency spec {spec!r}: expected {self.kind}:{expected}")
+            if any(value < 0 for value in params.values()):
+                raise ValueError(f"Invalid latency spec {spec!r}: values must not be negative")
+            self.params = params
+        else:
+            raise ValueError(f"Invalid latency spec {spec!r}: kind must be fixed, uniform, lognormal or replay")
+
+    def sample(self, rng: random.Random) -> float:
+        """One latency in seconds"""
+        if self.kind == "fixed":
+            ms = self.params["ms"]
+        elif self.kind == "uniform":
+            ms = rng.uniform(self.params["low"], self.params["high"])
+        elif self.kind == "lognormal":
+            ms = self.params["median"] * math.exp(self.params["sigma"] * rng.gauss(0.0, 1.0))
+        else:
+            ms = self._replay(rng.random())
+        return ms / 1000
+
+    def _replay(self, q: float) -> float:
+        points = self.points
+        for (q0, ms0), (q1, ms1) in zip(points, points[1:]):
+            if q <= q1:
+                return ms0 + (ms1 - ms0) * (q - q0) / (q1 - q0) if q1 > q0 else ms1
+        return points[-1][1]
+
+    def __repr__(self) -> str:
+        return f"LatencyModel({self.spec!r})"
+
+
+class MockCall:
+    """One simulated upstream attempt: its latency (s), fault (or None) and generator"""
+    __slots__ = ("latency", "fault", "rng")
+
+    def __init__(self, latency: float, fault: Optional[str], rng: random.Random):
+        self.latency = latency
+        self.fault = fault
+        self.rng = rng
+
+
+class MockEngine:
+    """
+    Seeded latency and fault model shared by the mock services and the
+    mock upstreams. Faults per attempt:
+    - huggingface: "loading" (503 with estimated_time) or "timeout"
+    - gemini: "timeout" or "parse_error" (a truncated, unparseable answer)
+    """
+    FAULTS = {
+        "huggingface": ("loading", "timeout"),
+        "gemini": ("parse_error", "timeout"),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._saved_rngs: Optional[Dict[str, Callable[[], float]]] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Back to the MOCK_* settings, with call counts cleared"""
+        self.configure(
+            seed=MOCK_SEED,
+            hf_latency=MOCK_HF_LATENCY,
+            gemini_latency=MOCK_GEMINI_LATENCY,
+            token_latency=MOCK_TOKEN_LATENCY,
+            hf_loading_rate=MOCK_HF_LOADING_RATE,
+            hf_loading_estimated_s=MOCK_HF_LOADING_ESTIMATED_S,
+            hf_timeout_rate=MOCK_HF_TIMEOUT_RATE,
+            gemini_timeout_rate=MOCK_GEMINI_TIMEOUT_RATE,
+            gemini_parse_error_rate=MOCK_GEMINI_PARSE_ERROR_RATE,
+        )
+
+    def configure(
+        self,
+        seed: Optional[int] = None,
+        hf_latency: Optional[Union[str, LatencyModel]] = None,
+        gemini_latency: Optional[Union[str, LatencyModel]] = None,
+        token_latency: Optional[Union[str, LatencyModel]] = None,
+        hf_loading_rate: Optional[float] = None,
+        hf_loading_estimated_s: Optional[float] = None,
+        hf_timeout_rate: Optional[float] = None,
+        gemini_timeout_rate: Optional[float] = None,
+        gemini_parse_error_rate: Optional[float] = None,
+    ) -> None:
+        """Override some settings (the others keep their value); call counts start over"""
+        for name, value in (("hf_latency", hf_latency), ("gemini_latency", gemini_latency), ("token_latency", token_latency)):
+            if value is not None:
+                setattr(self, name, value if isinstance(value, LatencyModel) else LatencyModel(value))
+        rates = {
+            "hf_loading_rate": hf_loading_rate,
+            "hf_timeout_rate": hf_timeout_rate,
+            "gemini_timeout_rate": gemini_timeout_rate,
+            "gemini_parse_error_rate": gemini_parse_error_rate,
+        }
+        for name, value in rates.items():
+            if value is not None:
+                if not 0 <= value <= 1:
+                    raise ValueError(f"{name} must be between 0 and 1, got {value}")
+                setattr(self, name, value)
+        if self.hf_loading_rate + self.hf_timeout_rate > 1 or self.gemini_timeout_rate + self.gemini_parse_error_rate > 1:
+            raise ValueError("Fault rates of one upstream must add up to at most 1")
+        if seed is not None:
+            self.seed = seed
+        if hf_loading_estimated_s is not None:
+            self.hf_loading_estimated_s = hf_loading_estimated_s
+        with self._lock:
+            self._seen: Dict[Tuple[str, str], int] = {}
+            self.calls = {upstream: 0 for upstream in self.FAULTS}
+            self.faults = {f"{upstream}.{fault}": 0 for upstream, faults in self.FAULTS.items() for fault in faults}
+
+    def attach(self) -> None:
+        """
+        Make the real services replayable against the simulated upstreams:
+        backoff without jitter (the full exponential delay) and reset,
+        bypassed circuit breakers. Idempotent; undone by detach()
+        """
+        policies = _retry_policies()
+        with self._lock:
+            if self._saved_rngs is not None:
+                return
+            self._saved_rngs = {name: policy.set_rng(_no_jitter) for name, policy in policies.items()}
+        for breaker in (huggingface_service.hf_breaker, gemini_service.gemini_breaker):
+            breaker.reset()
+            breaker.bypassed = True
+
+    def detach(self) -> None:
+        """Give the services back their jitter and circuit breakers"""
+        policies = _retry_policies()
+        with self._lock:
+            saved, self._saved_rngs = self._saved_rngs, None
+        if saved is None:
+            return
+        for name, policy in policies.items():
+            policy.set_rng(saved[name])
+        for breaker in (huggingface_service.hf_breaker, gemini_service.gemini_breaker):
+            breaker.bypassed = False
+            breaker.reset()
+
+    def _rng(self, upstream: str, key: str) -> random.Random:
+        """Generator for the next call with this input (the nth call always gets the same one)"""
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest()
+        with self._lock:
+            if len(self._seen) >= MAX_TRACKED_KEYS:
+                self._seen.clear()
+            count = self._seen.get((upstream, digest), 0)
+            self._seen[(upstream, digest)] = count + 1
+        return random.Random(f"{self.seed}:{upstream}:{digest}:{count}")
+
+    def _call(self, upstream: str, key: str, latency: LatencyModel, rates: Tuple[float, float]) -> MockCall:
+        rng = self._rng(upstream, key)
+        delay = latency.sample(rng)
+        draw = rng.random()
+        fault = None
+        threshold = 0.0
+        for name, rate in zip(self.FAULTS[upstream], rates):
+            threshold += rate
+            if draw < threshold:
+                fault = name
+                break
+        with self._lock:
+            self.calls[upstream] += 1
+            if fault is not None:
+                self.faults[f"{upstream}.{fault}"] += 1
+        return MockCall(delay, fault, rng)
+
+    def hf_call(self, key: str) -> MockCall:
+        """Draw one HuggingFace attempt for this input"""
+        return self._call("huggingface", key, self.hf_latency, (self.hf_loading_rate, self.hf_timeout_rate))
+
+    def gemini_call(self, key: str) -> MockCall:
+        """Draw one Gemini attempt for this prompt"""
+        return self._call("gemini", key, self.gemini_latency, (self.gemini_parse_error_rate, self.gemini_timeout_rate))
+
+    def settings(self) -> Dict[str, Any]:
+        """Current configuration, e.g. for a benchmark's metadata"""
+        return {
+            "seed": self.seed,
+            "hf_latency": self.hf_latency.spec,
+            "gemini_latency": self.gemini_latency.spec,
+            "token_latency": self.token_latency.spec,
+            "hf_loading_rate": self.hf_loading_rate,
+            "hf_loading_estimated_s": self.hf_loading_estimated_s,
+            "hf_timeout_rate": self.hf_timeout_rate,
+            "gemini_timeout_rate": self.gemini_timeout_rate,
+            "gemini_parse_error_rate": self.gemini_parse_error_rate,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.settings(),
+                "calls": dict(self.calls),
+                "faults": dict(self.faults),
+            }
+
+
+def _retry_policies() -> Dict[str, Any]:
+    return {"huggingface": huggingface_service.hf_retry, "gemini": gemini_service.gemini_retry}
+
+
+def _no_jitter() -> float:
+    """Jitter source for attached retry policies: always the full backoff"""
+    return 1.0
+
+
+mock_engine = MockEngine()
+
+
+def _scores(rng: random.Random, labels: List[str]) -> Dict[str, float]:
+    """Random scores adding up to 1, highest first"""
+    scores = {}
+    remaining = 1.0
+
+    for i, label in enumerate(labels):
+        if i == len(labels) - 1:
+            scores[label] = round(remaining, 4)
+        else:
+            score = rng.uniform(0, remaining * 0.8)
+            scores[label] = round(score, 4)
+            remaining -= score
+
+    return dict(sorted(scores.items(), key=lambda x: x[1], reverse=True))
+
+
+def _summary(category: Optional[str]) -> str:
+    return MOCK_SUMMARIES.get((category or "").lower(), DEFAULT_SUMMARY)
+
+
+def _gemini_answer(prompt: str, call: MockCall, stream: bool = False) -> str:
+    """
+    What Gemini would answer to one of gemini_service's prompts: a JSON
+    array for batch prompts, summary text plus the tone line for stream
+    prompts, a JSON object otherwise. A parse_error fault cuts it in half.
+    """
+    rng = call.rng
+    documents = re.findall(r'<document id="(\d+)" category="([^"]*)">', prompt)
+    if documents:
+        answer = json.dumps([
+            {"id": int(index), "summary": _summary(category), "tone": rng.choice(MOCK_TONES)}
+            for index, category in documents
+        ], ensure_ascii=False)
+    else:
+        labels = re.search(r"best matching category among: ([^\"\n]+)", prompt)
+        if labels:
+            category = rng.choice([label.strip() for label in labels.group(1).split(",") if label.strip()] or MOCK_CATEGORIES)
+        else:
+            classified = re.search(r'classified as "([^"]*)"', prompt)
+            category = classified.group(1) if classified else None
+        tone = rng.choice(MOCK_TONES)
+        if stream:
+            answer = f"{_summary(category)}\n{STREAM_TONE_MARKER} {tone}"
+        else:
+            data = {"summary": _summary(category), "tone": tone}
+            if labels:
+                data["category"] = category
+            answer = json.dumps(data, ensure_ascii=False)
+
+    if call.fault == "parse_error":
+        answer = answer[:len(answer) // 2]
+    return answer
+
+
+def _latency_ms(call: MockCall) -> int:
+    return int(call.latency * 1000)
+
 
 async def mock_classify_text(
     text: str,
@@ -36,70 +391,213 @@ async def mock_classify_text(
 ) -> Dict[str, Any]:
     """
     Mock HuggingFace classification - returns fake but realistic results.
-    
+
     Args:
         text: The text to classify
         candidate_labels: List of possible categories
-    
+
     Returns:
         Dict with category, confidence, and all scores
+
+    Raises:
+        HuggingFaceError: On an injected loading or timeout fault
     """
     if candidate_labels is None:
         candidate_labels = MOCK_CATEGORIES
-    
-    # Simulate API latency (100-500ms)
-    await asyncio.sleep(random.uniform(0.1, 0.5))
-    
-    # Generate random scores for each category
-    scores = {}
-    remaining = 1.0
-    
-    for i, label in enumerate(candidate_labels):
-        if i == len(candidate_labels) - 1:
-            scores[label] = round(remaining, 4)
-        else:
-            score = random.uniform(0, remaining * 0.8)
-            scores[label] = round(score, 4)
-            remaining -= score
-    
-    # Sort by score and get top category
-    sorted_scores = dict(sorted(scores.items(), key=lambda x: x[1], reverse=True))
-    top_label = list(sorted_scores.keys())[0]
-    top_score = sorted_scores[top_label]
-    
+
+    call = mock_engine.hf_call(text)
+    if call.fault == "timeout":
+        timeout = attempt_timeout(huggingface_service.TIMEOUT_SECONDS)
+        await asyncio.sleep(timeout)
+        raise HuggingFaceError(f"Request timeout after {timeout:.0f}s")
+
+    # Simulate API latency
+    await asyncio.sleep(call.latency)
+    if call.fault == "loading":
+        raise HuggingFaceError(f"Model is loading. Please try again in {mock_engine.hf_loading_estimated_s}s")
+
+    sorted_scores = _scores(call.rng, candidate_labels)
+    top_label = next(iter(sorted_scores))
+
     return {
         "category": top_label,
-        "confidence": top_score,
+        "confidence": sorted_scores[top_label],
         "scores": sorted_scores,
-        "latency_ms": random.randint(100, 500)
+        "latency_ms": _latency_ms(call)
     }
 
 
-async def mock_analyze_text(text: str, category: str) -> Dict[str, Any]:
+async def _gemini_timeout() -> None:
+    timeout = attempt_timeout(gemini_service.TIMEOUT_SECONDS)
+    await asyncio.sleep(timeout)
+    raise GeminiError("Analysis failed: 504 Deadline Exceeded")
+
+
+async def mock_analyze_text(
+    text: str,
+    category: str = None,
+    candidate_labels: List[str] = None
+) -> Dict[str, Any]:
     """
     Mock Gemini analysis - returns fake summary and tone.
-    
+
+    The fake answer goes through the real response parser: in
+    GEMINI_JSON_MODE a parse_error fault fails like the service does after
+    its retries, otherwise it ends up as what the lenient parser makes of it.
+
     Args:
         text: The original text to analyze
-        category: The category from classification
-    
+        category: The category from classification (None for a
+            category-agnostic analysis with a guessed category)
+        candidate_labels: Labels to guess from when category is None
+
     Returns:
         Dict with summary, tone, and latency_ms
+
+    Raises:
+        GeminiError: On an injected timeout fault, or a parse_error fault
+            in GEMINI_JSON_MODE
     """
-    # Simulate API latency (200-800ms)
-    await asyncio.sleep(random.uniform(0.2, 0.8))
-    
-    # Get mock summary based on category
-    summary = MOCK_SUMMARIES.get(
-        category.lower(),
-        "This text contains interesting content that has been analyzed by our AI system."
-    )
-    
-    # Random tone
-    tone = random.choice(MOCK_TONES)
-    
-    return {
-        "summary": summary,
+    if category is None:
+        prompt = _build_open_prompt(text, candidate_labels or MOCK_CATEGORIES)
+    else:
+        prompt = _build_prompt(text, category)
+
+    call = mock_engine.gemini_call(prompt)
+    if call.fault == "timeout":
+        await _gemini_timeout()
+
+    # Simulate API latency
+    await asyncio.sleep(call.latency)
+    try:
+        parsed = _parse_answer(_gemini_answer(prompt, call))
+    except GeminiError as e:
+        raise GeminiError(f"Analysis failed: {e}")
+
+    result = {
+        "summary": parsed["summary"],
+        "tone": parsed["tone"] if parsed["tone"] in VALID_TONES else "neutre",
+        "latency_ms": _latency_ms(call)
+    }
+    if category is None:
+        result["category"] = parsed.get("category")
+    return result
+
+
+async def mock_analyze_text_stream(text: str, category: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Mock streamed Gemini analysis - yields the fake summary word by word.
+
+    The first word arrives after the Gemini latency, the next ones after
+    the token latency each.
+
+    Args:
+        text: The original text to analyze
+        category: The category from classification
+
+    Yields:
+        Token events, then a result event with summary, tone and latency_ms
+
+    Raises:
+        GeminiError: On an injected timeout fault
+    """
+    prompt = _build_stream_prompt(text, category)
+    call = mock_engine.gemini_call(prompt)
+    if call.fault == "timeout":
+        await _gemini_timeout()
+
+    answer = _gemini_answer(prompt, call, stream=True)
+    summary, marker, tone_line = answer.partition(f"\n{STREAM_TONE_MARKER}")
+    tone = _normalize_tone(tone_line) if marker else "neutre"
+
+    start = time.perf_counter()
+    await asyncio.sleep(call.latency)
+    first_token_ms = _latency_ms(call)
+    for i, word in enumerate(summary.split(" ")):
+        if i:
+            await asyncio.sleep(mock_engine.token_latency.sample(call.rng))
+        yield {"type": "token", "text": word if i == 0 else " " + word}
+
+    yield {
+        "type": "result",
+        "summary": summary.strip(),
         "tone": tone,
-        "latency_ms": random.randint(200, 800)
+        "latency_ms": int((time.perf_counter() - start) * 1000),
+        "first_token_ms": first_token_ms
     }
+
+
+class MockHFTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport answering zero-shot requests like the inference API:
+    a [{label, score}] list per input, 503 {"error", "estimated_time"} on a
+    loading fault, and a hang until the request's read timeout (then
+    httpx.ReadTimeout) on a timeout fault.
+    """
+
+    def __init__(self):
+        mock_engine.attach()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(await request.aread())
+        inputs = payload["inputs"]
+        labels = payload.get("parameters", {}).get("candidate_labels") or MOCK_CATEGORIES
+        call = mock_engine.hf_call(json.dumps(inputs, ensure_ascii=False))
+
+        if call.fault == "timeout":
+            timeout = (request.extensions.get("timeout") or {}).get("read") or huggingface_service.TIMEOUT_SECONDS
+            await asyncio.sleep(timeout)
+            raise httpx.ReadTimeout("Simulated read timeout", request=request)
+
+        await asyncio.sleep(call.latency)
+        if call.fault == "loading":
+            return httpx.Response(503, json={
+                "error": f"Model {HF_MODEL_ID} is currently loading",
+                "estimated_time": mock_engine.hf_loading_estimated_s,
+            }, request=request)
+
+        def result():
+            return [{"label": label, "score": score} for label, score in _scores(call.rng, labels).items()]
+
+        body = [result() for _ in inputs] if isinstance(inputs, list) else result()
+        return httpx.Response(200, json=body, request=request)
+
+
+class MockGeminiModel:
+    """
+    Stand-in for genai.GenerativeModel: generate_content blocks its
+    (executor) thread for the Gemini latency like the SDK does, raises
+    DeadlineExceeded after the request timeout on a timeout fault, and
+    streams the answer word by word when stream=True. generation_config
+    is accepted and ignored: the fake answers are JSON already.
+    """
+
+    def __init__(self):
+        mock_engine.attach()
+
+    def generate_content(
+        self,
+        prompt: str,
+        stream: bool = False,
+        request_options: Optional[dict] = None,
+        generation_config: Optional[dict] = None
+    ):
+        call = mock_engine.gemini_call(prompt)
+        if call.fault == "timeout":
+            from google.api_core.exceptions import DeadlineExceeded
+            time.sleep((request_options or {}).get("timeout") or gemini_service.TIMEOUT_SECONDS)
+            raise DeadlineExceeded("Simulated deadline exceeded")
+
+        answer = _gemini_answer(prompt, call, stream=stream)
+        if stream:
+            return self._chunks(answer, call)
+        time.sleep(call.latency)
+        return SimpleNamespace(text=answer)
+
+    @staticmethod
+    def _chunks(answer: str, call: MockCall) -> Iterator[SimpleNamespace]:
+        time.sleep(call.latency)
+        for i, word in enumerate(answer.split(" ")):
+            if i:
+                time.sleep(mock_engine.token_latency.sample(call.rng))
+            yield SimpleNamespace(text=word if i == 0 else " " + word)
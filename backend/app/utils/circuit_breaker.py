@@ -0,0 +1,194 @@
+"""
+Circuit breaker for upstream calls
+Stops calling an upstream that keeps failing, so requests fail in
+milliseconds instead of burning their retries and timeouts on it.
+
+- closed:    calls go through; outcomes are tracked. Trips to open after
+             failure_threshold consecutive failures, or when the failure
+             rate over the last window_size calls reaches error_rate
+             (once at least min_calls were seen).
+- open:      calls fail at once with CircuitOpenError until reset_timeout
+             has passed.
+- half_open: up to half_open_max_calls probe calls go through at a time.
+             That many successful probes close the circuit; a failed
+             probe opens it again.
+
+A bypassed breaker admits every call and records nothing (the mock engine
+bypasses them so that seeded runs do not depend on completion order).
+"""
+import math
+import time
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict
+from app.utils.limiter import LoadShedError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(LoadShedError):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+    def __init__(self, upstream: str, retry_after: int):
+        super().__init__(upstream, retry_after)
+        self.args = (f"{upstream} circuit is open, retry in {retry_after}s",)
+
+
+class BreakerCall:
+    """Handle for one guarded call; set failed to report a failed response"""
+
+    def __init__(self, probe: bool):
+        self.probe = probe
+        self.failed = False
+
+
+class CircuitBreaker:
+    """Consecutive-failure and error-rate circuit breaker with half-open probing"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        error_rate: float,
+        window_size: int,
+        min_calls: int,
+        reset_timeout: float,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self._clock = clock
+        self.bypassed = False
+        self.reset()
+
+    def reset(self) -> None:
+        """Close the circuit and forget all outcomes"""
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.rejected = 0
+        self._outcomes: Deque[bool] = deque(maxlen=self.window_size)
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            logger.warning(f"{self.name} circuit {self.state} -> {state}")
+            self.state = state
+        if state == OPEN:
+            self.opened_at = self._clock()
+            self.times_opened += 1
+        if state in (CLOSED, HALF_OPEN):
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if state == CLOSED:
+            self.consecutive_failures = 0
+            self._outcomes.clear()
+
+    def _retry_after(self) -> int:
+        remaining = self.reset_timeout - (self._clock() - self.opened_at)
+        return max(1, math.ceil(remaining))
+
+    def before_call(self) -> BreakerCall:
+        """Admit a call or raise CircuitOpenError"""
+        if self.bypassed:
+            return BreakerCall(probe=False)
+
+        if self.state == OPEN and self._clock() - self.opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+
+        if self.state == OPEN or (
+            self.state == HALF_OPEN and self._probes_in_flight >= self.half_open_max_calls
+        ):
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self._retry_after())
+
+        if self.state == HALF_OPEN:
+            self._probes_in_flight += 1
+            return BreakerCall(probe=True)
+        return BreakerCall(probe=False)
+
+    def after_call(self, call: BreakerCall, success: bool) -> None:
+        """Record the outcome of an admitted call"""
+        if self.bypassed:
+            self.release(call)
+            return
+
+        if call.probe:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if self.state != HALF_OPEN:
+                return
+            if not success:
+                self._transition(OPEN)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_max_calls:
+                self._transition(CLOSED)
+            return
+
+        # Late outcomes of calls admitted before the circuit opened are ignored
+        if self.state != CLOSED:
+            return
+
+        self._outcomes.append(success)
+        self.consecutive_failures = 0 if success else self.consecutive_failures + 1
+
+        failures = self._outcomes.count(False)
+        if self.consecutive_failures >= self.failure_threshold or (
+            len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate
+        ):
+            self._transition(OPEN)
+
+    def release(self, call: BreakerCall) -> None:
+        """Give back a probe slot without recording an outcome"""
+        if call.probe:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    @asynccontextmanager
+    async def guard(self):
+        """
+        Guard the block with the breaker.
+        Exceptions escaping the block count as failures, except load shedding
+        (the upstream was never called) and cancellation; setting call.failed
+        records a failed response.
+        """
+        call = self.before_call()
+        try:
+            yield call
+        except LoadShedError:
+            self.release(call)
+            raise
+        except Exception:
+            self.after_call(call, success=False)
+            raise
+        except BaseException:
+            self.release(call)
+            raise
+        self.after_call(call, success=not call.failed)
+
+    def stats(self) -> Dict[str, Any]:
+        if self.state == OPEN and self._clock() - self.opened_at >= self.reset_timeout:
+            state = HALF_OPEN
+        else:
+            state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self.consecutive_failures,
+            "error_rate": round(self._outcomes.count(False) / len(self._outcomes), 3) if self._outcomes else 0.0,
+            "window_calls": len(self._outcomes),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_after": self._retry_after() if state == OPEN else None,
+        }
@@ -0,0 +1,175 @@
+"""
+Adaptive concurrency limits for upstream calls
+One AdaptiveLimiter per upstream acts as a bulkhead: it caps the calls in
+flight, queues a bounded number of callers and sheds the rest with
+LoadShedError instead of letting them pile up on a struggling service.
+
+The limit follows AIMD: it grows by about one slot per limit's worth of
+successful calls while the limiter is saturated, and is cut by
+backoff_ratio when a call fails with an overload signal or is slower than
+latency_target.
+"""
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class LoadShedError(Exception):
+    """Raised when an upstream is saturated and the caller should come back later"""
+
+    def __init__(self, upstream: str, retry_after: int):
+        super().__init__(f"{upstream} is overloaded, retry in {retry_after}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class Slot:
+    """Handle for one admitted call; set overloaded to report an overload response"""
+
+    def __init__(self):
+        self.overloaded = False
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limiter with a bounded FIFO wait queue"""
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        max_queue: int,
+        queue_timeout: float,
+        latency_target: float,
+        backoff_ratio: float = 0.7,
+        decrease_cooldown: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.initial_limit = min(max(initial_limit, min_limit), self.max_limit)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+        self.decrease_cooldown = decrease_cooldown
+        self._clock = clock
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.reset()
+
+    def reset(self) -> None:
+        """Back to the initial limit with zeroed counters (waiters are left alone)"""
+        self.limit = float(self.initial_limit)
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.decreases = 0
+        self.avg_latency = 0.0
+        self._last_decrease = float("-inf")
+
+    async def acquire(self) -> None:
+        """Take a slot, waiting in line up to queue_timeout; raises LoadShedError"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._shed("queue full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            raise self._shed(f"waited over {self.queue_timeout}s")
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled; give it back
+                self._release_slot()
+            else:
+                self._discard(waiter)
+            raise
+        self.admitted += 1
+
+    def release(self, latency: float, overloaded: bool = False) -> None:
+        """Return a slot and feed the call's outcome into the limit"""
+        saturated = self.in_flight >= int(self.limit)
+        self.avg_latency = latency if self.avg_latency == 0 else 0.8 * self.avg_latency + 0.2 * latency
+
+        if overloaded or latency > self.latency_target:
+            now = self._clock()
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self._last_decrease = now
+                self.decreases += 1
+                self.limit = max(float(self.min_limit), self.limit * self.backoff_ratio)
+                logger.warning(
+                    f"{self.name} limit cut to {int(self.limit)} "
+                    f"({'overload' if overloaded else f'latency {latency:.2f}s'})"
+                )
+        elif saturated:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+        self._release_slot()
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold a slot for the duration of the block.
+        Exceptions escaping the block count as overload; so does setting
+        slot.overloaded (e.g. on a 429/503 response).
+        """
+        await self.acquire()
+        handle = Slot()
+        started = self._clock()
+        try:
+            yield handle
+        except Exception:
+            handle.overloaded = True
+            raise
+        finally:
+            self.release(self._clock() - started, handle.overloaded)
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _shed(self, reason: str) -> LoadShedError:
+        self.shed += 1
+        queued_rounds = (len(self._waiters) + 1) / max(int(self.limit), 1)
+        retry_after = max(1, math.ceil(self.avg_latency * queued_rounds))
+        logger.warning(f"Shedding {self.name} call: {reason} (limit {int(self.limit)}, queued {len(self._waiters)})")
+        return LoadShedError(self.name, retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "decreases": self.decreases,
+            "avg_latency_ms": int(self.avg_latency * 1000),
+        }
@@ -0,0 +1,432 @@
+"""
+In-process metrics registry with Prometheus text exposition
+Counters, gauges and histograms with labels, rendered by GET /metrics in
+the Prometheus text format (version 0.0.4) - no client library needed.
+
+Hot-path cost is kept to a dict lookup for the labelled child (callers
+on hot paths bind children once at import), a bisect over the bucket
+bounds and a few additions under an uncontended lock. Gauges whose value
+already lives elsewhere (limiter in-flight, breaker state) are collected
+by callbacks at scrape time instead of being updated on every call.
+"""
+import math
+import time
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from app.config import METRICS_ENABLED
+
+# Seconds; covers a cached hit (ms) up to a slow Gemini call with retries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base of the metric families: a name, help text and labelled children"""
+    kind = "untyped"
+
+    def __init__(self, registry: "Registry", name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str, **kwargs: str):
+        """Child for one combination of label values (created on first use)"""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def clear(self) -> None:
+        """Zero every child in place (children bound at import stay registered)"""
+        with self._lock:
+            for child in self._children.values():
+                child.reset()
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self.value += amount
+
+    def reset(self) -> None:
+        self.value = 0.0
+
+
+class Counter(_Metric):
+    """
+    Monotonic count; name should end in _total.
+    With a callback, an existing counter is read at scrape time: the
+    callback returns {label values tuple: value}.
+    """
+    kind = "counter"
+
+    def __init__(
+        self,
+        registry: "Registry",
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None
+    ):
+        super().__init__(registry, name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def samples(self) -> Iterable[str]:
+        if self.callback is not None:
+            values = self.callback().items()
+        else:
+            values = [(key, child.value) for key, child in list(self._children.items())]
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class _GaugeChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def reset(self) -> None:
+        self.value = 0.0
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down.
+    With a callback, values are read at scrape time: the callback returns
+    {label values tuple: value}.
+    """
+    kind = "gauge"
+
+    def __init__(
+        self,
+        registry: "Registry",
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None
+    ):
+        super().__init__(registry, name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+    def samples(self) -> Iterable[str]:
+        if self.callback is not None:
+            values = self.callback().items()
+        else:
+            values = [(key, child.value) for key, child in list(self._children.items())]
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        if not METRICS_ENABLED:
+            return
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> "_Timer":
+        """Context manager observing the duration of its block, in seconds"""
+        return _Timer(self)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = [0] * (len(self.bounds) + 1)
+            self.sum = 0.0
+            self.count = 0
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    """Bucketed distribution (cumulative buckets, sum and count), in seconds"""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        registry: "Registry",
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(registry, name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def samples(self) -> Iterable[str]:
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket in zip(self.bounds + (math.inf,), counts):
+                cumulative += bucket
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, values)} {count}"
+
+
+class Registry:
+    """Set of metric families rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Prometheus text exposition of every metric"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Zero all recorded values (callback metrics are unaffected)"""
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+registry = Registry()
+
+# Stages: hf, gemini (one upstream attempt each), db (one SQL statement),
+# auth (get_current_user) and pipeline (classification + summary of one request)
+STAGE_DURATION = Histogram(
+    registry, "analyzer_stage_duration_seconds",
+    "Duration of pipeline stages, upstream attempts and SQL statements",
+    ["stage"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    registry, "analyzer_http_request_duration_seconds",
+    "HTTP request duration by route template and status code",
+    ["method", "route", "status"]
+)
+HTTP_IN_FLIGHT = Gauge(
+    registry, "analyzer_http_requests_in_flight",
+    "HTTP requests currently being served"
+)
+UPSTREAM_RESPONSES = Counter(
+    registry, "analyzer_upstream_responses_total",
+    "Upstream attempts by outcome: HTTP status code, ok, timeout or error class",
+    ["upstream", "status"]
+)
+UPSTREAM_RETRIES = Counter(
+    registry, "analyzer_upstream_retries_total",
+    "Upstream retries scheduled by the retry policies",
+    ["upstream"]
+)
+LABELS_PRUNED = Counter(
+    registry, "analyzer_labels_pruned_total",
+    "Candidate labels the pre-filter kept out of HuggingFace classification requests"
+)
+GEMINI_PARSE = Counter(
+    registry, "analyzer_gemini_parse_total",
+    "Structured Gemini answers by parse outcome: strict, repaired or failed",
+    ["outcome"]
+)
+DEDUP_LOOKUPS = Counter(
+    registry, "analyzer_dedup_lookups_total",
+    "Near-duplicate index lookups by outcome: hit, miss or skipped (text too short)",
+    ["outcome"]
+)
+ERRORS = Counter(
+    registry, "analyzer_errors_total",
+    "Failed analyses (requests, stream events and batch items) by error type",
+    ["type"]
+)
+# Starts at 1 ms: an idle pool picks a job up within microseconds
+PASSWORD_HASH_QUEUE = Histogram(
+    registry, "analyzer_password_hash_queue_seconds",
+    "Time password hashing jobs waited for a free worker",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+HF_DURATION = STAGE_DURATION.labels(stage="hf")
+GEMINI_DURATION = STAGE_DURATION.labels(stage="gemini")
+DB_DURATION = STAGE_DURATION.labels(stage="db")
+AUTH_DURATION = STAGE_DURATION.labels(stage="auth")
+PIPELINE_DURATION = STAGE_DURATION.labels(stage="pipeline")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request duration by route template (not raw
+    path, to bound label cardinality) and the in-flight count. Plain ASGI
+    like TracingMiddleware: timing ends with the last body message, so
+    streamed responses count until they finish.
+    """
+
+    def __init__(self, app, route_template: Callable[[dict], str]):
+        self.app = app
+        self.route_template = route_template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        state = {"status": 500, "done": False}
+        HTTP_IN_FLIGHT.inc()
+
+        def finish() -> None:
+            state["done"] = True
+            HTTP_IN_FLIGHT.dec()
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], self.route_template(scope), str(state["status"])
+            ).observe(time.perf_counter() - start)
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            if not state["done"]:
+                finish()
+
+
+def count_error(error: BaseException) -> None:
+    ERRORS.labels(type=type(error).__name__).inc()
+
+
+def instrument_engine(engine) -> None:
+    """Time every SQL statement of a (sync, or an async engine's sync_engine) SQLAlchemy engine"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if starts:
+            DB_DURATION.observe(time.perf_counter() - starts.pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
@@ -0,0 +1,134 @@
+"""
+Password hashing executor
+bcrypt is deliberately slow CPU work. Run inline (or on the shared
+threadpool) a login burst stalls unrelated endpoints, and the GIL keeps it
+on one core. PasswordHasher runs it on a dedicated, bounded executor
+instead - threads by default (bcrypt releases the GIL while hashing), or
+worker processes - and tracks how long each job waited for a free worker
+(queue time, also in analyzer_password_hash_queue_seconds), the signal
+that the pool is undersized.
+"""
+import time
+import asyncio
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+from app.config import BCRYPT_ROUNDS, PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS
+from app.utils.metrics import PASSWORD_HASH_QUEUE
+from app.utils.security import hash_password, verify_and_update_password
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = ("process", "thread", "inline")
+
+# Queue time samples kept for percentiles
+QUEUE_SAMPLES = 1024
+
+
+def _timed(fn: Callable, *args) -> Tuple[float, Any]:
+    """Runs in the worker: report when the job actually started"""
+    return time.time(), fn(*args)
+
+
+def _percentile(ordered, q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class PasswordHasher:
+    """bcrypt hashing and verification on a dedicated executor"""
+
+    def __init__(self, kind: str = PASSWORD_HASH_EXECUTOR, workers: int = PASSWORD_HASH_WORKERS, rounds: int = BCRYPT_ROUNDS):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown password hash executor '{kind}', expected one of {EXECUTOR_KINDS}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.rounds = rounds
+        self._executor: Optional[Executor] = None
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.jobs = 0
+        self.rehashes = 0
+        self.in_flight = 0
+        self._queue_ms: Deque[float] = deque(maxlen=QUEUE_SAMPLES)
+        self._max_queue_ms = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # spawn: forking a process that already runs threads (event loop, threadpool) is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    def start(self) -> None:
+        """Start the workers ahead of the first login (spawning processes takes a moment)"""
+        if self.kind != "inline":
+            executor = self._get_executor()
+            for _ in range(self.workers):
+                executor.submit(time.time)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        submitted = time.time()
+        self.in_flight += 1
+        try:
+            if self.kind == "inline":
+                started, result = _timed(fn, *args)
+            else:
+                loop = asyncio.get_running_loop()
+                try:
+                    started, result = await loop.run_in_executor(self._get_executor(), _timed, fn, *args)
+                except BrokenProcessPool:
+                    logger.warning("Password hashing pool broke, restarting it")
+                    self.shutdown()
+                    started, result = await loop.run_in_executor(self._get_executor(), _timed, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+        queue_ms = max(0.0, (started - submitted) * 1000)
+        self.jobs += 1
+        self._queue_ms.append(queue_ms)
+        self._max_queue_ms = max(self._max_queue_ms, queue_ms)
+        PASSWORD_HASH_QUEUE.observe(queue_ms / 1000)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify_and_update(self, plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password. On success also returns a fresh hash when the
+        stored one was made at a different cost than the configured one.
+        """
+        verified, new_hash = await self._run(verify_and_update_password, plain, hashed, self.rounds)
+        if new_hash is not None:
+            self.rehashes += 1
+        return verified, new_hash
+
+    def stats(self) -> Dict[str, Any]:
+        ordered = sorted(self._queue_ms)
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "jobs": self.jobs,
+            "in_flight": self.in_flight,
+            "rehashes": self.rehashes,
+            "queue_ms_p50": round(_percentile(ordered, 0.50), 2) if ordered else 0.0,
+            "queue_ms_p95": round(_percentile(ordered, 0.95), 2) if ordered else 0.0,
+            "queue_ms_max": round(self._max_queue_ms, 2),
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,270 @@
+"""
+Retry policy shared by the upstream services
+- exponential backoff with full jitter between attempts
+- classification of retryable vs fatal errors
+- a process-wide retry budget, so retries stay a bounded fraction of
+  traffic and an outage does not turn into a retry storm
+- an end-to-end request deadline (a contextvar set per request) that
+  caps per-attempt timeouts and stops retrying when time runs out
+"""
+import time
+import random
+import asyncio
+import logging
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, Optional
+import httpx
+from app.config import (
+    RETRY_BASE_DELAY_MS,
+    RETRY_MAX_DELAY_MS,
+    RETRY_BUDGET_RATIO,
+    RETRY_BUDGET_MIN_PER_SEC,
+    REQUEST_TIMEOUT_S,
+    REQUEST_TIMEOUT_MAX_S,
+)
+from app.utils.limiter import LoadShedError
+from app.utils.metrics import UPSTREAM_RETRIES
+from app.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Header clients use to set their own deadline, in seconds
+DEADLINE_HEADER = "X-Request-Timeout"
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# Absolute time.monotonic() value the current request must finish by
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the request deadline leaves no time for another upstream attempt"""
+    pass
+
+
+def set_deadline(seconds: Optional[float]) -> Token:
+    """Start a deadline seconds from now for the current context (None for no deadline)"""
+    return _deadline.set(None if seconds is None else time.monotonic() + seconds)
+
+
+def reset_deadline(token: Token) -> None:
+    _deadline.reset(token)
+
+
+def get_deadline() -> Optional[float]:
+    """The current deadline as a time.monotonic() value, or None"""
+    return _deadline.get()
+
+
+def set_deadline_at(deadline: Optional[float]) -> Token:
+    """Set the current deadline to a time.monotonic() value (None for no deadline)"""
+    return _deadline.set(deadline)
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def attempt_timeout(default: float) -> float:
+    """Timeout for the next upstream attempt: default, shrunk to the time left"""
+    remaining = time_remaining()
+    if remaining is None:
+        return default
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(default, remaining)
+
+
+def parse_timeout_header(value: Optional[str]) -> float:
+    """Deadline in seconds from the X-Request-Timeout header, clamped to the server maximum"""
+    try:
+        seconds = float(value) if value is not None else REQUEST_TIMEOUT_S
+    except ValueError:
+        seconds = REQUEST_TIMEOUT_S
+    if not seconds > 0:
+        seconds = REQUEST_TIMEOUT_S
+    return min(seconds, REQUEST_TIMEOUT_MAX_S)
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware starting the end-to-end deadline upstream calls and
+    retries must fit in (X-Request-Timeout or the default). Plain ASGI, so
+    the app runs in this context, streamed responses included.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = DEADLINE_HEADER.lower().encode("latin-1")
+        value = next((v.decode("latin-1") for k, v in scope["headers"] if k == header), None)
+        token = set_deadline(parse_timeout_header(value))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_deadline(token)
+
+
+def is_retryable_status(status_code: int) -> bool:
+    return status_code in RETRYABLE_STATUS_CODES
+
+
+def is_retryable_error(error: BaseException, unknown: bool = True) -> bool:
+    """
+    Whether another attempt may succeed.
+    Errors carrying an HTTP status (httpx responses, google.api_core
+    exceptions via .code) are judged by it; timeouts and connection errors
+    are retryable; shedding, deadlines and bad input are not. Anything else
+    gets the unknown default.
+    """
+    if isinstance(error, (LoadShedError, DeadlineExceeded)):
+        return False
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return is_retryable_status(error.response.status_code)
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return is_retryable_status(code)
+    if isinstance(error, (ValueError, TypeError)):
+        return False
+    return unknown
+
+
+class RetryBudget:
+    """
+    Token bucket shared by every retry policy in the process.
+    Each first attempt deposits ratio tokens and each retry spends one, so
+    retries stay below about ratio x traffic. min_per_second tokens trickle
+    in regardless, so low-traffic processes can still retry.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, clock: Callable[[], float] = time.monotonic):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max(10.0, min_per_second * 10)
+        self._clock = clock
+        self.reset()
+
+    def reset(self) -> None:
+        self.tokens = self.max_tokens
+        self._updated = self._clock()
+        self.deposits = 0
+        self.retries = 0
+        self.exhausted = 0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self) -> None:
+        """Record a first attempt"""
+        self._refill()
+        self.deposits += 1
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one retry token if available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.retries += 1
+            return True
+        self.exhausted += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "tokens": round(self.tokens, 2),
+            "max_tokens": self.max_tokens,
+            "ratio": self.ratio,
+            "first_attempts": self.deposits,
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+        }
+
+
+retry_budget = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_PER_SEC)
+
+
+class RetryPolicy:
+    """Backoff schedule plus the retry decision for one upstream"""
+
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int,
+        base_delay: float = RETRY_BASE_DELAY_MS / 1000,
+        max_delay: float = RETRY_MAX_DELAY_MS / 1000,
+        multiplier: float = 2.0,
+        budget: Optional[RetryBudget] = None,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.budget = budget if budget is not None else retry_budget
+        self._rng = rng
+
+    def set_rng(self, rng: Callable[[], float]) -> Callable[[], float]:
+        """Replace the jitter source (a random() returning 0-1); returns the previous one"""
+        previous, self._rng = self._rng, rng
+        return previous
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay after the given (0-based) failed attempt"""
+        cap = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return self._rng() * cap
+
+    def start(self) -> None:
+        """Call once per logical call, before its first attempt"""
+        self.budget.deposit()
+
+    def next_delay(
+        self,
+        attempt: int,
+        error: BaseException,
+        retryable: Optional[bool] = None,
+        retry_after: Optional[float] = None
+    ) -> Optional[float]:
+        """
+        Seconds to wait before retrying after a failed attempt, or None to give up.
+        retryable overrides is_retryable_error(error); retry_after is a
+        server hint (capped at max_delay). Raises DeadlineExceeded when the
+        request deadline leaves no room for another attempt.
+        """
+        if retryable is None:
+            retryable = is_retryable_error(error)
+        if not retryable:
+            return None
+        if attempt + 1 >= self.max_attempts:
+            return None
+
+        delay = min(retry_after, self.max_delay) if retry_after is not None else self.backoff(attempt)
+
+        remaining = time_remaining()
+        if remaining is not None and remaining <= delay:
+            logger.warning(f"{self.name}: deadline leaves {max(remaining, 0):.2f}s, not retrying after: {error}")
+            raise DeadlineExceeded(f"Request deadline exceeded (last error: {error})")
+
+        if not self.budget.try_spend():
+            logger.warning(f"{self.name}: retry budget exhausted, not retrying after: {error}")
+            return None
+
+        UPSTREAM_RETRIES.labels(upstream=self.name).inc()
+        return delay
+
+    async def sleep(self, delay: float) -> None:
+        """Wait out a next_delay() backoff, traced as a retry_wait span"""
+        with span("retry_wait", upstream=self.name, delay_ms=round(delay * 1000, 1)):
+            await asyncio.sleep(delay)
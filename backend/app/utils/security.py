@@ -1,21 +1,54 @@
+from typing import Dict, Optional, Tuple
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
-from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, BCRYPT_ROUNDS
 
-pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+def password_context(rounds: int) -> CryptContext:
+    """bcrypt context for a cost; hashes made at any other cost need a rehash"""
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
 
-def hash_password(password: str) -> str:
-    # Truncate to 72 bytes (UTF-8) before hashing
-    password = password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-    return pwd_ctx.hash(password)
 
+pwd_ctx = password_context(BCRYPT_ROUNDS)
 
-def verify_password(plain: str, hashed: str) -> bool:
-    # Truncate to 72 bytes (UTF-8) before verification
-    plain = plain.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-    return pwd_ctx.verify(plain, hashed)
+# Contexts for explicit costs (password hashing workers get the cost per job)
+_contexts: Dict[int, CryptContext] = {}
+
+
+def _context(rounds: Optional[int]) -> CryptContext:
+    if rounds is None:
+        return pwd_ctx
+    if rounds not in _contexts:
+        _contexts[rounds] = password_context(rounds)
+    return _contexts[rounds]
+
+
+def _truncate(password: str) -> str:
+    # bcrypt only uses the first 72 bytes (UTF-8)
+    return password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
+
+
+def hash_password(password: str, rounds: Optional[int] = None) -> str:
+    return _context(rounds).hash(_truncate(password))
+
+
+def verify_password(plain: str, hashed: str, rounds: Optional[int] = None) -> bool:
+    return _context(rounds).verify(_truncate(plain), hashed)
+
+
+def verify_and_update_password(plain: str, hashed: str, rounds: Optional[int] = None) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password; on success also return a new hash when the stored
+    one was made at a different cost than the configured one (else None)
+    """
+    return _context(rounds).verify_and_update(_truncate(plain), hashed)
 
 
 def create_access_token(data: dict, expires_minutes: int = None) -> str:
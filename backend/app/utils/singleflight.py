@@ -0,0 +1,129 @@
+"""
+In-flight request coalescing (singleflight)
+Concurrent calls sharing a key await one execution and all receive its
+result or its exception.
+"""
+import asyncio
+import logging
+from contextvars import Context
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from app.utils.retry import DeadlineExceeded, get_deadline, set_deadline_at, time_remaining
+from app.utils.tracing import Trace, current_trace, enter_trace, graft_trace
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """One shared execution, in a context of its own (no caller's deadline or trace leaks in)"""
+
+    def __init__(self, fn: Callable[[], Awaitable[Any]], deadline: Optional[float], trace: Optional[Trace]):
+        self.deadline = deadline
+        self.trace = trace
+        self.context = Context()
+        self.task = asyncio.get_running_loop().create_task(self._execute(fn), context=self.context)
+
+    async def _execute(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        set_deadline_at(self.deadline)
+        if self.trace is not None:
+            enter_trace(self.trace)
+        return await fn()
+
+    def cover(self, deadline: Optional[float]) -> None:
+        """Extend the work's deadline to a later caller's (None: no deadline)"""
+        if self.deadline is None or (deadline is not None and deadline <= self.deadline):
+            return
+        self.deadline = deadline
+        if not self.task.done():
+            # The task is suspended while another caller runs, so its context can be entered
+            self.context.run(set_deadline_at, deadline)
+
+    async def wait(self) -> Any:
+        """The shared result, waited for until the caller's own deadline"""
+        try:
+            remaining = time_remaining()
+            if remaining is None:
+                return await asyncio.shield(self.task)
+            try:
+                return await asyncio.wait_for(asyncio.shield(self.task), timeout=max(remaining, 0))
+            except asyncio.TimeoutError:
+                if self.task.done():
+                    raise
+                raise DeadlineExceeded("Request deadline exceeded waiting for a coalesced execution")
+        finally:
+            if self.trace is not None:
+                graft_trace(self.trace)
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent async calls by key.
+
+    The first caller for a key (the leader) starts the work as its own task;
+    callers arriving while it runs wait on the same task instead of starting
+    another one. The task is shielded, so a caller that disconnects or is
+    cancelled does not cancel the work for the others. The key is forgotten
+    as soon as the work finishes - results are not remembered (that is the
+    result cache's job).
+
+    The work belongs to no single caller: it runs in a context of its own,
+    under the latest deadline of its callers (extended as later ones join)
+    and with a trace of its own. Each caller waits only until its own
+    deadline (DeadlineExceeded past it) and gets the work's spans copied
+    into its trace.
+
+    cost(result) tells how many upstream calls one execution made, so that
+    saved_calls counts upstream calls avoided rather than executions.
+    """
+
+    def __init__(self, cost: Optional[Callable[[Any], int]] = None):
+        self._calls: Dict[str, _Call] = {}
+        self._cost = cost or (lambda result: 1)
+        self.executions = 0
+        self.coalesced = 0
+        self.saved_calls = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run fn() once for all concurrent callers of key.
+        Returns (result, shared) where shared is True for callers that
+        joined an execution started by someone else.
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+            logger.info(f"Coalesced request onto in-flight execution ({len(self._calls)} in flight)")
+            call.cover(get_deadline())
+            result = await call.wait()
+            self.saved_calls += self._cost(result)
+            return result, True
+
+        self.executions += 1
+        call = _Call(fn, get_deadline(), Trace("singleflight") if current_trace() is not None else None)
+        self._calls[key] = call
+        call.task.add_done_callback(lambda done: self._forget(key, done))
+        return await call.wait(), False
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        call = self._calls.get(key)
+        if call is not None and call.task is task:
+            del self._calls[key]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def reset(self) -> None:
+        """Zero the counters (in-flight calls are left alone)"""
+        self.executions = 0
+        self.coalesced = 0
+        self.saved_calls = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "upstream_calls_saved": self.saved_calls,
+        }
@@ -0,0 +1,164 @@
+"""
+Text helpers shared by the analysis pipeline
+"""
+import re
+import math
+import zlib
+import hashlib
+import unicodedata
+from typing import Dict, List, Tuple
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+_URL_SUFFIX_RE = re.compile(r"(https?://[^\s?#]+)[?#]\S*", re.IGNORECASE)
+
+# Size of the hashed feature space used by hashed_vector
+HASH_DIMS = 2 ** 18
+
+# Width of simhash fingerprints; 64 bits is too coarse to tell an edited
+# 100-word text from an unrelated one sharing its boilerplate
+SIMHASH_BITS = 256
+# _BIT_TABLES[b] maps every byte value to its bit b, for bytes.translate
+_BIT_TABLES = [bytes((value >> bit) & 1 for value in range(256)) for bit in range(8)]
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form of a text for hashing and comparison.
+    Applies NFKC normalization and collapses all runs of whitespace.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens"""
+    return _WORD_RE.findall(text.lower())
+
+
+def hashed_vector(text: str, dims: int = HASH_DIMS) -> Dict[int, float]:
+    """
+    Sparse L2-normalized bag-of-words vector using the hashing trick.
+    Each word contributes itself and its 5-character prefix, a cheap stand-in
+    for stemming ("technology" / "technological" share "techn").
+    """
+    counts: Dict[int, float] = {}
+    for token in tokenize(text):
+        features = (token, token[:5] + "*") if len(token) > 5 else (token,)
+        for feature in features:
+            index = zlib.crc32(feature.encode("utf-8")) % dims
+            counts[index] = counts.get(index, 0.0) + 1.0
+    
+    norm = math.sqrt(sum(v * v for v in counts.values()))
+    if norm == 0:
+        return {}
+    return {index: value / norm for index, value in counts.items()}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    """Cosine similarity of two normalized sparse vectors"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+
+def strip_url_suffixes(text: str) -> str:
+    """Drop the query string and fragment of every URL (tracking parameters)"""
+    return _URL_SUFFIX_RE.sub(r"\1", text)
+
+
+def simhash(text: str, shingle_words: int = 3) -> int:
+    """
+    SimHash (SIMHASH_BITS wide) of a text's word shingles: texts sharing
+    most of their shingles get fingerprints differing in few bits. Case,
+    whitespace and URL query strings are ignored; a shingle counts once per
+    occurrence.
+    """
+    tokens = tokenize(strip_url_suffixes(normalize_text(text)))
+    if len(tokens) <= shingle_words:
+        shingles = [" ".join(tokens)] if tokens else []
+    else:
+        shingles = [" ".join(tokens[i:i + shingle_words]) for i in range(len(tokens) - shingle_words + 1)]
+    if not shingles:
+        return 0
+    
+    # Bit i is set when more than half of the shingle hashes have it; the hashes
+    # are packed so that each byte position is one strided slice, counted in C
+    width = SIMHASH_BITS // 8
+    packed = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=width).digest() for s in shingles)
+    half = len(shingles) / 2
+    fingerprint = 0
+    for byte in range(width):
+        column = packed[byte::width]
+        for bit in range(8):
+            if column.translate(_BIT_TABLES[bit]).count(1) > half:
+                fingerprint |= 1 << (byte * 8 + bit)
+    return fingerprint
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough subword token count without a tokenizer: words and punctuation
+    marks, plus a third of the words for those split into several pieces
+    (BPE vocabularies like BART's average ~1.3 tokens per English word).
+    """
+    return len(_TOKEN_RE.findall(text)) + len(_WORD_RE.findall(text)) // 3
+
+
+def _split_words(sentence: str, max_tokens: int) -> List[str]:
+    """Cut an over-long sentence into runs of words that fit max_tokens"""
+    runs, words, tokens = [], [], 0
+    for word in sentence.split():
+        cost = estimate_tokens(word)
+        if words and tokens + cost > max_tokens:
+            runs.append(" ".join(words))
+            words, tokens = [], 0
+        words.append(word)
+        tokens += cost
+    if words:
+        runs.append(" ".join(words))
+    return runs
+
+
+def _units(text: str, max_tokens: int) -> List[Tuple[str, int, bool]]:
+    """(piece, tokens, starts a paragraph) for paragraphs, or their sentences when too long"""
+    units = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        tokens = estimate_tokens(paragraph)
+        if tokens <= max_tokens:
+            units.append((paragraph, tokens, True))
+            continue
+        first = True
+        for sentence in _SENTENCE_RE.split(paragraph):
+            pieces = [sentence] if estimate_tokens(sentence) <= max_tokens else _split_words(sentence, max_tokens)
+            for piece in pieces:
+                units.append((piece, estimate_tokens(piece), first))
+                first = False
+    return units
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Split a text into chunks of about max_tokens, cutting between
+    paragraphs where possible, else between sentences, and only inside a
+    sentence longer than a whole chunk. The budget is checked against the
+    sum of the pieces' estimates, so a chunk's own estimate can be a few
+    tokens over. Paragraph breaks are kept as blank lines; other
+    whitespace is collapsed.
+    """
+    chunks, current, used = [], [], 0
+    for piece, tokens, new_paragraph in _units(text, max_tokens):
+        if current and used + tokens > max_tokens:
+            chunks.append("".join(current))
+            current, used = [], 0
+        if current:
+            current.append("\n\n" if new_paragraph else " ")
+        current.append(piece)
+        used += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
@@ -0,0 +1,316 @@
+"""
+Request tracing
+A trace is started per HTTP request (TracingMiddleware) and kept in
+a contextvar; span() blocks record named intervals on time.perf_counter()
+into it, nested under the enclosing span. Outside a request, or with
+TRACING_ENABLED off, span() does nothing.
+
+Spans recorded by the app:
+- request: the whole request, from arrival until the last body byte
+- dependencies: arrival until the handler starts (body parsing, JSON
+  validation and the auth dependency)
+- auth, auth.user_lookup: get_current_user and its user query
+- cache.lookup, pipeline, classify, summarize
+- hf.attempt, gemini.attempt, gemini.stream: one upstream attempt each
+- retry_wait: a backoff sleep between attempts (upstream attribute)
+- handler: the endpoint function
+- serialize: handler return until the response starts (response model
+  validation and JSON encoding)
+
+Finished traces go to TRACE_EXPORT_PATH as JSON lines, one per span.
+"""
+import json
+import time
+import uuid
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from app.config import TRACING_ENABLED, TRACE_EXPORT_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """One named interval of a trace"""
+    __slots__ = ("span_id", "parent_id", "name", "start", "end", "attrs")
+
+    def __init__(self, span_id: int, parent_id: Optional[int], name: str, start: float, attrs: Dict[str, Any]):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.attrs = attrs
+
+    def set(self, **attrs: Any) -> None:
+        """Attach attributes (status code, attempt number...)"""
+        self.attrs.update(attrs)
+
+    def finish(self) -> None:
+        self.end = time.perf_counter()
+
+
+class _NoopSpan:
+    """Stand-in for a span when nothing is being traced"""
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans of one request, timed relative to its start; root is the request span"""
+
+    def __init__(self, name: str, **attrs: Any):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.spans: List[Span] = []
+        self._ids = 0
+        self.root = self.open("request", None, **attrs)
+        self.start = self.root.start
+        # Set when the response starts; the body may stream for much longer
+        self.serialize_end: Optional[float] = None
+
+    def open(self, name: str, parent_id: Optional[int], start: Optional[float] = None, **attrs: Any) -> Span:
+        """Start a span; it counts once its end is set"""
+        self._ids += 1
+        span = Span(self._ids, parent_id, name, time.perf_counter() if start is None else start, attrs)
+        self.spans.append(span)
+        return span
+
+    def record(self, name: str, start: float, end: float, parent_id: Optional[int] = None, **attrs: Any) -> Span:
+        """Add an already finished span"""
+        span = self.open(name, parent_id, start, **attrs)
+        span.end = end
+        return span
+
+    def find(self, name: str) -> Optional[Span]:
+        for span in self.spans:
+            if span.name == name:
+                return span
+        return None
+
+    def finished(self) -> List[Span]:
+        return sorted((s for s in self.spans if s.end is not None), key=lambda s: s.start)
+
+    def span_dict(self, span: Span) -> Dict[str, Any]:
+        item = {
+            "name": span.name,
+            "start_ms": round((span.start - self.start) * 1000, 3),
+            "duration_ms": round((span.end - span.start) * 1000, 3),
+        }
+        if span.attrs:
+            item["attrs"] = span.attrs
+        return item
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        """Finished spans in start order with their parent's name, for meta.spans"""
+        names = {s.span_id: s.name for s in self.spans}
+        return [{**self.span_dict(span), "parent": names.get(span.parent_id)} for span in self.finished()]
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("request_trace", default=None)
+_parent: ContextVar[Optional[int]] = ContextVar("trace_parent_span", default=None)
+
+
+def start_trace(name: str, **attrs: Any) -> Optional[Tuple[Trace, Token, Token]]:
+    """Make a new trace (and its request span) current; None when tracing is off"""
+    if not TRACING_ENABLED:
+        return None
+    return enter_trace(Trace(name, **attrs))
+
+
+def enter_trace(trace: Trace) -> Tuple[Trace, Token, Token]:
+    """Make an existing trace current, with its request span as the parent"""
+    return trace, _trace.set(trace), _parent.set(trace.root.span_id)
+
+
+def end_trace(state: Tuple[Trace, Token, Token]) -> None:
+    """Leave the trace's context (the trace itself is finished by finish_trace)"""
+    _, trace_token, parent_token = state
+    _parent.reset(parent_token)
+    _trace.reset(trace_token)
+
+
+def finish_trace(trace: Trace, **attrs: Any) -> None:
+    """Close the request span, derive dependencies/serialize from the handler span, export"""
+    end = time.perf_counter()
+    handler = trace.find("handler")
+    if handler is not None and handler.end is not None:
+        trace.record("dependencies", trace.start, handler.start, trace.root.span_id)
+        trace.record("serialize", handler.end, trace.serialize_end or end, trace.root.span_id)
+    trace.root.set(**attrs)
+    trace.root.end = end
+    if span_exporter is not None:
+        span_exporter.export(trace)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+def graft_trace(source: Trace) -> None:
+    """
+    Copy the finished spans of another trace (all but its request span) under
+    the current span, e.g. those of work shared by several requests
+    """
+    trace = _trace.get()
+    if trace is None or trace is source:
+        return
+    ids = {source.root.span_id: _parent.get()}
+    for item in source.finished():
+        if item is source.root:
+            continue
+        copy = trace.record(item.name, item.start, item.end, ids.get(item.parent_id, ids[source.root.span_id]), **item.attrs)
+        ids[item.span_id] = copy.span_id
+
+
+def request_start() -> float:
+    """perf_counter() value the current request arrived at (now, outside a trace)"""
+    trace = _trace.get()
+    return trace.start if trace is not None else time.perf_counter()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Any]:
+    """
+    Time the block as a child of the enclosing span.
+    An exception leaving the block is recorded as the error attribute.
+    Must open and close in the same task (not across an async generator's yields).
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield NOOP_SPAN
+        return
+    current = trace.open(name, _parent.get(), **attrs)
+    token = _parent.set(current.span_id)
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _parent.reset(token)
+
+
+def open_span(name: str, **attrs: Any) -> Any:
+    """
+    Start a child of the enclosing span without making it the parent of
+    later spans; call finish() on it. For intervals spanning the yields of
+    an async generator, where span() cannot be used.
+    """
+    trace = _trace.get()
+    if trace is None:
+        return NOOP_SPAN
+    return trace.open(name, _parent.get(), **attrs)
+
+
+def traced_handler(endpoint: Callable) -> Callable:
+    """Record an endpoint's run as the handler span (FastAPI still sees its signature)"""
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        with span("handler"):
+            return await endpoint(*args, **kwargs)
+    return wrapper
+
+
+def verbose_spans(verbose: bool) -> Optional[List[Dict[str, Any]]]:
+    """meta.spans value: the breakdown so far when the client asked for it"""
+    if not verbose:
+        return None
+    trace = _trace.get()
+    return trace.breakdown() if trace is not None else None
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware tracing each HTTP request (plain ASGI rather than
+    @app.middleware, so the app runs in the caller's task and context and
+    no extra task or body stream is added per request).
+    The request span ends with the last body message, so streamed responses
+    are traced until they finish.
+    """
+
+    def __init__(self, app, route_template: Callable[[dict], str]):
+        self.app = app
+        self.route_template = route_template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        state = start_trace(f"{scope['method']} {scope['path']}", method=scope["method"])
+        trace = state[0]
+        status = {"code": 500, "done": False}
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                trace.serialize_end = time.perf_counter()
+                status["code"] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                status["done"] = True
+                self._finish(trace, scope, status["code"])
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            end_trace(state)
+            if not status["done"]:
+                self._finish(trace, scope, status["code"])
+
+    def _finish(self, trace: Trace, scope, status: int) -> None:
+        trace.name = f"{scope['method']} {self.route_template(scope)}"
+        finish_trace(trace, status=status)
+
+
+class JsonlSpanExporter:
+    """Appends finished traces to a local file, one JSON object per span"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.exported = 0
+        self.failed = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace) -> None:
+        lines = [
+            json.dumps({
+                "trace_id": trace.trace_id,
+                "trace": trace.name,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                **trace.span_dict(span),
+            }, ensure_ascii=False, default=str)
+            for span in trace.finished()
+        ]
+        try:
+            with self._lock:
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write("\n".join(lines) + "\n")
+                self._file.flush()
+            self.exported += 1
+        except OSError as e:
+            self.failed += 1
+            logger.warning(f"Trace export to {self.path} failed: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+span_exporter: Optional[JsonlSpanExporter] = JsonlSpanExporter(TRACE_EXPORT_PATH) if TRACE_EXPORT_PATH else None
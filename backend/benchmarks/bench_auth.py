@@ -0,0 +1,146 @@
+"""
+Auth overhead microbenchmark
+Measures what authentication adds to each protected request, comparing the
+previous dependency (sync: JWT decode + users query on every call, run on
+the threadpool) with the cached async get_current_user.
+
+Three probe endpoints on a throwaway app share the benchmark database:
+/none (no auth, the baseline), /legacy and /cached. Overhead is the
+latency above /none. --db-latency-ms adds a sleep to every SQL statement
+to stand in for the network round trip to Postgres.
+
+Usage:
+    python -m benchmarks.bench_auth --requests 2000 --concurrency 16 --db-latency-ms 1
+"""
+import argparse
+import asyncio
+import time
+import warnings
+from typing import List
+
+from fastapi import Depends, FastAPI, HTTPException, Request
+from sqlalchemy import event
+from sqlalchemy.exc import LegacyAPIWarning
+from sqlalchemy.orm import Session
+import httpx
+
+from benchmarks.common import (
+    BenchSessionLocal, engine, async_engine, percentiles, print_table, setup_database,
+    _override_get_db, _override_get_session_factory,
+)
+from app.database.connection import get_db, get_session_factory
+from app.models.user import User
+from app.routers.auth import get_current_user, COOKIE_NAME
+from app.services.auth_service import create_user, auth_cache_stats, clear_auth_caches
+from app.utils.security import create_access_token, decode_token
+
+
+def legacy_get_current_user(request: Request, db: Session = Depends(get_db)):
+    """get_current_user as it was before the cached async version"""
+    token = None
+    auth_header = request.headers.get("Authorization")
+    if auth_header and auth_header.startswith("Bearer "):
+        token = auth_header[7:]
+    if not token:
+        token = request.cookies.get(COOKIE_NAME)
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    data = decode_token(token)
+    if not data or "sub" not in data:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    user = db.query(User).get(int(data["sub"]))
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
+# The legacy dependency used Query.get(); keep it as it was, without the warning
+warnings.filterwarnings("ignore", category=LegacyAPIWarning)
+
+
+def build_probe_app() -> FastAPI:
+    probe = FastAPI()
+    probe.dependency_overrides[get_db] = _override_get_db
+    probe.dependency_overrides[get_session_factory] = _override_get_session_factory
+
+    @probe.get("/none")
+    async def no_auth():
+        return {"ok": True}
+
+    @probe.get("/legacy")
+    async def legacy(user=Depends(legacy_get_current_user)):
+        return {"ok": True}
+
+    @probe.get("/cached")
+    async def cached(user=Depends(get_current_user)):
+        return {"ok": True}
+
+    return probe
+
+
+async def _measure(client: httpx.AsyncClient, path: str, headers: dict, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+
+    for _ in range(20):  # warm up
+        await one()
+    latencies.clear()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    wall = time.perf_counter() - start
+    return {"latency": percentiles(latencies), "throughput": requests / wall}
+
+
+async def run(requests: int, concurrency: int, db_latency_ms: float) -> None:
+    setup_database()
+    clear_auth_caches()
+
+    db = BenchSessionLocal()
+    user = create_user(db, "bench-auth@example.com", "benchpassword123")
+    token = create_access_token({"sub": str(user.id), "email": user.email})
+    db.close()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    if db_latency_ms > 0:
+        def _simulated_round_trip(*args):
+            time.sleep(db_latency_ms / 1000)
+
+        event.listen(engine, "before_cursor_execute", _simulated_round_trip)
+        event.listen(async_engine.sync_engine, "before_cursor_execute", _simulated_round_trip)
+
+    transport = httpx.ASGITransport(app=build_probe_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {path: await _measure(client, path, headers, requests, concurrency)
+                   for path in ("/none", "/legacy", "/cached")}
+
+    baseline = results["/none"]["latency"]["p50"]
+    rows = []
+    for path, r in results.items():
+        rows.append((
+            path, r["latency"]["p50"], r["latency"]["p95"], r["latency"]["p99"],
+            round(r["latency"]["p50"] - baseline, 3), f"{r['throughput']:.0f}",
+        ))
+
+    print(f"requests={requests}, concurrency={concurrency}, db_latency_ms={db_latency_ms}")
+    print_table(rows, ("endpoint", "p50_ms", "p95_ms", "p99_ms", "auth_overhead_p50_ms", "req/s"))
+    print(f"auth caches: {auth_cache_stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--db-latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.db_latency_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Classifier backend benchmark
+Runs each backend over the fixed corpus and reports latency, accuracy
+against the corpus labels and top-1 agreement with the reference backend
+(the first one listed).
+
+The hf backend needs HF_TOKEN and network access; it is skipped otherwise.
+
+Usage:
+    python -m benchmarks.bench_classifiers --backends hf,local,mock --concurrency 4
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from benchmarks.common import percentiles, print_table
+from benchmarks.corpus import CORPUS
+from app.config import HF_TOKEN
+from app.services import huggingface_service
+from app.services.classifier_service import get_classifier
+from app.services.huggingface_service import DEFAULT_LABELS
+
+
+async def _run_backend(name: str, concurrency: int) -> Dict:
+    backend = get_classifier(name)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = [0.0] * len(CORPUS)
+    predictions: List[str] = [""] * len(CORPUS)
+
+    async def one(index: int, text: str):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await backend.classify(text, DEFAULT_LABELS)
+            latencies[index] = (time.perf_counter() - start) * 1000
+            predictions[index] = result["category"]
+
+    # Warm up so one-off model loading is not counted
+    await backend.classify(CORPUS[0][0], DEFAULT_LABELS)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i, text) for i, (text, _) in enumerate(CORPUS)])
+    wall = time.perf_counter() - start
+
+    accuracy = sum(p == expected for p, (_, expected) in zip(predictions, CORPUS)) / len(CORPUS)
+    return {
+        "model_id": backend.model_id,
+        "latency": percentiles(latencies),
+        "throughput": len(CORPUS) / wall,
+        "accuracy": accuracy,
+        "predictions": predictions,
+    }
+
+
+async def run(backends: List[str], concurrency: int) -> None:
+    if "hf" in backends and not HF_TOKEN:
+        print("Skipping hf backend: HF_TOKEN is not set")
+        backends = [b for b in backends if b != "hf"]
+
+    results = {}
+    try:
+        for name in backends:
+            results[name] = await _run_backend(name, concurrency)
+    finally:
+        await huggingface_service.close_client()
+
+    reference = results[backends[0]]["predictions"]
+    rows = []
+    for name in backends:
+        r = results[name]
+        agreement = sum(a == b for a, b in zip(r["predictions"], reference)) / len(reference)
+        rows.append((
+            name, r["model_id"], r["latency"]["p50"], r["latency"]["p95"],
+            f"{r['throughput']:.1f}", f"{r['accuracy']:.0%}", f"{agreement:.0%}",
+        ))
+
+    print(f"corpus={len(CORPUS)} texts, labels={len(DEFAULT_LABELS)}, concurrency={concurrency}, "
+          f"reference={backends[0]}")
+    print_table(rows, ("backend", "model", "p50_ms", "p95_ms", "texts/s", "accuracy", "agreement"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="hf,local,mock", help="Comma-separated; the first is the reference")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run([b.strip() for b in args.backends.split(",") if b.strip()], args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Concurrency benchmark for POST /analyze
+Fires N parallel requests at the in-process app with a Gemini SDK stub that
+blocks its thread (like the real generate_content call) for a fixed delay.
+
+With a non-blocking Gemini path, N parallel requests should finish in roughly
+the time of one request rather than N times as long. Every request sends its
+own text and near-duplicate reuse is off, so none is served by the result
+cache, a near-identical text or a coalesced request instead of the stub.
+
+Usage:
+    python -m benchmarks.bench_concurrency --requests 10 --gemini-delay 0.5
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from unittest.mock import MagicMock, patch
+
+from benchmarks.common import Stopwatch, make_client, register_user, setup_database
+
+SAMPLE_TEXT = (
+    "The new artificial intelligence system has revolutionized the way we process data. "
+    "Machine learning algorithms are now capable of analyzing complex patterns."
+)
+
+
+def _blocking_model(delay: float) -> MagicMock:
+    response = MagicMock()
+    response.text = '{"summary": "Benchmark summary.", "tone": "neutre"}'
+
+    def generate_content(prompt, *args, **kwargs):
+        time.sleep(delay)
+        return response
+
+    model = MagicMock()
+    model.generate_content.side_effect = generate_content
+    return model
+
+
+async def _fake_classify(text, candidate_labels=None):
+    await asyncio.sleep(0)
+    return {"category": "technology", "confidence": 0.9, "scores": {"technology": 0.9}, "latency_ms": 0}
+
+
+async def run(requests: int, gemini_delay: float) -> None:
+    setup_database()
+    model = _blocking_model(gemini_delay)
+
+    with patch("google.generativeai.GenerativeModel", return_value=model), \
+            patch("app.services.gemini_service._model", None), \
+            patch("app.routers.analyze.classify_text", side_effect=_fake_classify), \
+            patch("app.routers.analyze.DEDUP_ENABLED", False):
+        async with make_client() as client:
+            headers = await register_user(client, "bench-concurrency@example.com")
+            serial = itertools.count()
+
+            async def one():
+                text = f"{SAMPLE_TEXT} #{next(serial)}"
+                response = await client.post("/analyze/", json={"text": text}, headers=headers)
+                response.raise_for_status()
+
+            # Warm up (model construction, first request overhead)
+            await one()
+
+            with Stopwatch() as single:
+                await one()
+
+            with Stopwatch() as parallel:
+                await asyncio.gather(*[one() for _ in range(requests)])
+
+    if single.elapsed < gemini_delay:
+        raise SystemExit(
+            f"Single request took {single.elapsed:.3f}s, under the {gemini_delay:.3f}s Gemini stub delay: "
+            "requests are no longer reaching the stub"
+        )
+
+    serial_estimate = single.elapsed * requests
+    print(f"Gemini stub delay:       {gemini_delay:.3f}s")
+    print(f"Single request:          {single.elapsed:.3f}s")
+    print(f"Parallel requests ({requests}):  {parallel.elapsed:.3f}s")
+    print(f"Serialized estimate:     {serial_estimate:.3f}s")
+    print(f"Parallel / single:       {parallel.elapsed / single.elapsed:.2f}x (ideal ~1x, blocking ~{requests}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10, help="Number of parallel /analyze calls")
+    parser.add_argument("--gemini-delay", type=float, default=0.5, help="Seconds each Gemini call blocks")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.gemini_delay))
+
+
+if __name__ == "__main__":
+    main()
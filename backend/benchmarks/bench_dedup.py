@@ -0,0 +1,174 @@
+"""
+Near-duplicate index benchmark
+Fills a NearDuplicateIndex with synthetic articles and queries it with
+edited resubmissions and with fresh articles, at several DEDUP_THRESHOLD
+values, reporting:
+
+- memory of the index and the result dicts it holds (tracemalloc), build time
+- fingerprint cost and lookup latency, with the average LSH candidates compared
+- recall per edit type: the resubmission reuses a result (the exact result
+  cache is shown first for comparison)
+- false-reuse rate: a query reuses the result of a text whose word 3-gram
+  Jaccard similarity to it is below --jaccard (exact, computed on the side)
+
+Articles open with a sentence of the classifier corpus (so many share
+their lead), continue with sentences of random corpus words and end with
+the same boilerplate footer. --shared-sentences draws more of the body from
+the 30 corpus sentences instead, an adversarial mix where different
+articles often share most of their text.
+
+Usage:
+    python -m benchmarks.bench_dedup --entries 10000 --queries 400 --thresholds 0.9,0.85,0.8,0.75
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Set
+
+from benchmarks.common import percentiles, print_table
+from benchmarks.corpus import CORPUS
+from app.services.cache_service import make_cache_key
+from app.services.dedup_service import NearDuplicateIndex, text_fingerprint
+from app.utils.text import normalize_text, strip_url_suffixes, tokenize
+
+FOOTER = ("Follow us for more stories like this one, and sign up for the morning newsletter to get "
+          "the day's most important news delivered to your inbox.")
+SENTENCES = [text for text, _ in CORPUS]
+VOCABULARY = sorted({word for text in SENTENCES for word in tokenize(text)})
+CONTEXT = "default"
+
+
+def make_sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(14)).capitalize() + "."
+
+
+def make_article(rng: random.Random, serial: int, shared: int) -> str:
+    """Corpus sentences (1 + shared), random sentences, a tracked link and the shared footer"""
+    body = rng.sample(SENTENCES, 1 + shared) + [make_sentence(rng) for _ in range(4 - shared)]
+    return f"{' '.join(body)} Read more at https://news.example.com/story/{serial} {FOOTER}"
+
+
+def _swap_word(rng: random.Random, text: str, count: int) -> str:
+    words = text.split(" ")
+    for _ in range(count):
+        index = rng.randrange(len(words))
+        words[index] = rng.choice(VOCABULARY)
+    return " ".join(words)
+
+
+EDITS: Dict[str, Callable[[random.Random, str], str]] = {
+    "whitespace": lambda rng, text: text.replace(". ", ".\n\n").replace(" ", "  ", 3),
+    "tracking": lambda rng, text: text.replace(" Follow", "?utm_source=feed&utm_medium=rss#top Follow", 1),
+    "typo": lambda rng, text: _swap_word(rng, text, 1),
+    "3 words": lambda rng, text: _swap_word(rng, text, 3),
+    "new sentence": lambda rng, text: text.replace(" Read more", f" {make_sentence(rng)} Read more", 1),
+}
+
+
+def shingles(text: str) -> Set[str]:
+    tokens = tokenize(strip_url_suffixes(normalize_text(text)))
+    return {" ".join(tokens[i:i + 3]) for i in range(len(tokens) - 2)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def fake_result(rng: random.Random) -> dict:
+    """Result dict of realistic size (summary of ~300 characters)"""
+    return {
+        "category": rng.choice(["technology", "business", "politics", "sports"]),
+        "hf_scores": {label: round(rng.random(), 4) for label in ("technology", "business", "politics", "sports")},
+        "summary": " ".join(rng.choice(VOCABULARY) for _ in range(45)),
+        "tone": rng.choice(["positif", "neutre", "négatif"]),
+    }
+
+
+def run(entries: int, queries: int, thresholds: List[float], min_jaccard: float, shared: int, seed: int) -> None:
+    rng = random.Random(seed)
+    articles = [make_article(rng, serial, shared) for serial in range(entries)]
+
+    started = time.perf_counter()
+    fingerprints = [text_fingerprint(article, min_words=0) for article in articles]
+    fingerprint_us = (time.perf_counter() - started) / entries * 1e6
+
+    sources = [rng.randrange(entries) for _ in range(queries)]
+    edited = {name: [edit(rng, articles[i]) for i in sources] for name, edit in EDITS.items()}
+    fresh = [make_article(rng, entries + serial, shared) for serial in range(queries)]
+    fresh_shingles = [shingles(text) for text in fresh]
+
+    exact_keys = {make_cache_key(article, [], []) for article in articles}
+    exact_row = ["exact cache", "-", "-", "-", "-", "-"]
+    for name in EDITS:
+        hits = sum(make_cache_key(text, [], []) in exact_keys for text in edited[name])
+        exact_row.append(f"{hits / queries:.0%}")
+    rows = [tuple(exact_row + ["0.0%"])]
+
+    for threshold in thresholds:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        index = NearDuplicateIndex(threshold=threshold, max_entries=entries)
+        results = [fake_result(random.Random(position)) for position in range(entries)]
+        started = time.perf_counter()
+        for fingerprint, result in zip(fingerprints, results):
+            index.add(CONTEXT, fingerprint, result)
+        build_ms = (time.perf_counter() - started) * 1000
+        memory_mb = (tracemalloc.get_traced_memory()[0] - before) / 2 ** 20
+        tracemalloc.stop()
+        positions = {id(result): position for position, result in enumerate(results)}
+
+        row = [threshold, index.max_distance, f"{memory_mb:.1f}", f"{build_ms:.0f}"]
+        latencies = []
+        recall = []
+        for name in EDITS:
+            hits = 0
+            for text in edited[name]:
+                fingerprint = text_fingerprint(text, min_words=0)
+                started = time.perf_counter()
+                match = index.lookup(CONTEXT, fingerprint)
+                latencies.append((time.perf_counter() - started) * 1000)
+                hits += match is not None
+            recall.append(f"{hits / queries:.0%}")
+
+        false_reuse = 0
+        for text, text_shingles in zip(fresh, fresh_shingles):
+            fingerprint = text_fingerprint(text, min_words=0)
+            started = time.perf_counter()
+            match = index.lookup(CONTEXT, fingerprint)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if match is not None and jaccard(text_shingles, shingles(articles[positions[id(match[0])]])) < min_jaccard:
+                false_reuse += 1
+
+        stats = index.stats()
+        lookup = percentiles(latencies)
+        rows.append(tuple(
+            row + [f"{lookup['p50'] * 1000:.0f}/{lookup['p99'] * 1000:.0f}", stats["avg_candidates"]]
+            + recall + [f"{false_reuse / queries:.1%}"]
+        ))
+
+    print(f"entries={entries}, queries={queries} per edit type, shared sentences={1 + shared}/5, "
+          f"fingerprint={fingerprint_us:.0f}us/text, false reuse = Jaccard < {min_jaccard}")
+    print_table(
+        rows,
+        ("threshold", "max_bits", "memory_mb", "build_ms", "lookup_p50/p99_us", "candidates",
+         *EDITS, "false_reuse")
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--thresholds", default="0.9,0.85,0.8,0.75", help="Comma-separated DEDUP_THRESHOLD values")
+    parser.add_argument("--jaccard", type=float, default=0.7, help="Reuse below this true similarity counts as false")
+    parser.add_argument("--shared-sentences", type=int, choices=range(0, 5), default=0,
+                        help="Body sentences drawn from the corpus besides the lead")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    thresholds = [float(t) for t in args.thresholds.split(",")]
+    run(args.entries, args.queries, thresholds, args.jaccard, args.shared_sentences, args.seed)
+
+
+if __name__ == "__main__":
+    main()
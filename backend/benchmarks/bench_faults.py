@@ -0,0 +1,142 @@
+"""
+Upstream fault benchmark
+Drives POST /analyze through the real HuggingFace and Gemini services
+(retries, deadlines, limiters) against the simulated upstreams of
+MOCK_UPSTREAMS, under a few seeded fault scenarios. The simulated
+upstreams switch off retry jitter and bypass the circuit breakers, so
+each scenario runs twice with the same seed and the per-request outcomes
+should match: a change in retry or timeout behavior shows up as a change
+in the table rather than as noise.
+
+Reports per scenario: share of 200s, p50/p95 latency, upstream attempts,
+retries and the injected faults.
+
+Usage:
+    python -m benchmarks.bench_faults --requests 200 --concurrency 8
+"""
+import os
+
+# Must be set before the app is imported (benchmarks.common imports it)
+os.environ["MOCK_UPSTREAMS"] = "true"
+os.environ["MOCK_MODE"] = "false"
+
+import argparse
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+from unittest.mock import patch
+
+from benchmarks.common import make_client, percentiles, print_table, register_user, setup_database
+from app.routers.analyze import analysis_flight
+from app.services.cache_service import result_cache
+from app.services.huggingface_service import hf_breaker, hf_limiter
+from app.services.gemini_service import gemini_breaker, gemini_limiter
+from app.services.mock_service import mock_engine
+from app.utils.metrics import UPSTREAM_RETRIES, registry
+from app.utils.retry import retry_budget
+
+# Every injected fault logs a warning; the table is the output
+logging.getLogger("app").setLevel(logging.ERROR)
+
+SCENARIOS = [
+    ("clean", {}),
+    ("hf loading 20%", {"hf_loading_rate": 0.2}),
+    ("hf timeout 5%", {"hf_timeout_rate": 0.05}),
+    ("gemini timeout 5%", {"gemini_timeout_rate": 0.05}),
+    ("gemini parse 10%", {"gemini_parse_error_rate": 0.1}),
+    ("mixed", {"hf_loading_rate": 0.1, "hf_timeout_rate": 0.02, "gemini_timeout_rate": 0.02, "gemini_parse_error_rate": 0.05}),
+]
+
+NO_FAULTS = {"hf_loading_rate": 0, "hf_timeout_rate": 0, "gemini_timeout_rate": 0, "gemini_parse_error_rate": 0}
+
+
+def _reset_state() -> None:
+    result_cache.clear()
+    analysis_flight.reset()
+    retry_budget.reset()
+    for guard in (hf_limiter, gemini_limiter, hf_breaker, gemini_breaker):
+        guard.reset()
+    registry.reset()
+
+
+async def _run_scenario(client, headers, faults: dict, args) -> dict:
+    _reset_state()
+    mock_engine.configure(seed=args.seed, **{**NO_FAULTS, **faults})
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+    outcomes = [None] * args.requests
+    samples = []
+
+    async def worker():
+        while not queue.empty():
+            i = queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.post(
+                "/analyze/", json={"text": f"Fault benchmark document {i} about markets and policy"}, headers=headers
+            )
+            samples.append((time.perf_counter() - start) * 1000)
+            outcomes[i] = response.status_code
+
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    stats = mock_engine.stats()
+    return {
+        "outcomes": outcomes,
+        "latency": percentiles(samples),
+        "calls": stats["calls"],
+        "faults": sum(stats["faults"].values()),
+        "retries": sum(UPSTREAM_RETRIES.labels(upstream=name).value for name in ("huggingface", "gemini")),
+    }
+
+
+async def run(args) -> None:
+    setup_database()
+    rows = []
+    async with make_client() as client:
+        headers = await register_user(client, "bench-faults@example.com")
+        with ExitStack() as stack:
+            for target in ("app.services.huggingface_service.TIMEOUT_SECONDS", "app.services.gemini_service.TIMEOUT_SECONDS"):
+                stack.enter_context(patch(target, args.attempt_timeout))
+            mock_engine.configure(
+                hf_latency=args.hf_latency, gemini_latency=args.gemini_latency, hf_loading_estimated_s=0.2
+            )
+            for label, faults in SCENARIOS:
+                first = await _run_scenario(client, headers, faults, args)
+                second = await _run_scenario(client, headers, faults, args)
+                ok = Counter(first["outcomes"])[200] / args.requests
+                rows.append((
+                    label,
+                    f"{ok:.1%}",
+                    first["latency"]["p50"],
+                    first["latency"]["p95"],
+                    first["calls"]["huggingface"],
+                    first["calls"]["gemini"],
+                    int(first["retries"]),
+                    first["faults"],
+                    "yes" if first["outcomes"] == second["outcomes"] and first["calls"] == second["calls"] else "NO",
+                ))
+    mock_engine.reset()
+
+    print(
+        f"POST /analyze x{args.requests}, {args.concurrency} concurrent, seed {args.seed}, "
+        f"attempt timeout {args.attempt_timeout}s (HF {args.hf_latency}, Gemini {args.gemini_latency})"
+    )
+    print_table(rows, ("scenario", "ok", "p50_ms", "p95_ms", "hf_calls", "gemini_calls", "retries", "faults", "repeatable"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--attempt-timeout", type=float, default=1.0, help="Per-attempt upstream timeout in seconds")
+    parser.add_argument("--hf-latency", default="lognormal:median=40,sigma=0.4")
+    parser.add_argument("--gemini-latency", default="lognormal:median=80,sigma=0.4")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Gemini answer parsing benchmark
+Microseconds per parse of typical answer shapes with the lenient free-form
+parser (_parse_gemini_response: regex search, then line heuristics) and the
+JSON mode parser (_parse_json_response: json.loads, then one repair pass),
+and what each makes of the answer:
+- ok: the expected summary and tone
+- wrong: a result, but not the expected one (e.g. half a JSON object kept
+  as the summary)
+- retry: GeminiParseError, which costs another Gemini call
+
+Usage:
+    python -m benchmarks.bench_gemini_parse --ops 50000
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import print_table
+from app.services.gemini_service import GeminiParseError, _parse_gemini_response, _parse_json_response
+
+SUMMARY = (
+    "The central bank kept its key rate unchanged, citing easing inflation and a resilient labor market, "
+    "while signalling that cuts could come later this year if price growth keeps slowing toward its target."
+)
+TONE = "neutre"
+ANSWER = json.dumps({"summary": SUMMARY, "tone": TONE}, ensure_ascii=False)
+
+SHAPES = [
+    ("bare JSON (structured output)", ANSWER),
+    ("JSON in a code fence", f"```json\n{ANSWER}\n```"),
+    ("JSON after a preamble", f"Here is the analysis you asked for:\n{ANSWER}"),
+    ("trailing comma", ANSWER[:-1] + ",\n}"),
+    ("Summary:/Tone: lines", f"Summary: {SUMMARY}\nTone: {TONE}"),
+    ("truncated JSON", ANSWER[:len(ANSWER) // 2]),
+]
+
+
+def _us_per_op(fn, text: str, ops: int) -> float:
+    start = time.perf_counter()
+    for _ in range(ops):
+        try:
+            fn(text)
+        except GeminiParseError:
+            pass
+    return round((time.perf_counter() - start) / ops * 1e6, 2)
+
+
+def _outcome(fn, text: str) -> str:
+    try:
+        result = fn(text)
+    except GeminiParseError:
+        return "retry"
+    return "ok" if result["summary"] == SUMMARY and result["tone"] == TONE else "wrong"
+
+
+def run(ops: int) -> None:
+    rows = []
+    for label, text in SHAPES:
+        rows.append((
+            label,
+            _us_per_op(_parse_gemini_response, text, ops),
+            _outcome(_parse_gemini_response, text),
+            _us_per_op(_parse_json_response, text, ops),
+            _outcome(_parse_json_response, text),
+        ))
+    print(f"{ops} parses per cell, {len(ANSWER)}-character answer")
+    print_table(rows, ("answer", "lenient_us", "lenient", "json_mode_us", "json_mode"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=50000)
+    args = parser.parse_args()
+    run(args.ops)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+HuggingFace connection pooling benchmark
+Compares a fresh httpx.AsyncClient per request (the old behaviour) with the
+shared pooled client used by classify_text.
+
+By default it starts a local HTTP server that adds --connect-delay to every
+new connection, standing in for the TCP+TLS handshake to router.huggingface.co.
+Pass --url to measure against a real endpoint instead.
+
+Usage:
+    python -m benchmarks.bench_hf_pool --requests 200 --concurrency 20 --connect-delay 0.08
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List, Optional
+from unittest.mock import patch
+
+import httpx
+
+from benchmarks.common import percentiles, print_table
+from app.services import huggingface_service
+
+RESPONSE_BODY = json.dumps([
+    {"label": "technology", "score": 0.91},
+    {"label": "business", "score": 0.09},
+]).encode()
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, connect_delay: float):
+    await asyncio.sleep(connect_delay)  # simulated handshake, paid once per connection
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.decode("latin-1").split("\r\n"):
+                if line.lower().startswith("content-length:"):
+                    length = int(line.split(":", 1)[1])
+            if length:
+                await reader.readexactly(length)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(RESPONSE_BODY)}\r\n\r\n".encode()
+                + RESPONSE_BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _drive(call, requests: int, concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            samples.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*[one() for _ in range(requests)])
+    return samples
+
+
+async def run(requests: int, concurrency: int, connect_delay: float, url: Optional[str]) -> None:
+    server = None
+    if url is None:
+        server = await asyncio.start_server(
+            lambda r, w: _handle_connection(r, w, connect_delay), "127.0.0.1", 0
+        )
+        port = server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}/models/facebook/bart-large-mnli"
+
+    payload = {"inputs": "benchmark text", "parameters": {"candidate_labels": ["technology", "business"]}}
+
+    async def fresh_client_call():
+        async with httpx.AsyncClient(timeout=30) as client:
+            await client.post(url, json=payload)
+
+    async def shared_client_call():
+        await huggingface_service.classify_text("benchmark text", ["technology", "business"])
+
+    with patch.object(huggingface_service, "HF_API_URL", url), \
+            patch.object(huggingface_service, "HF_TOKEN", huggingface_service.HF_TOKEN or "bench-token"):
+        fresh = await _drive(fresh_client_call, requests, concurrency)
+        await huggingface_service.start_client()
+        try:
+            shared = await _drive(shared_client_call, requests, concurrency)
+            stats = huggingface_service.pool_stats()
+        finally:
+            await huggingface_service.close_client()
+
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+    fresh_p, shared_p = percentiles(fresh), percentiles(shared)
+    rows = [
+        ("fresh client per request", fresh_p["mean"], fresh_p["p50"], fresh_p["p95"], fresh_p["p99"]),
+        ("shared pooled client", shared_p["mean"], shared_p["p50"], shared_p["p95"], shared_p["p99"]),
+    ]
+    print(f"target={url} requests={requests} concurrency={concurrency}")
+    print_table(rows, ("mode", "mean_ms", "p50_ms", "p95_ms", "p99_ms"))
+    print(f"\nMean latency saved per request: {fresh_p['mean'] - shared_p['mean']:.2f}ms")
+    print(f"Pool stats after run: {stats}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--connect-delay", type=float, default=0.08, help="Simulated handshake seconds (local server)")
+    parser.add_argument("--url", default=None, help="Benchmark a real endpoint instead of the local server")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.connect_delay, args.url))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Analysis history benchmark
+Seeds one user with a long history and compares page latency of the
+keyset query behind /analyze/history with the equivalent LIMIT/OFFSET
+query, at the start, middle and end of the history. Also compares the
+per-request cost of queueing a row in the write-behind buffer with an
+inline INSERT + COMMIT.
+
+Usage:
+    python -m benchmarks.bench_history --rows 200000 --page-size 20
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from sqlalchemy import insert, select
+
+from benchmarks.common import BenchAsyncSessionLocal, engine, percentiles, print_table, setup_database
+from app.models.analysis import Analysis
+from app.services.history_service import HistoryWriter, list_history
+
+USER_ID = 1
+
+
+def _row(i: int, user_id: int = USER_ID) -> dict:
+    return {
+        "user_id": user_id,
+        "text_hash": f"{i:064x}",
+        "category": ("technology", "business", "sports", "health")[i % 4],
+        "hf_scores": {"technology": 0.9, "business": 0.1},
+        "summary": "A short summary of the analyzed text.",
+        "tone": "neutre",
+        "hf_latency_ms": 400,
+        "gemini_latency_ms": 800,
+        "total_execution_ms": 1250,
+        "cached": False,
+    }
+
+
+def seed(rows: int) -> None:
+    """rows analyses for USER_ID, interleaved with other users' rows"""
+    chunk = 10000
+    with engine.begin() as conn:
+        for start in range(0, rows, chunk):
+            batch = []
+            for i in range(start, min(rows, start + chunk)):
+                batch.append(_row(i))
+                batch.append(_row(i, user_id=2 + i % 50))
+            conn.execute(insert(Analysis), batch)
+
+
+async def _time(fn, repeats: int) -> float:
+    samples: List[float] = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)["p50"]
+
+
+async def run(rows: int, page_size: int, repeats: int) -> None:
+    setup_database()
+    print(f"seeding {rows} rows for one user (+{rows} for others)...")
+    seed(rows)
+
+    async with BenchAsyncSessionLocal() as db:
+        newest = (await db.execute(
+            select(Analysis.id).where(Analysis.user_id == USER_ID).order_by(Analysis.id.desc()).limit(1)
+        )).scalar()
+        ids = [r for r in (await db.execute(
+            select(Analysis.id).where(Analysis.user_id == USER_ID).order_by(Analysis.id.desc())
+        )).scalars()]
+
+        result_rows = []
+        for label, offset in (("first", 0), ("middle", rows // 2), ("last", rows - page_size)):
+            cursor = None if offset == 0 else ids[offset - 1]
+
+            async def keyset():
+                await list_history(db, USER_ID, page_size, cursor)
+
+            async def offset_page():
+                query = (
+                    select(Analysis).where(Analysis.user_id == USER_ID)
+                    .order_by(Analysis.id.desc()).offset(offset).limit(page_size)
+                )
+                list((await db.execute(query)).scalars())
+
+            result_rows.append((label, offset, await _time(keyset, repeats), await _time(offset_page, repeats)))
+
+    print(f"rows={rows}, page_size={page_size}, newest_id={newest}")
+    print_table(result_rows, ("page", "offset", "keyset_p50_ms", "offset_p50_ms"))
+
+    # Request-path cost of persisting one result
+    writer = HistoryWriter(BenchAsyncSessionLocal, batch_size=100, flush_interval=60, max_buffer=100000)
+    count = 500
+
+    start = time.perf_counter()
+    for i in range(count):
+        writer.record(_row(i))
+    record_us = (time.perf_counter() - start) / count * 1e6
+    start = time.perf_counter()
+    await writer.flush()
+    flush_ms = (time.perf_counter() - start) * 1000
+
+    async def inline_insert():
+        async with BenchAsyncSessionLocal() as db:
+            await db.execute(insert(Analysis), [_row(0)])
+            await db.commit()
+
+    inline_ms = await _time(inline_insert, 100)
+    print()
+    print_table(
+        [("write-behind record()", f"{record_us:.1f} us"), ("inline INSERT+COMMIT", f"{inline_ms} ms"),
+         (f"background flush of {count}", f"{flush_ms:.1f} ms")],
+        ("request path", "cost per row")
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.page_size, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
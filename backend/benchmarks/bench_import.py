@@ -0,0 +1,106 @@
+"""
+Cold start benchmark
+Imports the app in fresh interpreters (what a serverless cold start pays
+before the first request) and reports:
+- wall time of "import app.main" (median over --runs fresh processes)
+- the slowest modules by cumulative import time, from python -X importtime,
+  grouped by top-level package and listed individually for app.*
+- which heavy optional packages got imported at all
+
+Usage:
+    python -m benchmarks.bench_import --runs 5 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Imported lazily by the app; they should only show up once a request needs them
+WATCHED = ("google.generativeai", "google.api_core", "grpc", "psycopg2", "asyncpg", "aiosqlite", "transformers")
+
+_TIMED_IMPORT = (
+    "import time, sys; start = time.perf_counter(); import app.main; "
+    "elapsed = time.perf_counter() - start; "
+    "print(elapsed, ','.join(name for name in {watched!r} if name in sys.modules))"
+)
+
+
+def print_table(rows: List[Tuple], headers: Tuple) -> None:
+    """Same layout as benchmarks.common.print_table, which would import the app into this process"""
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    line = "  ".join(str(h).ljust(w) for h, w in zip(headers, widths))
+    print(line)
+    print("-" * len(line))
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    env["PYTHONWARNINGS"] = "ignore"
+    return env
+
+
+def _timed_import() -> Tuple[float, List[str]]:
+    out = subprocess.run(
+        [sys.executable, "-c", _TIMED_IMPORT.format(watched=WATCHED)],
+        capture_output=True, text=True, env=_env(), check=True,
+    ).stdout.strip().splitlines()[-1]
+    elapsed, loaded = out.split(" ", 1) if " " in out else (out, "")
+    return float(elapsed) * 1000, [name for name in loaded.split(",") if name]
+
+
+def _importtime() -> List[Tuple[str, float, float]]:
+    """(module, self_ms, cumulative_ms) for every module imported by app.main"""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, env=_env(), check=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((name, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return rows
+
+
+def run(runs: int, top: int) -> None:
+    samples = []
+    loaded: List[str] = []
+    for _ in range(runs):
+        elapsed, loaded = _timed_import()
+        samples.append(elapsed)
+    print(
+        f"import app.main: median {statistics.median(samples):.0f} ms "
+        f"(min {min(samples):.0f}, max {max(samples):.0f}, {runs} fresh processes)"
+    )
+    print(f"heavy packages loaded at import: {', '.join(loaded) or 'none'}\n")
+
+    rows = _importtime()
+    by_package: Dict[str, float] = defaultdict(float)
+    for name, self_ms, _ in rows:
+        by_package[name.split(".")[0]] += self_ms
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    print_table([(name, round(ms, 1)) for name, ms in packages], ("package", "self_ms (summed)"))
+    print()
+
+    app_modules = sorted((row for row in rows if row[0].split(".")[0] == "app"), key=lambda row: row[2], reverse=True)[:top]
+    print_table([(name, round(self_ms, 1), round(cum_ms, 1)) for name, self_ms, cum_ms in app_modules],
+                ("app module", "self_ms", "cumulative_ms"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    run(args.runs, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Two-stage classification benchmark
+Runs classify_text over the fixed corpus with every label (the reference)
+and with the label pre-filter at several LABEL_PREFILTER_TOP_K values, and
+reports latency, labels sent per request, top-1 agreement with the
+full-label path, accuracy against the corpus labels and the pre-filter's
+own cost.
+
+--upstream hf calls the real inference API (needs HF_TOKEN and network
+access). The default stub answers like BART-MNLI would cost-wise: a fixed
+overhead plus one NLI pass per label sent (STUB_BASE_MS + STUB_MS_PER_LABEL
+x labels), ranking the corpus label first when it was sent. With the stub,
+agreement therefore measures how often the pre-filter keeps the label the
+full path would pick.
+
+Usage:
+    python -m benchmarks.bench_label_prefilter --top-k 1,2,3,5 --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+from unittest.mock import patch
+
+import httpx
+
+from benchmarks.common import percentiles, print_table
+from benchmarks.corpus import CORPUS
+from app.config import HF_TOKEN
+from app.services import huggingface_service
+from app.services.huggingface_service import DEFAULT_LABELS, classify_text
+from app.services.label_prefilter import label_prefilter
+
+STUB_BASE_MS = 60
+STUB_MS_PER_LABEL = 35
+
+_EXPECTED = dict(CORPUS)
+
+
+async def _stub_nli(request: httpx.Request) -> httpx.Response:
+    payload = json.loads(request.content)
+    text, labels = payload["inputs"], payload["parameters"]["candidate_labels"]
+    await asyncio.sleep((STUB_BASE_MS + STUB_MS_PER_LABEL * len(labels)) / 1000)
+    rng = random.Random(text)
+    expected = _EXPECTED.get(text)
+    ranked = sorted(labels, key=lambda label: (label != expected, rng.random()))
+    weights = [0.5 ** i for i in range(len(ranked))]
+    total = sum(weights)
+    return httpx.Response(200, json=[{"label": label, "score": w / total} for label, w in zip(ranked, weights)])
+
+
+async def _run(top_k: int, concurrency: int) -> Dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = [0.0] * len(CORPUS)
+    predictions: List[str] = [""] * len(CORPUS)
+    sent: List[int] = [0] * len(CORPUS)
+
+    async def one(index: int, text: str):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await classify_text(text, DEFAULT_LABELS)
+            latencies[index] = (time.perf_counter() - start) * 1000
+            predictions[index] = result["category"]
+            sent[index] = len(DEFAULT_LABELS) - len(result.get("pruned_labels", []))
+
+    with patch("app.services.huggingface_service.LABEL_PREFILTER_TOP_K", top_k):
+        await asyncio.gather(*[one(i, text) for i, (text, _) in enumerate(CORPUS)])
+
+    return {
+        "latency": percentiles(latencies),
+        "labels_sent": sum(sent) / len(sent),
+        "accuracy": sum(p == expected for p, (_, expected) in zip(predictions, CORPUS)) / len(CORPUS),
+        "predictions": predictions,
+    }
+
+
+def _prefilter_us(top_k: int, rounds: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text, _ in CORPUS:
+            label_prefilter.select(text, DEFAULT_LABELS, top_k)
+    return round((time.perf_counter() - start) / (rounds * len(CORPUS)) * 1e6, 1)
+
+
+async def run(upstream: str, top_ks: List[int], concurrency: int) -> None:
+    if upstream == "hf" and not HF_TOKEN:
+        print("HF_TOKEN is not set; using the stub upstream")
+        upstream = "stub"
+    if upstream == "stub":
+        huggingface_service._client = httpx.AsyncClient(transport=httpx.MockTransport(_stub_nli))
+
+    results = {}
+    try:
+        for top_k in [0] + top_ks:
+            results[top_k] = await _run(top_k, concurrency)
+    finally:
+        await huggingface_service.close_client()
+
+    reference = results[0]["predictions"]
+    rows = []
+    for top_k, r in results.items():
+        agreement = sum(a == b for a, b in zip(r["predictions"], reference)) / len(reference)
+        rows.append((
+            top_k or "all", f"{r['labels_sent']:.1f}", r["latency"]["p50"], r["latency"]["p95"],
+            f"{agreement:.0%}", f"{r['accuracy']:.0%}", _prefilter_us(top_k) if top_k else "-",
+        ))
+
+    cost = f" ({STUB_BASE_MS} ms + {STUB_MS_PER_LABEL} ms/label)" if upstream == "stub" else ""
+    print(f"corpus={len(CORPUS)} texts, labels={len(DEFAULT_LABELS)}, concurrency={concurrency}, upstream={upstream}{cost}")
+    print_table(rows, ("top_k", "labels_sent", "p50_ms", "p95_ms", "agreement", "accuracy", "prefilter_us"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--upstream", choices=("stub", "hf"), default="stub")
+    parser.add_argument("--top-k", default="1,2,3,5", help="Comma-separated LABEL_PREFILTER_TOP_K values")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    top_ks = [int(value) for value in args.top_k.split(",") if value.strip()]
+    asyncio.run(run(args.upstream, top_ks, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
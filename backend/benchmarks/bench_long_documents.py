@@ -0,0 +1,137 @@
+"""
+Long document benchmark
+POST /analyze on documents of growing size, single-call pipeline versus
+the map-reduce pipeline at several CHUNK_CONCURRENCY values.
+
+Upstreams are stubbed with a size-dependent latency model so the numbers
+reflect the pipeline's shape, not network noise:
+- classification: HF_BASE_MS + HF_MS_PER_TOKEN per input token, input
+  truncated at 1024 tokens like BART-MNLI
+- summarization: GEMINI_BASE_MS + GEMINI_MS_PER_TOKEN per prompt token
+
+Reports per document size and mode: latency, chunks, upstream calls, peak
+calls in flight, and the peak Python memory allocated during the request
+(tracemalloc, measured in a separate pass).
+
+Usage:
+    python -m benchmarks.bench_long_documents --sizes 500,2000,8000,32000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from contextlib import ExitStack
+from unittest.mock import patch
+
+from benchmarks.common import make_client, print_table, register_user, setup_database
+from benchmarks.corpus import CORPUS
+from app.routers.analyze import analysis_flight
+from app.services.cache_service import result_cache
+from app.config import CHUNK_MAX_TOKENS
+from app.utils.text import chunk_text, estimate_tokens
+
+HF_BASE_MS = 80
+HF_MS_PER_TOKEN = 0.1
+BART_MAX_TOKENS = 1024
+GEMINI_BASE_MS = 400
+GEMINI_MS_PER_TOKEN = 0.4
+
+
+async def _fake_classify(text, candidate_labels=None):
+    tokens = min(estimate_tokens(text), BART_MAX_TOKENS)
+    await asyncio.sleep((HF_BASE_MS + HF_MS_PER_TOKEN * tokens) / 1000)
+    return {"category": "business", "confidence": 0.7, "scores": {"business": 0.7, "politics": 0.3}, "latency_ms": 0}
+
+
+async def _fake_summarize(text, category=None, candidate_labels=None):
+    await asyncio.sleep((GEMINI_BASE_MS + GEMINI_MS_PER_TOKEN * estimate_tokens(text)) / 1000)
+    return {"summary": "A concise summary of this part of the document in two or three sentences. " * 2,
+            "tone": "neutre", "latency_ms": 0}
+
+
+def _document(tokens: int) -> str:
+    """Corpus paragraphs repeated up to about this many estimated tokens"""
+    paragraphs = [" ".join(text for text, _ in CORPUS[i:i + 3]) for i in range(0, len(CORPUS), 3)]
+    out, used, i = [], 0, 0
+    while used < tokens:
+        paragraph = paragraphs[i % len(paragraphs)]
+        out.append(paragraph)
+        used += estimate_tokens(paragraph)
+        i += 1
+    return "\n\n".join(out)
+
+
+async def _measure(client, headers, text: str, memory: bool) -> dict:
+    result_cache.clear()
+    analysis_flight.reset()
+    if memory:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    response = await client.post("/analyze/", json={"text": text}, headers=headers)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    response.raise_for_status()
+    out = {"ms": round(elapsed_ms), "meta": response.json()["meta"]}
+    if memory:
+        out["peak_kib"] = round((tracemalloc.get_traced_memory()[1] - before) / 1024)
+    return out
+
+
+async def run(sizes, concurrencies) -> None:
+    setup_database()
+    modes = [("single call", False, None)] + [(f"map-reduce x{c}", True, c) for c in concurrencies]
+    rows = []
+    async with make_client() as client:
+        headers = await register_user(client, "bench-long@example.com")
+        with patch("app.routers.analyze.classify_text", side_effect=_fake_classify), \
+                patch("app.routers.analyze.analyze_text", side_effect=_fake_summarize):
+            for size in sizes:
+                text = _document(size)
+                start = time.perf_counter()
+                chunk_text(text, CHUNK_MAX_TOKENS)
+                split_ms = (time.perf_counter() - start) * 1000
+                for label, enabled, concurrency in modes:
+                    with ExitStack() as stack:
+                        stack.enter_context(patch("app.routers.analyze.LONG_DOC_ENABLED", enabled))
+                        if concurrency:
+                            stack.enter_context(patch("app.routers.analyze.CHUNK_CONCURRENCY", concurrency))
+                        timed = await _measure(client, headers, text, memory=False)
+                        tracemalloc.start()
+                        try:
+                            traced = await _measure(client, headers, text, memory=True)
+                        finally:
+                            tracemalloc.stop()
+                    chunking = timed["meta"]["chunking"] or {}
+                    rows.append((
+                        estimate_tokens(text),
+                        len(text),
+                        label,
+                        timed["ms"],
+                        chunking.get("chunks", 1),
+                        chunking.get("upstream_calls", 2),
+                        chunking.get("peak_in_flight", 1),
+                        chunking.get("reduce_levels", 0),
+                        traced["peak_kib"],
+                        round(split_ms, 1) if enabled else "-",
+                    ))
+
+    print(
+        f"Stubbed upstreams: HF {HF_BASE_MS} ms + {HF_MS_PER_TOKEN} ms/token (truncated at {BART_MAX_TOKENS}), "
+        f"Gemini {GEMINI_BASE_MS} ms + {GEMINI_MS_PER_TOKEN} ms/token"
+    )
+    print_table(rows, ("tokens", "chars", "mode", "total_ms", "chunks", "calls", "peak_in_flight",
+                       "reduce_levels", "peak_mem_kib", "split_ms"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="500,2000,8000,32000", help="Document sizes in estimated tokens")
+    parser.add_argument("--concurrency", default="1,4,8", help="CHUNK_CONCURRENCY values to compare")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    concurrencies = [int(value) for value in args.concurrency.split(",")]
+    asyncio.run(run(sizes, concurrencies))
+
+
+if __name__ == "__main__":
+    main()
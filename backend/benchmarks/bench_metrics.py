@@ -0,0 +1,100 @@
+"""
+Metrics overhead benchmark
+Measures the hot-path cost of the instrumentation: nanoseconds per counter
+increment, histogram observation and timer block, then the p50/p95 latency
+of POST /analyze (stubbed upstreams, so the instrumentation is a large share
+of the request) with METRICS_ENABLED on and off, and the cost of a scrape.
+
+Usage:
+    python -m benchmarks.bench_metrics --ops 200000 --requests 2000
+"""
+import argparse
+import asyncio
+import time
+from unittest.mock import patch
+
+from benchmarks.common import make_client, percentiles, print_table, register_user, setup_database
+from app.utils.metrics import ERRORS, HF_DURATION, STAGE_DURATION, registry
+
+
+async def _fake_classify(text, candidate_labels=None):
+    return {"category": "technology", "confidence": 0.9, "scores": {"technology": 0.9}, "latency_ms": 0}
+
+
+async def _fake_summarize(text, category=None):
+    return {"summary": "Benchmark summary.", "tone": "neutre", "latency_ms": 0}
+
+
+def _ns_per_op(fn, ops: int) -> float:
+    start = time.perf_counter()
+    for _ in range(ops):
+        fn()
+    return round((time.perf_counter() - start) / ops * 1e9, 1)
+
+
+def micro(ops: int) -> None:
+    counter = ERRORS.labels(type="BenchError")
+
+    def timed():
+        with HF_DURATION.time():
+            pass
+
+    rows = [
+        ("baseline (empty call)", _ns_per_op(lambda: None, ops)),
+        ("counter.inc() bound child", _ns_per_op(counter.inc, ops)),
+        ("histogram.observe() bound child", _ns_per_op(lambda: HF_DURATION.observe(0.042), ops)),
+        ("histogram.labels(...).observe()", _ns_per_op(lambda: STAGE_DURATION.labels(stage="hf").observe(0.042), ops)),
+        ("with histogram.time()", _ns_per_op(timed, ops)),
+    ]
+    print_table(rows, ("operation", "ns/op"))
+
+
+async def _analyze_latencies(client, headers, requests: int, offset: int) -> dict:
+    samples = []
+    for i in range(requests):
+        start = time.perf_counter()
+        response = await client.post(
+            "/analyze/", json={"text": f"Benchmark text number {offset + i} about markets"}, headers=headers
+        )
+        response.raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+async def end_to_end(requests: int) -> None:
+    setup_database()
+    rows = []
+    async with make_client() as client:
+        headers = await register_user(client, "bench-metrics@example.com")
+        with patch("app.routers.analyze.classify_text", side_effect=_fake_classify), \
+                patch("app.routers.analyze.analyze_text", side_effect=_fake_summarize):
+            await _analyze_latencies(client, headers, 50, -100)  # warm up
+            for enabled in (False, True, False, True):
+                with patch("app.utils.metrics.METRICS_ENABLED", enabled):
+                    r = await _analyze_latencies(client, headers, requests, len(rows) * requests)
+                rows.append(("on" if enabled else "off", r["p50"], r["p95"], r["mean"]))
+
+            scrape = []
+            for _ in range(50):
+                start = time.perf_counter()
+                (await client.get("/metrics")).raise_for_status()
+                scrape.append((time.perf_counter() - start) * 1000)
+
+    print(f"POST /analyze x{requests} per run (stubbed upstreams)")
+    print_table(rows, ("metrics", "p50_ms", "p95_ms", "mean_ms"))
+    series = sum(1 for line in registry.render().splitlines() if not line.startswith("#"))
+    print(f"\nGET /metrics: p50 {percentiles(scrape)['p50']} ms for {series} series")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    micro(args.ops)
+    print()
+    asyncio.run(end_to_end(args.requests))
+
+
+if __name__ == "__main__":
+    main()
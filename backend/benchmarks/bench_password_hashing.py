@@ -0,0 +1,123 @@
+"""
+Login burst benchmark for the password hashing executor
+Fires a burst of concurrent logins and, at the same time, pings a cheap
+sync endpoint that needs a threadpool worker. Shows login throughput and
+how much the burst delays the unrelated endpoint.
+
+Modes:
+- legacy:  sync def login with bcrypt inline, as before (runs on, and
+           saturates, the shared threadpool)
+- inline / thread / process: the async login route with the password
+           hasher on that executor kind
+
+Usage:
+    python -m benchmarks.bench_password_hashing --logins 64 --bcrypt-rounds 10 --workers 4
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+import httpx
+
+from benchmarks.common import (
+    BenchSessionLocal, percentiles, print_table, setup_database,
+    _override_get_db, _override_get_async_db,
+)
+from app.schemas.user_schema import UserLogin
+from app.services.auth_service import create_user, authenticate_user, authenticate_user_async
+from app.utils.security import pwd_ctx
+from app.utils.password_hasher import password_hasher
+
+MODES = ("legacy", "inline", "thread", "process")
+
+
+def build_probe_app() -> FastAPI:
+    probe = FastAPI()
+
+    @probe.post("/legacy/login")
+    def legacy_login(payload: UserLogin, db: Session = Depends(_override_get_db)):
+        if not authenticate_user(db, payload.email, payload.password):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        return {"ok": True}
+
+    @probe.post("/login")
+    async def login(payload: UserLogin, db: AsyncSession = Depends(_override_get_async_db)):
+        if not await authenticate_user_async(db, payload.email, payload.password):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        return {"ok": True}
+
+    @probe.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    return probe
+
+
+async def _burst(client: httpx.AsyncClient, path: str, credentials: dict, logins: int) -> dict:
+    ping_ms: List[float] = []
+    done = asyncio.Event()
+
+    async def pinger():
+        while not done.is_set():
+            start = time.perf_counter()
+            (await client.get("/ping")).raise_for_status()
+            ping_ms.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.005)
+
+    async def one_login():
+        (await client.post(path, json=credentials)).raise_for_status()
+
+    ping_task = asyncio.create_task(pinger())
+    start = time.perf_counter()
+    await asyncio.gather(*[one_login() for _ in range(logins)])
+    wall = time.perf_counter() - start
+    done.set()
+    await ping_task
+    return {"throughput": logins / wall, "ping": percentiles(ping_ms)}
+
+
+async def run(logins: int, bcrypt_rounds: int, workers: int) -> None:
+    pwd_ctx.update(bcrypt__rounds=bcrypt_rounds, bcrypt__min_rounds=bcrypt_rounds, bcrypt__max_rounds=bcrypt_rounds)
+    setup_database()
+    credentials = {"email": "bench-hash@example.com", "password": "benchpassword123"}
+    db = BenchSessionLocal()
+    create_user(db, credentials["email"], credentials["password"])
+    db.close()
+
+    transport = httpx.ASGITransport(app=build_probe_app())
+    rows = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        for mode in MODES:
+            if mode != "legacy":
+                password_hasher.shutdown()
+                password_hasher.kind, password_hasher.workers, password_hasher.rounds = mode, workers, bcrypt_rounds
+                password_hasher.reset_stats()
+                password_hasher.start()
+            path = "/legacy/login" if mode == "legacy" else "/login"
+            await _burst(client, path, credentials, min(logins, 8))  # warm up
+            password_hasher.reset_stats()
+
+            r = await _burst(client, path, credentials, logins)
+            queue = password_hasher.stats()["queue_ms_p95"] if mode != "legacy" else "-"
+            rows.append((mode, f"{r['throughput']:.1f}", r["ping"]["p50"], r["ping"]["p95"], r["ping"]["p99"], queue))
+
+    password_hasher.shutdown()
+    print(f"logins={logins}, bcrypt_rounds={bcrypt_rounds}, workers={workers}")
+    print_table(rows, ("mode", "logins/s", "ping_p50_ms", "ping_p95_ms", "ping_p99_ms", "hash_queue_p95_ms"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args.logins, args.bcrypt_rounds, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Tracing overhead benchmark
+p50/p95 latency of POST /analyze with stubbed upstreams (so tracing is a
+large share of the request) with tracing off, on, on with ?verbose=true and
+on with the JSONL exporter writing to a temp file.
+
+Usage:
+    python -m benchmarks.bench_tracing --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+from benchmarks.common import make_client, percentiles, print_table, register_user, setup_database
+from app.utils.tracing import JsonlSpanExporter
+
+
+async def _fake_classify(text, candidate_labels=None):
+    return {"category": "technology", "confidence": 0.9, "scores": {"technology": 0.9}, "latency_ms": 0}
+
+
+async def _fake_summarize(text, category=None):
+    return {"summary": "Benchmark summary.", "tone": "neutre", "latency_ms": 0}
+
+
+async def _latencies(client, headers, requests: int, offset: int, path: str) -> dict:
+    samples = []
+    for i in range(requests):
+        start = time.perf_counter()
+        response = await client.post(
+            path, json={"text": f"Benchmark text number {offset + i} about markets"}, headers=headers
+        )
+        response.raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+async def run(requests: int) -> None:
+    setup_database()
+    export_path = os.path.join(tempfile.mkdtemp(), "spans.jsonl")
+    exporter = JsonlSpanExporter(export_path)
+    modes = [
+        ("off", False, "/analyze/", None),
+        ("on", True, "/analyze/", None),
+        ("on + verbose", True, "/analyze/?verbose=true", None),
+        ("on + jsonl export", True, "/analyze/", exporter),
+    ]
+    rows = []
+    async with make_client() as client:
+        headers = await register_user(client, "bench-tracing@example.com")
+        with patch("app.routers.analyze.classify_text", side_effect=_fake_classify), \
+                patch("app.routers.analyze.analyze_text", side_effect=_fake_summarize):
+            await _latencies(client, headers, 50, -100, "/analyze/")  # warm up
+            for index, (label, enabled, path, span_exporter) in enumerate(modes * 2):
+                with ExitStack() as stack:
+                    stack.enter_context(patch("app.utils.tracing.TRACING_ENABLED", enabled))
+                    stack.enter_context(patch("app.utils.tracing.span_exporter", span_exporter))
+                    r = await _latencies(client, headers, requests, index * requests, path)
+                rows.append((label, r["p50"], r["p95"], r["mean"]))
+    exporter.close()
+
+    print(f"POST /analyze x{requests} per run (stubbed upstreams, each mode run twice)")
+    print_table(rows, ("tracing", "p50_ms", "p95_ms", "mean_ms"))
+    print(f"\nexported {exporter.exported} traces, {os.path.getsize(export_path) // max(exporter.exported, 1)} bytes each")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Shared helpers for the benchmark scripts
+Boots the FastAPI app in-process against a throwaway SQLite file, shared by
+the sync engine and the async (aiosqlite) engine
+
+Run the scripts from the backend folder, e.g.:
+    python -m benchmarks.bench_concurrency
+"""
+import os
+import time
+import tempfile
+import logging
+import statistics
+from typing import Dict, List, Tuple
+
+# Must be set before the app (and its database module) is imported
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.main import app
+from app.database.base import Base
+from app.database.connection import get_db, get_async_db, get_session_factory
+
+# The app configures INFO logging per request; keep benchmark output readable
+logging.getLogger().setLevel(logging.WARNING)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+_db_dir = tempfile.TemporaryDirectory()
+BENCH_DATABASE_PATH = os.path.join(_db_dir.name, "bench.db")
+
+engine = create_engine(
+    f"sqlite:///{BENCH_DATABASE_PATH}",
+    connect_args={"check_same_thread": False},
+)
+BenchSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# NullPool: scripts may run several event loops, and pooled aiosqlite connections are loop-bound
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{BENCH_DATABASE_PATH}", poolclass=NullPool)
+BenchAsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+
+def _override_get_db():
+    db = BenchSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def _override_get_async_db():
+    async with BenchAsyncSessionLocal() as db:
+        yield db
+
+
+async def _override_get_session_factory():
+    return BenchAsyncSessionLocal
+
+
+def setup_database():
+    """Point the app at a fresh benchmark database"""
+    app.dependency_overrides[get_db] = _override_get_db
+    app.dependency_overrides[get_async_db] = _override_get_async_db
+    app.dependency_overrides[get_session_factory] = _override_get_session_factory
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+def make_client() -> httpx.AsyncClient:
+    """Async HTTP client wired directly to the ASGI app"""
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120)
+
+
+async def register_user(client: httpx.AsyncClient, email: str, password: str = "benchpassword123") -> Dict[str, str]:
+    """Register a user and return bearer auth headers"""
+    response = await client.post("/auth/register", json={"email": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 summary of a list of latencies in milliseconds"""
+    if not samples_ms:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0}
+    ordered = sorted(samples_ms)
+
+    def pick(q: float) -> float:
+        index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+        return round(ordered[index], 2)
+
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": round(statistics.fmean(ordered), 2),
+    }
+
+
+class Stopwatch:
+    """Context manager measuring wall-clock time with a monotonic clock"""
+
+    def __enter__(self) -> "Stopwatch":
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.elapsed = time.perf_counter() - self.start
+
+
+def print_table(rows: List[Tuple], headers: Tuple) -> None:
+    """Print a small aligned text table"""
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    line = "  ".join(str(h).ljust(w) for h, w in zip(headers, widths))
+    print(line)
+    print("-" * len(line))
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
@@ -0,0 +1,76 @@
+"""
+Fixed labeled corpus used by the classifier benchmarks
+Three short texts per default label, (text, expected_label)
+"""
+
+CORPUS = [
+    ("The new smartphone ships with an AI chip that runs machine learning models on the device "
+     "and processes data 50% faster than the previous generation.", "technology"),
+    ("A critical vulnerability in popular cloud software lets attackers run code remotely; "
+     "vendors have released patches for affected servers.", "technology"),
+    ("The startup open-sourced its programming framework, letting developers build apps "
+     "that sync data across devices without writing backend code.", "technology"),
+
+    ("Shares of the retailer fell 8% after the company cut its revenue forecast, citing weak "
+     "consumer demand and rising costs.", "business"),
+    ("The two banks agreed to a merger worth 12 billion dollars, creating the largest lender "
+     "in the region by assets.", "business"),
+    ("Inflation slowed for a third month, and investors now expect the central bank to hold "
+     "interest rates steady at its next meeting.", "business"),
+
+    ("The parliament passed the pension reform after a tense vote, and opposition parties "
+     "announced they would challenge the law in court.", "politics"),
+    ("The president named a new foreign minister ahead of the summit, signaling a shift in "
+     "diplomatic priorities.", "politics"),
+    ("Campaigns entered the final week before the election, with polls showing the two "
+     "candidates nearly tied.", "politics"),
+
+    ("The home team scored twice in the final ten minutes to win the championship match "
+     "and lift the trophy in front of their fans.", "sports"),
+    ("The tennis star withdrew from the tournament with a shoulder injury, ending her "
+     "season early.", "sports"),
+    ("After a record-breaking season, the basketball coach signed a five-year contract "
+     "extension with the league leaders.", "sports"),
+
+    ("The film premiered at the festival to a standing ovation, and critics praised the "
+     "lead actress's performance.", "entertainment"),
+    ("The band announced a world tour to promote its new album, with concerts in thirty "
+     "cities next year.", "entertainment"),
+    ("The streaming series was renewed for a second season after becoming the most watched "
+     "show on the platform.", "entertainment"),
+
+    ("Doctors say the new vaccine reduced hospital admissions by half among older patients "
+     "in a large clinical trial.", "health"),
+    ("Regular exercise and a balanced diet lower the risk of heart disease, according to "
+     "guidelines published by the medical association.", "health"),
+    ("The hospital opened a mental health clinic offering free therapy sessions to "
+     "teenagers and their families.", "health"),
+
+    ("Astronomers detected water vapor in the atmosphere of a distant planet using the "
+     "space telescope.", "science"),
+    ("Researchers discovered a new species of deep-sea fish during an expedition studying "
+     "ocean biology.", "science"),
+    ("Physicists at the laboratory measured the particle's mass with unprecedented "
+     "precision in a new experiment.", "science"),
+
+    ("The university will offer free online courses so students can earn credits toward "
+     "a degree from home.", "education"),
+    ("Teachers welcomed the new curriculum, which adds coding and financial literacy classes "
+     "for secondary school pupils.", "education"),
+    ("Exam results improved across the district after schools introduced small-group "
+     "tutoring for struggling students.", "education"),
+
+    ("Tourists are flocking to the island's beaches now that the airline has added direct "
+     "flights from three European cities.", "travel"),
+    ("Our two-week journey through the mountains ended in a charming hotel overlooking "
+     "the old city.", "travel"),
+    ("The country will drop visa requirements for holiday visitors, hoping to boost tourism "
+     "after a slow year.", "travel"),
+
+    ("The chef's new restaurant serves a tasting menu built around seasonal ingredients "
+     "from local farms.", "food"),
+    ("This easy recipe for chocolate cake needs only five ingredients and one bowl, "
+     "perfect for weekend baking.", "food"),
+    ("Street food vendors in the capital are famous for spicy noodle dishes full of "
+     "flavor.", "food"),
+]
@@ -0,0 +1,390 @@
+"""
+Load test for the analyze pipeline
+Registers synthetic users, logs them in, then drives a weighted mix of
+POST /analyze/, POST /auth/login and GET /auth/me and reports throughput
+and p50/p95/p99 latency per endpoint.
+
+Targets:
+- in-process (default): the app over httpx.ASGITransport, with its
+  lifespan running and MOCK_MODE on (set before the app is imported)
+- --base-url http://127.0.0.1:8000: a running server, e.g.
+  MOCK_MODE=true uvicorn app.main:app --port 8000
+In-process, upstream latency and faults follow the MOCK_* settings (e.g.
+MOCK_GEMINI_LATENCY, MOCK_HF_LOADING_RATE), recorded in the result's meta.
+
+Load models:
+- closed loop (default): --concurrency workers, each sending its next
+  request as soon as the previous one returns
+- open loop: --rate requests per second with Poisson arrivals, at most
+  --max-in-flight outstanding. Latency counts from the scheduled arrival,
+  so a stalled server shows up in the tail instead of slowing the
+  arrivals down (no coordinated omission).
+
+Results are printed and, with --output, saved as a JSON baseline.
+--baseline compares this run with a saved one: a throughput drop or a
+p95/p99 rise beyond --tolerance percent (and above --min-delta-ms), or an
+error rate up more than one point, is flagged and exits with status 1.
+Baselines are machine-specific: benchmarks/baselines/mock_inprocess.json
+is a default run on a 1-CPU box (its meta records the settings and
+commit); record your own on the machine you compare on.
+
+Usage:
+    python -m benchmarks.load_test --duration 20 --concurrency 32
+    python -m benchmarks.load_test --rate 40 --duration 30 --output benchmarks/baselines/mock_inprocess.json
+    python -m benchmarks.load_test --baseline benchmarks/baselines/mock_inprocess.json
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 --mix analyze=1
+"""
+import os
+
+# Must be set before the app is imported (benchmarks.common imports it)
+os.environ.setdefault("MOCK_MODE", "true")
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.common import BenchAsyncSessionLocal, make_client, percentiles, print_table, setup_database
+from benchmarks.corpus import CORPUS
+from app.main import app
+from app.config import MOCK_MODE
+from app.services.history_service import history_writer
+from app.services.mock_service import mock_engine
+from app.utils.password_hasher import password_hasher
+from app.utils.security import pwd_ctx
+
+ENDPOINTS = ("analyze", "login", "me")
+PASSWORD = "loadtestpassword123"
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """'analyze=8,me=1,login=1' -> normalized weights"""
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r} (expected one of {', '.join(ENDPOINTS)})")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("mix weights must add up to more than 0")
+    return {name: weight / total for name, weight in weights.items()}
+
+
+class Recorder:
+    """Latency samples and outcomes per endpoint; only kept once the warm-up is over"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+        self.started = 0.0
+        self.stopped = 0.0
+
+    def start(self) -> None:
+        self.recording = True
+        self.started = time.perf_counter()
+
+    def stop(self) -> None:
+        self.recording = False
+        self.stopped = time.perf_counter()
+
+    def add(self, endpoint: str, latency_ms: float, status: str, ok: bool) -> None:
+        if not self.recording:
+            return
+        self.samples[endpoint].append(latency_ms)
+        self.statuses[endpoint][status] += 1
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def summary(self) -> dict:
+        elapsed = max(self.stopped - self.started, 1e-9)
+
+        def stats(samples: List[float], errors: int, statuses: Optional[dict] = None) -> dict:
+            item = {
+                "requests": len(samples),
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+                "rps": round(len(samples) / elapsed, 2),
+                **percentiles(samples),
+            }
+            if statuses is not None:
+                item["statuses"] = dict(statuses)
+            return item
+
+        endpoints = {
+            name: stats(self.samples[name], self.errors[name], self.statuses[name])
+            for name in ENDPOINTS if self.samples.get(name)
+        }
+        everything = [latency for name in endpoints for latency in self.samples[name]]
+        overall = stats(everything, sum(self.errors.values()))
+        return {"elapsed_s": round(elapsed, 2), "overall": overall, "endpoints": endpoints}
+
+
+class Workload:
+    """Synthetic users and the requests they send"""
+
+    def __init__(self, client: httpx.AsyncClient, users: List[dict], mix: Dict[str, float], repeat_ratio: float, seed: int):
+        self.client = client
+        self.users = users
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.repeat_ratio = repeat_ratio
+        self.rng = random.Random(seed)
+        self.counter = 0
+
+    def _text(self) -> str:
+        text, _ = self.rng.choice(CORPUS)
+        if self.rng.random() < self.repeat_ratio:
+            return text  # may be served from the result cache
+        self.counter += 1
+        return f"{text} (load test {uuid.uuid4().hex[:8]}-{self.counter})"
+
+    def next_request(self) -> Tuple[str, dict]:
+        endpoint = self.rng.choices(self.names, self.weights)[0]
+        return endpoint, self.rng.choice(self.users)
+
+    async def send(self, endpoint: str, user: dict) -> httpx.Response:
+        if endpoint == "analyze":
+            return await self.client.post("/analyze/", json={"text": self._text()}, headers=user["headers"])
+        if endpoint == "login":
+            return await self.client.post("/auth/login", json={"email": user["email"], "password": PASSWORD})
+        return await self.client.get("/auth/me", headers=user["headers"])
+
+
+async def timed_send(workload: Workload, recorder: Recorder, endpoint: str, user: dict, started: float) -> None:
+    try:
+        response = await workload.send(endpoint, user)
+        status, ok = str(response.status_code), response.status_code < 400
+    except httpx.HTTPError as e:
+        status, ok = type(e).__name__, False
+    recorder.add(endpoint, (time.perf_counter() - started) * 1000, status, ok)
+
+
+async def create_users(client: httpx.AsyncClient, count: int) -> List[dict]:
+    """Register and log in count synthetic users (unique emails, so reruns against a server work)"""
+    run_id = uuid.uuid4().hex[:8]
+
+    async def one(index: int) -> dict:
+        email = f"load-{run_id}-{index}@example.com"
+        response = await client.post("/auth/register", json={"email": email, "password": PASSWORD})
+        response.raise_for_status()
+        login = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+        login.raise_for_status()
+        return {"email": email, "headers": {"Authorization": f"Bearer {login.json()['access_token']}"}}
+
+    return list(await asyncio.gather(*[one(i) for i in range(count)]))
+
+
+async def closed_loop(workload: Workload, recorder: Recorder, concurrency: int, warmup: float, duration: float) -> None:
+    deadline = time.perf_counter() + warmup + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            endpoint, user = workload.next_request()
+            await timed_send(workload, recorder, endpoint, user, time.perf_counter())
+
+    async def window():
+        await asyncio.sleep(warmup)
+        recorder.start()
+        await asyncio.sleep(duration)
+        recorder.stop()
+
+    await asyncio.gather(window(), *[worker() for _ in range(concurrency)])
+
+
+async def open_loop(
+    workload: Workload, recorder: Recorder, rate: float, max_in_flight: int, warmup: float, duration: float
+) -> None:
+    slots = asyncio.Semaphore(max_in_flight)
+    tasks = set()
+    start = time.perf_counter()
+    next_at = start
+    recording_at, stop_at = start + warmup, start + warmup + duration
+
+    async def one(endpoint: str, user: dict, scheduled: float):
+        async with slots:
+            await timed_send(workload, recorder, endpoint, user, scheduled)
+
+    while next_at < stop_at:
+        now = time.perf_counter()
+        if not recorder.recording and recording_at <= now:
+            recorder.start()
+        if next_at > now:
+            await asyncio.sleep(next_at - now)
+        endpoint, user = workload.next_request()
+        task = asyncio.create_task(one(endpoint, user, next_at))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        next_at += workload.rng.expovariate(rate)
+
+    await asyncio.gather(*tasks)
+    recorder.stop()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Settings that must match for a comparison to mean anything
+COMPARABLE = ("target", "mock_mode", "load_model", "concurrency", "rate", "users", "mix", "repeat_ratio", "bcrypt_rounds")
+
+
+def setting_differences(current: dict, baseline: dict) -> List[str]:
+    return [
+        f"{key}: {baseline['meta'].get(key)} -> {current['meta'].get(key)}"
+        for key in COMPARABLE if current["meta"].get(key) != baseline["meta"].get(key)
+    ]
+
+
+def compare(current: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> List[tuple]:
+    """Rows (scope, metric, baseline, current, change %, flag) for every metric both runs have"""
+    rows = []
+    scopes = [("overall", current["overall"], baseline["overall"])]
+    scopes += [
+        (name, current["endpoints"][name], baseline["endpoints"][name])
+        for name in ENDPOINTS if name in current["endpoints"] and name in baseline["endpoints"]
+    ]
+    for scope, now, before in scopes:
+        for metric, higher_is_worse in (("rps", False), ("p50", True), ("p95", True), ("p99", True), ("error_rate", True)):
+            old, new = before[metric], now[metric]
+            change = (new - old) / old * 100 if old else (0.0 if new == old else float("inf"))
+            if metric == "error_rate":
+                regressed = new - old > 0.01
+            elif metric == "rps":
+                regressed = change < -tolerance
+            else:
+                regressed = metric != "p50" and change > tolerance and new - old > min_delta_ms
+            rows.append((scope, metric, old, new, f"{change:+.1f}%", "REGRESSION" if regressed else ""))
+    return rows
+
+
+async def run(args) -> int:
+    in_process = args.base_url is None
+    if in_process:
+        if not MOCK_MODE:
+            print("warning: MOCK_MODE is off, /analyze will call the real upstreams", file=sys.stderr)
+        setup_database()
+        history_writer.session_factory = BenchAsyncSessionLocal
+        if args.bcrypt_rounds:
+            rounds = args.bcrypt_rounds
+            pwd_ctx.update(bcrypt__rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds)
+            password_hasher.rounds = rounds
+        client = make_client()
+    else:
+        limits = httpx.Limits(max_connections=max(args.concurrency, args.max_in_flight))
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits)
+
+    recorder = Recorder()
+    async with client:
+        lifespan = app.router.lifespan_context(app) if in_process else None
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        try:
+            print(f"creating {args.users} users...")
+            users = await create_users(client, args.users)
+            workload = Workload(client, users, args.mix, args.repeat_ratio, args.seed)
+            mode = f"open loop, {args.rate} req/s" if args.rate else f"closed loop, {args.concurrency} workers"
+            print(f"running {mode} for {args.warmup}s warm-up + {args.duration}s...")
+            if args.rate:
+                await open_loop(workload, recorder, args.rate, args.max_in_flight, args.warmup, args.duration)
+            else:
+                await closed_loop(workload, recorder, args.concurrency, args.warmup, args.duration)
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+
+    result = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "target": "in-process" if in_process else args.base_url,
+            "mock_mode": MOCK_MODE if in_process else None,
+            "mock_engine": mock_engine.settings() if in_process and MOCK_MODE else None,
+            "load_model": "open" if args.rate else "closed",
+            "concurrency": None if args.rate else args.concurrency,
+            "rate": args.rate,
+            "max_in_flight": args.max_in_flight if args.rate else None,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "users": args.users,
+            "mix": args.mix,
+            "repeat_ratio": args.repeat_ratio,
+            "bcrypt_rounds": args.bcrypt_rounds,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        **recorder.summary(),
+    }
+
+    rows = [("overall", *_row(result["overall"]))]
+    rows += [(name, *_row(stats)) for name, stats in result["endpoints"].items()]
+    print_table(rows, ("endpoint", "requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms"))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nsaved {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\ncompared with {args.baseline} ({baseline['meta'].get('git_commit')}, {baseline['meta'].get('timestamp')})")
+        for difference in setting_differences(result, baseline):
+            print(f"warning: load settings differ, {difference}")
+        comparison = compare(result, baseline, args.tolerance, args.min_delta_ms)
+        print_table(comparison, ("scope", "metric", "baseline", "current", "change", ""))
+        regressions = [row for row in comparison if row[-1]]
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance}%")
+            return 1
+        print("\nno regressions")
+    return 0
+
+
+def _row(stats: dict) -> tuple:
+    return stats["requests"], stats["errors"], stats["rps"], stats["p50"], stats["p95"], stats["p99"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="Running server to test (default: the app in-process)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("analyze=8,me=1,login=1"))
+    parser.add_argument("--concurrency", type=int, default=32, help="Closed loop workers")
+    parser.add_argument("--rate", type=float, default=None, help="Open loop arrivals per second")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Open loop cap on outstanding requests")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Seconds of load before measuring")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0,
+                        help="Share of /analyze texts repeated verbatim from the corpus (result cache hits)")
+    parser.add_argument("--bcrypt-rounds", type=int, default=None, help="In-process only: override BCRYPT_ROUNDS")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Save the results as a JSON baseline")
+    parser.add_argument("--baseline", default=None, help="JSON baseline to compare with")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="Allowed regression, in percent")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore latency rises smaller than this")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
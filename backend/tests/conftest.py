@@ -2,10 +2,12 @@
 Pytest Configuration and Test Fixtures
 """
 import pytest
+import tempfile
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from unittest.mock import AsyncMock, patch, MagicMock
 import sys
 import os
@@ -13,22 +15,30 @@ import os
 # Add app directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+# Every TestClient runs the lifespan; hash on threads rather than spawning worker processes each time
+os.environ.setdefault("PASSWORD_HASH_EXECUTOR", "thread")
+
 from app.main import app
 from app.database.base import Base
-from app.database.connection import get_db
+from app.database.connection import get_db, get_async_db, get_session_factory
 from app.models.user import User
 
 
-# Create in-memory SQLite database for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# SQLite file shared by the sync engine and the async (aiosqlite) engine;
+# an in-memory database would be private to one of them
+_db_dir = tempfile.TemporaryDirectory()
+SQLALCHEMY_DATABASE_PATH = os.path.join(_db_dir.name, "test.db")
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
+    f"sqlite:///{SQLALCHEMY_DATABASE_PATH}",
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# NullPool: every TestClient runs its own event loop, so connections must not be reused across tests
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{SQLALCHEMY_DATABASE_PATH}", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
 
 def override_get_db():
     """Override database dependency for testing"""
@@ -39,6 +49,114 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    """Override the async database dependency for testing"""
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+async def override_get_session_factory():
+    """Override the session factory dependency for testing"""
+    return TestingAsyncSessionLocal
+
+
+@pytest.fixture(autouse=True)
+def real_service_mode():
+    """
+    Route /analyze through the real service functions (which tests patch),
+    even when MOCK_MODE is set in the environment as it is in CI
+    """
+    with patch('app.routers.analyze.MOCK_MODE', False), \
+            patch('app.routers.analyze.CLASSIFIER_BACKEND', 'hf'):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def reset_result_cache():
+    """Start every test with empty result caches and zeroed coalescing counters"""
+    from app.services.cache_service import result_cache
+    from app.services.dedup_service import near_duplicates
+    from app.routers.analyze import analysis_flight
+    result_cache.clear()
+    near_duplicates.clear()
+    analysis_flight.reset()
+    yield
+    result_cache.clear()
+    near_duplicates.clear()
+    analysis_flight.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_auth_caches():
+    """Tables are recreated per test, so cached tokens, users and label sets must not leak between tests"""
+    from app.services.auth_service import clear_auth_caches
+    from app.services.label_set_service import clear_label_profiles
+    clear_auth_caches()
+    clear_label_profiles()
+    yield
+    clear_auth_caches()
+    clear_label_profiles()
+
+
+@pytest.fixture(autouse=True)
+def reset_upstream_guards():
+    """Start every test with initial upstream limits, closed circuit breakers and a full retry budget"""
+    from app.services.huggingface_service import hf_limiter, hf_breaker
+    from app.services.gemini_service import gemini_limiter, gemini_breaker
+    from app.utils.retry import retry_budget
+    retry_budget.reset()
+    hf_limiter.reset()
+    gemini_limiter.reset()
+    hf_breaker.reset()
+    gemini_breaker.reset()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_history_writer():
+    """Write history to the test database, starting each test with an empty buffer"""
+    from app.services.history_service import history_writer
+    history_writer.clear()
+    history_writer.session_factory = TestingAsyncSessionLocal
+    yield
+    history_writer.clear()
+    history_writer.session_factory = None
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Zero the metrics registry between tests"""
+    from app.utils.metrics import registry
+    registry.reset()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_password_hasher():
+    """Zero the password hashing stats between tests"""
+    from app.utils.password_hasher import password_hasher
+    password_hasher.reset_stats()
+    yield
+
+
+@pytest.fixture
+def mock_engine():
+    """
+    The seeded mock engine with instant upstreams and no faults; tests
+    configure() the faults they need. Restored to the MOCK_* settings, and
+    detached from the services, after
+    """
+    from app.services.mock_service import mock_engine
+    mock_engine.configure(
+        seed=1234, hf_latency="fixed:ms=0", gemini_latency="fixed:ms=0", token_latency="fixed:ms=0",
+        hf_loading_rate=0, hf_timeout_rate=0, gemini_timeout_rate=0, gemini_parse_error_rate=0,
+        hf_loading_estimated_s=0.01,
+    )
+    yield mock_engine
+    mock_engine.detach()
+    mock_engine.reset()
+
+
 @pytest.fixture(scope="function")
 def db_session():
     """Create a fresh database for each test"""
@@ -49,10 +167,19 @@ def db_session():
     Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture(scope="function")
+async def async_db_session(db_session):
+    """AsyncSession on the same fresh database as db_session"""
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 @pytest.fixture(scope="function")
 def client(db_session):
     """Test client with database override"""
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_session_factory] = override_get_session_factory
     Base.metadata.create_all(bind=engine)
     
     with TestClient(app) as test_client:
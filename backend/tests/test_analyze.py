@@ -2,8 +2,19 @@
 Analyze Endpoint Tests
 Tests for POST /analyze with mocked HuggingFace and Gemini services
 """
+import json
+import asyncio
 import pytest
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
+
+
+def parse_sse(body: str) -> list:
+    """Split a text/event-stream body into (event, data) pairs"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
 
 
 class TestAnalyzeEndpoint:
@@ -123,6 +134,475 @@ class TestAnalyzeEndpoint:
         assert "Summarization service unavailable" in response.json()["detail"]
 
 
+class TestAnalyzeParallelPipeline:
+    """Tests for PIPELINE_MODE=parallel"""
+    
+    @patch('app.routers.analyze.PIPELINE_MODE', 'parallel')
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_parallel_keeps_matching_speculative_result(
+        self,
+        mock_gemini,
+        mock_hf,
+        client,
+        auth_headers,
+        sample_text,
+        mock_huggingface_response,
+        mock_gemini_response
+    ):
+        """Test Gemini runs once when its category guess agrees with HuggingFace"""
+        mock_hf.return_value = mock_huggingface_response
+        mock_gemini.return_value = {**mock_gemini_response, "category": "technology"}
+        
+        response = client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+        
+        assert response.status_code == 200
+        meta = response.json()["meta"]
+        assert meta["pipeline_mode"] == "parallel"
+        assert meta["gemini_reran"] is False
+        assert meta["stage_overlap_ms"] >= 0
+        assert mock_gemini.call_count == 1
+        assert mock_gemini.call_args[0][1] is None  # category-agnostic prompt
+    
+    @patch('app.routers.analyze.PIPELINE_MODE', 'parallel')
+    @patch('app.routers.analyze.PARALLEL_RERUN_POLICY', 'mismatch')
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_parallel_reruns_on_category_mismatch(
+        self,
+        mock_gemini,
+        mock_hf,
+        client,
+        auth_headers,
+        sample_text,
+        mock_huggingface_response,
+        mock_gemini_response
+    ):
+        """Test Gemini is re-run with the HF category when its guess disagrees"""
+        mock_hf.return_value = mock_huggingface_response
+        mock_gemini.side_effect = [
+            {**mock_gemini_response, "category": "sports"},
+            {**mock_gemini_response, "summary": "Category-aware summary."}
+        ]
+        
+        response = client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["summary"] == "Category-aware summary."
+        assert data["meta"]["gemini_reran"] is True
+        assert mock_gemini.call_args[0][1] == "technology"
+    
+    @patch('app.routers.analyze.PIPELINE_MODE', 'parallel')
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_parallel_huggingface_error(
+        self,
+        mock_gemini,
+        mock_hf,
+        client,
+        auth_headers,
+        sample_text,
+        mock_gemini_response
+    ):
+        """Test a classification failure still returns 503 in parallel mode"""
+        from app.services.huggingface_service import HuggingFaceError
+        mock_hf.side_effect = HuggingFaceError("API timeout")
+        mock_gemini.return_value = mock_gemini_response
+        
+        response = client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+        
+        assert response.status_code == 503
+        assert "Classification service unavailable" in response.json()["detail"]
+
+
+def long_document(paragraphs: int = 12) -> str:
+    """Text well over LONG_DOC_THRESHOLD_TOKENS: two sports paragraphs for every business one"""
+    sports = "The home team won the championship match after scoring twice in the final minutes. " * 6
+    business = "Shares of the retailer fell after the company cut its revenue forecast for the year. " * 6
+    return "\n\n".join(business if i % 3 == 2 else sports for i in range(paragraphs))
+
+
+async def classify_chunk(text, labels):
+    """Fake classify_text scoring sports vs business by keyword counts"""
+    await asyncio.sleep(0.01)
+    sports = text.count("championship") / (text.count("championship") + text.count("revenue"))
+    scores = {"sports": sports, "business": 1 - sports}
+    top = max(scores, key=scores.get)
+    return {"category": top, "confidence": scores[top], "scores": scores, "latency_ms": 5}
+
+
+async def summarize_chunk(text, category=None, candidate_labels=None):
+    """Fake analyze_text naming the length of what it summarized"""
+    return {"summary": f"Summary of {len(text)} characters about {category}.", "tone": "neutre", "latency_ms": 5}
+
+
+class TestLongDocuments:
+    """Tests for the map-reduce pipeline on long texts"""
+    
+    def test_chunk_text_respects_boundaries(self):
+        """Test that chunks stay within budget and cut between paragraphs, then sentences"""
+        from app.utils.text import chunk_text, estimate_tokens
+        
+        text = long_document()
+        chunks = chunk_text(text, 200)
+        
+        assert len(chunks) > 1
+        assert all(estimate_tokens(chunk) <= 205 for chunk in chunks)
+        assert all(chunk.endswith(".") for chunk in chunks)
+        assert " ".join(" ".join(chunks).split()) == " ".join(text.split())
+        # A single sentence longer than the budget is cut between words
+        assert len(chunk_text("word " * 500, 100)) == 5
+    
+    @patch('app.routers.analyze.CHUNK_MAX_TOKENS', 200)
+    @patch('app.routers.analyze.LONG_DOC_REDUCE_MAX_TOKENS', 200)
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_long_document_map_reduce(self, mock_gemini, mock_hf, client, auth_headers):
+        """Test that chunks are classified and summarized separately, then the summaries reduced"""
+        mock_hf.side_effect = classify_chunk
+        mock_gemini.side_effect = summarize_chunk
+        text = long_document()
+        
+        response = client.post("/analyze/", json={"text": text}, headers=auth_headers)
+        
+        assert response.status_code == 200
+        data = response.json()
+        chunking = data["meta"]["chunking"]
+        assert data["meta"]["pipeline_mode"] == "map_reduce"
+        assert chunking["chunks"] == mock_hf.call_count > 1
+        assert 1 < chunking["peak_in_flight"] <= chunking["concurrency"]
+        assert chunking["reduce_levels"] >= 1
+        assert chunking["upstream_calls"] == mock_hf.call_count + mock_gemini.call_count
+        assert data["category"] == "sports"
+        assert data["hf_scores"]["sports"] == pytest.approx(2 / 3, abs=0.05)
+        assert all(len(call.args[0]) < len(text) for call in mock_hf.call_args_list)
+    
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_short_text_skips_chunking(
+        self, mock_gemini, mock_hf, client, auth_headers, sample_text,
+        mock_huggingface_response, mock_gemini_response
+    ):
+        """Test that texts under the threshold keep the single-call pipeline"""
+        mock_hf.return_value = mock_huggingface_response
+        mock_gemini.return_value = mock_gemini_response
+        
+        response = client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+        
+        assert response.json()["meta"]["chunking"] is None
+        assert mock_hf.call_count == 1
+    
+    @patch('app.routers.analyze.CHUNK_MAX_TOKENS', 200)
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_chunk_failure_fails_request(self, mock_gemini, mock_hf, client, auth_headers, mock_huggingface_response):
+        """Test that one failing chunk fails the request like a single-call failure"""
+        from app.services.huggingface_service import HuggingFaceError
+        
+        mock_hf.side_effect = [mock_huggingface_response, HuggingFaceError("API timeout")] + [mock_huggingface_response] * 50
+        
+        response = client.post("/analyze/", json={"text": long_document()}, headers=auth_headers)
+        
+        assert response.status_code == 503
+        assert mock_gemini.call_count == 0
+    
+    @patch('app.routers.analyze.BATCH_CONCURRENCY', 2)
+    @patch('app.routers.analyze.CHUNK_MAX_TOKENS', 200)
+    @patch('app.routers.analyze.LONG_DOC_REDUCE_MAX_TOKENS', 200)
+    @patch('app.routers.analyze.classify_texts')
+    @patch('app.routers.analyze.analyze_texts')
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_batch_long_document_map_reduce(
+        self, mock_gemini, mock_hf, mock_gemini_group, mock_hf_group, client, auth_headers, sample_text,
+        mock_huggingface_response, mock_gemini_response
+    ):
+        """Test that a long batch item is chunked on its own while short ones stay grouped"""
+        state = {"in_flight": 0, "peak": 0}
+        
+        async def classify(text, labels):
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            try:
+                return await classify_chunk(text, labels)
+            finally:
+                state["in_flight"] -= 1
+        
+        async def classify_group(texts, labels, call_slot):
+            async with call_slot():
+                return [mock_huggingface_response for _ in texts]
+        
+        async def summarize_group(items, call_slot):
+            async with call_slot():
+                return [mock_gemini_response for _ in items]
+        
+        mock_hf.side_effect = classify
+        mock_gemini.side_effect = summarize_chunk
+        mock_hf_group.side_effect = classify_group
+        mock_gemini_group.side_effect = summarize_group
+        text = long_document()
+        
+        response = client.post("/analyze/batch", json={"texts": [sample_text, text]}, headers=auth_headers)
+        
+        data = response.json()
+        assert data["meta"]["succeeded"] == 2
+        assert data["results"][0]["result"]["meta"]["chunking"] is None
+        long_result = data["results"][1]["result"]
+        assert long_result["category"] == "sports"
+        assert long_result["meta"]["pipeline_mode"] == "map_reduce"
+        assert long_result["meta"]["chunking"]["chunks"] == mock_hf.call_count > 1
+        assert mock_hf_group.call_args[0][0] == [sample_text]
+        assert all(len(call.args[0]) < len(text) for call in mock_hf.call_args_list)
+        assert state["peak"] <= 2
+        assert data["meta"]["hf_requests"] == mock_hf.call_count + 1
+        assert data["meta"]["gemini_requests"] == mock_gemini.call_count + 1
+    
+    @patch('app.routers.analyze.CHUNK_MAX_TOKENS', 200)
+    @patch('app.routers.analyze.LONG_DOC_REDUCE_MAX_TOKENS', 200)
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    @patch('app.routers.analyze.analyze_text_stream')
+    def test_stream_long_document_map_reduce(self, mock_stream, mock_gemini, mock_hf, client, auth_headers):
+        """Test that a long streamed text is chunked and only the final reduce call is streamed"""
+        async def fake_stream(text, category):
+            yield {"type": "token", "text": "Mostly "}
+            yield {"type": "token", "text": "sports."}
+            yield {"type": "result", "summary": "Mostly sports.", "tone": "positif", "latency_ms": 30}
+        
+        mock_hf.side_effect = classify_chunk
+        mock_gemini.side_effect = summarize_chunk
+        mock_stream.side_effect = fake_stream
+        text = long_document()
+        
+        response = client.post("/analyze/stream", json={"text": text}, headers=auth_headers)
+        
+        events = parse_sse(response.text)
+        assert [name for name, _ in events] == ["classification", "token", "token", "done"]
+        assert events[0][1]["category"] == "sports"
+        done = events[-1][1]
+        assert done["summary"] == "Mostly sports."
+        assert done["meta"]["pipeline_mode"] == "map_reduce"
+        assert done["meta"]["chunking"]["chunks"] == mock_hf.call_count > 1
+        assert all(len(call.args[0]) < len(text) for call in mock_hf.call_args_list)
+        mock_stream.assert_called_once()
+        assert mock_stream.call_args[0][0].startswith("Summary of")
+    
+    @patch('app.routers.analyze.CHUNK_MAX_TOKENS', 200)
+    @patch('app.routers.analyze.classify_text')
+    def test_stream_long_document_failure(self, mock_hf, client, auth_headers, mock_huggingface_response):
+        """Test that a failing chunk ends a long stream with an error event"""
+        from app.services.huggingface_service import HuggingFaceError
+        
+        mock_hf.side_effect = [mock_huggingface_response, HuggingFaceError("API timeout")] + [mock_huggingface_response] * 50
+        
+        response = client.post("/analyze/stream", json={"text": long_document()}, headers=auth_headers)
+        
+        assert parse_sse(response.text) == [("error", {"detail": "Classification service unavailable: API timeout"})]
+    
+    def test_text_over_max_length_rejected(self, client, auth_headers):
+        """Test that texts beyond MAX_TEXT_LENGTH are refused by validation"""
+        from app.config import MAX_TEXT_LENGTH
+        
+        response = client.post("/analyze/", json={"text": "a" * (MAX_TEXT_LENGTH + 1)}, headers=auth_headers)
+        
+        assert response.status_code == 422
+
+
+class TestAnalyzeBatch:
+    """Tests for POST /analyze/batch endpoint"""
+    
+    @patch('app.routers.analyze.classify_texts')
+    @patch('app.routers.analyze.analyze_texts')
+    def test_batch_success(
+        self,
+        mock_gemini,
+        mock_hf,
+        client,
+        auth_headers,
+        sample_text,
+        mock_huggingface_response,
+        mock_gemini_response
+    ):
+        """Test batch analysis groups texts into batched upstream calls"""
+        async def classify(texts, labels, call_slot):
+            async with call_slot():
+                return [mock_huggingface_response for _ in texts]
+        
+        async def summarize(items, call_slot):
+            async with call_slot():
+                return [mock_gemini_response for _ in items]
+        
+        mock_hf.side_effect = classify
+        mock_gemini.side_effect = summarize
+        texts = [f"{sample_text} Variant {i}." for i in range(3)]
+        
+        response = client.post(
+            "/analyze/batch",
+            json={"texts": texts},
+            headers=auth_headers
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["index"] for item in data["results"]] == [0, 1, 2]
+        assert all(item["error"] is None for item in data["results"])
+        assert data["results"][0]["result"]["category"] == "technology"
+        assert data["meta"]["succeeded"] == 3
+        assert data["meta"]["hf_requests"] == 1
+        assert data["meta"]["gemini_requests"] == 1
+        mock_hf.assert_called_once()
+        assert len(mock_hf.call_args[0][0]) == 3
+    
+    @patch('app.routers.analyze.classify_texts')
+    @patch('app.routers.analyze.analyze_texts')
+    def test_batch_per_item_errors(
+        self,
+        mock_gemini,
+        mock_hf,
+        client,
+        auth_headers,
+        sample_text,
+        mock_huggingface_response,
+        mock_gemini_response
+    ):
+        """Test invalid and failing items are reported without failing the batch"""
+        from app.services.gemini_service import GeminiError
+        
+        mock_hf.side_effect = lambda texts, labels, call_slot: [mock_huggingface_response for _ in texts]
+        mock_gemini.side_effect = lambda items, call_slot: [GeminiError("API error"), mock_gemini_response]
+        texts = ["Too short", sample_text, sample_text + " Second."]
+        
+        response = client.post(
+            "/analyze/batch",
+            json={"texts": texts},
+            headers=auth_headers
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["results"][0]["error"] is not None
+        assert "Summarization service unavailable" in data["results"][1]["error"]
+        assert data["results"][2]["result"]["summary"] == mock_gemini_response["summary"]
+        assert data["meta"]["failed"] == 2
+        assert data["meta"]["succeeded"] == 1
+    
+    @patch('app.routers.analyze.BATCH_CONCURRENCY', 2)
+    @patch('app.routers.analyze.analyze_texts')
+    @patch('app.services.huggingface_service.httpx.AsyncClient')
+    def test_batch_fallback_respects_concurrency(
+        self,
+        mock_client_class,
+        mock_gemini,
+        client,
+        auth_headers,
+        sample_text,
+        mock_gemini_response
+    ):
+        """Test that one-by-one fallbacks of a rejected group call hold their own slots and are counted"""
+        from app.services import huggingface_service
+        
+        state = {"in_flight": 0, "peak": 0}
+        
+        async def post(url, json, **kwargs):
+            response = MagicMock()
+            if isinstance(json["inputs"], list):
+                response.status_code = 400
+                return response
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            await asyncio.sleep(0.02)
+            state["in_flight"] -= 1
+            response.status_code = 200
+            response.json.return_value = [{"label": "technology", "score": 0.9}]
+            return response
+        
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = post
+        mock_client_class.return_value = mock_client
+        mock_gemini.side_effect = lambda items, call_slot: [mock_gemini_response for _ in items]
+        huggingface_service._client = None
+        texts = [f"{sample_text} Variant {i}." for i in range(6)]
+        
+        try:
+            response = client.post("/analyze/batch", json={"texts": texts}, headers=auth_headers)
+        finally:
+            huggingface_service._client = None
+        
+        data = response.json()
+        assert data["meta"]["succeeded"] == 6
+        assert state["peak"] == 2
+        assert data["meta"]["hf_requests"] == mock_client.post.call_count
+    
+    def test_batch_empty_list(self, client, auth_headers):
+        """Test batch requires at least one text"""
+        response = client.post("/analyze/batch", json={"texts": []}, headers=auth_headers)
+        
+        assert response.status_code == 422
+    
+    def test_batch_no_auth(self, client, sample_text):
+        """Test batch fails without authentication"""
+        response = client.post("/analyze/batch", json={"texts": [sample_text]})
+        
+        assert response.status_code == 401
+
+
+class TestAnalyzeStream:
+    """Tests for POST /analyze/stream (Server-Sent Events)"""
+    
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text_stream')
+    def test_stream_success(
+        self,
+        mock_stream,
+        mock_hf,
+        client,
+        auth_headers,
+        sample_text,
+        mock_huggingface_response
+    ):
+        """Test classification, tokens and final event are streamed in order"""
+        async def fake_stream(text, category):
+            yield {"type": "token", "text": "AI is "}
+            yield {"type": "token", "text": "changing data."}
+            yield {"type": "result", "summary": "AI is changing data.", "tone": "positif",
+                   "latency_ms": 120, "first_token_ms": 40}
+        
+        mock_hf.return_value = mock_huggingface_response
+        mock_stream.side_effect = fake_stream
+        
+        response = client.post("/analyze/stream", json={"text": sample_text}, headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse(response.text)
+        
+        assert [name for name, _ in events] == ["classification", "token", "token", "done"]
+        assert events[0][1]["category"] == "technology"
+        assert "".join(data["text"] for name, data in events if name == "token") == "AI is changing data."
+        done = events[-1][1]
+        assert done["tone"] == "positif"
+        assert done["meta"]["gemini_latency_ms"] == 120
+        assert done["meta"]["time_to_first_token_ms"] is not None
+    
+    @patch('app.routers.analyze.classify_text')
+    def test_stream_huggingface_error(self, mock_hf, client, auth_headers, sample_text):
+        """Test an upstream failure is reported as an error event"""
+        from app.services.huggingface_service import HuggingFaceError
+        mock_hf.side_effect = HuggingFaceError("API timeout")
+        
+        response = client.post("/analyze/stream", json={"text": sample_text}, headers=auth_headers)
+        
+        events = parse_sse(response.text)
+        assert events == [("error", {"detail": "Classification service unavailable: API timeout"})]
+    
+    def test_stream_no_auth(self, client, sample_text):
+        """Test streaming fails without authentication"""
+        response = client.post("/analyze/stream", json={"text": sample_text})
+        
+        assert response.status_code == 401
+
+
 class TestAnalyzeHealthCheck:
     """Tests for GET /analyze/health"""
     
@@ -135,3 +615,4 @@ class TestAnalyzeHealthCheck:
         assert data["status"] == "ok"
         assert data["service"] == "analyze"
         assert "mock_mode" in data
+        assert "hf_pool" in data
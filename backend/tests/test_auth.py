@@ -3,6 +3,7 @@ Authentication Endpoint Tests
 Tests for /auth/register, /auth/login, /auth/me, /auth/logout
 """
 import pytest
+from unittest.mock import patch
 
 
 class TestRegister:
@@ -130,3 +131,51 @@ class TestLogout:
         
         assert response.status_code == 200
         assert response.json()["message"] == "Logged out"
+
+
+class TestAuthCaches:
+    """Tests for the cached token and user lookups behind get_current_user"""
+    
+    def test_repeat_requests_skip_decode_and_database(self, client, auth_headers):
+        """Test that a known token is neither re-verified nor looked up again"""
+        from app.services.auth_service import auth_cache_stats
+        
+        client.get("/auth/me", headers=auth_headers)
+        with patch('app.services.auth_service.decode_token') as mock_decode, \
+                patch('app.services.auth_service._load_user') as mock_load:
+            for _ in range(3):
+                assert client.get("/auth/me", headers=auth_headers).status_code == 200
+        
+        mock_decode.assert_not_called()
+        mock_load.assert_not_called()
+        stats = auth_cache_stats()
+        assert stats["token_hits"] >= 3
+        assert stats["user_hits"] >= 3
+    
+    def test_invalidated_user_is_reloaded(self, client, auth_headers, db_session):
+        """Test that invalidate_user forces the next request to the database"""
+        from app.services.auth_service import invalidate_user
+        from app.models.user import User
+        
+        user_id = client.get("/auth/me", headers=auth_headers).json()["id"]
+        
+        db_session.query(User).filter(User.id == user_id).delete()
+        db_session.commit()
+        
+        # Still served from the user cache until it is invalidated
+        assert client.get("/auth/me", headers=auth_headers).status_code == 200
+        
+        invalidate_user(user_id)
+        response = client.get("/auth/me", headers=auth_headers)
+        
+        assert response.status_code == 401
+        assert response.json()["detail"] == "User not found"
+    
+    def test_expired_token_not_cached(self, client, test_user_data):
+        """Test that an expired token is rejected"""
+        from app.utils.security import create_access_token
+        
+        token = create_access_token({"sub": "1", "email": test_user_data["email"]}, expires_minutes=-1)
+        response = client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+        
+        assert response.status_code == 401
@@ -0,0 +1,74 @@
+"""
+Cold Start Tests
+Tests for lazy initialization and the database bootstrap
+"""
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+
+class TestLazyImports:
+    """Tests for what importing the app does"""
+
+    def test_app_import_skips_sdk_and_database(self, tmp_path):
+        """Test that importing the app loads no Gemini SDK and creates no tables"""
+        db_path = tmp_path / "cold.db"
+        code = (
+            "import sys, sqlalchemy; import app.main; "
+            "from app.database.connection import engine; "
+            "print('google.generativeai' in sys.modules, sqlalchemy.inspect(engine).get_table_names())"
+        )
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "PYTHONWARNINGS": "ignore"}
+        backend = os.path.join(os.path.dirname(__file__), "..")
+        out = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, env=env, cwd=backend, check=True
+        ).stdout.strip().splitlines()[-1]
+
+        assert out == "False []"
+
+    def test_gemini_sdk_loads_on_first_use(self):
+        """Test that the first model lookup imports and configures the SDK"""
+        from app.services import gemini_service
+
+        with patch('google.generativeai.GenerativeModel') as model_class, \
+                patch.object(gemini_service, '_model', None), \
+                patch.object(gemini_service, '_genai', None):
+            model = gemini_service._get_model()
+
+        assert model is model_class.return_value
+        model_class.assert_called_once_with(gemini_service.GEMINI_MODEL)
+
+
+class TestBootstrap:
+    """Tests for table creation"""
+
+    def test_create_tables(self, tmp_path):
+        """Test that the bootstrap command creates every table"""
+        from sqlalchemy import create_engine, inspect
+        from app.database import bootstrap
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'bootstrap.db'}")
+        with patch.object(bootstrap, 'engine', engine):
+            bootstrap.main()
+
+        assert {"users", "analysis_cache", "analyses", "label_sets"} <= set(inspect(engine).get_table_names())
+
+    def test_lifespan_creates_tables_when_enabled(self, tmp_path):
+        """Test that DB_CREATE_TABLES creates missing tables at startup"""
+        from fastapi.testclient import TestClient
+        from sqlalchemy import create_engine, inspect
+        from app.main import app
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'lifespan.db'}")
+        with patch('app.database.bootstrap.engine', engine):
+            with patch('app.main.DB_CREATE_TABLES', False):
+                with TestClient(app):
+                    pass
+            assert inspect(engine).get_table_names() == []
+
+            with patch('app.main.DB_CREATE_TABLES', True):
+                with TestClient(app):
+                    pass
+
+        assert "users" in inspect(engine).get_table_names()
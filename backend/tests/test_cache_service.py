@@ -0,0 +1,216 @@
+"""
+Result Cache Tests
+Tests for cache keys, the cache backends and cached /analyze responses
+"""
+import pytest
+from unittest.mock import patch
+
+
+class FakeClock:
+    """Controllable clock for TTL tests"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCacheKey:
+    """Tests for make_cache_key"""
+
+    def test_whitespace_is_normalized(self):
+        """Test that texts differing only in whitespace share a key"""
+        from app.services.cache_service import make_cache_key
+
+        a = make_cache_key("Hello   world,\n this is a test", ["tech"], ["m1", "m2"])
+        b = make_cache_key("  Hello world, this is a test ", ["tech"], ["m1", "m2"])
+
+        assert a == b
+
+    def test_label_order_does_not_matter(self):
+        """Test that label order does not change the key"""
+        from app.services.cache_service import make_cache_key
+
+        a = make_cache_key("Some text", ["tech", "food"], ["m1"])
+        b = make_cache_key("Some text", ["food", "tech"], ["m1"])
+
+        assert a == b
+
+    def test_labels_and_models_change_key(self):
+        """Test that different labels or models produce different keys"""
+        from app.services.cache_service import make_cache_key
+
+        base = make_cache_key("Some text", ["tech"], ["m1"])
+
+        assert make_cache_key("Some text", ["food"], ["m1"]) != base
+        assert make_cache_key("Some text", ["tech"], ["m2"]) != base
+
+
+class TestMemoryCacheBackend:
+    """Tests for the in-process LRU + TTL backend"""
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        from app.services.cache_service import MemoryCacheBackend
+
+        cache = MemoryCacheBackend(max_entries=2)
+        cache.set("a", {"v": 1}, ttl=60)
+        cache.set("b", {"v": 2}, ttl=60)
+        cache.get("a")  # "b" is now least recently used
+        cache.set("c", {"v": 3}, ttl=60)
+
+        assert cache.get("a") == {"v": 1}
+        assert cache.get("b") is None
+        assert cache.get("c") == {"v": 3}
+        assert cache.size() == 2
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after their TTL"""
+        from app.services.cache_service import MemoryCacheBackend
+
+        clock = FakeClock()
+        cache = MemoryCacheBackend(max_entries=10, clock=clock)
+        cache.set("a", {"v": 1}, ttl=30)
+
+        clock.now += 29
+        assert cache.get("a") == {"v": 1}
+
+        clock.now += 2
+        assert cache.get("a") is None
+        assert cache.size() == 0
+
+
+class TestSQLiteCacheBackend:
+    """Tests for the SQLite file backend"""
+
+    def test_round_trip_and_eviction(self, tmp_path):
+        """Test set/get and bounded size"""
+        from app.services.cache_service import SQLiteCacheBackend
+
+        cache = SQLiteCacheBackend(str(tmp_path / "cache.db"), max_entries=2)
+        cache.set("a", {"v": 1}, ttl=60)
+        cache.set("b", {"v": 2}, ttl=60)
+        cache.set("c", {"v": 3}, ttl=60)
+
+        assert cache.size() == 2
+        assert cache.get("c") == {"v": 3}
+
+    def test_expired_entry(self, tmp_path):
+        """Test that expired rows are not returned"""
+        from app.services.cache_service import SQLiteCacheBackend
+
+        cache = SQLiteCacheBackend(str(tmp_path / "cache.db"), max_entries=10)
+        cache.set("a", {"v": 1}, ttl=-1)
+
+        assert cache.get("a") is None
+
+
+class TestDatabaseCacheBackend:
+    """Tests for the application database backend"""
+
+    def test_round_trip_and_eviction(self, db_session):
+        """Test set/get and bounded size against the test database"""
+        from sqlalchemy.orm import sessionmaker
+        from app.services.cache_service import DatabaseCacheBackend
+
+        cache = DatabaseCacheBackend(sessionmaker(bind=db_session.get_bind()), max_entries=2)
+        cache.set("a", {"v": 1}, ttl=60)
+        cache.set("b", {"v": 2}, ttl=60)
+        cache.set("c", {"v": 3}, ttl=60)
+
+        assert cache.size() == 2
+        assert cache.get("c") == {"v": 3}
+
+        cache.clear()
+        assert cache.size() == 0
+
+
+class TestResultCache:
+    """Tests for the async cache front"""
+
+    @pytest.mark.asyncio
+    async def test_hit_miss_counters(self):
+        """Test that hits and misses are counted"""
+        from app.services.cache_service import ResultCache, MemoryCacheBackend
+
+        cache = ResultCache(MemoryCacheBackend(10), ttl=60)
+
+        assert await cache.get("k") is None
+        await cache.set("k", {"v": 1})
+        assert await cache.get("k") == {"v": 1}
+
+        assert cache.hits == 1
+        assert cache.misses == 1
+        assert cache.stats()["entries"] == 1
+
+    @pytest.mark.asyncio
+    async def test_disabled_cache(self):
+        """Test that a cache without backend never stores anything"""
+        from app.services.cache_service import build_cache
+
+        cache = build_cache("none")
+        await cache.set("k", {"v": 1})
+
+        assert await cache.get("k") is None
+        assert cache.stats()["backend"] == "none"
+
+
+class TestAnalyzeCaching:
+    """Tests for cached POST /analyze responses"""
+
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_repeat_request_served_from_cache(
+        self,
+        mock_gemini,
+        mock_hf,
+        client,
+        auth_headers,
+        sample_text,
+        mock_huggingface_response,
+        mock_gemini_response
+    ):
+        """Test that a resubmitted text skips both upstream calls"""
+        mock_hf.return_value = mock_huggingface_response
+        mock_gemini.return_value = mock_gemini_response
+
+        first = client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+        second = client.post("/analyze/", json={"text": "  " + sample_text + "\n"}, headers=auth_headers)
+
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert first.json()["meta"]["cached"] is False
+
+        meta = second.json()["meta"]
+        assert meta["cached"] is True
+        assert meta["cache_hits"] == 1
+        assert meta["cache_latency_ms"] is not None
+        assert second.json()["summary"] == first.json()["summary"]
+        assert mock_hf.call_count == 1
+        assert mock_gemini.call_count == 1
+
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_failed_analysis_not_cached(
+        self,
+        mock_gemini,
+        mock_hf,
+        client,
+        auth_headers,
+        sample_text,
+        mock_huggingface_response,
+        mock_gemini_response
+    ):
+        """Test that upstream failures are not cached"""
+        from app.services.gemini_service import GeminiError
+
+        mock_hf.return_value = mock_huggingface_response
+        mock_gemini.side_effect = [GeminiError("API error"), mock_gemini_response]
+
+        first = client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+        second = client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+
+        assert first.status_code == 503
+        assert second.status_code == 200
+        assert second.json()["meta"]["cached"] is False
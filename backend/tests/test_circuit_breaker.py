@@ -0,0 +1,197 @@
+"""
+Circuit Breaker Tests
+Tests for breaker state transitions and fast-failing upstream calls
+"""
+import pytest
+import httpx
+from unittest.mock import patch, AsyncMock
+
+
+class FakeClock:
+    """Controllable clock for reset timeout tests"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock=None, **overrides):
+    from app.utils.circuit_breaker import CircuitBreaker
+
+    settings = dict(
+        failure_threshold=3,
+        error_rate=0.5,
+        window_size=10,
+        min_calls=4,
+        reset_timeout=30,
+        half_open_max_calls=1,
+    )
+    settings.update(overrides)
+    return CircuitBreaker("test", clock=clock or FakeClock(), **settings)
+
+
+def record(breaker, *outcomes):
+    for success in outcomes:
+        breaker.after_call(breaker.before_call(), success)
+
+
+class TestCircuitBreaker:
+    """Tests for CircuitBreaker state transitions"""
+
+    def test_trips_on_consecutive_failures(self):
+        """Test that failure_threshold failures in a row open the circuit"""
+        from app.utils.circuit_breaker import CircuitOpenError
+
+        breaker = make_breaker()
+        record(breaker, False, False)
+        assert breaker.state == "closed"
+
+        record(breaker, False)
+        assert breaker.state == "open"
+
+        with pytest.raises(CircuitOpenError) as exc_info:
+            breaker.before_call()
+        assert exc_info.value.retry_after == 30
+        assert breaker.rejected == 1
+
+    def test_success_resets_consecutive_count(self):
+        """Test that a success in between keeps the circuit closed"""
+        breaker = make_breaker(min_calls=100)
+        record(breaker, False, False, True, False, False)
+
+        assert breaker.state == "closed"
+
+    def test_trips_on_error_rate(self):
+        """Test that a high failure rate over the window opens the circuit"""
+        breaker = make_breaker(failure_threshold=100)
+        record(breaker, True, False, True)
+        assert breaker.state == "closed"
+
+        record(breaker, False)
+        assert breaker.state == "open"
+
+    def test_half_open_probe_success_closes(self):
+        """Test that after reset_timeout one probe is let through and closes the circuit"""
+        from app.utils.circuit_breaker import CircuitOpenError
+
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        record(breaker, False, False, False)
+
+        clock.now += 31
+        probe = breaker.before_call()
+        assert breaker.state == "half_open"
+        assert probe.probe is True
+
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.after_call(probe, success=True)
+        assert breaker.state == "closed"
+        assert breaker.stats()["error_rate"] == 0.0
+
+    def test_half_open_probe_failure_reopens(self):
+        """Test that a failed probe opens the circuit for another reset_timeout"""
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        record(breaker, False, False, False)
+
+        clock.now += 31
+        breaker.after_call(breaker.before_call(), success=False)
+
+        assert breaker.state == "open"
+        assert breaker.times_opened == 2
+        assert breaker.stats()["retry_after"] == 30
+
+    @pytest.mark.asyncio
+    async def test_guard_ignores_load_shedding(self):
+        """Test that shed calls inside the guard are not counted as failures"""
+        from app.utils.limiter import LoadShedError
+
+        breaker = make_breaker(failure_threshold=1)
+
+        with pytest.raises(LoadShedError):
+            async with breaker.guard():
+                raise LoadShedError("test", 1)
+        assert breaker.state == "closed"
+
+        with pytest.raises(RuntimeError):
+            async with breaker.guard():
+                raise RuntimeError("boom")
+        assert breaker.state == "open"
+
+    @pytest.mark.asyncio
+    async def test_guard_failed_flag(self):
+        """Test that marking call.failed records a failure without an exception"""
+        breaker = make_breaker(failure_threshold=1)
+
+        async with breaker.guard() as call:
+            call.failed = True
+
+        assert breaker.state == "open"
+
+
+class TestUpstreamBreakers:
+    """Tests for the breakers around HuggingFace and Gemini"""
+
+    @pytest.mark.asyncio
+    @patch('app.services.huggingface_service.hf_retry.base_delay', 0)
+    @patch('app.services.huggingface_service.httpx.AsyncClient')
+    async def test_open_circuit_stops_huggingface_retries(self, mock_client_class):
+        """Test that an open circuit cuts retries short and fails later calls at once"""
+        from app.services import huggingface_service
+        from app.services.huggingface_service import classify_text, hf_breaker
+        from app.utils.circuit_breaker import CircuitOpenError
+
+        huggingface_service._client = None
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = httpx.ConnectError("connection refused")
+        mock_client_class.return_value = mock_client
+
+        with patch.object(hf_breaker, "failure_threshold", 2):
+            with pytest.raises(CircuitOpenError):
+                await classify_text("Some text to classify")
+            assert mock_client.post.call_count == 2
+
+            with pytest.raises(CircuitOpenError):
+                await classify_text("Some text to classify")
+            assert mock_client.post.call_count == 2
+
+        huggingface_service._client = None
+
+    @pytest.mark.asyncio
+    @patch('app.services.gemini_service._get_model')
+    async def test_open_circuit_fails_gemini_fast(self, mock_get_model):
+        """Test that analyze_text does not call Gemini while its circuit is open"""
+        from app.services.gemini_service import analyze_text, gemini_breaker
+        from app.utils.circuit_breaker import CircuitOpenError
+
+        record(gemini_breaker, *[False] * gemini_breaker.failure_threshold)
+
+        with pytest.raises(CircuitOpenError):
+            await analyze_text("Some text to analyze", "technology")
+
+        mock_get_model.return_value.generate_content.assert_not_called()
+
+    @patch('app.routers.analyze.classify_text')
+    def test_open_circuit_returns_503(self, mock_hf, client, auth_headers, sample_text):
+        """Test that /analyze answers an open circuit with 503 and Retry-After"""
+        from app.utils.circuit_breaker import CircuitOpenError
+
+        mock_hf.side_effect = CircuitOpenError("huggingface", 12)
+
+        response = client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "12"
+        assert response.json()["detail"].startswith("Classification service unavailable")
+
+    def test_health_reports_breakers(self, client):
+        """Test that the health check exposes breaker state"""
+        response = client.get("/analyze/health")
+
+        breakers = response.json()["breakers"]
+        assert breakers["huggingface"]["state"] == "closed"
+        assert breakers["gemini"]["state"] == "closed"
@@ -0,0 +1,112 @@
+"""
+Classifier Backend Tests
+Tests for the backend registry, the local CPU engine and backend selection in /analyze
+"""
+import pytest
+from unittest.mock import patch
+
+
+class TestGetClassifier:
+    """Tests for the backend registry"""
+
+    def test_returns_singleton_per_name(self):
+        """Test backends are created once and reused"""
+        from app.services.classifier_service import get_classifier, LocalClassifier
+
+        assert get_classifier("local") is get_classifier("local")
+        assert isinstance(get_classifier("local"), LocalClassifier)
+
+    def test_unknown_backend(self):
+        """Test an unknown backend name is rejected"""
+        from app.services.classifier_service import get_classifier
+
+        with pytest.raises(ValueError):
+            get_classifier("does-not-exist")
+
+    def test_unknown_backend_fails_startup(self):
+        """Test the app refuses to start with an unknown CLASSIFIER_BACKEND"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        with patch('app.main.CLASSIFIER_BACKEND', 'bert'):
+            with pytest.raises(ValueError, match="Unknown classifier backend 'bert'"):
+                with TestClient(app):
+                    pass
+
+    @pytest.mark.asyncio
+    @patch('app.services.classifier_service.classify_text')
+    async def test_hf_backend_delegates(self, mock_classify, mock_huggingface_response):
+        """Test the hf backend calls classify_text"""
+        from app.services.classifier_service import get_classifier
+
+        mock_classify.return_value = mock_huggingface_response
+
+        result = await get_classifier("hf").classify("Some text", ["technology"])
+
+        assert result == mock_huggingface_response
+        mock_classify.assert_called_once_with("Some text", ["technology"])
+
+
+class TestLocalClassifier:
+    """Tests for the local hashed-centroid engine"""
+
+    @pytest.mark.asyncio
+    async def test_classifies_obvious_texts(self):
+        """Test clear-cut texts land in the expected category"""
+        from app.services.classifier_service import LocalClassifier
+
+        classifier = LocalClassifier(model_name="")
+
+        tech = await classifier.classify("The new smartphone chip runs machine learning algorithms on device")
+        food = await classifier.classify("This recipe for chocolate cake is perfect for weekend baking")
+
+        assert tech["category"] == "technology"
+        assert food["category"] == "food"
+
+    @pytest.mark.asyncio
+    async def test_result_shape(self):
+        """Test the result matches classify_text's shape and scores sum to one"""
+        from app.services.classifier_service import LocalClassifier
+
+        classifier = LocalClassifier(model_name="")
+        result = await classifier.classify("Stocks rallied as the bank beat profit forecasts", ["business", "sports"])
+
+        assert set(result) == {"category", "confidence", "scores", "latency_ms"}
+        assert list(result["scores"]) == ["business", "sports"]
+        assert result["confidence"] == result["scores"]["business"]
+        assert sum(result["scores"].values()) == pytest.approx(1.0, abs=1e-3)
+
+    @pytest.mark.asyncio
+    async def test_custom_labels_without_description(self):
+        """Test labels without a description are matched by their own name"""
+        from app.services.classifier_service import LocalClassifier
+
+        classifier = LocalClassifier(model_name="")
+        result = await classifier.classify("A long thread about gardening and roses", ["gardening", "finance"])
+
+        assert result["category"] == "gardening"
+
+
+class TestAnalyzeWithLocalBackend:
+    """Tests for CLASSIFIER_BACKEND selection in /analyze"""
+
+    @patch('app.routers.analyze.CLASSIFIER_BACKEND', 'local')
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_local_backend_skips_huggingface(
+        self,
+        mock_gemini,
+        mock_hf,
+        client,
+        auth_headers,
+        sample_text,
+        mock_gemini_response
+    ):
+        """Test the local backend classifies without calling HuggingFace"""
+        mock_gemini.return_value = mock_gemini_response
+
+        response = client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.json()["category"] == "technology"
+        mock_hf.assert_not_called()
@@ -0,0 +1,158 @@
+"""
+Near-duplicate Reuse Tests
+Tests for SimHash fingerprints, the LSH index and near-duplicate reuse in /analyze
+"""
+import pytest
+from unittest.mock import patch
+
+ARTICLE = (
+    "The city council approved a plan on Tuesday to convert three downtown parking garages into "
+    "affordable housing, a move supporters say could add nearly four hundred apartments within five "
+    "years. The proposal passed after a long debate in which several members questioned the cost "
+    "of the conversions and the loss of parking for nearby shops. Officials said construction on "
+    "the first garage would begin next spring and that rents would be capped for at least thirty "
+    "years. Read more at https://news.example.com/council-housing-plan"
+)
+
+RESUBMITTED = (
+    "The city council approved a plan on Tuesday to convert three downtown parking garages into\n"
+    "affordable housing,  a move supporters say could add nearly four hundred apartments within five "
+    "years. The proposal passed after a long debate in which several members questionned the cost "
+    "of the conversions and the loss of parking for nearby shops. Officials said construction on "
+    "the first garage would begin next spring and that rents would be capped for at least thirty "
+    "years. Read more at https://news.example.com/council-housing-plan?utm_source=newsletter&utm_medium=email"
+)
+
+UNRELATED = (
+    "The national team won its opening match of the tournament on Saturday after a late goal from "
+    "its youngest player, who came off the bench in the second half. The coach praised the squad's "
+    "patience against a defensive opponent and said the win would give the players confidence for "
+    "the tougher games ahead. Fans celebrated in the streets of the capital late into the night, and "
+    "the federation announced extra ticket sales for the next home game later this month."
+)
+
+
+class TestSimHash:
+    """Tests for text fingerprints"""
+
+    def test_trivial_edits_stay_close(self):
+        """Test that whitespace, case and tracking parameters are ignored, and a typo moves few bits"""
+        from app.utils.text import simhash
+
+        base = simhash(ARTICLE)
+
+        assert simhash("  " + ARTICLE.upper().replace(" ", "\n ")) == base
+        assert simhash(ARTICLE + "?utm_campaign=spring#comments") == base
+        assert (simhash(RESUBMITTED) ^ base).bit_count() <= 256 * 0.1
+
+    def test_unrelated_texts_are_far(self):
+        """Test that different articles are not within the default threshold"""
+        from app.utils.text import simhash
+        from app.services.dedup_service import max_distance
+
+        assert (simhash(ARTICLE) ^ simhash(UNRELATED)).bit_count() > max_distance(0.8)
+
+    def test_short_texts_are_not_fingerprinted(self):
+        """Test that texts under min_words only match exactly"""
+        from app.services.dedup_service import text_fingerprint
+
+        assert text_fingerprint("A short note about the weather today.", min_words=50) is None
+        assert text_fingerprint(ARTICLE, min_words=50) is not None
+
+
+class TestNearDuplicateIndex:
+    """Tests for the LSH index"""
+
+    def test_lookup_within_distance_and_context(self):
+        """Test that a match needs at most max_distance differing bits and the same context"""
+        from app.services.dedup_service import NearDuplicateIndex
+
+        fingerprint = 0x0123456789ABCDEF << 100
+        index = NearDuplicateIndex(threshold=0.9, max_entries=10)
+        index.add("ctx", fingerprint, {"category": "politics"})
+
+        result, similarity = index.lookup("ctx", fingerprint ^ (2 ** 25 - 1))
+        assert result == {"category": "politics"}
+        assert similarity == round(1 - 25 / 256, 4)
+        assert index.lookup("ctx", fingerprint ^ (2 ** 26 - 1)) is None
+        assert index.lookup("other", fingerprint) is None
+
+    def test_eviction_empties_buckets(self):
+        """Test that least recently used entries leave the index entirely"""
+        from app.services.dedup_service import NearDuplicateIndex, LSH_BANDS
+
+        ones = 2 ** 256 - 1
+        index = NearDuplicateIndex(threshold=0.9, max_entries=2)
+        for fingerprint in (0, ones // 3, ones):
+            index.add("ctx", fingerprint, {"fingerprint": fingerprint})
+
+        assert index.size() == 2
+        assert index.lookup("ctx", 0) is None
+        assert index.lookup("ctx", ones)[0] == {"fingerprint": ones}
+        assert index.stats()["buckets"] == 2 * LSH_BANDS
+
+
+class TestAnalyzeNearDuplicates:
+    """Tests for near-duplicate reuse in /analyze"""
+
+    @pytest.fixture(autouse=True)
+    def dedup_enabled(self, mock_huggingface_response, mock_gemini_response):
+        with patch('app.routers.analyze.DEDUP_ENABLED', True), \
+                patch('app.routers.analyze.classify_text') as mock_hf, \
+                patch('app.routers.analyze.analyze_text') as mock_gemini:
+            mock_hf.return_value = mock_huggingface_response
+            mock_gemini.return_value = mock_gemini_response
+            yield mock_hf
+
+    def test_resubmission_reuses_result(self, client, auth_headers, dedup_enabled):
+        """Test that an edited resubmission is served from the first analysis"""
+        first = client.post("/analyze/", json={"text": ARTICLE}, headers=auth_headers).json()
+        response = client.post("/analyze/", json={"text": RESUBMITTED}, headers=auth_headers)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert dedup_enabled.call_count == 1
+        assert data["summary"] == first["summary"]
+        assert data["meta"]["cached"] is True
+        assert data["meta"]["near_duplicate_similarity"] >= 0.85
+
+    def test_no_reuse_across_texts_or_labels(self, client, auth_headers, dedup_enabled):
+        """Test that an unrelated text, or the same text with other labels, runs the pipeline"""
+        client.post("/analyze/", json={"text": ARTICLE}, headers=auth_headers)
+        response = client.post("/analyze/", json={"text": UNRELATED}, headers=auth_headers)
+        assert response.json()["meta"]["near_duplicate_similarity"] is None
+
+        label_set = client.post(
+            "/label-sets/", json={"name": "civic", "labels": ["housing", "transport"]}, headers=auth_headers
+        ).json()
+        client.post("/analyze/", json={"text": RESUBMITTED, "label_set_id": label_set["id"]}, headers=auth_headers)
+
+        assert dedup_enabled.call_count == 3
+
+    def test_index_rebuilds_from_history(self, client, auth_headers, dedup_enabled):
+        """Test that fingerprints written with the history restore the index"""
+        from app.services.dedup_service import near_duplicates
+        from app.services.history_service import history_writer
+
+        client.post("/analyze/", json={"text": ARTICLE}, headers=auth_headers)
+        client.portal.call(history_writer.flush)
+        near_duplicates.clear()
+
+        assert client.portal.call(near_duplicates.rebuild, history_writer.session_factory) == 1
+        response = client.post("/analyze/", json={"text": RESUBMITTED}, headers=auth_headers)
+
+        assert dedup_enabled.call_count == 1
+        assert response.json()["meta"]["near_duplicate_similarity"] is not None
+
+    def test_rebuild_after_near_duplicate_chain(self, client, auth_headers, dedup_enabled):
+        """Test that reused results are not indexed, so a rebuild keeps matching against the computed text only"""
+        from app.services.dedup_service import near_duplicates
+        from app.services.history_service import history_writer
+
+        client.post("/analyze/", json={"text": ARTICLE}, headers=auth_headers)
+        reused = client.post("/analyze/", json={"text": RESUBMITTED}, headers=auth_headers).json()
+        assert reused["meta"]["near_duplicate_similarity"] is not None
+        before = near_duplicates.stats()["entries"]
+        client.portal.call(history_writer.flush)
+
+        assert client.portal.call(near_duplicates.rebuild, history_writer.session_factory) == before == 1
@@ -2,15 +2,26 @@
 Gemini Service Unit Tests
 Tests for analyze_text with mocked Gemini API
 """
+import time
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 
 
+@pytest.fixture(autouse=True)
+def reset_gemini_model():
+    """Drop the cached model so each test sees its own patched GenerativeModel"""
+    from app.services import gemini_service
+    gemini_service._model = None
+    yield
+    gemini_service._model = None
+
+
 class TestAnalyzeText:
     """Tests for Gemini analyze_text function"""
     
     @pytest.mark.asyncio
-    @patch('app.services.gemini_service.genai.GenerativeModel')
+    @patch('google.generativeai.GenerativeModel')
     async def test_analyze_text_success_json_response(self, mock_model_class):
         """Test successful analysis with JSON response"""
         from app.services.gemini_service import analyze_text
@@ -30,7 +41,7 @@ class TestAnalyzeText:
         assert "latency_ms" in result
     
     @pytest.mark.asyncio
-    @patch('app.services.gemini_service.genai.GenerativeModel')
+    @patch('google.generativeai.GenerativeModel')
     async def test_analyze_text_success_plain_text_response(self, mock_model_class):
         """Test successful analysis with plain text response (fallback parsing)"""
         from app.services.gemini_service import analyze_text
@@ -49,7 +60,7 @@ class TestAnalyzeText:
         assert result["tone"] == "positif"
     
     @pytest.mark.asyncio
-    @patch('app.services.gemini_service.genai.GenerativeModel')
+    @patch('google.generativeai.GenerativeModel')
     async def test_analyze_text_negative_tone(self, mock_model_class):
         """Test detection of negative tone"""
         from app.services.gemini_service import analyze_text
@@ -66,7 +77,7 @@ class TestAnalyzeText:
         assert result["tone"] == "négatif"
     
     @pytest.mark.asyncio
-    @patch('app.services.gemini_service.genai.GenerativeModel')
+    @patch('google.generativeai.GenerativeModel')
     async def test_analyze_text_neutral_tone(self, mock_model_class):
         """Test detection of neutral tone"""
         from app.services.gemini_service import analyze_text
@@ -83,7 +94,7 @@ class TestAnalyzeText:
         assert result["tone"] == "neutre"
     
     @pytest.mark.asyncio
-    @patch('app.services.gemini_service.genai.GenerativeModel')
+    @patch('google.generativeai.GenerativeModel')
     async def test_analyze_text_invalid_tone_defaults_to_neutre(self, mock_model_class):
         """Test that invalid tone defaults to neutre"""
         from app.services.gemini_service import analyze_text
@@ -100,7 +111,7 @@ class TestAnalyzeText:
         assert result["tone"] == "neutre"
     
     @pytest.mark.asyncio
-    @patch('app.services.gemini_service.genai.GenerativeModel')
+    @patch('google.generativeai.GenerativeModel')
     async def test_analyze_text_empty_response_error(self, mock_model_class):
         """Test error handling for empty response"""
         from app.services.gemini_service import analyze_text, GeminiError
@@ -118,7 +129,7 @@ class TestAnalyzeText:
         assert "Empty response" in str(exc_info.value)
     
     @pytest.mark.asyncio
-    @patch('app.services.gemini_service.genai.GenerativeModel')
+    @patch('google.generativeai.GenerativeModel')
     async def test_analyze_text_api_exception(self, mock_model_class):
         """Test error handling for API exceptions"""
         from app.services.gemini_service import analyze_text, GeminiError
@@ -133,6 +144,172 @@ class TestAnalyzeText:
         assert "API quota exceeded" in str(exc_info.value)
 
 
+class TestCategoryAgnosticAnalysis:
+    """Tests for analyze_text without a category (parallel pipeline)"""
+    
+    @pytest.mark.asyncio
+    @patch('google.generativeai.GenerativeModel')
+    async def test_returns_category_guess(self, mock_model_class):
+        """Test the open prompt lists the labels and the guess is returned"""
+        from app.services.gemini_service import analyze_text
+        
+        mock_response = MagicMock()
+        mock_response.text = '{"summary": "Rates went up.", "tone": "neutre", "category": "Business"}'
+        mock_model_class.return_value.generate_content.return_value = mock_response
+        
+        result = await analyze_text("Central bank news", None, ["business", "sports"])
+        
+        prompt = mock_model_class.return_value.generate_content.call_args[0][0]
+        assert "business, sports" in prompt
+        assert "classified as" not in prompt
+        assert result["category"] == "business"
+
+
+class TestAnalyzeTexts:
+    """Tests for packed multi-document analyze_texts"""
+    
+    @pytest.mark.asyncio
+    @patch('google.generativeai.GenerativeModel')
+    async def test_single_packed_prompt(self, mock_model_class):
+        """Test several documents are analyzed with one Gemini call"""
+        from app.services.gemini_service import analyze_texts
+        
+        mock_response = MagicMock()
+        mock_response.text = (
+            '```json\n[{"id": 0, "summary": "First.", "tone": "positif"},'
+            ' {"id": 1, "summary": "Second.", "tone": "négatif"}]\n```'
+        )
+        mock_model_class.return_value.generate_content.return_value = mock_response
+        
+        results = await analyze_texts([("Text one", "technology"), ("Text two", "business")])
+        
+        assert mock_model_class.return_value.generate_content.call_count == 1
+        assert results[0]["summary"] == "First."
+        assert results[1]["tone"] == "négatif"
+    
+    @pytest.mark.asyncio
+    @patch('google.generativeai.GenerativeModel')
+    async def test_missing_documents_analyzed_individually(self, mock_model_class):
+        """Test documents missing from the packed answer fall back to analyze_text"""
+        from app.services.gemini_service import analyze_texts
+        
+        packed = MagicMock()
+        packed.text = '[{"id": 0, "summary": "First.", "tone": "neutre"}]'
+        single = MagicMock()
+        single.text = '{"summary": "Second, alone.", "tone": "positif"}'
+        mock_model_class.return_value.generate_content.side_effect = [packed, single]
+        
+        results = await analyze_texts([("Text one", "technology"), ("Text two", "business")])
+        
+        assert results[0]["summary"] == "First."
+        assert results[1]["summary"] == "Second, alone."
+        assert mock_model_class.return_value.generate_content.call_count == 2
+
+
+class TestAnalyzeTextStream:
+    """Tests for streamed analyze_text_stream"""
+    
+    @staticmethod
+    def _chunks(*texts):
+        chunks = []
+        for text in texts:
+            chunk = MagicMock()
+            chunk.text = text
+            chunks.append(chunk)
+        return chunks
+    
+    @pytest.mark.asyncio
+    @patch('google.generativeai.GenerativeModel')
+    async def test_stream_tokens_and_tone(self, mock_model_class):
+        """Test summary tokens are streamed and the tone line is held back"""
+        from app.services.gemini_service import analyze_text_stream
+        
+        mock_model_class.return_value.generate_content.return_value = self._chunks(
+            "The market ", "rallied strongly today.\nTO", "NE: positif"
+        )
+        
+        events = [event async for event in analyze_text_stream("Market news", "business")]
+        
+        tokens = "".join(e["text"] for e in events if e["type"] == "token")
+        assert tokens.strip() == "The market rallied strongly today."
+        assert "TONE" not in tokens
+        assert events[-1]["type"] == "result"
+        assert events[-1]["tone"] == "positif"
+        assert events[-1]["summary"] == "The market rallied strongly today."
+    
+    @pytest.mark.asyncio
+    @patch('google.generativeai.GenerativeModel')
+    async def test_stream_without_tone_line(self, mock_model_class):
+        """Test a reply without tone line streams everything and defaults to neutre"""
+        from app.services.gemini_service import analyze_text_stream
+        
+        mock_model_class.return_value.generate_content.return_value = self._chunks("Just a summary.")
+        
+        events = [event async for event in analyze_text_stream("Some text", "science")]
+        
+        assert "".join(e["text"] for e in events if e["type"] == "token") == "Just a summary."
+        assert events[-1]["tone"] == "neutre"
+    
+    @pytest.mark.asyncio
+    @patch('google.generativeai.GenerativeModel')
+    async def test_stream_error_before_first_token_is_retried(self, mock_model_class):
+        """Test a failure before any token triggers a retry"""
+        from app.services.gemini_service import analyze_text_stream
+        
+        mock_model_class.return_value.generate_content.side_effect = [
+            Exception("Temporary failure"),
+            self._chunks("Recovered summary.\nTONE: neutre")
+        ]
+        
+        events = [event async for event in analyze_text_stream("Some text", "science")]
+        
+        assert events[-1]["summary"] == "Recovered summary."
+
+
+class TestGeminiConcurrency:
+    """Tests for the non-blocking Gemini execution path"""
+    
+    @pytest.mark.asyncio
+    @patch('google.generativeai.GenerativeModel')
+    async def test_model_built_once(self, mock_model_class):
+        """Test that the model object is created once and reused"""
+        from app.services.gemini_service import analyze_text
+        
+        mock_response = MagicMock()
+        mock_response.text = '{"summary": "Reused model.", "tone": "neutre"}'
+        mock_model_class.return_value.generate_content.return_value = mock_response
+        
+        await analyze_text("First text", "technology")
+        await analyze_text("Second text", "technology")
+        
+        assert mock_model_class.call_count == 1
+        assert mock_model_class.return_value.generate_content.call_count == 2
+    
+    @pytest.mark.asyncio
+    @patch('google.generativeai.GenerativeModel')
+    async def test_blocking_call_does_not_block_event_loop(self, mock_model_class):
+        """Test that parallel calls overlap instead of running one after another"""
+        from app.services.gemini_service import analyze_text
+        
+        mock_response = MagicMock()
+        mock_response.text = '{"summary": "Slow upstream.", "tone": "neutre"}'
+        
+        def slow_generate(prompt, **kwargs):
+            time.sleep(0.3)
+            return mock_response
+        
+        mock_model_class.return_value.generate_content.side_effect = slow_generate
+        
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            analyze_text(f"Text number {i}", "technology") for i in range(5)
+        ])
+        elapsed = time.perf_counter() - start
+        
+        assert len(results) == 5
+        assert elapsed < 1.0  # 5 serialized calls would take at least 1.5s
+
+
 class TestParseGeminiResponse:
     """Tests for _parse_gemini_response helper function"""
     
@@ -175,3 +352,104 @@ class TestParseGeminiResponse:
         # Should use the text as summary (up to 500 chars)
         assert result["summary"] == text
         assert result["tone"] == "neutre"  # Default
+
+
+# Answers seen from Gemini (and other chat models) around a JSON request:
+# (raw answer, parse outcome, summary, tone); summary None means the parse fails
+MALFORMED_RESPONSES = [
+    ('{"summary": "Stocks rose.", "tone": "positif"}', "strict", "Stocks rose.", "positif"),
+    ('\n  {"summary": "Stocks rose.", "tone": "Positif"}\n', "strict", "Stocks rose.", "positif"),
+    ('{"summary": "Le marché recule.", "tone": "négatif", "category": "Business"}', "strict", "Le marché recule.", "négatif"),
+    ('{"summary": "Braces {inside} the text.", "tone": "neutre"}', "strict", "Braces {inside} the text.", "neutre"),
+    ('```json\n{"summary": "Fenced answer.", "tone": "neutre"}\n```', "repaired", "Fenced answer.", "neutre"),
+    ('Here is the analysis:\n{"summary": "With a preamble.", "tone": "positif"}\nHope this helps!', "repaired", "With a preamble.", "positif"),
+    ('{"summary": "Trailing comma.", "tone": "neutre",\n}', "repaired", "Trailing comma.", "neutre"),
+    ('{\n  "summary": "Nested, trailing comma.",\n  "tone": "négatif",\n}\n```', "repaired", "Nested, trailing comma.", "négatif"),
+    ("Summary: Plain labeled lines.\nTone: positive", "repaired", "Plain labeled lines.", "positif"),
+    ("**Résumé:** Markdown labels.\n**Ton:** négatif", "repaired", "Markdown labels.", "négatif"),
+    ('{"summary": "Cut off in the middle of the sen', "failed", None, None),
+    ('{"summary": "Missing closing quote, "tone": "neutre"}', "failed", None, None),
+    ("{'summary': 'Python dict quoting', 'tone': 'neutre'}", "failed", None, None),
+    ('{“summary”: “Smart quotes”, “tone”: “neutre”}', "failed", None, None),
+    ('{"summary": "", "tone": "neutre"}', "failed", None, None),
+    ('{"tone": "neutre"}', "failed", None, None),
+    ('[{"summary": "Wrapped in an array.", "tone": "neutre"}]', "repaired", "Wrapped in an array.", "neutre"),
+    ('[{"summary": "Two objects.", "tone": "neutre"}, {"summary": "Ambiguous.", "tone": "neutre"}]', "failed", None, None),
+    ("I'm sorry, I can't help with that request.", "failed", None, None),
+]
+
+
+class TestStructuredOutput:
+    """Tests for the JSON mode parser and schema-constrained requests"""
+    
+    @pytest.mark.parametrize("raw,outcome,summary,tone", MALFORMED_RESPONSES)
+    def test_parse_corpus(self, raw, outcome, summary, tone):
+        """Test the strict parser and its repair pass on real-world answers"""
+        from app.services.gemini_service import _parse_json_response, GeminiParseError
+        from app.utils.metrics import GEMINI_PARSE
+        
+        if summary is None:
+            with pytest.raises(GeminiParseError):
+                _parse_json_response(raw)
+        else:
+            result = _parse_json_response(raw)
+            assert result["summary"] == summary
+            assert result["tone"] == tone
+        
+        assert GEMINI_PARSE.labels(outcome=outcome).value == 1
+    
+    @pytest.mark.asyncio
+    @patch('google.generativeai.GenerativeModel')
+    async def test_requests_schema(self, mock_model_class):
+        """Test that analyze_text asks for JSON constrained to the answer schema"""
+        from app.services.gemini_service import analyze_text
+        
+        mock_model = MagicMock()
+        mock_model.generate_content.return_value = MagicMock(
+            text='{"summary": "Guessed.", "tone": "neutre", "category": "sports"}'
+        )
+        mock_model_class.return_value = mock_model
+        
+        result = await analyze_text("Some text", None, ["sports", "travel"])
+        
+        config = mock_model.generate_content.call_args.kwargs["generation_config"]
+        assert config["response_mime_type"] == "application/json"
+        assert config["response_schema"]["properties"]["category"]["enum"] == ["sports", "travel"]
+        assert result["category"] == "sports"
+    
+    @pytest.mark.asyncio
+    @patch('google.generativeai.GenerativeModel')
+    async def test_unparseable_answer_is_retried(self, mock_model_class):
+        """Test that an answer the repair pass cannot read is retried"""
+        from app.services.gemini_service import analyze_text
+        from app.utils.metrics import GEMINI_PARSE
+        
+        mock_model = MagicMock()
+        mock_model.generate_content.side_effect = [
+            MagicMock(text='{"summary": "Cut off'),
+            MagicMock(text='{"summary": "Complete.", "tone": "positif"}'),
+        ]
+        mock_model_class.return_value = mock_model
+        
+        result = await analyze_text("Some text", "technology")
+        
+        assert result["summary"] == "Complete."
+        assert mock_model.generate_content.call_count == 2
+        assert GEMINI_PARSE.labels(outcome="failed").value == 1
+        assert GEMINI_PARSE.labels(outcome="strict").value == 1
+    
+    @pytest.mark.asyncio
+    @patch('google.generativeai.GenerativeModel')
+    async def test_json_mode_off(self, mock_model_class):
+        """Test that without JSON mode no schema is sent and prose is kept as the summary"""
+        from app.services.gemini_service import analyze_text
+        
+        mock_model = MagicMock()
+        mock_model.generate_content.return_value = MagicMock(text="Just some prose about the text.")
+        mock_model_class.return_value = mock_model
+        
+        with patch('app.services.gemini_service.GEMINI_JSON_MODE', False):
+            result = await analyze_text("Some text", "technology")
+        
+        assert "generation_config" not in mock_model.generate_content.call_args.kwargs
+        assert result["summary"] == "Just some prose about the text."
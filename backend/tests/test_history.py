@@ -0,0 +1,236 @@
+"""
+Analysis History Tests
+Tests for the write-behind history buffer and GET /analyze/history
+"""
+import pytest
+from unittest.mock import patch
+
+
+def make_row(user_id=1, category="technology", **overrides):
+    row = {
+        "user_id": user_id,
+        "text_hash": "0" * 64,
+        "category": category,
+        "hf_scores": {category: 0.9},
+        "summary": "A summary.",
+        "tone": "neutre",
+        "hf_latency_ms": 10,
+        "gemini_latency_ms": 20,
+        "total_execution_ms": 35,
+        "cached": False,
+    }
+    row.update(overrides)
+    return row
+
+
+def seed(db_session, user_id, count, category="technology"):
+    from app.models.analysis import Analysis
+
+    db_session.add_all([Analysis(**make_row(user_id, category)) for _ in range(count)])
+    db_session.commit()
+
+
+class TestHistoryWriter:
+    """Tests for the write-behind buffer"""
+
+    @pytest.mark.asyncio
+    async def test_flush_inserts_in_batches(self, db_session):
+        """Test that buffered rows are written in batch_size chunks"""
+        from app.services.history_service import HistoryWriter, history_writer
+        from app.models.analysis import Analysis
+
+        writer = HistoryWriter(history_writer.session_factory, batch_size=2, flush_interval=60, max_buffer=100)
+        for _ in range(5):
+            assert writer.record(make_row()) is True
+        assert db_session.query(Analysis).count() == 0
+
+        assert await writer.flush() == 5
+
+        assert db_session.query(Analysis).count() == 5
+        stats = writer.stats()
+        assert stats["flushes"] == 3
+        assert stats["pending"] == 0
+
+    def test_full_buffer_drops_new_rows(self):
+        """Test that record never blocks and drops rows past max_buffer"""
+        from app.services.history_service import HistoryWriter
+
+        writer = HistoryWriter(batch_size=10, max_buffer=2)
+
+        assert writer.record(make_row()) is True
+        assert writer.record(make_row()) is True
+        assert writer.record(make_row()) is False
+        assert writer.stats()["dropped"] == 1
+        assert writer.pending() == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_rows(self):
+        """Test that rows survive a database outage for the next flush"""
+        from app.services.history_service import HistoryWriter
+
+        def broken_session():
+            raise ConnectionError("database is down")
+
+        writer = HistoryWriter(broken_session, batch_size=2, max_buffer=10)
+        for _ in range(3):
+            writer.record(make_row())
+
+        assert await writer.flush() == 0
+        assert writer.pending() == 3
+        assert writer.stats()["failed_flushes"] == 1
+
+    @pytest.mark.asyncio
+    async def test_rejected_row_does_not_stall_others(self, db_session):
+        """Test that a row the database rejects is isolated, retried and dropped without holding up later rows"""
+        from app.services.history_service import HistoryWriter, history_writer
+        from app.models.analysis import Analysis
+
+        writer = HistoryWriter(history_writer.session_factory, batch_size=4, max_buffer=100, max_attempts=2)
+        writer.record(make_row())
+        writer.record(make_row(category=None))  # NOT NULL violation
+        for _ in range(5):
+            writer.record(make_row())
+
+        assert await writer.flush() == 6
+        assert db_session.query(Analysis).count() == 6
+        assert writer.pending() == 1
+
+        writer.record(make_row())
+        assert await writer.flush() == 1
+        assert writer.pending() == 0
+        stats = writer.stats()
+        assert stats["rejected"] == 1
+        assert stats["failed_flushes"] == 0
+        assert db_session.query(Analysis).count() == 7
+
+    @pytest.mark.asyncio
+    async def test_background_flush_on_full_batch(self, db_session):
+        """Test that the running flusher writes as soon as a batch is full"""
+        import asyncio
+        from app.services.history_service import HistoryWriter, history_writer
+        from app.models.analysis import Analysis
+
+        writer = HistoryWriter(history_writer.session_factory, batch_size=2, flush_interval=60, max_buffer=100)
+        await writer.start()
+        try:
+            writer.record(make_row())
+            writer.record(make_row())
+            for _ in range(100):
+                if writer.stats()["written"] == 2:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await writer.stop()
+
+        assert db_session.query(Analysis).count() == 2
+
+    @pytest.mark.asyncio
+    async def test_stop_during_slow_insert_keeps_rows(self, db_session):
+        """Test that stopping mid-insert lets the batch finish and writes the rest"""
+        import asyncio
+        from app.services.history_service import HistoryWriter, history_writer
+        from app.models.analysis import Analysis
+
+        writer = HistoryWriter(history_writer.session_factory, batch_size=2, flush_interval=60, max_buffer=100)
+        insert = writer._insert
+        inserting = asyncio.Event()
+
+        async def slow_insert(entries):
+            inserting.set()
+            await asyncio.sleep(0.1)
+            await insert(entries)
+
+        writer._insert = slow_insert
+        await writer.start()
+        for _ in range(4):
+            writer.record(make_row())
+        await asyncio.wait_for(inserting.wait(), timeout=5)
+        await writer.stop()
+
+        assert db_session.query(Analysis).count() == 4
+        stats = writer.stats()
+        assert (stats["written"], stats["pending"], stats["dropped"]) == (4, 0, 0)
+
+    def test_keyset_query_uses_composite_index(self, db_session):
+        """Test that a history page is an index range scan, not a table scan plus sort"""
+        from sqlalchemy import select, text
+        from app.models.analysis import Analysis
+
+        query = (
+            select(Analysis).where(Analysis.user_id == 1, Analysis.id < 1000)
+            .order_by(Analysis.id.desc()).limit(21)
+        )
+        sql = str(query.compile(compile_kwargs={"literal_binds": True}))
+        plan = " ".join(str(row[-1]) for row in db_session.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+        assert "ix_analyses_user_id_id" in plan
+        assert "TEMP B-TREE" not in plan
+
+
+class TestHistoryEndpoint:
+    """Tests for GET /analyze/history"""
+
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_analysis_appears_in_history(
+        self, mock_gemini, mock_hf, client, auth_headers, sample_text,
+        mock_huggingface_response, mock_gemini_response
+    ):
+        """Test that an /analyze result is written behind and listed"""
+        from app.services.history_service import history_writer, text_hash
+
+        mock_hf.return_value = mock_huggingface_response
+        mock_gemini.return_value = mock_gemini_response
+
+        assert client.post("/analyze/", json={"text": sample_text}, headers=auth_headers).status_code == 200
+        client.portal.call(history_writer.flush)
+
+        response = client.get("/analyze/history", headers=auth_headers)
+
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) == 1
+        item = page["items"][0]
+        assert item["category"] == "technology"
+        assert item["summary"] == mock_gemini_response["summary"]
+        assert item["text_hash"] == text_hash(sample_text)
+        assert item["gemini_latency_ms"] == 650
+        assert page["next_cursor"] is None
+
+    def test_pages_follow_cursor(self, client, auth_headers, db_session):
+        """Test that following next_cursor lists every row once, newest first"""
+        user_id = client.get("/auth/me", headers=auth_headers).json()["id"]
+        seed(db_session, user_id, 25)
+        seed(db_session, user_id + 1, 5)
+
+        ids, cursor = [], None
+        while True:
+            params = {"limit": 10} if cursor is None else {"limit": 10, "cursor": cursor}
+            page = client.get("/analyze/history", params=params, headers=auth_headers).json()
+            ids.extend(item["id"] for item in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        assert len(ids) == 25
+        assert ids == sorted(ids, reverse=True)
+
+    def test_category_filter(self, client, auth_headers, db_session):
+        """Test filtering the history by category"""
+        user_id = client.get("/auth/me", headers=auth_headers).json()["id"]
+        seed(db_session, user_id, 3, "sports")
+        seed(db_session, user_id, 2, "health")
+
+        page = client.get("/analyze/history", params={"category": "health"}, headers=auth_headers).json()
+
+        assert [item["category"] for item in page["items"]] == ["health", "health"]
+
+    def test_limit_is_bounded(self, client, auth_headers):
+        """Test that oversized pages are rejected"""
+        response = client.get("/analyze/history", params={"limit": 100000}, headers=auth_headers)
+
+        assert response.status_code == 422
+
+    def test_requires_auth(self, client):
+        """Test that the history is not public"""
+        assert client.get("/analyze/history").status_code == 401
@@ -7,6 +7,15 @@ from unittest.mock import patch, AsyncMock, MagicMock
 import httpx
 
 
+@pytest.fixture(autouse=True)
+def reset_hf_client():
+    """Drop the shared client so each test builds one from its patched AsyncClient"""
+    from app.services import huggingface_service
+    huggingface_service._client = None
+    yield
+    huggingface_service._client = None
+
+
 class TestClassifyText:
     """Tests for HuggingFace classify_text function"""
     
@@ -156,3 +165,107 @@ class TestClassifyText:
         
         assert result["category"] == "positive"
         assert result["confidence"] == 0.75
+
+
+class TestClassifyTexts:
+    """Tests for batched classify_texts"""
+    
+    @pytest.mark.asyncio
+    @patch('app.services.huggingface_service.httpx.AsyncClient')
+    async def test_multi_input_request(self, mock_client_class):
+        """Test several texts are classified with one request"""
+        from app.services.huggingface_service import classify_texts
+        
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = [
+            {"sequence": "a", "labels": ["technology", "food"], "scores": [0.9, 0.1]},
+            {"sequence": "b", "labels": ["food", "technology"], "scores": [0.8, 0.2]}
+        ]
+        
+        mock_client = AsyncMock()
+        mock_client.post.return_value = mock_response
+        mock_client_class.return_value = mock_client
+        
+        results = await classify_texts(["text a", "text b"], ["technology", "food"])
+        
+        assert mock_client.post.call_count == 1
+        assert mock_client.post.call_args.kwargs["json"]["inputs"] == ["text a", "text b"]
+        assert [r["category"] for r in results] == ["technology", "food"]
+    
+    @pytest.mark.asyncio
+    @patch('app.services.huggingface_service.httpx.AsyncClient')
+    async def test_falls_back_to_single_requests(self, mock_client_class):
+        """Test fallback to one request per text when the batch is rejected"""
+        from app.services.huggingface_service import classify_texts
+        
+        rejected = MagicMock()
+        rejected.status_code = 400
+        single = MagicMock()
+        single.status_code = 200
+        single.json.return_value = [{"label": "technology", "score": 0.9}]
+        
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = [rejected, single, single]
+        mock_client_class.return_value = mock_client
+        
+        results = await classify_texts(["text a", "text b"])
+        
+        assert mock_client.post.call_count == 3
+        assert all(r["category"] == "technology" for r in results)
+
+
+class TestSharedClient:
+    """Tests for the pooled, lifespan-managed HTTP client"""
+    
+    @pytest.mark.asyncio
+    @patch('app.services.huggingface_service.httpx.AsyncClient')
+    async def test_client_reused_across_calls(self, mock_client_class):
+        """Test that consecutive classifications share one client"""
+        from app.services.huggingface_service import classify_text
+        
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = [{"label": "technology", "score": 0.9}]
+        
+        mock_client = AsyncMock()
+        mock_client.post.return_value = mock_response
+        mock_client_class.return_value = mock_client
+        
+        await classify_text("First text about technology")
+        await classify_text("Second text about technology")
+        
+        assert mock_client_class.call_count == 1
+        assert mock_client.post.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_start_and_close_client(self):
+        """Test lifespan hooks open and close the shared client"""
+        from app.services import huggingface_service
+        
+        await huggingface_service.start_client()
+        client = huggingface_service._client
+        assert client is not None
+        
+        # Starting twice keeps the same client
+        await huggingface_service.start_client()
+        assert huggingface_service._client is client
+        
+        stats = huggingface_service.pool_stats()
+        assert stats["started"] is True
+        assert stats["connections"] == 0
+        
+        await huggingface_service.close_client()
+        assert huggingface_service._client is None
+        assert client.is_closed
+    
+    @pytest.mark.asyncio
+    async def test_pool_stats_before_start(self):
+        """Test pool statistics are available before the client exists"""
+        from app.services.huggingface_service import pool_stats, HF_POOL_MAX_CONNECTIONS
+        
+        stats = pool_stats()
+        
+        assert stats["started"] is False
+        assert stats["max_connections"] == HF_POOL_MAX_CONNECTIONS
+        assert "connections" not in stats
@@ -0,0 +1,148 @@
+"""
+Label Pre-filter Tests
+Tests for the local first stage of two-stage classification
+"""
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+
+@pytest.fixture(autouse=True)
+def reset_hf_client():
+    """Drop the shared client so each test builds one from its patched AsyncClient"""
+    from app.services import huggingface_service
+    huggingface_service._client = None
+    yield
+    huggingface_service._client = None
+
+
+class TestLabelPrefilter:
+    """Tests for LabelPrefilter.select"""
+
+    def test_keeps_closest_labels_in_order(self):
+        """Test that the top k labels are kept in their original order"""
+        from app.services.label_prefilter import label_prefilter
+        from app.services.huggingface_service import DEFAULT_LABELS
+
+        kept, pruned = label_prefilter.select(
+            "The home team won the championship match after a late goal from their young player",
+            DEFAULT_LABELS, 3
+        )
+
+        assert len(kept) == 3 and len(pruned) == len(DEFAULT_LABELS) - 3
+        assert "sports" in kept
+        assert kept == [label for label in DEFAULT_LABELS if label in kept]
+        assert set(kept) | set(pruned) == set(DEFAULT_LABELS)
+
+    def test_keeps_everything_without_signal(self):
+        """Test that nothing is pruned for few labels or a text unlike every description"""
+        from app.services.label_prefilter import label_prefilter
+        from app.services.huggingface_service import DEFAULT_LABELS
+
+        assert label_prefilter.select("Any text", ["sports", "food"], 3) == (["sports", "food"], [])
+        assert label_prefilter.select("Zxqv wqpl krrt", DEFAULT_LABELS, 3) == (DEFAULT_LABELS, [])
+
+
+class TestTwoStageClassification:
+    """Tests for classify_text with LABEL_PREFILTER_TOP_K"""
+
+    @pytest.mark.asyncio
+    @patch('app.services.huggingface_service.LABEL_PREFILTER_TOP_K', 3)
+    @patch('app.services.huggingface_service.httpx.AsyncClient')
+    async def test_sends_only_kept_labels(self, mock_client_class):
+        """Test that only the kept labels are sent and pruned ones come back at 0"""
+        from app.services.huggingface_service import classify_text, DEFAULT_LABELS
+        from app.utils.metrics import LABELS_PRUNED
+
+        def answer(url, json, **kwargs):
+            labels = sorted(json["parameters"]["candidate_labels"], key=lambda label: label != "sports")
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = [{"label": label, "score": 0.9 if i == 0 else 0.05} for i, label in enumerate(labels)]
+            return response
+
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = answer
+        mock_client_class.return_value = mock_client
+
+        result = await classify_text("The home team won the championship match after a late goal")
+
+        sent = mock_client.post.call_args.kwargs["json"]["parameters"]["candidate_labels"]
+        assert len(sent) == 3 and "sports" in sent
+        assert result["category"] == "sports"
+        assert set(result["scores"]) == set(DEFAULT_LABELS)
+        assert set(result["pruned_labels"]) == set(DEFAULT_LABELS) - set(sent)
+        assert all(result["scores"][label] == 0.0 for label in result["pruned_labels"])
+        assert LABELS_PRUNED.labels().value == len(DEFAULT_LABELS) - 3
+
+    @pytest.mark.asyncio
+    @patch('app.services.huggingface_service.LABEL_PREFILTER_TOP_K', 3)
+    @patch('app.services.huggingface_service.httpx.AsyncClient')
+    async def test_batch_matches_single_classification(self, mock_client_class):
+        """Test that batched texts are pre-filtered like single ones, one request per set of kept labels"""
+        from app.services.huggingface_service import classify_text, classify_texts
+
+        def score(labels):
+            return [{"label": label, "score": round(1 / (i + 2), 4)} for i, label in enumerate(labels)]
+
+        def answer(url, json, **kwargs):
+            labels = json["parameters"]["candidate_labels"]
+            response = MagicMock()
+            response.status_code = 200
+            inputs = json["inputs"]
+            response.json.return_value = [score(labels) for _ in inputs] if isinstance(inputs, list) else score(labels)
+            return response
+
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = answer
+        mock_client_class.return_value = mock_client
+        texts = [
+            "The home team won the championship match after a late goal",
+            "The coach praised the team after the league match and the player's goal",
+            "The chef cooked a new dessert recipe in the restaurant kitchen",
+        ]
+
+        batched = await classify_texts(texts)
+        requests = [call.kwargs["json"] for call in mock_client.post.call_args_list]
+        single = [await classify_text(text) for text in texts]
+
+        assert len(requests) == 2
+        assert sorted(len(r["inputs"]) if isinstance(r["inputs"], list) else 1 for r in requests) == [1, 2]
+        assert all(len(r["parameters"]["candidate_labels"]) == 3 for r in requests)
+        for one, many in zip(single, batched):
+            assert many["scores"] == one["scores"]
+            assert many["pruned_labels"] == one["pruned_labels"]
+
+    @pytest.mark.asyncio
+    @patch('app.services.huggingface_service.httpx.AsyncClient')
+    async def test_disabled_by_default(self, mock_client_class):
+        """Test that every label is sent when the pre-filter is off"""
+        from app.services.huggingface_service import classify_text, DEFAULT_LABELS
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = [{"label": "sports", "score": 1.0}]
+        mock_client = AsyncMock()
+        mock_client.post.return_value = mock_response
+        mock_client_class.return_value = mock_client
+
+        result = await classify_text("The home team won the championship match after a late goal")
+
+        assert mock_client.post.call_args.kwargs["json"]["parameters"]["candidate_labels"] == DEFAULT_LABELS
+        assert "pruned_labels" not in result
+
+    @patch('app.routers.analyze.LABEL_PREFILTER_TOP_K', 3)
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_pruned_labels_in_meta(self, mock_gemini, mock_hf, client, auth_headers, sample_text, mock_gemini_response):
+        """Test that /analyze reports the pruned labels"""
+        mock_hf.return_value = {
+            "category": "technology", "confidence": 0.9,
+            "scores": {"technology": 0.9, "science": 0.1, "food": 0.0},
+            "pruned_labels": ["food"], "latency_ms": 100
+        }
+        mock_gemini.return_value = mock_gemini_response
+
+        response = client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.json()["meta"]["pruned_labels"] == ["food"]
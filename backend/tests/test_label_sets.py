@@ -0,0 +1,141 @@
+"""
+Label Set Tests
+Tests for per-user label sets and their use in /analyze
+"""
+from unittest.mock import patch
+
+SUPPORT_LABELS = ["billing", "bug report", "feature request"]
+
+
+def create_set(client, headers, name="support", labels=None):
+    response = client.post(
+        "/label-sets/", json={"name": name, "labels": labels or SUPPORT_LABELS}, headers=headers
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+def other_user_headers(client):
+    user = {"email": "other@example.com", "password": "otherpassword123"}
+    client.post("/auth/register", json=user)
+    token = client.post("/auth/login", json=user).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestLabelSetEndpoints:
+    """Tests for /label-sets CRUD"""
+
+    def test_create_list_get(self, client, auth_headers):
+        """Test that a created set is listed and readable"""
+        created = create_set(client, auth_headers, labels=["  billing ", "bug report"])
+
+        assert created["labels"] == ["billing", "bug report"]
+        assert created["version"] == 1
+        assert [s["id"] for s in client.get("/label-sets/", headers=auth_headers).json()] == [created["id"]]
+        assert client.get(f"/label-sets/{created['id']}", headers=auth_headers).json()["name"] == "support"
+
+    def test_validation(self, client, auth_headers):
+        """Test that too few, blank or duplicate labels and duplicate names are rejected"""
+        for labels in (["only one"], ["billing", " "], ["Billing", "billing"]):
+            response = client.post("/label-sets/", json={"name": "bad", "labels": labels}, headers=auth_headers)
+            assert response.status_code == 422
+
+        create_set(client, auth_headers)
+        response = client.post("/label-sets/", json={"name": "support", "labels": SUPPORT_LABELS}, headers=auth_headers)
+        assert response.status_code == 409
+
+    @patch('app.routers.label_sets.get_label_set_by_name')
+    def test_concurrent_duplicate_name(self, mock_by_name, client, auth_headers):
+        """Test that a name taken between the check and the insert still gets a 409"""
+        mock_by_name.return_value = None
+        create_set(client, auth_headers)
+
+        response = client.post("/label-sets/", json={"name": "support", "labels": SUPPORT_LABELS}, headers=auth_headers)
+        assert response.status_code == 409
+
+        other = create_set(client, auth_headers, name="sales")
+        response = client.put(
+            f"/label-sets/{other['id']}", json={"name": "support", "labels": SUPPORT_LABELS}, headers=auth_headers
+        )
+        assert response.status_code == 409
+        assert [s["name"] for s in client.get("/label-sets/", headers=auth_headers).json()] == ["support", "sales"]
+
+    def test_sets_are_private(self, client, auth_headers):
+        """Test that another user can neither read nor use a set"""
+        created = create_set(client, auth_headers)
+        headers = other_user_headers(client)
+
+        assert client.get(f"/label-sets/{created['id']}", headers=headers).status_code == 404
+        assert client.get("/label-sets/", headers=headers).json() == []
+        response = client.post(
+            "/analyze/", json={"text": "x" * 30, "label_set_id": created["id"]}, headers=headers
+        )
+        assert response.status_code == 404
+
+    def test_update_and_delete(self, client, auth_headers):
+        """Test that an update bumps the version and a delete removes the set"""
+        created = create_set(client, auth_headers)
+
+        response = client.put(
+            f"/label-sets/{created['id']}", json={"name": "support v2", "labels": ["refund", "outage"]},
+            headers=auth_headers
+        )
+        assert response.json()["version"] == 2
+        assert response.json()["labels"] == ["refund", "outage"]
+
+        assert client.delete(f"/label-sets/{created['id']}", headers=auth_headers).status_code == 204
+        assert client.get(f"/label-sets/{created['id']}", headers=auth_headers).status_code == 404
+
+
+class TestAnalyzeWithLabelSet:
+    """Tests for label_set_id in /analyze"""
+
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_classifies_against_set_labels(self, mock_gemini, mock_hf, client, auth_headers, sample_text, mock_gemini_response):
+        """Test that the set's labels reach the classifier and the profile is cached"""
+        from app.services.label_set_service import label_profile_stats
+
+        mock_hf.return_value = {"category": "bug report", "confidence": 0.8, "scores": {"bug report": 0.8}, "latency_ms": 10}
+        mock_gemini.return_value = mock_gemini_response
+        created = create_set(client, auth_headers)
+
+        for _ in range(2):
+            response = client.post(
+                "/analyze/", json={"text": sample_text, "label_set_id": created["id"]}, headers=auth_headers
+            )
+            assert response.status_code == 200
+
+        assert mock_hf.call_args.args[1] == SUPPORT_LABELS
+        assert response.json()["category"] == "bug report"
+        assert label_profile_stats()["misses"] == 1
+
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_result_cache_separates_label_sets(
+        self, mock_gemini, mock_hf, client, auth_headers, sample_text, mock_huggingface_response, mock_gemini_response
+    ):
+        """Test that a text analyzed with the defaults, a set, and the updated set is classified each time"""
+        mock_hf.return_value = mock_huggingface_response
+        mock_gemini.return_value = mock_gemini_response
+        created = create_set(client, auth_headers)
+
+        client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+        client.post("/analyze/", json={"text": sample_text, "label_set_id": created["id"]}, headers=auth_headers)
+        client.put(
+            f"/label-sets/{created['id']}", json={"name": "support", "labels": ["refund", "outage"]},
+            headers=auth_headers
+        )
+        response = client.post(
+            "/analyze/", json={"text": sample_text, "label_set_id": created["id"]}, headers=auth_headers
+        )
+
+        assert mock_hf.call_count == 3
+        assert mock_hf.call_args.args[1] == ["refund", "outage"]
+        assert response.json()["meta"]["cached"] is False
+
+    def test_unknown_label_set(self, client, auth_headers, sample_text):
+        """Test that an unknown label_set_id is a 404"""
+        response = client.post("/analyze/", json={"text": sample_text, "label_set_id": 999}, headers=auth_headers)
+
+        assert response.status_code == 404
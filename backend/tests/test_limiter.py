@@ -0,0 +1,179 @@
+"""
+Adaptive Limiter Tests
+Tests for AIMD concurrency limits, queueing, load shedding and the 503 + Retry-After response
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+
+
+def make_limiter(**overrides):
+    from app.utils.limiter import AdaptiveLimiter
+
+    settings = dict(
+        initial_limit=2,
+        min_limit=1,
+        max_limit=4,
+        max_queue=2,
+        queue_timeout=0.5,
+        latency_target=1.0,
+        decrease_cooldown=0.0,
+    )
+    settings.update(overrides)
+    return AdaptiveLimiter("test", **settings)
+
+
+class TestAdaptiveLimiter:
+    """Tests for AdaptiveLimiter"""
+
+    @pytest.mark.asyncio
+    async def test_caps_concurrency(self):
+        """Test that no more than limit calls run at once"""
+        limiter = make_limiter(max_queue=10)
+        running = 0
+        peak = 0
+
+        async def call():
+            nonlocal running, peak
+            async with limiter.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.02)
+                running -= 1
+
+        await asyncio.gather(*[call() for _ in range(6)])
+
+        assert peak == 2
+        assert limiter.in_flight == 0
+        assert limiter.admitted == 6
+
+    @pytest.mark.asyncio
+    async def test_sheds_when_queue_full(self):
+        """Test that callers beyond limit + max_queue are rejected at once"""
+        from app.utils.limiter import LoadShedError
+
+        limiter = make_limiter(max_queue=1)
+        await limiter.acquire()
+        await limiter.acquire()
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(LoadShedError) as exc_info:
+            await limiter.acquire()
+
+        assert exc_info.value.retry_after >= 1
+        assert limiter.shed == 1
+
+        limiter.release(0.01)
+        await queued
+        assert limiter.in_flight == 2
+
+    @pytest.mark.asyncio
+    async def test_sheds_after_queue_timeout(self):
+        """Test that a caller waiting longer than queue_timeout is shed"""
+        from app.utils.limiter import LoadShedError
+
+        limiter = make_limiter(initial_limit=1, queue_timeout=0.05)
+        await limiter.acquire()
+
+        with pytest.raises(LoadShedError):
+            await limiter.acquire()
+
+        assert limiter.stats()["queued"] == 0
+
+    @pytest.mark.asyncio
+    async def test_waiters_served_in_order(self):
+        """Test that released slots go to waiters first come, first served"""
+        limiter = make_limiter(initial_limit=1, max_queue=5)
+        order = []
+        await limiter.acquire()
+
+        async def wait(name):
+            await limiter.acquire()
+            order.append(name)
+            limiter.release(0.01)
+
+        tasks = [asyncio.create_task(wait(name)) for name in "abc"]
+        await asyncio.sleep(0)
+        limiter.release(0.01)
+        await asyncio.gather(*tasks)
+
+        assert order == ["a", "b", "c"]
+
+    @pytest.mark.asyncio
+    async def test_multiplicative_decrease(self):
+        """Test that overload and slow calls cut the limit, never below min_limit"""
+        limiter = make_limiter(initial_limit=4, min_limit=2, backoff_ratio=0.5)
+
+        await limiter.acquire()
+        limiter.release(0.01, overloaded=True)
+        assert limiter.stats()["limit"] == 2
+
+        await limiter.acquire()
+        limiter.release(5.0)
+        assert limiter.stats()["limit"] == 2
+        assert limiter.decreases == 2
+
+    @pytest.mark.asyncio
+    async def test_additive_increase_when_saturated(self):
+        """Test that successful calls at the limit grow it up to max_limit"""
+        limiter = make_limiter(initial_limit=1, max_limit=2)
+
+        for _ in range(5):
+            await limiter.acquire()
+            limiter.release(0.01)
+
+        assert limiter.stats()["limit"] == 2
+
+    @pytest.mark.asyncio
+    async def test_exception_in_slot_counts_as_overload(self):
+        """Test that errors inside the slot release it and back off"""
+        limiter = make_limiter(initial_limit=4, backoff_ratio=0.5)
+
+        with pytest.raises(RuntimeError):
+            async with limiter.slot():
+                raise RuntimeError("timeout")
+
+        assert limiter.in_flight == 0
+        assert limiter.stats()["limit"] == 2
+
+
+class TestAnalyzeLoadShedding:
+    """Tests for shed requests on /analyze"""
+
+    @patch('app.routers.analyze.classify_text')
+    def test_shed_request_returns_503_with_retry_after(self, mock_hf, client, auth_headers, sample_text):
+        """Test that a shed classification answers 503 with Retry-After"""
+        from app.utils.limiter import LoadShedError
+
+        mock_hf.side_effect = LoadShedError("huggingface", 3)
+
+        response = client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "3"
+        assert "overloaded" in response.json()["detail"]
+
+    @pytest.mark.asyncio
+    @patch('app.services.huggingface_service.httpx.AsyncClient')
+    async def test_classify_text_sheds_without_retrying(self, mock_client_class):
+        """Test that classify_text does not retry or wrap a shed call"""
+        from app.services import huggingface_service
+        from app.services.huggingface_service import classify_text, hf_limiter
+        from app.utils.limiter import LoadShedError
+
+        huggingface_service._client = None
+        with patch.object(hf_limiter, "max_queue", 0), patch.object(hf_limiter, "limit", 0.0):
+            with pytest.raises(LoadShedError):
+                await classify_text("Some text to classify")
+
+        mock_client_class.return_value.post.assert_not_called()
+        huggingface_service._client = None
+
+    def test_health_reports_limits(self, client):
+        """Test that the health check exposes limits and queue depths"""
+        response = client.get("/analyze/health")
+
+        limits = response.json()["limits"]
+        assert set(limits) == {"huggingface", "gemini"}
+        assert {"limit", "in_flight", "queued", "shed"} <= set(limits["gemini"])
@@ -0,0 +1,185 @@
+"""
+Metrics Tests
+Tests for the metrics registry, its exposition format and GET /metrics
+"""
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+
+class TestRegistry:
+    """Tests for counters, gauges, histograms and the text format"""
+
+    def test_histogram_exposition(self):
+        """Test cumulative buckets, +Inf, sum and count"""
+        from app.utils.metrics import Registry, Histogram
+
+        registry = Registry()
+        histogram = Histogram(registry, "test_seconds", "Test histogram", ["stage"], buckets=(0.1, 1.0))
+        child = histogram.labels(stage="hf")
+        for value in (0.05, 0.1, 0.5, 2.0):
+            child.observe(value)
+
+        text = registry.render()
+
+        assert "# TYPE test_seconds histogram" in text
+        assert 'test_seconds_bucket{stage="hf",le="0.1"} 2' in text
+        assert 'test_seconds_bucket{stage="hf",le="1"} 3' in text
+        assert 'test_seconds_bucket{stage="hf",le="+Inf"} 4' in text
+        assert 'test_seconds_sum{stage="hf"} 2.65' in text
+        assert 'test_seconds_count{stage="hf"} 4' in text
+
+    def test_counter_and_gauge(self):
+        """Test labelled counters, plain gauges and label escaping"""
+        from app.utils.metrics import Registry, Counter, Gauge
+
+        registry = Registry()
+        counter = Counter(registry, "test_total", "Test counter", ["type"])
+        gauge = Gauge(registry, "test_in_flight", "Test gauge")
+        counter.labels(type='say "hi"').inc()
+        counter.labels(type='say "hi"').inc(2)
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+
+        text = registry.render()
+
+        assert 'test_total{type="say \\"hi\\""} 3' in text
+        assert "test_in_flight 1" in text
+
+    def test_callback_gauge_read_at_scrape(self):
+        """Test that callback gauges report the current value"""
+        from app.utils.metrics import Registry, Gauge
+
+        registry = Registry()
+        state = {"value": 1}
+        Gauge(registry, "test_state", "Test", ["name"], callback=lambda: {("a",): state["value"]})
+        state["value"] = 7
+
+        assert 'test_state{name="a"} 7' in registry.render()
+
+    def test_label_mismatch_and_duplicates_rejected(self):
+        """Test misuse fails loudly"""
+        from app.utils.metrics import Registry, Counter
+
+        registry = Registry()
+        counter = Counter(registry, "test_total", "Test", ["a", "b"])
+
+        with pytest.raises(ValueError):
+            counter.labels("only-one")
+        with pytest.raises(ValueError):
+            Counter(registry, "test_total", "Again")
+
+    def test_reset_keeps_bound_children(self):
+        """Test that reset zeroes values without detaching children bound at import"""
+        from app.utils.metrics import Registry, Histogram
+
+        registry = Registry()
+        child = Histogram(registry, "test_seconds", "Test", ["stage"]).labels(stage="db")
+        child.observe(0.2)
+
+        registry.reset()
+        child.observe(0.3)
+
+        assert 'test_seconds_count{stage="db"} 1' in registry.render()
+
+
+class TestInstrumentation:
+    """Tests for the metrics recorded by the app"""
+
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_metrics_endpoint_after_analysis(
+        self, mock_gemini, mock_hf, client, auth_headers, sample_text,
+        mock_huggingface_response, mock_gemini_response
+    ):
+        """Test that /metrics exposes stage, auth and HTTP histograms"""
+        from app.utils.metrics import PIPELINE_DURATION, AUTH_DURATION
+
+        mock_hf.return_value = mock_huggingface_response
+        mock_gemini.return_value = mock_gemini_response
+        client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert PIPELINE_DURATION.count == 1
+        assert AUTH_DURATION.count >= 1
+        body = response.text
+        assert 'analyzer_http_request_duration_seconds_count{method="POST",route="/analyze/",status="200"} 1' in body
+        assert 'analyzer_circuit_state{upstream="huggingface"} 0' in body
+        assert 'analyzer_stage_duration_seconds_count{stage="db"}' in body
+
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text_stream')
+    def test_streamed_request_timed_until_last_chunk(
+        self, mock_stream, mock_hf, client, auth_headers, sample_text, mock_huggingface_response
+    ):
+        """Test that a streamed response is timed, and counted in flight, until its body ends"""
+        import asyncio
+        from app.utils.metrics import HTTP_REQUEST_DURATION, HTTP_IN_FLIGHT
+        from app.utils.retry import time_remaining
+
+        remaining = []
+
+        async def slow_stream(text, category):
+            for word in ("Slow ", "summary."):
+                await asyncio.sleep(0.15)
+                remaining.append(time_remaining())
+                yield {"type": "token", "text": word}
+            yield {"type": "result", "summary": "Slow summary.", "tone": "neutre", "latency_ms": 300, "first_token_ms": 150}
+
+        mock_hf.return_value = mock_huggingface_response
+        mock_stream.side_effect = slow_stream
+
+        response = client.post(
+            "/analyze/stream", json={"text": sample_text}, headers={**auth_headers, "X-Request-Timeout": "5"}
+        )
+
+        assert response.status_code == 200
+        timing = HTTP_REQUEST_DURATION.labels("POST", "/analyze/stream", "200")
+        assert timing.count == 1
+        assert timing.sum >= 0.3
+        assert HTTP_IN_FLIGHT.labels().value == 0
+        assert all(r is not None and 4 < r <= 5 for r in remaining)
+
+    @patch('app.routers.analyze.classify_text')
+    def test_errors_counted_by_type(self, mock_hf, client, auth_headers, sample_text):
+        """Test that failed analyses are counted by error class"""
+        from app.services.huggingface_service import HuggingFaceError
+
+        mock_hf.side_effect = HuggingFaceError("boom")
+        client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+
+        assert 'analyzer_errors_total{type="HuggingFaceError"} 1' in client.get("/metrics").text
+
+    @pytest.mark.asyncio
+    @patch('app.services.huggingface_service.httpx.AsyncClient')
+    async def test_upstream_statuses_and_retries(self, mock_client_class):
+        """Test that HF attempts are timed and counted by status, and retries are counted"""
+        from app.services import huggingface_service
+        from app.utils.metrics import HF_DURATION, UPSTREAM_RESPONSES, UPSTREAM_RETRIES
+
+        loading = MagicMock(status_code=503)
+        loading.json.return_value = {"estimated_time": 0}
+        ok = MagicMock(status_code=200)
+        ok.json.return_value = [{"label": "technology", "score": 0.85}]
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = [loading, ok]
+        mock_client_class.return_value = mock_client
+
+        huggingface_service._client = None
+        try:
+            await huggingface_service.classify_text("Some text to classify")
+        finally:
+            huggingface_service._client = None
+
+        assert HF_DURATION.count == 2
+        assert UPSTREAM_RESPONSES.labels(upstream="huggingface", status="503").value == 1
+        assert UPSTREAM_RESPONSES.labels(upstream="huggingface", status="200").value == 1
+        assert UPSTREAM_RETRIES.labels(upstream="huggingface").value == 1
+
+    def test_endpoint_disabled(self, client):
+        """Test that /metrics is hidden when METRICS_ENABLED is off"""
+        with patch('app.routers.metrics.METRICS_ENABLED', False):
+            assert client.get("/metrics").status_code == 404
@@ -0,0 +1,302 @@
+"""
+Mock Service Tests
+Tests for the seeded mock engine: latency models, fault injection and the
+simulated upstreams behind MOCK_UPSTREAMS
+"""
+import random
+import pytest
+from unittest.mock import patch
+
+
+class TestLatencyModel:
+    """Tests for latency specs"""
+
+    def test_fixed_and_uniform(self):
+        """Test that fixed latencies are exact and uniform ones stay in range"""
+        from app.services.mock_service import LatencyModel
+
+        rng = random.Random(0)
+        assert LatencyModel("fixed:ms=250").sample(rng) == 0.25
+        samples = [LatencyModel("uniform:low=100,high=200").sample(rng) for _ in range(500)]
+        assert 0.1 <= min(samples) and max(samples) <= 0.2
+
+    def test_lognormal_median(self):
+        """Test that half of the lognormal samples fall under the median"""
+        from app.services.mock_service import LatencyModel
+
+        model = LatencyModel("lognormal:median=400,sigma=0.8")
+        rng = random.Random(1)
+        samples = sorted(model.sample(rng) for _ in range(4000))
+        assert 0.37 < samples[2000] < 0.43
+        assert samples[-1] > 1.0
+
+    def test_replay_percentiles(self):
+        """Test that replayed samples reproduce the recorded percentiles"""
+        from app.services.mock_service import LatencyModel
+
+        model = LatencyModel("replay:p50=420,p90=900,p99=2500")
+        rng = random.Random(2)
+        samples = sorted(model.sample(rng) for _ in range(10000))
+        assert samples[5000] == pytest.approx(0.42, rel=0.05)
+        assert samples[9000] == pytest.approx(0.9, rel=0.05)
+        assert samples[-1] <= 2.5
+
+    @pytest.mark.parametrize("spec", [
+        "gaussian:mean=3", "fixed:ms=abc", "uniform:low=1", "replay:median=3", "replay:p50=500,p90=100", "fixed:ms=-1",
+    ])
+    def test_invalid_specs(self, spec):
+        """Test that malformed specs are rejected with ValueError"""
+        from app.services.mock_service import LatencyModel
+
+        with pytest.raises(ValueError):
+            LatencyModel(spec)
+
+
+class TestMockEngine:
+    """Tests for the engine's deterministic draws"""
+
+    def test_draws_do_not_depend_on_interleaving(self, mock_engine):
+        """Test that each input gets the same sequence of calls whatever order inputs arrive in"""
+        mock_engine.configure(hf_latency="lognormal:median=300,sigma=0.5", hf_loading_rate=0.3)
+
+        def draws(order):
+            mock_engine.configure(seed=7)
+            seen = {}
+            for key in order:
+                call = mock_engine.hf_call(key)
+                seen.setdefault(key, []).append((call.latency, call.fault, call.rng.random()))
+            return seen
+
+        assert draws(["a", "b", "a", "c", "b"]) == draws(["c", "b", "b", "a", "a"])
+
+    def test_seed_changes_draws(self, mock_engine):
+        """Test that another seed gives other latencies"""
+        mock_engine.configure(gemini_latency="uniform:low=0,high=1000", seed=1)
+        first = [mock_engine.gemini_call(f"prompt {i}").latency for i in range(5)]
+        mock_engine.configure(seed=2)
+        second = [mock_engine.gemini_call(f"prompt {i}").latency for i in range(5)]
+
+        assert first != second
+
+    def test_fault_rates(self, mock_engine):
+        """Test that faults are drawn at the configured rate and counted"""
+        mock_engine.configure(hf_loading_rate=0.2, hf_timeout_rate=0.1)
+        for i in range(2000):
+            mock_engine.hf_call(f"text {i}")
+
+        stats = mock_engine.stats()
+        assert stats["calls"]["huggingface"] == 2000
+        assert 330 < stats["faults"]["huggingface.loading"] < 470
+        assert 140 < stats["faults"]["huggingface.timeout"] < 260
+
+    def test_invalid_rates(self, mock_engine):
+        """Test that rates outside 0-1, or adding up past 1, are rejected"""
+        with pytest.raises(ValueError):
+            mock_engine.configure(gemini_timeout_rate=1.5)
+        with pytest.raises(ValueError):
+            mock_engine.configure(gemini_timeout_rate=0.6, gemini_parse_error_rate=0.6)
+
+
+class TestMockServices:
+    """Tests for the MOCK_MODE service functions"""
+
+    @pytest.mark.asyncio
+    async def test_classify_is_reproducible(self, mock_engine):
+        """Test that the same seed and text give the same scores"""
+        from app.services.mock_service import mock_classify_text
+
+        first = await mock_classify_text("Markets rallied after the announcement")
+        mock_engine.configure(seed=1234)
+        second = await mock_classify_text("Markets rallied after the announcement")
+
+        assert first == second
+        assert sum(first["scores"].values()) == pytest.approx(1.0, abs=0.01)
+
+    @pytest.mark.asyncio
+    async def test_classify_loading_fault(self, mock_engine):
+        """Test that a loading fault fails like the service does after its retries"""
+        from app.services.mock_service import mock_classify_text
+        from app.services.huggingface_service import HuggingFaceError
+
+        mock_engine.configure(hf_loading_rate=1)
+
+        with pytest.raises(HuggingFaceError, match="Model is loading"):
+            await mock_classify_text("Some text")
+
+    @pytest.mark.asyncio
+    async def test_analyze_parse_error(self, mock_engine):
+        """Test that a parse fault fails in JSON mode like the service does after its retries"""
+        from app.services.mock_service import mock_analyze_text
+        from app.services.gemini_service import GeminiError
+
+        mock_engine.configure(gemini_parse_error_rate=1)
+
+        with pytest.raises(GeminiError, match="Unparseable"):
+            await mock_analyze_text("Some text", "sports")
+
+    @pytest.mark.asyncio
+    async def test_analyze_parse_error_lenient(self, mock_engine):
+        """Test that without JSON mode a parse fault yields what the lenient parser makes of a truncated answer"""
+        from app.services.mock_service import mock_analyze_text, MOCK_SUMMARIES
+
+        mock_engine.configure(gemini_parse_error_rate=1)
+        with patch('app.services.gemini_service.GEMINI_JSON_MODE', False):
+            result = await mock_analyze_text("Some text", "sports")
+
+        assert result["summary"] != MOCK_SUMMARIES["sports"]
+        assert result["summary"].startswith('{"summary"')
+        assert result["tone"] == "neutre"
+
+    @pytest.mark.asyncio
+    async def test_analyze_timeout(self, mock_engine):
+        """Test that a Gemini timeout waits for the call timeout, then fails"""
+        from app.services.mock_service import mock_analyze_text
+        from app.services.gemini_service import GeminiError
+
+        mock_engine.configure(gemini_timeout_rate=1)
+
+        with patch('app.services.gemini_service.TIMEOUT_SECONDS', 0.01):
+            with pytest.raises(GeminiError, match="Deadline Exceeded"):
+                await mock_analyze_text("Some text", "sports")
+
+    @pytest.mark.asyncio
+    async def test_stream(self, mock_engine):
+        """Test that the stream mock yields the summary word by word, then the result"""
+        from app.services.mock_service import mock_analyze_text_stream, MOCK_SUMMARIES
+
+        events = [event async for event in mock_analyze_text_stream("Some text", "health")]
+
+        tokens = "".join(event["text"] for event in events if event["type"] == "token")
+        assert tokens == MOCK_SUMMARIES["health"]
+        assert events[-1]["type"] == "result"
+        assert events[-1]["tone"] in ("positif", "neutre", "négatif")
+
+
+class TestMockUpstreams:
+    """Tests for the real services running against the simulated upstreams"""
+
+    @pytest.mark.asyncio
+    async def test_hf_loading_goes_through_retries(self, mock_engine):
+        """Test that 503 loading answers are retried by the real client, then reported"""
+        import httpx
+        from app.services.huggingface_service import classify_text, HuggingFaceError, MAX_RETRIES
+        from app.services.mock_service import MockHFTransport
+        from app.utils.metrics import UPSTREAM_RESPONSES
+
+        mock_engine.configure(hf_loading_rate=1)
+        client = httpx.AsyncClient(transport=MockHFTransport())
+
+        with patch('app.services.huggingface_service.get_client', return_value=client):
+            with pytest.raises(HuggingFaceError, match="Model is loading"):
+                await classify_text("Some text", ["sports", "politics"])
+        await client.aclose()
+
+        assert UPSTREAM_RESPONSES.labels(upstream="huggingface", status="503").value == MAX_RETRIES
+        assert mock_engine.stats()["faults"]["huggingface.loading"] == MAX_RETRIES
+
+    @pytest.mark.asyncio
+    async def test_hf_retries_are_reproducible(self, mock_engine):
+        """Test that the same seed replays the same faults and results through the retry loop, in any order"""
+        import asyncio
+        import httpx
+        from app.services.huggingface_service import classify_text, hf_limiter
+        from app.services.mock_service import MockHFTransport
+        from app.utils.retry import retry_budget
+
+        texts = [f"text number {i}" for i in range(8)]
+
+        async def run(order):
+            hf_limiter.reset()
+            retry_budget.reset()
+            mock_engine.configure(seed=99, hf_loading_rate=0.5)
+            client = httpx.AsyncClient(transport=MockHFTransport())
+            with patch('app.services.huggingface_service.get_client', return_value=client):
+                results = await asyncio.gather(*[classify_text(text) for text in order], return_exceptions=True)
+            await client.aclose()
+            outcomes = {text: r["category"] if isinstance(r, dict) else str(r) for text, r in zip(order, results)}
+            return outcomes, mock_engine.stats()
+
+        first = await run(texts)
+        for _ in range(5):
+            assert await run(texts) == first
+        assert await run(texts[::-1]) == first
+        assert first[1]["faults"]["huggingface.loading"] > 0
+        assert not any("circuit is open" in outcome for outcome in first[0].values())
+
+    def test_attach_removes_jitter_and_breakers(self, mock_engine):
+        """Test that the simulated upstreams switch off jitter and breakers until detach"""
+        from app.services.huggingface_service import hf_breaker, hf_retry
+        from app.services.gemini_service import gemini_breaker
+        from app.services.mock_service import MockGeminiModel
+
+        MockGeminiModel()
+        assert hf_retry.backoff(1) == hf_retry.backoff(1) == min(hf_retry.max_delay, hf_retry.base_delay * 2)
+        for _ in range(50):
+            hf_breaker.after_call(hf_breaker.before_call(), success=False)
+        assert hf_breaker.stats()["state"] == "closed"
+        assert gemini_breaker.bypassed
+
+        mock_engine.detach()
+        assert not hf_breaker.bypassed and not gemini_breaker.bypassed
+        assert len({hf_retry.backoff(5) for _ in range(20)}) > 1
+
+    @pytest.mark.asyncio
+    async def test_hf_timeout(self, mock_engine):
+        """Test that a hanging upstream ends in the client's read timeout"""
+        import httpx
+        from app.services.huggingface_service import classify_text, HuggingFaceError
+        from app.services.mock_service import MockHFTransport
+        from app.utils.metrics import UPSTREAM_RESPONSES
+
+        mock_engine.configure(hf_timeout_rate=1)
+        client = httpx.AsyncClient(transport=MockHFTransport())
+
+        with patch('app.services.huggingface_service.get_client', return_value=client), \
+                patch('app.services.huggingface_service.TIMEOUT_SECONDS', 0.01):
+            with pytest.raises(HuggingFaceError, match="timeout"):
+                await classify_text("Some text")
+        await client.aclose()
+
+        assert UPSTREAM_RESPONSES.labels(upstream="huggingface", status="timeout").value >= 1
+
+    @pytest.mark.asyncio
+    async def test_gemini_model(self, mock_engine):
+        """Test that analyze_text parses the mock model's answer"""
+        from app.services.gemini_service import analyze_text
+        from app.services.mock_service import MockGeminiModel, MOCK_SUMMARIES
+
+        with patch('app.services.gemini_service._model', MockGeminiModel()):
+            result = await analyze_text("Some text", "food")
+            guess = await analyze_text("Some text", None, ["sports", "travel"])
+
+        assert result["summary"] == MOCK_SUMMARIES["food"]
+        assert guess["category"] in ("sports", "travel")
+
+    @pytest.mark.asyncio
+    async def test_gemini_deadline_is_retried(self, mock_engine):
+        """Test that DeadlineExceeded from the model is retried, then raised as GeminiError"""
+        from app.services.gemini_service import analyze_text, GeminiError, MAX_RETRIES
+        from app.services.mock_service import MockGeminiModel
+        from app.utils.metrics import UPSTREAM_RESPONSES
+
+        mock_engine.configure(gemini_timeout_rate=1)
+
+        with patch('app.services.gemini_service._model', MockGeminiModel()), \
+                patch('app.services.gemini_service.TIMEOUT_SECONDS', 0.01):
+            with pytest.raises(GeminiError):
+                await analyze_text("Some text", "food")
+
+        assert UPSTREAM_RESPONSES.labels(upstream="gemini", status="504").value == MAX_RETRIES + 1
+
+    @pytest.mark.asyncio
+    async def test_gemini_stream(self, mock_engine):
+        """Test that the real stream parser holds back the mock model's tone line"""
+        from app.services.gemini_service import analyze_text_stream
+        from app.services.mock_service import MockGeminiModel, MOCK_SUMMARIES
+
+        with patch('app.services.gemini_service._model', MockGeminiModel()):
+            events = [event async for event in analyze_text_stream("Some text", "travel")]
+
+        tokens = "".join(event["text"] for event in events if event["type"] == "token")
+        assert tokens.strip() == MOCK_SUMMARIES["travel"]
+        assert events[-1]["summary"] == MOCK_SUMMARIES["travel"]
@@ -0,0 +1,112 @@
+"""
+Password Hasher Tests
+Tests for the bcrypt executor, rehash-on-login and queue time stats
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+
+
+class TestPasswordHasher:
+    """Tests for PasswordHasher"""
+
+    def test_unknown_executor_rejected(self):
+        """Test that a misconfigured executor kind fails loudly"""
+        from app.utils.password_hasher import PasswordHasher
+
+        with pytest.raises(ValueError):
+            PasswordHasher(kind="gpu")
+
+    @pytest.mark.asyncio
+    async def test_process_pool_round_trip(self):
+        """Test hashing and verifying in worker processes"""
+        from app.utils.password_hasher import PasswordHasher
+
+        hasher = PasswordHasher(kind="process", workers=1, rounds=4)
+        try:
+            hashed = await hasher.hash("password123")
+            assert hashed.startswith("$2b$04$")
+            assert await hasher.verify_and_update("password123", hashed) == (True, None)
+            assert (await hasher.verify_and_update("wrongpassword", hashed))[0] is False
+        finally:
+            hasher.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_inline_executor(self):
+        """Test that inline mode works without any pool"""
+        from app.utils.password_hasher import PasswordHasher
+
+        hasher = PasswordHasher(kind="inline", rounds=4)
+        hashed = await hasher.hash("password123")
+
+        assert (await hasher.verify_and_update("password123", hashed))[0] is True
+        assert hasher._executor is None
+
+    @pytest.mark.asyncio
+    async def test_cost_change_returns_new_hash(self):
+        """Test that a hash made at another cost is verified and replaced"""
+        from app.utils.password_hasher import PasswordHasher
+        from app.utils.security import hash_password
+
+        hasher = PasswordHasher(kind="inline", rounds=5)
+        verified, new_hash = await hasher.verify_and_update("password123", hash_password("password123", rounds=4))
+
+        assert verified is True
+        assert new_hash.startswith("$2b$05$")
+        assert hasher.stats()["rehashes"] == 1
+
+    @pytest.mark.asyncio
+    async def test_queue_time_recorded(self):
+        """Test that jobs waiting for the only worker report queue time"""
+        from app.utils.password_hasher import PasswordHasher
+
+        hasher = PasswordHasher(kind="thread", workers=1, rounds=4)
+        try:
+            await asyncio.gather(*[hasher.hash("password123") for _ in range(4)])
+        finally:
+            hasher.shutdown()
+
+        stats = hasher.stats()
+        assert stats["jobs"] == 4
+        assert stats["in_flight"] == 0
+        assert stats["queue_ms_max"] > 0
+
+
+class TestRehashOnLogin:
+    """Tests for transparent rehashing in /auth/login"""
+
+    def test_login_rehashes_outdated_cost(self, client, test_user_data, db_session):
+        """Test that logging in upgrades a password hashed at the old cost"""
+        from app.models.user import User
+        from app.utils.password_hasher import password_hasher
+
+        with patch.object(password_hasher, "rounds", 4):
+            client.post("/auth/register", json=test_user_data)
+
+        with patch.object(password_hasher, "rounds", 5):
+            response = client.post("/auth/login", json=test_user_data)
+            assert response.status_code == 200
+
+            user = db_session.query(User).filter(User.email == test_user_data["email"]).first()
+            assert user.password.startswith("$2b$05$")
+
+            client.post("/auth/login", json=test_user_data)
+
+        assert password_hasher.stats()["rehashes"] == 1
+
+    def test_health_reports_hashing_queue(self, client, test_user_data):
+        """Test that the health check exposes password hashing stats"""
+        client.post("/auth/register", json=test_user_data)
+
+        stats = client.get("/analyze/health").json()["password_hashing"]
+
+        assert stats["jobs"] >= 1
+        assert "queue_ms_p95" in stats
+
+    def test_metrics_report_hashing_queue(self, client, test_user_data):
+        """Test that hashing queue time is exported on /metrics"""
+        client.post("/auth/register", json=test_user_data)
+
+        text = client.get("/metrics").text
+
+        assert "analyzer_password_hash_queue_seconds_count 1" in text
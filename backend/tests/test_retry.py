@@ -0,0 +1,322 @@
+"""
+Retry Policy Tests
+Tests for backoff, retryable-error classification, the retry budget and request deadlines
+"""
+import pytest
+import httpx
+from unittest.mock import patch, AsyncMock, MagicMock
+
+
+@pytest.fixture(autouse=True)
+def reset_upstream_clients():
+    """Drop the cached Gemini model and HF client so tests see their own patches"""
+    from app.services import gemini_service, huggingface_service
+    gemini_service._model = None
+    huggingface_service._client = None
+    yield
+    gemini_service._model = None
+    huggingface_service._client = None
+
+
+class FakeClock:
+    """Controllable clock for budget refill tests"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StatusError(Exception):
+    """Stand-in for an SDK exception carrying an HTTP status code"""
+
+    def __init__(self, code):
+        super().__init__(f"status {code}")
+        self.code = code
+
+
+class TestBackoff:
+    """Tests for RetryPolicy.backoff"""
+
+    def test_exponential_with_cap(self):
+        """Test that the jitter ceiling doubles per attempt up to max_delay"""
+        from app.utils.retry import RetryPolicy, RetryBudget
+
+        policy = RetryPolicy("test", 5, base_delay=0.5, max_delay=3.0, budget=RetryBudget(1, 1), rng=lambda: 1.0)
+
+        assert [policy.backoff(a) for a in range(4)] == [0.5, 1.0, 2.0, 3.0]
+
+    def test_full_jitter(self):
+        """Test that delays are spread between zero and the ceiling"""
+        from app.utils.retry import RetryPolicy, RetryBudget
+
+        policy = RetryPolicy("test", 5, base_delay=1.0, max_delay=10.0, budget=RetryBudget(1, 1))
+        delays = [policy.backoff(2) for _ in range(200)]
+
+        assert all(0 <= d <= 4.0 for d in delays)
+        assert max(delays) - min(delays) > 1.0
+
+
+class TestRetryableErrors:
+    """Tests for is_retryable_error"""
+
+    def test_classification(self):
+        """Test transient errors are retryable and bad requests are not"""
+        from app.utils.retry import is_retryable_error, DeadlineExceeded
+        from app.utils.limiter import LoadShedError
+
+        assert is_retryable_error(httpx.ReadTimeout("slow"))
+        assert is_retryable_error(httpx.ConnectError("refused"))
+        assert is_retryable_error(StatusError(429))
+        assert is_retryable_error(StatusError(503))
+        assert not is_retryable_error(StatusError(400))
+        assert not is_retryable_error(StatusError(403))
+        assert not is_retryable_error(ValueError("response blocked"))
+        assert not is_retryable_error(LoadShedError("gemini", 1))
+        assert not is_retryable_error(DeadlineExceeded("late"))
+        assert is_retryable_error(Exception("unknown"))
+        assert not is_retryable_error(Exception("unknown"), unknown=False)
+
+
+class TestNextDelay:
+    """Tests for RetryPolicy.next_delay"""
+
+    def make_policy(self, budget=None, attempts=3):
+        from app.utils.retry import RetryPolicy, RetryBudget
+
+        return RetryPolicy("test", attempts, base_delay=0.1, max_delay=1.0,
+                           budget=budget or RetryBudget(0.2, 1), rng=lambda: 1.0)
+
+    def test_fatal_error_not_retried(self):
+        """Test that non-retryable errors give up at once"""
+        assert self.make_policy().next_delay(0, StatusError(400)) is None
+
+    def test_attempts_exhausted(self):
+        """Test that the last attempt is never retried"""
+        policy = self.make_policy(attempts=2)
+
+        assert policy.next_delay(0, StatusError(503)) == 0.1
+        assert policy.next_delay(1, StatusError(503)) is None
+
+    def test_retry_after_hint(self):
+        """Test that a server hint replaces the backoff, capped at max_delay"""
+        policy = self.make_policy()
+
+        assert policy.next_delay(0, StatusError(429), retry_after=0.5) == 0.5
+        assert policy.next_delay(0, StatusError(429), retry_after=30) == 1.0
+
+    def test_budget_exhausted(self):
+        """Test that retries stop once the shared budget is spent"""
+        from app.utils.retry import RetryBudget
+
+        clock = FakeClock()
+        budget = RetryBudget(ratio=0.5, min_per_second=0, clock=clock)
+        budget.tokens = 1
+        policy = self.make_policy(budget)
+
+        assert policy.next_delay(0, StatusError(503)) is not None
+        assert policy.next_delay(0, StatusError(503)) is None
+        assert budget.exhausted == 1
+
+        policy.start()
+        policy.start()
+        assert policy.next_delay(0, StatusError(503)) is not None
+
+    def test_deadline_leaves_no_room(self):
+        """Test that a retry that cannot fit in the deadline raises DeadlineExceeded"""
+        from app.utils.retry import set_deadline, reset_deadline, DeadlineExceeded
+
+        policy = self.make_policy()
+        token = set_deadline(0.05)
+        try:
+            with pytest.raises(DeadlineExceeded):
+                policy.next_delay(0, StatusError(503))
+        finally:
+            reset_deadline(token)
+
+
+class TestDeadline:
+    """Tests for the request deadline"""
+
+    def test_attempt_timeout_shrinks(self):
+        """Test that attempt timeouts are capped by the time left"""
+        from app.utils.retry import set_deadline, reset_deadline, attempt_timeout
+
+        assert attempt_timeout(60) == 60
+
+        token = set_deadline(2)
+        try:
+            assert 1.5 < attempt_timeout(60) <= 2
+            assert attempt_timeout(1) == 1
+        finally:
+            reset_deadline(token)
+
+    def test_expired_deadline(self):
+        """Test that no attempt starts after the deadline"""
+        from app.utils.retry import set_deadline, reset_deadline, attempt_timeout, DeadlineExceeded
+
+        token = set_deadline(-1)
+        try:
+            with pytest.raises(DeadlineExceeded):
+                attempt_timeout(60)
+        finally:
+            reset_deadline(token)
+
+    @pytest.mark.asyncio
+    async def test_middleware_covers_streamed_body(self):
+        """Test that the header's deadline holds while every body chunk is sent, then is cleared"""
+        from app.utils.retry import DeadlineMiddleware, time_remaining
+
+        seen = []
+
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            for more in (True, True, False):
+                seen.append(time_remaining())
+                await send({"type": "http.response.body", "body": b"x", "more_body": more})
+
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "headers": [(b"x-request-timeout", b"3")]}
+        await DeadlineMiddleware(app)(scope, None, send)
+
+        assert len(seen) == 3 and all(2 < r <= 3 for r in seen)
+        assert time_remaining() is None
+
+    def test_parse_timeout_header(self):
+        """Test header parsing falls back to the default and is clamped"""
+        from app.utils.retry import parse_timeout_header
+        from app.config import REQUEST_TIMEOUT_S, REQUEST_TIMEOUT_MAX_S
+
+        assert parse_timeout_header("2.5") == 2.5
+        assert parse_timeout_header(None) == REQUEST_TIMEOUT_S
+        assert parse_timeout_header("soon") == REQUEST_TIMEOUT_S
+        assert parse_timeout_header("-3") == REQUEST_TIMEOUT_S
+        assert parse_timeout_header("100000") == REQUEST_TIMEOUT_MAX_S
+
+
+class TestServiceRetries:
+    """Tests for the retry behavior of the upstream services"""
+
+    @pytest.mark.asyncio
+    @patch('app.services.huggingface_service.httpx.AsyncClient')
+    async def test_huggingface_client_error_not_retried(self, mock_client_class):
+        """Test that a 4xx answer fails without retrying"""
+        from app.services.huggingface_service import classify_text, HuggingFaceError
+
+        response = MagicMock()
+        response.status_code = 400
+        response.text = "Bad Request"
+        mock_client = AsyncMock()
+        mock_client.post.return_value = response
+        mock_client_class.return_value = mock_client
+
+        with pytest.raises(HuggingFaceError):
+            await classify_text("Some text")
+
+        assert mock_client.post.call_count == 1
+
+    @pytest.mark.asyncio
+    @patch('app.services.huggingface_service.hf_retry.base_delay', 0.01)
+    @patch('app.services.huggingface_service.httpx.AsyncClient')
+    async def test_huggingface_attempt_timeout_follows_deadline(self, mock_client_class):
+        """Test that each attempt gets at most the time left before the deadline"""
+        from app.services.huggingface_service import classify_text
+        from app.utils.retry import set_deadline, reset_deadline
+
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = [{"label": "technology", "score": 0.9}]
+        mock_client = AsyncMock()
+        mock_client.post.return_value = response
+        mock_client_class.return_value = mock_client
+
+        token = set_deadline(3)
+        try:
+            await classify_text("Some text")
+        finally:
+            reset_deadline(token)
+
+        assert mock_client.post.call_args.kwargs["timeout"] <= 3
+
+    @pytest.mark.asyncio
+    @patch('google.generativeai.GenerativeModel')
+    async def test_gemini_blocked_response_not_retried(self, mock_model_class):
+        """Test that a fatal Gemini error is not retried"""
+        from app.services.gemini_service import analyze_text, GeminiError
+
+        mock_model_class.return_value.generate_content.side_effect = ValueError("response was blocked")
+
+        with pytest.raises(GeminiError):
+            await analyze_text("Some text", "technology")
+
+        assert mock_model_class.return_value.generate_content.call_count == 1
+
+    @pytest.mark.asyncio
+    @patch('app.services.gemini_service.gemini_retry.base_delay', 0.01)
+    @patch('google.generativeai.GenerativeModel')
+    async def test_gemini_transient_error_retried_with_timeout(self, mock_model_class):
+        """Test that transient Gemini errors are retried and every call gets a timeout"""
+        from app.services.gemini_service import analyze_text
+
+        ok = MagicMock()
+        ok.text = '{"summary": "Recovered.", "tone": "neutre"}'
+        mock_model_class.return_value.generate_content.side_effect = [StatusError(503), ok]
+
+        result = await analyze_text("Some text", "technology")
+
+        assert result["summary"] == "Recovered."
+        calls = mock_model_class.return_value.generate_content.call_args_list
+        assert len(calls) == 2
+        assert all(call.kwargs["request_options"]["timeout"] > 0 for call in calls)
+
+
+class TestRequestDeadlineHeader:
+    """Tests for the X-Request-Timeout header on /analyze"""
+
+    @patch('app.routers.analyze.analyze_text')
+    @patch('app.routers.analyze.classify_text')
+    def test_header_sets_deadline(
+        self,
+        mock_hf,
+        mock_gemini,
+        client,
+        auth_headers,
+        sample_text,
+        mock_huggingface_response,
+        mock_gemini_response
+    ):
+        """Test that upstream calls see the deadline the client asked for"""
+        from app.utils.retry import time_remaining
+
+        seen = []
+
+        async def classify(text, labels):
+            seen.append(time_remaining())
+            return mock_huggingface_response
+
+        mock_hf.side_effect = classify
+        mock_gemini.return_value = mock_gemini_response
+
+        response = client.post(
+            "/analyze/",
+            json={"text": sample_text},
+            headers={**auth_headers, "X-Request-Timeout": "5"}
+        )
+
+        assert response.status_code == 200
+        assert 0 < seen[0] <= 5
+
+    @patch('app.routers.analyze.classify_text')
+    def test_deadline_exceeded_returns_504(self, mock_hf, client, auth_headers, sample_text):
+        """Test that running out of time answers 504"""
+        from app.utils.retry import DeadlineExceeded
+
+        mock_hf.side_effect = DeadlineExceeded("Request deadline exceeded")
+
+        response = client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+
+        assert response.status_code == 504
+        assert response.json()["detail"] == "Request deadline exceeded"
@@ -0,0 +1,236 @@
+"""
+Request Coalescing Tests
+Tests for SingleFlight and coalesced /analyze pipeline runs
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from fastapi import HTTPException
+
+
+class TestSingleFlight:
+    """Tests for the SingleFlight helper"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """Test that concurrent callers with one key run the work once"""
+        from app.utils.singleflight import SingleFlight
+
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"value": 42}
+
+        outcomes = await asyncio.gather(*[flight.do("k", work) for _ in range(5)])
+
+        assert calls == 1
+        assert all(result == {"value": 42} for result, _ in outcomes)
+        assert [shared for _, shared in outcomes].count(False) == 1
+        assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 4, "upstream_calls_saved": 4}
+
+    @pytest.mark.asyncio
+    async def test_different_keys_run_separately(self):
+        """Test that different keys are not coalesced"""
+        from app.utils.singleflight import SingleFlight
+
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            return 1
+
+        await asyncio.gather(flight.do("a", work), flight.do("b", work))
+
+        assert flight.executions == 2
+        assert flight.coalesced == 0
+
+    @pytest.mark.asyncio
+    async def test_failure_reaches_every_waiter(self):
+        """Test that an exception is raised to all coalesced callers"""
+        from app.utils.singleflight import SingleFlight
+
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            raise RuntimeError("upstream down")
+
+        outcomes = await asyncio.gather(*[flight.do("k", work) for _ in range(3)], return_exceptions=True)
+
+        assert all(isinstance(o, RuntimeError) for o in outcomes)
+        assert flight.executions == 1
+        assert flight.saved_calls == 0
+        assert flight.in_flight() == 0
+
+    @pytest.mark.asyncio
+    async def test_leader_cancellation_does_not_cancel_waiters(self):
+        """Test that waiters still get the result when the first caller goes away"""
+        from app.utils.singleflight import SingleFlight
+
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == ("done", True)
+
+    @pytest.mark.asyncio
+    async def test_follower_not_bound_by_leader_deadline(self):
+        """Test that the work outlives a short leader deadline when a follower has a later one"""
+        from app.utils.singleflight import SingleFlight
+        from app.utils.retry import DeadlineExceeded, set_deadline, time_remaining
+
+        flight = SingleFlight()
+        seen = []
+
+        async def work():
+            await asyncio.sleep(0.1)
+            seen.append(time_remaining())
+            return "done"
+
+        async def call(seconds):
+            set_deadline(seconds)
+            return await flight.do("k", work)
+
+        leader = asyncio.create_task(call(0.03))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(call(5))
+
+        with pytest.raises(DeadlineExceeded):
+            await leader
+        assert await follower == ("done", True)
+        assert 4 < seen[0] <= 5
+
+    @pytest.mark.asyncio
+    async def test_shared_work_traced_into_each_waiter(self):
+        """Test that the shared work runs in its own trace, copied into every waiter's"""
+        from app.utils.singleflight import SingleFlight
+        from app.utils.tracing import current_trace, end_trace, span, start_trace
+
+        flight = SingleFlight()
+        traces = []
+
+        async def work():
+            with span("shared"):
+                await asyncio.sleep(0.02)
+            return current_trace()
+
+        async def call():
+            state = start_trace("POST /analyze")
+            try:
+                with span("handler"):
+                    result, _ = await flight.do("k", work)
+                traces.append(current_trace())
+                return result
+            finally:
+                end_trace(state)
+
+        inner = await asyncio.gather(call(), call())
+
+        assert inner[0] is inner[1] and inner[0] not in traces
+        for trace in traces:
+            parents = {s["name"]: s["parent"] for s in trace.breakdown()}
+            assert parents["shared"] == "handler"
+
+    @pytest.mark.asyncio
+    async def test_key_forgotten_after_completion(self):
+        """Test that sequential calls each execute (no result memoization)"""
+        from app.utils.singleflight import SingleFlight
+
+        flight = SingleFlight(cost=lambda result: 2)
+
+        async def work():
+            return 1
+
+        await flight.do("k", work)
+        await flight.do("k", work)
+
+        assert flight.executions == 2
+        assert flight.saved_calls == 0
+
+
+class TestAnalyzeCoalescing:
+    """Tests for coalesced POST /analyze pipeline runs"""
+
+    @pytest.mark.asyncio
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    async def test_identical_requests_share_upstream_calls(
+        self,
+        mock_gemini,
+        mock_hf,
+        sample_text,
+        mock_huggingface_response,
+        mock_gemini_response
+    ):
+        """Test that concurrent identical texts call each upstream once"""
+        from app.routers.analyze import analyze, analysis_flight
+        from app.schemas.analyze_schema import AnalyzeRequest
+
+        async def slow_classify(text, labels):
+            await asyncio.sleep(0.05)
+            return mock_huggingface_response
+
+        mock_hf.side_effect = slow_classify
+        mock_gemini.return_value = mock_gemini_response
+        user = SimpleNamespace(id=1, email="test@example.com")
+
+        responses = await asyncio.gather(*[
+            analyze(AnalyzeRequest(text=sample_text + " " * i), current_user=user)
+            for i in range(4)
+        ])
+
+        assert mock_hf.call_count == 1
+        assert mock_gemini.call_count == 1
+        assert {r.summary for r in responses} == {mock_gemini_response["summary"]}
+        assert sum(r.meta.coalesced for r in responses) == 3
+        assert analysis_flight.stats()["upstream_calls_saved"] == 6
+
+    @pytest.mark.asyncio
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    async def test_failure_propagates_to_coalesced_requests(
+        self,
+        mock_gemini,
+        mock_hf,
+        sample_text,
+        mock_huggingface_response
+    ):
+        """Test that every coalesced request gets the upstream 503"""
+        from app.routers.analyze import analyze
+        from app.schemas.analyze_schema import AnalyzeRequest
+        from app.services.gemini_service import GeminiError
+
+        async def slow_classify(text, labels):
+            await asyncio.sleep(0.05)
+            return mock_huggingface_response
+
+        mock_hf.side_effect = slow_classify
+        mock_gemini.side_effect = GeminiError("API error")
+        user = SimpleNamespace(id=1, email="test@example.com")
+
+        outcomes = await asyncio.gather(
+            *[analyze(AnalyzeRequest(text=sample_text), current_user=user) for _ in range(3)],
+            return_exceptions=True
+        )
+
+        assert all(isinstance(o, HTTPException) and o.status_code == 503 for o in outcomes)
+        assert mock_gemini.call_count == 1
+
+    def test_health_reports_coalescing(self, client):
+        """Test that the health check exposes the coalescing counters"""
+        response = client.get("/analyze/health")
+
+        assert response.json()["coalescing"]["upstream_calls_saved"] == 0
@@ -0,0 +1,142 @@
+"""
+Tracing Tests
+Tests for request spans, meta.spans and the JSONL span exporter
+"""
+import json
+import pytest
+from unittest.mock import patch
+
+
+class TestSpans:
+    """Tests for the span API"""
+
+    def test_spans_nest_and_record_errors(self):
+        """Test that spans get their enclosing span as parent and keep the error class"""
+        from app.utils.tracing import start_trace, end_trace, span
+
+        state = start_trace("test")
+        trace = state[0]
+        try:
+            with span("outer"):
+                with span("inner", step=1) as inner:
+                    inner.set(status=200)
+                with pytest.raises(ValueError):
+                    with span("failing"):
+                        raise ValueError("boom")
+        finally:
+            end_trace(state)
+
+        spans = {item["name"]: item for item in trace.breakdown()}
+        assert spans["outer"]["parent"] == "request"
+        assert spans["inner"]["parent"] == "outer"
+        assert spans["inner"]["attrs"] == {"step": 1, "status": 200}
+        assert spans["failing"]["attrs"] == {"error": "ValueError"}
+        assert spans["inner"]["start_ms"] >= spans["outer"]["start_ms"]
+
+    def test_span_without_trace_is_noop(self):
+        """Test that code outside a request can use span() freely"""
+        from app.utils.tracing import span, current_trace, NOOP_SPAN
+
+        with span("orphan") as current:
+            current.set(ignored=True)
+
+        assert current is NOOP_SPAN
+        assert current_trace() is None
+
+    @pytest.mark.asyncio
+    async def test_retry_wait_is_traced(self):
+        """Test that backoff sleeps show up as retry_wait spans"""
+        from app.utils.retry import RetryPolicy
+        from app.utils.tracing import start_trace, end_trace
+
+        state = start_trace("test")
+        try:
+            await RetryPolicy("huggingface", max_attempts=3).sleep(0.01)
+        finally:
+            end_trace(state)
+
+        [wait] = [item for item in state[0].breakdown() if item["name"] == "retry_wait"]
+        assert wait["attrs"]["upstream"] == "huggingface"
+        assert wait["duration_ms"] >= 10
+
+
+class TestRequestTracing:
+    """Tests for traced requests"""
+
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_verbose_meta_spans(
+        self, mock_gemini, mock_hf, client, auth_headers, sample_text,
+        mock_huggingface_response, mock_gemini_response
+    ):
+        """Test that ?verbose=true returns the span breakdown"""
+        mock_hf.return_value = mock_huggingface_response
+        mock_gemini.return_value = mock_gemini_response
+
+        response = client.post("/analyze/?verbose=true", json={"text": sample_text}, headers=auth_headers)
+
+        assert response.status_code == 200
+        meta = response.json()["meta"]
+        names = [item["name"] for item in meta["spans"]]
+        for name in ("auth", "cache.lookup", "pipeline", "classify", "summarize"):
+            assert name in names
+        by_name = {item["name"]: item for item in meta["spans"]}
+        assert by_name["classify"]["parent"] == "pipeline"
+        assert by_name["pipeline"]["parent"] == "handler"
+        assert meta["total_execution_ms"] >= int(by_name["pipeline"]["duration_ms"])
+
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_spans_omitted_by_default(
+        self, mock_gemini, mock_hf, client, auth_headers, sample_text,
+        mock_huggingface_response, mock_gemini_response
+    ):
+        """Test that meta.spans stays empty unless asked for"""
+        mock_hf.return_value = mock_huggingface_response
+        mock_gemini.return_value = mock_gemini_response
+
+        response = client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+
+        assert response.json()["meta"]["spans"] is None
+
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_jsonl_export(
+        self, mock_gemini, mock_hf, client, auth_headers, sample_text,
+        mock_huggingface_response, mock_gemini_response, tmp_path
+    ):
+        """Test that finished traces are appended one span per line, with serialization and dependencies"""
+        from app.utils.tracing import JsonlSpanExporter
+
+        mock_hf.return_value = mock_huggingface_response
+        mock_gemini.return_value = mock_gemini_response
+        exporter = JsonlSpanExporter(str(tmp_path / "spans.jsonl"))
+
+        with patch('app.utils.tracing.span_exporter', exporter):
+            client.post("/analyze/", json={"text": sample_text}, headers=auth_headers)
+        exporter.close()
+
+        records = [json.loads(line) for line in (tmp_path / "spans.jsonl").read_text().splitlines()]
+        analyze = [r for r in records if r["trace"] == "POST /analyze/"]
+        names = {r["name"] for r in analyze}
+        assert {"request", "dependencies", "auth", "handler", "serialize", "pipeline"} <= names
+        assert len({r["trace_id"] for r in analyze}) == 1
+        [root] = [r for r in analyze if r["name"] == "request"]
+        assert root["parent_id"] is None
+        assert root["attrs"]["status"] == 200
+
+    @patch('app.routers.analyze.classify_text')
+    @patch('app.routers.analyze.analyze_text')
+    def test_tracing_disabled(
+        self, mock_gemini, mock_hf, client, auth_headers, sample_text,
+        mock_huggingface_response, mock_gemini_response
+    ):
+        """Test that requests still work, without spans, when TRACING_ENABLED is off"""
+        mock_hf.return_value = mock_huggingface_response
+        mock_gemini.return_value = mock_gemini_response
+
+        with patch('app.utils.tracing.TRACING_ENABLED', False):
+            response = client.post("/analyze/?verbose=true", json={"text": sample_text}, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.json()["meta"]["spans"] is None